@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк прореживания длинных ценовых рядов в графиках (core/charts.py)
+
+Для синтетических минутных свечей (10k -> 500k баров) строятся свечной график,
+кривая стоимости позиции и таблица-сканер без прореживания (max_points=None) и
+с бюджетами по умолчанию (core/decimation.py). Замеряются:
+- build  - построение go.Figure (включая прореживание);
+- json   - сериализация fig.to_json(), то, что st.plotly_chart отправляет в браузер;
+- размер Plotly JSON, КБ.
+
+Время отрисовки в браузере пропорционально числу точек в JSON; здесь оно
+оценивается серверной сериализацией, без headless-браузера.
+
+Использование:
+    python -m benchmarks.charts
+    python -m benchmarks.charts --sizes 10000,100000 --output data/interim/bench_charts.json
+"""
+
+import json
+import math
+import time
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from functools import partial
+from pathlib import Path
+
+import click
+import numpy as np
+import plotly.graph_objects as go
+
+from src.app.core.charts import candlestick_chart, equity_curve, scanner_table
+from src.app.core.decimation import CANDLE_BUDGET, LINE_BUDGET, SPARKLINE_BUDGET
+
+DEFAULT_SIZES = "10000,100000,500000"
+SCANNER_SYMBOLS = 10
+
+
+@dataclass
+class ChartBench:
+    chart: str
+    n: int
+    mode: str  # "full" или "decimated"
+    points: int
+    build_ms: float
+    json_ms: float
+    payload_kb: float
+
+
+def synthetic_bars(n: int, seed: int = 0) -> dict[str, np.ndarray]:
+    """Минутные свечи: геометрическое случайное блуждание цены"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 1e-3, n)))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    spread = np.abs(rng.normal(0, 5e-4, n)) * close
+    return {
+        "time": np.datetime64("2024-01-01T07:00", "ms") + np.arange(n) * np.timedelta64(60_000, "ms"),
+        "open": open_,
+        "high": np.maximum(open_, close) + spread,
+        "low": np.minimum(open_, close) - spread,
+        "close": close,
+        "volume": rng.integers(1, 10_000, n).astype(np.float64),
+    }
+
+
+def synthetic_trades(bars: dict[str, np.ndarray], symbol: str, count: int = 50) -> list[dict[str, str]]:
+    """Сделки счета по инструменту в случайные моменты ряда"""
+    rng = np.random.default_rng(1)
+    picks = np.sort(rng.choice(len(bars["close"]), size=min(count, len(bars["close"])), replace=False))
+    return [
+        {
+            "symbol": symbol,
+            "side": "SIDE_BUY" if i % 2 == 0 else "SIDE_SELL",
+            "size": "10",
+            "price": f"{bars['close'][p]:.2f}",
+            "timestamp": f"{bars['time'][p]}Z",
+        }
+        for i, p in enumerate(picks)
+    ]
+
+
+def chart_factories(n: int) -> dict[str, tuple[Callable[[int | None], go.Figure], int]]:
+    """Построители графиков на n свечах (аргумент - max_points) и их бюджеты по умолчанию"""
+    bars = synthetic_bars(n)
+    trades = synthetic_trades(bars, "SBER@MISX")
+    scanner = {f"T{i}@MISX": synthetic_bars(n // SCANNER_SYMBOLS, seed=i) for i in range(SCANNER_SYMBOLS)}
+    return {
+        "candles": (lambda max_points: candlestick_chart(bars, "SBER@MISX", max_points), CANDLE_BUDGET),
+        "equity": (lambda max_points: equity_curve(bars, trades, "SBER@MISX", max_points), LINE_BUDGET),
+        "scanner": (lambda max_points: scanner_table(scanner, max_points), SPARKLINE_BUDGET),
+    }
+
+
+def count_points(fig: go.Figure) -> int:
+    return sum(len(trace.x) for trace in fig.data if getattr(trace, "x", None) is not None)
+
+
+def measure(build: Callable[[], go.Figure], repeat: int) -> tuple[go.Figure, float, float, int]:
+    """Лучшее время построения и сериализации из repeat запусков: (fig, build, json, bytes)"""
+    best_build = best_json = math.inf
+    fig, payload = None, ""
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fig = build()
+        built = time.perf_counter()
+        payload = fig.to_json()
+        best_build = min(best_build, built - started)
+        best_json = min(best_json, time.perf_counter() - built)
+    return fig, best_build, best_json, len(payload.encode())  # type: ignore[return-value]
+
+
+@click.command()
+@click.option("--sizes", default=DEFAULT_SIZES, help="Число свечей через запятую")
+@click.option("--repeat", type=int, default=3, help="Повторов на замер (берется лучший)")
+@click.option("--output", type=click.Path(path_type=Path), default=None, help="Сохранить результаты в JSON")
+def main(sizes: str, repeat: int, output: Path | None) -> None:
+    """Бенчмарк прореживания рядов в графиках: до и после"""
+    results: list[ChartBench] = []
+    for n in sorted({int(v.replace("_", "")) for v in sizes.split(",") if v.strip()}):
+        for chart, (factory, budget) in chart_factories(n).items():
+            row = {}
+            for mode, max_points in (("full", None), ("decimated", budget)):
+                fig, build_s, json_s, size = measure(partial(factory, max_points), repeat if n < 100_000 else 1)
+                result = ChartBench(chart, n, mode, count_points(fig), build_s * 1000, json_s * 1000, size / 1024)
+                results.append(result)
+                row[mode] = result
+            full, dec = row["full"], row["decimated"]
+            click.echo(
+                f"📊 {chart:<8} n={n:<7} точек {full.points:>8} -> {dec.points:<6} "
+                f"JSON {full.payload_kb:>9.0f} -> {dec.payload_kb:>6.0f} КБ  "
+                f"build+json {full.build_ms + full.json_ms:>8.1f} -> {dec.build_ms + dec.json_ms:>6.1f} мс"
+            )
+
+    if output:
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps([asdict(r) for r in results], ensure_ascii=False, indent=2), encoding="utf-8")
+        click.echo(f"\n💾 Результаты сохранены в {output}")
+
+
+if __name__ == "__main__":
+    main()
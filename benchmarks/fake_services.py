@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+Локальные заглушки OpenRouter и Finam TradeAPI для офлайн бенчмарков
+
+Один HTTP сервер (stdlib, без внешних зависимостей) обслуживает:
+- POST /api/v1/chat/completions - OpenRouter-совместимый ответ со скриптованным
+  API запросом (по вопросу из train.csv, иначе rule-based сопоставление);
+  агентам smolagents (CodeAgent) отвечает кодом: менеджер делегирует вопрос
+  finam_agent, тот вызывает инструмент эндпоинта и возвращает API_REQUEST;
+- эндпоинты Finam TradeAPI из реестра ENDPOINTS (/v1/...) - синтетические,
+  детерминированные по символу JSON ответы.
+
+Для каждого сервиса настраиваются латентность, jitter и доля ошибок 5xx / 429.
+
+Использование:
+    python -m benchmarks.fake_services --port 8765 --llm-latency-ms 300 --error-rate 0.05
+
+    OPENROUTER_BASE=http://127.0.0.1:8765/api/v1 FINAM_API_BASE_URL=http://127.0.0.1:8765 \\
+        poetry run chat-cli
+"""
+
+import csv
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+from urllib.parse import unquote
+
+import click
+
+from src.app.adapters.finam_endpoints import RouteMatch, get_router, split_request
+from src.app.core.rule_matcher import match_question
+
+LLM_PATH = "/api/v1/chat/completions"
+
+QUESTION_RE = re.compile(r'^Вопрос: "(.*)"$', re.MULTILINE)
+
+# Подсказки, которые приложение дописывает к вопросу: символ "(SBER@MISX)" (ticker_resolver)
+# и интервал "(2025-09-22T00:00:00Z - 2025-09-28T23:59:59Z)" (temporal)
+ANNOTATION_RE = re.compile(
+    r" \((?:[A-Za-z][\w.\-]*@[A-Z]{3,6}|\d{4}-\d{2}-\d{2}T[\d:]+Z - \d{4}-\d{2}-\d{2}T[\d:]+Z)\)"
+)
+
+# Задача управляемого агента smolagents (prompt_templates["managed_agent"]["task"])
+MANAGED_TASK_RE = re.compile(r"You're a helpful agent named '(\w+)'.*?Task:\n(.*?)\n---", re.DOTALL)
+
+
+@dataclass
+class FaultConfig:
+    """Латентность и инъекция ошибок для одного сервиса"""
+
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+
+    def delay(self, rng: random.Random) -> float:
+        return max(0.0, self.latency_ms + rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+
+    def fault(self, rng: random.Random) -> int | None:
+        """HTTP статус инъецированной ошибки или None"""
+        roll = rng.random()
+        if roll < self.error_rate:
+            return 503
+        if roll < self.error_rate + self.rate_limit_rate:
+            return 429
+        return None
+
+
+@dataclass
+class FakeServicesConfig:
+    llm: FaultConfig = field(default_factory=FaultConfig)
+    finam: FaultConfig = field(default_factory=FaultConfig)
+    seed: int = 0
+    # Скриптованные ответы LLM: вопрос -> (type, request)
+    script: dict[str, tuple[str, str]] = field(default_factory=dict)
+
+
+def load_script(path: Path) -> dict[str, tuple[str, str]]:
+    """Загрузить скриптованные ответы из CSV с колонками question;type;request (train.csv)"""
+    with open(path, encoding="utf-8") as f:
+        return {row["question"]: (row["type"], row["request"]) for row in csv.DictReader(f, delimiter=";")}
+
+
+def extract_question(messages: list[dict[str, str]]) -> str:
+    """Вопрос пользователя из сообщений: последний 'Вопрос: "..."' в промпте или последнее сообщение"""
+    content = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+    questions = QUESTION_RE.findall(content)
+    return questions[-1] if questions else content.strip()
+
+
+def message_text(content: Any) -> str:  # noqa: ANN401
+    """Текст сообщения: строка или список частей OpenAI ({"type": "text", "text": ...})"""
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+
+def _route_slots(route: RouteMatch) -> dict[str, Any]:
+    """Значения параметров эндпоинта (имена как в реестре) из распознанного запроса"""
+    slots: dict[str, Any] = dict(route.path_params)
+    query = dict(route.query)
+    for param in route.endpoint.query_params:
+        if param.key in query:
+            value = query[param.key]
+            slots[param.name] = int(value) if param.type == "integer" and value.isdigit() else value
+    return slots
+
+
+class FakeLLM:
+    """Скриптованный OpenRouter: отвечает заранее известным API запросом"""
+
+    def __init__(self, script: dict[str, tuple[str, str]]) -> None:
+        self.script = script
+
+    def answer(self, question: str) -> tuple[str, str]:
+        question = ANNOTATION_RE.sub("", question)
+        if question in self.script:
+            # В эталоне путь иногда записан с префиксом метода ("GET /v1/...")
+            method, request = self.script[question]
+            return method, split_request(request)[1]
+        match = match_question(question)
+        return match.to_request() if match else ("GET", "/v1/assets")
+
+    def agent_step(self, messages: list[dict[str, Any]]) -> str:
+        """
+        Шаг CodeAgent: код в тегах <code>
+
+        Менеджер: делегировать вопрос finam_agent, затем вернуть его ответ.
+        Исполнитель: вызвать инструмент эндпоинта, затем вернуть API_REQUEST.
+        """
+        task = next((m["content"] for m in messages if m["role"] == "user"), "")
+        step = sum(m["role"] == "assistant" for m in messages)
+        managed = MANAGED_TASK_RE.search(task)
+        question = managed.group(2).strip() if managed else task.removeprefix("New task:\n").strip()
+
+        if not managed and "finam_agent" in messages[0]["content"]:
+            code = f"answer = finam_agent(task={question!r})\nprint(answer)" if step == 0 else "final_answer(answer)"
+            return f"Thought: Делегирую задачу finam_agent.\n<code>\n{code}\n</code>"
+
+        method, request = self.answer(question)
+        route = get_router().match(method, request)
+        if step == 0 and route is not None:
+            args = ", ".join(f"{name}={value!r}" for name, value in _route_slots(route).items())
+            code = f"result = finam_{route.endpoint.name}({args})\nprint(result)"
+        else:
+            code = f"final_answer({f'API_REQUEST: {method} {request}'!r})"
+        return f"Thought: Вызываю Finam TradeAPI.\n<code>\n{code}\n</code>"
+
+    def complete(self, payload: dict[str, Any]) -> dict[str, Any]:
+        messages = [{**m, "content": message_text(m.get("content"))} for m in payload.get("messages", [])]
+        last = messages[-1]["content"] if messages else ""
+        system = messages[0]["content"] if messages and messages[0]["role"] == "system" else ""
+
+        if "final_answer" in system and "<code>" in system:
+            content = self.agent_step(messages)
+        elif last.startswith("Результат API запроса"):
+            content = "Анализ: данные получены, ключевые показатели в норме."
+        else:
+            method, request = self.answer(extract_question(messages))
+            if payload.get("response_format"):
+                route = get_router().match(method, request)
+                data: dict[str, Any] = {"method": None, "path_template": None}
+                if route:
+                    data = {"method": route.method, "path_template": route.template, **_route_slots(route)}
+                content = json.dumps(data, ensure_ascii=False)
+            elif "Ответ (только HTTP метод" in last:
+                content = f"{method} {request}"
+            else:
+                content = f"API_REQUEST: {method} {request}\n\nВыполняю запрос."
+
+        prompt_tokens = sum(len(m.get("content", "")) for m in messages) // 4
+        return {
+            "id": "fake-completion",
+            "model": payload.get("model", "fake"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(content) // 4},
+        }
+
+
+def _seeded(*parts: str) -> random.Random:
+    """Детерминированный генератор по значениям параметров (одинаковые ответы на одинаковые запросы)"""
+    digest = hashlib.sha256("|".join(parts).encode()).digest()
+    return random.Random(int.from_bytes(digest[:8], "big"))
+
+
+def finam_payload(route: RouteMatch) -> dict[str, Any]:
+    """Синтетический ответ Finam TradeAPI для распознанного эндпоинта"""
+    params = route.path_params
+    symbol = params.get("symbol", "SBER@MISX")
+    rng = _seeded(route.endpoint.name, *params.values())
+    price = round(rng.uniform(10, 5000), 2)
+    name = route.endpoint.name
+
+    if name == "get_quote":
+        return {
+            "symbol": symbol,
+            "quote": {"bid": price - 0.1, "ask": price + 0.1, "last": price, "volume": rng.randint(1_000, 1_000_000)},
+        }
+    if name == "get_orderbook":
+        depth = int(dict(route.query).get("depth", 10))
+        return {
+            "symbol": symbol,
+            "orderbook": {
+                "rows": [
+                    {"price": round(price + (i - depth / 2) * 0.1, 2), "size": rng.randint(1, 500)}
+                    for i in range(depth)
+                ]
+            },
+        }
+    if name in {"get_candles", "get_latest_trades"}:
+        bars = []
+        for i in range(100):
+            price = round(price * (1 + rng.gauss(0, 0.01)), 2)
+            bars.append({
+                "timestamp": 1_700_000_000 + i * 86_400,
+                "open": price,
+                "high": round(price * 1.01, 2),
+                "low": round(price * 0.99, 2),
+                "close": price,
+                "volume": rng.randint(1_000, 100_000),
+            })
+        return {"symbol": symbol, "bars" if name == "get_candles" else "trades": bars}
+    if name == "get_account":
+        return {
+            "account_id": params.get("account_id"),
+            "equity": round(rng.uniform(10_000, 1_000_000), 2),
+            "positions": [
+                {"symbol": s, "quantity": rng.randint(1, 100), "current_price": round(rng.uniform(10, 500), 2)}
+                for s in ("SBER@MISX", "GAZP@MISX", "YNDX@MISX")
+            ],
+        }
+    if name == "get_assets":
+        return {"assets": [{"symbol": f"T{i:04d}@MISX", "name": f"Asset {i}"} for i in range(50)]}
+    return {"endpoint": name, **params, "status": "ok"}
+
+
+class FakeServices:
+    """Состояние заглушек: конфигурация, генератор ошибок и счетчики запросов"""
+
+    def __init__(self, config: FakeServicesConfig) -> None:
+        self.config = config
+        self.llm = FakeLLM(config.script)
+        self.stats: Counter[str] = Counter()
+        self._rng = random.Random(config.seed)
+        self._lock = threading.Lock()
+
+    def inject(self, service: str, faults: FaultConfig) -> int | None:
+        """Задержка и возможная ошибка для запроса к сервису"""
+        with self._lock:
+            self.stats[f"{service}_requests"] += 1
+            delay = faults.delay(self._rng)
+            status = faults.fault(self._rng)
+            if status is not None:
+                self.stats[f"{service}_errors_{status}"] += 1
+        time.sleep(delay)
+        return status
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "FakeServicesServer"
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: ANN401
+        pass
+
+    def do_GET(self) -> None:
+        self._handle("GET")
+
+    def do_POST(self) -> None:
+        self._handle("POST")
+
+    def do_DELETE(self) -> None:
+        self._handle("DELETE")
+
+    def _send(self, status: int, body: dict[str, Any]) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if status == 429:
+            self.send_header("Retry-After", "1")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self, method: str) -> None:
+        services = self.server.services
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+
+        if self.path.startswith(LLM_PATH):
+            if status := services.inject("llm", services.config.llm):
+                self._send(status, {"error": {"code": status, "message": "injected error"}})
+                return
+            self._send(200, services.llm.complete(json.loads(raw or b"{}")))
+            return
+
+        route = get_router().match(method, unquote(self.path))
+        if route is None:
+            services.stats["finam_not_found"] += 1
+            self._send(404, {"code": 5, "message": f"Unknown endpoint: {method} {self.path}"})
+            return
+        if status := services.inject("finam", services.config.finam):
+            self._send(status, {"code": 14, "message": "injected error"})
+            return
+        self._send(200, finam_payload(route))
+
+
+class FakeServicesServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], services: FakeServices) -> None:
+        super().__init__(address, _Handler)
+        self.services = services
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+@contextmanager
+def run_fake_services(
+    config: FakeServicesConfig, host: str = "127.0.0.1", port: int = 0
+) -> Iterator[FakeServicesServer]:
+    """Запустить заглушки в фоновом потоке (port=0 - свободный порт)"""
+    server = FakeServicesServer((host, port), FakeServices(config))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@click.command()
+@click.option("--host", default="127.0.0.1", help="Адрес сервера")
+@click.option("--port", type=int, default=8765, help="Порт сервера")
+@click.option(
+    "--script-file",
+    type=click.Path(exists=True, path_type=Path),
+    default="data/processed/train.csv",
+    help="CSV со скриптованными ответами LLM (question;type;request)",
+)
+@click.option("--llm-latency-ms", type=float, default=0.0, help="Латентность LLM, мс")
+@click.option("--finam-latency-ms", type=float, default=0.0, help="Латентность Finam API, мс")
+@click.option("--jitter-ms", type=float, default=0.0, help="Разброс латентности, мс")
+@click.option("--error-rate", type=float, default=0.0, help="Доля ответов 503")
+@click.option("--rate-limit-rate", type=float, default=0.0, help="Доля ответов 429")
+@click.option("--seed", type=int, default=0, help="Seed генератора ошибок и латентности")
+def main(
+    host: str,
+    port: int,
+    script_file: Path,
+    llm_latency_ms: float,
+    finam_latency_ms: float,
+    jitter_ms: float,
+    error_rate: float,
+    rate_limit_rate: float,
+    seed: int,
+) -> None:
+    """Запустить заглушки OpenRouter и Finam TradeAPI"""
+    config = FakeServicesConfig(
+        llm=FaultConfig(llm_latency_ms, jitter_ms, error_rate, rate_limit_rate),
+        finam=FaultConfig(finam_latency_ms, jitter_ms, error_rate, rate_limit_rate),
+        seed=seed,
+        script=load_script(script_file),
+    )
+    with run_fake_services(config, host, port) as server:
+        click.echo(f"🧪 Заглушки запущены на {server.base_url}")
+        click.echo(f"   OPENROUTER_BASE={server.base_url}/api/v1")
+        click.echo(f"   FINAM_API_BASE_URL={server.base_url}")
+        click.echo("   Ctrl+C для остановки")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            click.echo("\n📊 Запросы: " + ", ".join(f"{k}={v}" for k, v in sorted(server.services.stats.items())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк времени импорта / старта CLI
+
+Запускает `chat-cli --help` под `python -X importtime` в отдельном процессе,
+парсит отчет и сравнивает суммарное время импорта с целевым значением.
+Дополнительно проверяет, что тяжелые зависимости агента (smolagents, openai,
+Levenshtein, transliterate) не импортируются при старте.
+
+Использование:
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --target-ms 300 --runs 5 --top 15
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+import click
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Модули, которые не должны попадать в граф импорта при старте CLI
+FORBIDDEN_MODULES = ("smolagents", "openai", "Levenshtein", "transliterate", "huggingface_hub")
+
+DEFAULT_COMMAND = ["-m", "src.app.interfaces.chat_cli", "--help"]
+
+
+def run_importtime(command: list[str]) -> list[tuple[str, int, int]]:
+    """Запустить команду под -X importtime и вернуть [(module, self_us, cumulative_us)]"""
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join([str(ROOT), str(ROOT / "src")])}
+    # Чтобы get_settings() не падал без .env
+    env.setdefault("OPENROUTER_API_KEY", "benchmark")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", *command],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Command failed ({proc.returncode}): {proc.stderr[-2000:]}")
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, self_us, cumulative_us, name = line.replace("import time:", "|").split("|")
+        # Отступ в имени модуля отражает вложенность импорта, сохраняем его
+        rows.append((name[1:].rstrip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def total_import_ms(rows: list[tuple[str, int, int]]) -> float:
+    """Суммарное время импорта (сумма self-времени всех модулей), мс"""
+    return sum(self_us for _, self_us, _ in rows) / 1000
+
+
+@click.command()
+@click.option("--target-ms", type=float, default=300.0, help="Целевое время импорта для chat-cli --help, мс")
+@click.option("--runs", type=int, default=3, help="Количество прогонов (берется медиана)")
+@click.option("--top", type=int, default=10, help="Сколько самых медленных модулей показать")
+def main(target_ms: float, runs: int, top: int) -> None:
+    """Измерить время импорта при запуске chat-cli --help"""
+    timings = []
+    rows: list[tuple[str, int, int]] = []
+    for _ in range(runs):
+        rows = run_importtime(DEFAULT_COMMAND)
+        timings.append(total_import_ms(rows))
+
+    median_ms = statistics.median(timings)
+    click.echo(f"⏱  chat-cli --help: импорт {median_ms:.1f} мс (медиана из {runs}, цель {target_ms:.0f} мс)")
+
+    click.echo(f"\n🐢 Топ-{top} модулей по cumulative времени:")
+    top_level = [r for r in rows if not r[0].startswith(" ")]
+    for name, _, cumulative_us in sorted(top_level, key=lambda r: r[2], reverse=True)[:top]:
+        click.echo(f"   {cumulative_us / 1000:>8.1f} мс  {name}")
+
+    imported = {name.strip() for name, _, _ in rows}
+    leaked = sorted(m for m in imported if m.split(".")[0] in FORBIDDEN_MODULES)
+
+    failed = False
+    if leaked:
+        failed = True
+        click.echo(f"\n❌ При старте импортируются тяжелые модули: {', '.join(leaked[:10])}")
+    if median_ms > target_ms:
+        failed = True
+        click.echo(f"\n❌ Время импорта {median_ms:.1f} мс превышает цель {target_ms:.0f} мс")
+
+    if failed:
+        sys.exit(1)
+    click.echo("\n✅ Время старта в пределах цели")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Офлайн бенчмарк end-to-end сценариев на локальных заглушках
+
+Поднимает заглушки OpenRouter и Finam TradeAPI (benchmarks/fake_services.py)
+на свободном порту, направляет на них настройки приложения и прогоняет:
+- submission: generate_with_fallback по вопросам (как generate-submission);
+- chat: ход chat-cli (ответ LLM -> запрос к Finam API -> анализ результата);
+- agent: ход Streamlit чата через иерархию агентов smolagents
+  (manager_agent -> finam_agent -> инструмент), затем запрос и анализ;
+- routed: то же с intent router: простые вопросы - один вызов API и LLM;
+- cached: routed с семантическим кэшем ответов (core/response_cache.py), общим
+  для прогона: повторы вопросов (--questions больше числа вопросов в файле)
+  отвечаются из кэша в пределах TTL эндпоинта.
+
+Выводит throughput, латентность p50/p95/p99, долю ответов LLM и точность
+относительно скриптованных ответов. Сеть и ключи не нужны.
+
+Использование:
+    python -m benchmarks.offline_run
+    python -m benchmarks.offline_run --flow chat --questions 300 --workers 8 \\
+        --llm-latency-ms 200 --jitter-ms 50 --error-rate 0.05 --output bench.json
+    python -m benchmarks.offline_run --flow agent --flow routed --questions 100
+    python -m benchmarks.offline_run --flow routed --flow cached --questions 300
+"""
+
+import csv
+import io
+import json
+import os
+import statistics
+import time
+from collections import Counter
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext, redirect_stdout
+from pathlib import Path
+from typing import Any
+
+import click
+
+from benchmarks.fake_services import FakeServicesConfig, FaultConfig, load_script, run_fake_services
+
+FLOWS = ("submission", "chat", "agent", "routed", "cached")
+
+# Сценарии со smolagents: агенты печатают шаги в stdout, вывод подавляется
+AGENT_FLOWS = ("agent", "routed", "cached")
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Перцентиль по отсортированным значениям (nearest rank)"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def same_request(got: tuple[str, str], expected: tuple[str, str]) -> bool:
+    """Совпадение запросов после нормализации роутером (в эталоне путь бывает с префиксом метода)"""
+    from src.app.adapters.finam_endpoints import get_router, split_request
+
+    def canonical(method: str, request: str) -> tuple[str, str]:
+        path = split_request(request)[1]
+        return get_router().normalize(method, path) or (method, path)
+
+    return canonical(*got) == canonical(*expected)
+
+
+def configure_app(base_url: str) -> None:
+    """Направить настройки приложения на заглушки"""
+    from src.app.core.config import get_settings
+
+    os.environ["OPENROUTER_BASE"] = f"{base_url}/api/v1"
+    os.environ["OPENROUTER_API_KEY"] = "offline-benchmark"
+    os.environ["FINAM_API_BASE_URL"] = base_url
+    os.environ["FINAM_ACCESS_TOKEN"] = "offline-benchmark"
+    get_settings.cache_clear()
+
+
+def submission_flow(examples: list[dict[str, str]], policy: Any, budget: Any) -> Callable[[dict], bool]:  # noqa: ANN401
+    """Сценарий generate-submission: вопрос -> (type, request) с retry и fallback"""
+    from scripts.generate_submission import generate_api_call, generate_with_fallback
+    from src.app.core.config import get_settings
+
+    model = get_settings().openrouter_model
+
+    def run(item: dict[str, str]) -> bool:
+        api_call, _, source, _ = generate_with_fallback(
+            item["question"],
+            lambda question: generate_api_call(question, examples, model, policy=policy),
+            examples,
+            budget,
+            policy,
+        )
+        item["source"] = source
+        return same_request((api_call["type"], api_call["request"]), (item["type"], item["request"]))
+
+    return run
+
+
+def chat_flow() -> Callable[[dict], bool]:
+    """Сценарий chat-cli: ответ ассистента -> запрос к Finam API -> финальный анализ"""
+    from src.app.adapters import FinamAPIClient
+    from src.app.core import call_llm
+    from src.app.interfaces.chat_cli import create_system_prompt, get_assistant_reply
+
+    system_prompt = create_system_prompt()
+
+    def run(item: dict[str, str]) -> bool:
+        client = FinamAPIClient()
+        history = [{"role": "system", "content": system_prompt}, {"role": "user", "content": item["question"]}]
+        assistant_message, method, path = get_assistant_reply(history, structured=False)
+        item["source"] = "llm"
+        if not (method and path):
+            return False
+        api_response = client.execute_request(method, path)
+        history.append({"role": "assistant", "content": assistant_message})
+        history.append({"role": "user", "content": f"Результат API запроса: {api_response}\n\nПроанализируй это."})
+        call_llm(history, temperature=0.3)
+        return "error" not in api_response and same_request((method, path), (item["type"], item["request"]))
+
+    return run
+
+
+def agent_flow(route: bool, cache: bool = False) -> Callable[[dict], bool]:
+    """
+    Сценарий Streamlit чата: иерархия агентов
+
+    С route=True сначала intent router, с cache=True перед ним кэш ответов.
+    """
+    from src.app.adapters import FinamAPIClient
+    from src.app.core import call_llm, call_smolagents
+    from src.app.core.intent_router import answer_routed, route_question
+    from src.app.core.response_cache import ResponseCache
+    from src.app.interfaces.chat_cli import create_system_prompt, extract_api_request
+
+    system_prompt = create_system_prompt()
+    response_cache = ResponseCache() if cache else None
+
+    def run(item: dict[str, str]) -> bool:
+        client = FinamAPIClient()
+        expected = (item["type"], item["request"])
+        history = [{"role": "system", "content": system_prompt}, {"role": "user", "content": item["question"]}]
+        routed = route_question(item["question"]) if route else None
+        cached = response_cache.lookup(routed) if response_cache is not None and routed else None
+        if cached is not None:
+            item["source"] = "cache"
+            return same_request((cached.method, cached.path), expected)
+        if routed is not None:
+            item["source"] = "router"
+            started = time.perf_counter()
+            answer = answer_routed(routed, client, history)
+            if response_cache is not None:
+                response_cache.store(routed, answer.response, time.perf_counter() - started)
+            return "error" not in answer.response and same_request((answer.method, answer.path), expected)
+
+        item["source"] = "llm"
+        result = call_smolagents(history, temperature=0.3)
+        method, path = extract_api_request(str(result.output))
+        if not (method and path):
+            return False
+        api_response = client.execute_request(method, path)
+        history.append({"role": "assistant", "content": str(result.output)})
+        history.append({"role": "user", "content": f"Результат API запроса: {api_response}\n\nПроанализируй это."})
+        call_llm(history, temperature=0.3)
+        return "error" not in api_response and same_request((method, path), expected)
+
+    return run
+
+
+def run_flow(run: Callable[[dict], bool], items: list[dict[str, str]], workers: int) -> dict[str, Any]:
+    """Прогнать сценарий по вопросам и собрать метрики"""
+    latencies: list[float] = []
+    correct = 0
+    errors = 0
+
+    def timed(item: dict[str, str]) -> tuple[bool, float, bool]:
+        started = time.perf_counter()
+        try:
+            ok, failed = run(item), False
+        except Exception:
+            ok, failed = False, True
+        return ok, time.perf_counter() - started, failed
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for ok, latency, failed in pool.map(timed, items):
+            latencies.append(latency)
+            correct += ok
+            errors += failed
+    wall = time.perf_counter() - started
+    by_source: dict[str, list[float]] = {}
+    for item, latency in zip(items, latencies, strict=True):
+        by_source.setdefault(item.get("source", "none"), []).append(latency)
+
+    return {
+        "questions": len(items),
+        "wall_s": round(wall, 3),
+        "throughput_qps": round(len(items) / wall, 2) if wall else 0.0,
+        "latency_ms": {
+            "p50": round(statistics.median(latencies) * 1000, 2),
+            "p95": round(percentile(latencies, 0.95) * 1000, 2),
+            "p99": round(percentile(latencies, 0.99) * 1000, 2),
+            "max": round(max(latencies) * 1000, 2),
+        },
+        "accuracy": round(correct / len(items), 4),
+        "llm_share": round(sum(item.get("source") == "llm" for item in items) / len(items), 4),
+        "sources": dict(Counter(item.get("source", "none") for item in items)),
+        "latency_ms_by_source": {
+            source: {
+                "p50": round(statistics.median(values) * 1000, 2),
+                "p95": round(percentile(values, 0.95) * 1000, 2),
+            }
+            for source, values in by_source.items()
+        },
+        "exceptions": errors,
+    }
+
+
+@click.command()
+@click.option(
+    "--flow",
+    type=click.Choice([*FLOWS, "all"]),
+    multiple=True,
+    default=["all"],
+    help="Сценарий бенчмарка (можно указать несколько раз)",
+)
+@click.option(
+    "--questions-file",
+    type=click.Path(exists=True, path_type=Path),
+    default="data/processed/train.csv",
+    help="Вопросы с эталонными ответами (question;type;request), они же скрипт заглушки LLM",
+)
+@click.option("--questions", type=int, default=100, help="Количество вопросов (циклически повторяются)")
+@click.option("--workers", type=int, default=4, help="Параллельных вопросов")
+@click.option("--llm-latency-ms", type=float, default=50.0, help="Латентность заглушки LLM, мс")
+@click.option("--finam-latency-ms", type=float, default=10.0, help="Латентность заглушки Finam API, мс")
+@click.option("--jitter-ms", type=float, default=10.0, help="Разброс латентности, мс")
+@click.option("--error-rate", type=float, default=0.0, help="Доля ответов 503")
+@click.option("--rate-limit-rate", type=float, default=0.0, help="Доля ответов 429")
+@click.option("--max-attempts", type=int, default=4, help="Попыток на вызов LLM")
+@click.option("--seed", type=int, default=0, help="Seed латентности и ошибок")
+@click.option("--output", type=click.Path(path_type=Path), default=None, help="Сохранить результаты в JSON")
+def main(
+    flow: tuple[str, ...],
+    questions_file: Path,
+    questions: int,
+    workers: int,
+    llm_latency_ms: float,
+    finam_latency_ms: float,
+    jitter_ms: float,
+    error_rate: float,
+    rate_limit_rate: float,
+    max_attempts: int,
+    seed: int,
+    output: Path | None,
+) -> None:
+    """Офлайн бенчмарк generate-submission и chat-cli на заглушках"""
+    with open(questions_file, encoding="utf-8") as f:
+        rows = list(csv.DictReader(f, delimiter=";"))
+    config = FakeServicesConfig(
+        llm=FaultConfig(llm_latency_ms, jitter_ms, error_rate, rate_limit_rate),
+        finam=FaultConfig(finam_latency_ms, jitter_ms, error_rate, rate_limit_rate),
+        seed=seed,
+        script=load_script(questions_file),
+    )
+
+    results: dict[str, Any] = {
+        "config": {
+            "questions": questions,
+            "workers": workers,
+            "llm_latency_ms": llm_latency_ms,
+            "finam_latency_ms": finam_latency_ms,
+            "jitter_ms": jitter_ms,
+            "error_rate": error_rate,
+            "rate_limit_rate": rate_limit_rate,
+            "max_attempts": max_attempts,
+            "seed": seed,
+        },
+        "flows": {},
+    }
+
+    with run_fake_services(config) as server:
+        configure_app(server.base_url)
+        from scripts.generate_submission import load_train_examples
+        from src.app.core.retry import FailureBudget, RetryPolicy
+
+        click.echo(f"🧪 Заглушки OpenRouter / Finam API на {server.base_url}")
+        examples = load_train_examples(questions_file)
+        # Короткие задержки между попытками, чтобы ошибки не доминировали во времени прогона
+        policy = RetryPolicy(max_attempts=max_attempts, base_delay=0.05, max_delay=0.5, timeout=30.0)
+
+        for name in FLOWS if "all" in flow else dict.fromkeys(flow):
+            items = [dict(rows[i % len(rows)]) for i in range(questions)]
+            if name == "submission":
+                run = submission_flow(examples, policy, FailureBudget(questions))
+            elif name in AGENT_FLOWS:
+                run = agent_flow(route=name in {"routed", "cached"}, cache=name == "cached")
+            else:
+                run = chat_flow()
+            with redirect_stdout(io.StringIO()) if name in AGENT_FLOWS else nullcontext():
+                metrics = run_flow(run, items, workers)
+            results["flows"][name] = metrics
+            click.echo(
+                f"\n⚙️  {name}: {metrics['throughput_qps']} вопр/с, "
+                f"p50 {metrics['latency_ms']['p50']} мс, p95 {metrics['latency_ms']['p95']} мс, "
+                f"accuracy {metrics['accuracy']:.2%}, ответов LLM {metrics['llm_share']:.2%}"
+            )
+            if len(metrics["latency_ms_by_source"]) > 1:
+                for source, latency in metrics["latency_ms_by_source"].items():
+                    click.echo(f"     {source}: p50 {latency['p50']} мс, p95 {latency['p95']} мс")
+        results["server"] = dict(server.services.stats)
+
+    click.echo("\n📊 Запросы к заглушкам: " + ", ".join(f"{k}={v}" for k, v in sorted(results["server"].items())))
+    if output:
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+        click.echo(f"💾 Результаты сохранены в {output}")
+
+
+if __name__ == "__main__":
+    main()
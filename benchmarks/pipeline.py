@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк пайплайна генерация -> валидация -> метрики на синтетических данных
+
+Замеряет, как масштабируются по размеру данных:
+- create_prompt / parse_llm_response (scripts/generate_submission.py);
+- FinamAPIClient.find_asset_name (число активов);
+- load_csv / calculate_accuracy / calculate_accuracy_vectorized (scripts/calculate_metrics.py);
+- evaluate.evaluate (scripts/evaluate.py);
+- FinamAPIToolkit.get_tools (построение инструментов агента).
+
+Синтетические датасеты (100 -> 1M строк, 1k -> 100k активов) строятся из реестра
+эндпоинтов. Результаты сохраняются в JSON; при --baseline выводится сравнение
+с прошлым прогоном. Для каждого бенчмарка считается показатель масштабирования
+(наклон log(time) / log(n)): заметно больше 1 - суперлинейный рост.
+
+Использование:
+    python -m benchmarks.pipeline --output data/interim/bench_pipeline.json
+    python -m benchmarks.pipeline --rows 100,10000 --assets 1000 --only calculate_accuracy,evaluate
+    python -m benchmarks.pipeline --baseline data/interim/bench_pipeline.json
+"""
+
+import csv
+import json
+import math
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+import click
+
+from src.app.adapters.finam_endpoints import ENDPOINTS, TIMEFRAMES
+
+DEFAULT_ROWS = "100,1000,10000,100000,1000000"
+DEFAULT_ASSETS = "1000,10000,100000"
+
+# Показатель масштабирования, начиная с которого рост считается суперлинейным
+SUPERLINEAR_SLOPE = 1.25
+
+
+@dataclass
+class BenchResult:
+    name: str
+    n: int
+    seconds: float
+    per_item_us: float
+
+
+def synthetic_assets(n: int, seed: int = 0) -> list[dict[str, str]]:
+    """Синтетический справочник активов {symbol, name}"""
+    rng = random.Random(seed)
+    letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    assets = []
+    for i in range(n):
+        ticker = "".join(rng.choices(letters, k=4)) + str(i)
+        assets.append({"symbol": f"{ticker}@MISX", "name": f"Company {ticker.title()} PAO"})
+    return assets
+
+
+def synthetic_rows(n: int, seed: int = 0) -> list[dict[str, str]]:
+    """Синтетические размеченные вопросы {uid, question, type, request} по реестру эндпоинтов"""
+    rng = random.Random(seed)
+    symbols = [a["symbol"] for a in synthetic_assets(200, seed)]
+    endpoints = [ep for ep in ENDPOINTS if ep.method != "POST"]
+    rows = []
+    for i in range(n):
+        endpoint = rng.choice(endpoints)
+        slots: dict[str, Any] = {
+            "symbol": rng.choice(symbols),
+            "account_id": f"ACC-{rng.randint(1, 999):03d}-A",
+            "order_id": f"ORD{rng.randint(100000, 999999)}",
+        }
+        if any(p.name == "timeframe" for p in endpoint.params):
+            slots["timeframe"] = rng.choice(TIMEFRAMES)
+        slots = {k: v for k, v in slots.items() if any(p.name == k for p in endpoint.params)}
+        rows.append({
+            "uid": f"{i:08x}",
+            "question": f"{endpoint.summary} {' '.join(map(str, slots.values()))}",
+            "type": endpoint.method,
+            "request": endpoint.format_path(**slots),
+        })
+    return rows
+
+
+def corrupt(rows: list[dict[str, str]], rate: float = 0.2, seed: int = 1) -> list[dict[str, str]]:
+    """Предсказания: копия эталона, где доля rate строк испорчена (метод или путь)"""
+    rng = random.Random(seed)
+    predicted = []
+    for row in rows:
+        row = {"uid": row["uid"], "type": row["type"], "request": row["request"]}
+        if rng.random() < rate:
+            if rng.random() < 0.5:
+                row["type"] = "POST" if row["type"] == "GET" else "GET"
+            else:
+                row["request"] = row["request"].replace("@MISX", "@RTSX")
+        predicted.append(row)
+    return predicted
+
+
+def write_csv(path: Path, rows: list[dict[str, str]], fieldnames: list[str]) -> Path:
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, delimiter=";", extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+    return path
+
+
+def measure(fn: Callable[[], object], repeat: int) -> float:
+    """Лучшее время из repeat запусков, сек"""
+    best = math.inf
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+# Бенчмарки: имя -> (ось масштабирования, максимальный размер, фабрика замера)
+# Фабрика получает n и временную директорию и возвращает функцию без аргументов.
+
+
+def bench_create_prompt(n: int, _: Path) -> Callable[[], object]:
+    from scripts.generate_submission import create_prompt
+
+    examples = synthetic_rows(n)
+    return lambda: create_prompt("Какая цена SBER@MISX?", examples)
+
+
+def bench_parse_llm_response(n: int, _: Path) -> Callable[[], object]:
+    from scripts.generate_submission import parse_llm_response
+
+    responses = [f"{row['type']} {row['request']}" for row in synthetic_rows(n)]
+    return lambda: [parse_llm_response(r) for r in responses]
+
+
+def bench_find_asset_name(n: int, _: Path) -> Callable[[], object]:
+    from src.app.adapters.finam_client import FinamAPIClient
+
+    assets = {"assets": synthetic_assets(n)}
+
+    class InMemoryAssetsClient(FinamAPIClient):
+        """Справочник активов из памяти вместо запроса к API"""
+
+        def execute_request(self, method: str, path: str, **kwargs: Any) -> dict[str, Any]:  # noqa: ANN401, ARG002
+            return assets
+
+    client = InMemoryAssetsClient(access_token="benchmark", base_url="http://localhost")
+    return lambda: client.find_asset_name("сбербанк")
+
+
+def bench_load_csv(n: int, tmp: Path) -> Callable[[], object]:
+    from scripts.calculate_metrics import load_csv
+
+    path = write_csv(tmp / f"true_{n}.csv", synthetic_rows(n), ["uid", "question", "type", "request"])
+    return lambda: load_csv(path)
+
+
+def bench_calculate_accuracy(n: int, _: Path) -> Callable[[], object]:
+    from scripts.calculate_metrics import calculate_accuracy
+
+    rows = synthetic_rows(n)
+    truth = {r["uid"]: {"type": r["type"], "request": r["request"]} for r in rows}
+    predicted = {r["uid"]: {"type": r["type"], "request": r["request"]} for r in corrupt(rows)}
+    return lambda: calculate_accuracy(predicted, truth)
+
+
+def bench_calculate_accuracy_vectorized(n: int, tmp: Path) -> Callable[[], object]:
+    from scripts.calculate_metrics import calculate_accuracy_vectorized
+
+    rows = synthetic_rows(n)
+    fields = ["uid", "type", "request"]
+    truth = write_csv(tmp / f"vec_true_{n}.csv", rows, fields)
+    predicted = write_csv(tmp / f"vec_pred_{n}.csv", corrupt(rows), fields)
+    # Включая загрузку CSV и разбивку по шаблонам эндпоинтов
+    return lambda: calculate_accuracy_vectorized(predicted, truth, by_template=True)
+
+
+def bench_evaluate(n: int, tmp: Path) -> Callable[[], object]:
+    from scripts.evaluate import evaluate
+
+    rows = synthetic_rows(n)
+    fields = ["uid", "type", "request"]
+    submission = write_csv(tmp / f"submission_{n}.csv", corrupt(rows), fields)
+    public = write_csv(tmp / f"public_{n}.csv", rows[: n // 2], fields)
+    private = write_csv(tmp / f"private_{n}.csv", rows[n // 2 :], fields)
+    return lambda: evaluate(str(submission), str(private), str(public))
+
+
+def bench_toolkit(n: int, _: Path) -> Callable[[], object]:
+    from src.app.adapters.finam_client import FinamAPIClient
+    from src.app.core.smolagents_wrapper import FinamAPIToolkit
+
+    toolkit = FinamAPIToolkit(FinamAPIClient(access_token="benchmark", base_url="http://localhost"))
+    return lambda: [toolkit.get_tools() for _ in range(n)]
+
+
+BENCHMARKS: dict[str, tuple[str, int, Callable[[int, Path], Callable[[], object]]]] = {
+    "create_prompt": ("rows", 100_000, bench_create_prompt),
+    "parse_llm_response": ("rows", 1_000_000, bench_parse_llm_response),
+    "find_asset_name": ("assets", 100_000, bench_find_asset_name),
+    "load_csv": ("rows", 1_000_000, bench_load_csv),
+    "calculate_accuracy": ("rows", 1_000_000, bench_calculate_accuracy),
+    "calculate_accuracy_vectorized": ("rows", 1_000_000, bench_calculate_accuracy_vectorized),
+    "evaluate": ("rows", 1_000_000, bench_evaluate),
+    # n - количество сборок набора инструментов
+    "toolkit_get_tools": ("rows", 1_000, bench_toolkit),
+}
+
+
+def scaling_slopes(results: list[BenchResult]) -> dict[str, float]:
+    """Наклон log(time)/log(n) между минимальным и максимальным размером для каждого бенчмарка"""
+    slopes = {}
+    for name in dict.fromkeys(r.name for r in results):
+        points = sorted((r.n, r.seconds) for r in results if r.name == name and r.seconds > 0)
+        if len(points) >= 2 and points[-1][0] > points[0][0]:
+            (n0, t0), (n1, t1) = points[0], points[-1]
+            slopes[name] = round(math.log(t1 / t0) / math.log(n1 / n0), 3)
+    return slopes
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_with_baseline(results: list[BenchResult], baseline_path: Path, threshold: float) -> bool:
+    """Вывести сравнение с прошлым прогоном; вернуть True, если есть регрессии"""
+    baseline = {(r["name"], r["n"]): r["seconds"] for r in json.loads(baseline_path.read_text())["results"]}
+    regressed = False
+    click.echo(f"\n🔁 Сравнение с {baseline_path}:")
+    for r in results:
+        before = baseline.get((r.name, r.n))
+        if not before:
+            continue
+        ratio = r.seconds / before
+        mark = "❌" if ratio > 1 + threshold else "✅"
+        regressed |= ratio > 1 + threshold
+        click.echo(
+            f"   {mark} {r.name:<20} n={r.n:<9} {before * 1000:>10.2f} -> {r.seconds * 1000:>10.2f} мс  x{ratio:.2f}"
+        )
+    return regressed
+
+
+def parse_sizes(value: str) -> list[int]:
+    return sorted({int(v.replace("_", "")) for v in value.split(",") if v.strip()})
+
+
+@click.command()
+@click.option("--rows", default=DEFAULT_ROWS, help="Размеры датасетов вопросов через запятую")
+@click.option("--assets", default=DEFAULT_ASSETS, help="Размеры справочника активов через запятую")
+@click.option("--only", default=None, help=f"Только указанные бенчмарки через запятую ({', '.join(BENCHMARKS)})")
+@click.option("--repeat", type=int, default=3, help="Повторов на замер (берется лучший)")
+@click.option("--output", type=click.Path(path_type=Path), default=None, help="Сохранить результаты в JSON")
+@click.option("--baseline", type=click.Path(exists=True, path_type=Path), default=None, help="JSON прошлого прогона")
+@click.option("--threshold", type=float, default=0.2, help="Допустимое замедление относительно baseline (0.2 = 20%)")
+def main(
+    rows: str,
+    assets: str,
+    only: str | None,
+    repeat: int,
+    output: Path | None,
+    baseline: Path | None,
+    threshold: float,
+) -> None:
+    """Бенчмарк пайплайна генерация -> валидация -> метрики"""
+    sizes = {"rows": parse_sizes(rows), "assets": parse_sizes(assets)}
+    selected = [name.strip() for name in only.split(",")] if only else list(BENCHMARKS)
+    unknown = set(selected) - set(BENCHMARKS)
+    if unknown:
+        raise click.BadParameter(f"Неизвестные бенчмарки: {', '.join(sorted(unknown))}", param_hint="--only")
+
+    results: list[BenchResult] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in selected:
+            axis, max_n, factory = BENCHMARKS[name]
+            for n in sizes[axis]:
+                if n > max_n:
+                    continue
+                fn = factory(n, Path(tmp))
+                seconds = measure(fn, repeat if n < 100_000 else 1)
+                result = BenchResult(name, n, seconds, seconds / n * 1e6)
+                results.append(result)
+                click.echo(f"⏱  {name:<20} n={n:<9} {seconds * 1000:>10.2f} мс  ({result.per_item_us:.2f} мкс/элемент)")
+
+    slopes = scaling_slopes(results)
+    click.echo("\n📈 Масштабирование (наклон log(time)/log(n), 1.0 = линейно):")
+    for name, slope in sorted(slopes.items(), key=lambda item: item[1], reverse=True):
+        mark = "⚠️ " if slope > SUPERLINEAR_SLOPE else "  "
+        click.echo(f"   {mark}{name:<20} {slope:.2f}")
+
+    if output:
+        output.parent.mkdir(parents=True, exist_ok=True)
+        report = {
+            "meta": {
+                "timestamp": datetime.now(UTC).isoformat(timespec="seconds"),
+                "git": git_revision(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+            },
+            "results": [asdict(r) for r in results],
+            "slopes": slopes,
+        }
+        output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        click.echo(f"\n💾 Результаты сохранены в {output}")
+
+    if baseline and compare_with_baseline(results, baseline, threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
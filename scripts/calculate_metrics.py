@@ -21,14 +21,41 @@
 
     # С отображением ошибок
     poetry run calculate-metrics --show-errors 5
+
+    # Потоковый режим для файлов на миллионы строк (ограниченная память)
+    poetry run calculate-metrics --streaming --pred big_pred.csv --true big_true.csv
+
+    # Векторизованный расчет (NumPy) с разбивкой по шаблонам эндпоинтов
+    poetry run calculate-metrics --backend vectorized --by-template
+
+    # Отчет об ошибках по шаблонам: матрица ошибок, слоты, HTML + CSV
+    poetry run calculate-metrics --report data/interim/error_report
 """
 
 import csv
 from pathlib import Path
-from typing import Optional
 
 import click
 
+try:
+    from scripts.streaming import (
+        DEFAULT_BUCKET_ROWS,
+        DEFAULT_ERROR_SAMPLE,
+        ErrorReservoir,
+        bucket_count,
+        iter_buckets,
+        partition_files,
+    )
+except ImportError:  # запуск как python scripts/calculate_metrics.py без корня проекта в PYTHONPATH
+    from streaming import (  # type: ignore[no-redef]
+        DEFAULT_BUCKET_ROWS,
+        DEFAULT_ERROR_SAMPLE,
+        ErrorReservoir,
+        bucket_count,
+        iter_buckets,
+        partition_files,
+    )
+
 
 def load_csv(file_path: Path) -> dict[str, dict[str, str]]:
     """Загрузить CSV файл в словарь {uid: {type, request}}"""
@@ -113,7 +140,20 @@ def calculate_accuracy(
     type_accuracy = correct_type / total if total > 0 else 0.0
     request_accuracy = correct_request / total if total > 0 else 0.0
 
-    # Рассчитываем precision, recall, f1 для каждого типа
+    return accuracy, {
+        "total": total,
+        "correct": correct,
+        "correct_type": correct_type,
+        "correct_request": correct_request,
+        "type_accuracy": type_accuracy,
+        "request_accuracy": request_accuracy,
+        "errors": errors,
+        "type_stats": type_scores(type_stats),
+    }
+
+
+def type_scores(type_stats: dict[str, dict[str, int]]) -> dict[str, dict[str, float]]:
+    """Рассчитать precision, recall, f1 для каждого типа по счетчикам tp/fp/fn"""
     detailed_type_stats = {}
     for method, stats in type_stats.items():
         tp = stats["tp"]
@@ -132,16 +172,111 @@ def calculate_accuracy(
             "recall": recall,
             "f1": f1,
         }
+    return detailed_type_stats
+
+
+def calculate_accuracy_vectorized(
+    pred_file: Path, true_file: Path, by_template: bool = False, max_errors: int | None = None
+) -> tuple[float, dict]:
+    """
+    Векторизованный вариант calculate_accuracy (NumPy, см. scripts/columnar.py)
 
+    Файлы загружаются в колонки и сравниваются операциями над массивами, что
+    на порядок быстрее цикла по uid на файлах в миллионы строк. С by_template
+    в "templates" добавляется accuracy по шаблонам эндпоинтов
+    (GET /v1/instruments/{symbol}/quotes/latest, .../bars, ...).
+
+    Returns:
+        tuple: (accuracy, detailed_stats) в формате calculate_accuracy
+    """
+    try:
+        from scripts.columnar import compare_columns, load_pair
+    except ImportError:  # запуск как python scripts/calculate_metrics.py без корня проекта в PYTHONPATH
+        from columnar import compare_columns, load_pair  # type: ignore[no-redef]
+
+    stats = compare_columns(load_pair(pred_file, true_file), by_template, max_errors)
+    stats["type_stats"] = type_scores(stats["type_stats"])
+    accuracy = stats["correct"] / stats["total"] if stats["total"] > 0 else 0.0
+    return accuracy, stats
+
+
+def calculate_accuracy_streaming(
+    pred_file: Path,
+    true_file: Path,
+    bucket_rows: int = DEFAULT_BUCKET_ROWS,
+    error_sample: int = DEFAULT_ERROR_SAMPLE,
+    seed: int = 0,
+) -> tuple[float, dict]:
+    """
+    Потоковый вариант calculate_accuracy для очень больших файлов
+
+    Файлы раскладываются по бакетам на диске (hash по uid) и сравниваются
+    побакетно, поэтому память ограничена размером одного бакета. Вместо всех
+    ошибок возвращается равномерная выборка из error_sample штук, общее
+    количество ошибок - в "error_count".
+
+    Returns:
+        tuple: (accuracy, detailed_stats) в формате calculate_accuracy
+    """
+    total = correct = correct_type = correct_request = 0
+    reservoir = ErrorReservoir(error_sample, seed)
+    type_stats = {method: {"tp": 0, "fp": 0, "fn": 0} for method in ("GET", "POST", "DELETE")}
+
+    buckets = bucket_count([pred_file, true_file], bucket_rows)
+    with partition_files({"pred": pred_file, "true": true_file}, buckets, strip=False) as tmp_dir:
+        for bucket in iter_buckets(tmp_dir, ["pred", "true"], buckets):
+            predicted = bucket["pred"]
+            for uid, (true_type, true_request) in bucket["true"].items():
+                total += 1
+                if uid not in predicted:
+                    reservoir.add({
+                        "uid": uid,
+                        "error": "missing",
+                        "true_type": true_type,
+                        "true_request": true_request,
+                        "pred_type": None,
+                        "pred_request": None,
+                    })
+                    type_stats[true_type]["fn"] += 1
+                    continue
+
+                pred_type, pred_request = predicted[uid]
+                type_match = true_type == pred_type
+                request_match = true_request == pred_request
+                correct_type += type_match
+                correct_request += request_match
+
+                if type_match and request_match:
+                    correct += 1
+                    type_stats[true_type]["tp"] += 1
+                    continue
+
+                reservoir.add({
+                    "uid": uid,
+                    "error": "mismatch",
+                    "true_type": true_type,
+                    "true_request": true_request,
+                    "pred_type": pred_type,
+                    "pred_request": pred_request,
+                    "type_match": "yes" if type_match else "no",
+                    "request_match": "yes" if request_match else "no",
+                })
+                if not type_match:
+                    type_stats[true_type]["fn"] += 1
+                    if pred_type in type_stats:
+                        type_stats[pred_type]["fp"] += 1
+
+    accuracy = correct / total if total > 0 else 0.0
     return accuracy, {
         "total": total,
         "correct": correct,
         "correct_type": correct_type,
         "correct_request": correct_request,
-        "type_accuracy": type_accuracy,
-        "request_accuracy": request_accuracy,
-        "errors": errors,
-        "type_stats": detailed_type_stats,
+        "type_accuracy": correct_type / total if total > 0 else 0.0,
+        "request_accuracy": correct_request / total if total > 0 else 0.0,
+        "errors": sorted(reservoir.items, key=lambda e: e["uid"]),
+        "error_count": reservoir.seen,
+        "type_stats": type_scores(type_stats),
     }
 
 
@@ -170,9 +305,45 @@ def calculate_accuracy(
     "--save-errors",
     type=click.Path(path_type=Path),
     default=None,
-    help="Сохранить все ошибки в CSV файл",
+    help="Сохранить все ошибки в CSV файл (в потоковом режиме - выборку ошибок)",
+)
+@click.option(
+    "--streaming",
+    is_flag=True,
+    help="Потоковый режим с ограниченной памятью: hash join по uid на диске, выборка ошибок",
+)
+@click.option("--bucket-rows", type=int, default=DEFAULT_BUCKET_ROWS, help="Строк в бакете в потоковом режиме")
+@click.option("--error-sample", type=int, default=DEFAULT_ERROR_SAMPLE, help="Размер выборки ошибок в потоковом режиме")
+@click.option(
+    "--backend",
+    type=click.Choice(["python", "vectorized"]),
+    default="python",
+    help="Реализация расчета: цикл по uid или векторизованная (NumPy)",
+)
+@click.option(
+    "--by-template",
+    is_flag=True,
+    help="Accuracy по шаблонам эндпоинтов (включает векторизованный расчет)",
+)
+@click.option(
+    "--report",
+    "report_dir",
+    type=click.Path(path_type=Path),
+    default=None,
+    help="Сохранить отчет об ошибках по шаблонам (report.html, templates/confusion/slots.csv) в директорию",
 )
-def main(pred_file: Path, true_file: Path, show_errors: int, save_errors: Optional[Path]) -> None:  # noqa: C901
+def main(  # noqa: C901
+    pred_file: Path,
+    true_file: Path,
+    show_errors: int,
+    save_errors: Path | None,
+    streaming: bool,
+    bucket_rows: int,
+    error_sample: int,
+    backend: str,
+    by_template: bool,
+    report_dir: Path | None,
+) -> None:
     """Рассчитать метрику accuracy для submission файла"""
 
     click.echo("📊 Расчет метрики accuracy...")
@@ -180,16 +351,20 @@ def main(pred_file: Path, true_file: Path, show_errors: int, save_errors: Option
     click.echo(f"📖 Ground Truth: {true_file}")
     click.echo("=" * 70)
 
-    # Загружаем данные
+    # Загружаем данные и рассчитываем метрики
     try:
-        predicted = load_csv(pred_file)
-        ground_truth = load_csv(true_file)
+        if streaming:
+            accuracy, stats = calculate_accuracy_streaming(pred_file, true_file, bucket_rows, error_sample)
+        elif backend == "vectorized" or by_template:
+            accuracy, stats = calculate_accuracy_vectorized(pred_file, true_file, by_template)
+        else:
+            predicted = load_csv(pred_file)
+            ground_truth = load_csv(true_file)
+            accuracy, stats = calculate_accuracy(predicted, ground_truth)
     except Exception as e:
         click.echo(f"❌ Ошибка при чтении файлов: {e}", err=True)
         return
-
-    # Рассчитываем метрики
-    accuracy, stats = calculate_accuracy(predicted, ground_truth)
+    error_count = stats.get("error_count", len(stats["errors"]))
 
     # Выводим результаты
     click.echo("\n🎯 ОСНОВНАЯ МЕТРИКА (из evaluation.md):")
@@ -200,7 +375,9 @@ def main(pred_file: Path, true_file: Path, show_errors: int, save_errors: Option
     click.echo(f"   Полностью правильных:     {stats['correct']} ({accuracy * 100:.2f}%)")
     click.echo(f"   Правильный type:          {stats['correct_type']} ({stats['type_accuracy'] * 100:.2f}%)")
     click.echo(f"   Правильный request:       {stats['correct_request']} ({stats['request_accuracy'] * 100:.2f}%)")
-    click.echo(f"   Ошибок:                   {len(stats['errors'])}")
+    click.echo(f"   Ошибок:                   {error_count}")
+    if streaming and error_count > len(stats["errors"]):
+        click.echo(f"   (в выборке ошибок:        {len(stats['errors'])})")
 
     # Статистика по типам запросов
     click.echo("\n📊 СТАТИСТИКА ПО ТИПАМ ЗАПРОСОВ:")
@@ -214,6 +391,17 @@ def main(pred_file: Path, true_file: Path, show_errors: int, save_errors: Option
             f"{method_stats['f1']:.4f} ({method_stats['f1'] * 100:>5.1f}%)"
         )
 
+    # Статистика по шаблонам эндпоинтов
+    if stats.get("templates"):
+        click.echo("\n🧭 ACCURACY ПО ШАБЛОНАМ ЭНДПОИНТОВ:")
+        click.echo(f"   {'Шаблон':<58} {'Всего':>7} {'Верно':>7} {'Accuracy':>9}")
+        click.echo(f"   {'-' * 84}")
+        for template, template_stats in sorted(stats["templates"].items(), key=lambda item: -item[1]["total"]):
+            click.echo(
+                f"   {template:<58} {template_stats['total']:>7} {template_stats['correct']:>7} "
+                f"{template_stats['accuracy'] * 100:>8.1f}%"
+            )
+
     # Показываем примеры ошибок
     if show_errors > 0 and stats["errors"]:
         click.echo(f"\n❌ ПРИМЕРЫ ОШИБОК (первые {show_errors}):")
@@ -269,6 +457,27 @@ def main(pred_file: Path, true_file: Path, show_errors: int, save_errors: Option
 
         click.echo(f"\n💾 Ошибки сохранены в: {save_errors}")
 
+    # Отчет об ошибках по шаблонам эндпоинтов
+    if report_dir:
+        try:
+            from scripts.columnar import load_pair
+            from scripts.error_report import build_report, write_report
+        except ImportError:  # запуск как python scripts/calculate_metrics.py без корня проекта в PYTHONPATH
+            from columnar import load_pair  # type: ignore[no-redef]
+            from error_report import build_report, write_report  # type: ignore[no-redef]
+
+        report = build_report(load_pair(pred_file, true_file))
+        click.echo("\n🔀 ЧАСТЫЕ ПУТАНИЦЫ ШАБЛОНОВ (эталон -> предсказание):")
+        for true_template, pred_template, count in report.template_errors[:5]:
+            click.echo(f"   {count:>6}  {true_template}  ->  {pred_template}")
+        if report.slot_groups:
+            groups = ", ".join(f"{group}: {n}" for group, n in report.slot_groups.most_common())
+            click.echo(f"   Ошибки слотов при верном шаблоне: {groups}")
+        if report.format_only:
+            click.echo(f"   Только форматирование (шаблон и слоты совпали): {report.format_only}")
+        paths = write_report(report, report_dir)
+        click.echo(f"\n💾 Отчет сохранен: {', '.join(str(p) for p in paths)}")
+
     # Финальный вердикт
     click.echo("\n" + "=" * 70)
     if accuracy == 1.0:
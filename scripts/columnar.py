@@ -0,0 +1,266 @@
+"""
+Векторизованный (колоночный) расчет метрик
+
+Оба CSV загружаются в колонки, строковые значения (uid, type, request)
+кодируются целыми числами по общему для обоих файлов словарю: через
+pyarrow.dictionary_encode, если pyarrow установлен, иначе словарем Python.
+Дальше дедупликация uid, join предсказаний с эталоном, exact match, type match
+и precision/recall/F1 по методам считаются операциями над массивами NumPy.
+
+Разбивка по шаблонам эндпоинтов (/v1/instruments/{symbol}/bars, ...) требует
+роутера только для уникальных пар (type, request) и агрегируется через bincount.
+
+Используется в calculate_metrics.py (--backend vectorized, --by-template).
+"""
+
+import csv
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+METHODS = ("GET", "POST", "DELETE")
+
+COLUMNS = ("uid", "type", "request")
+
+UNKNOWN_TEMPLATE = "<unknown>"
+
+
+@dataclass
+class Columns:
+    """Закодированные колонки CSV файла после удаления дублей uid"""
+
+    uid: np.ndarray
+    type: np.ndarray
+    request: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.uid)
+
+
+@dataclass
+class EncodedPair:
+    """
+    Предсказания и эталон в общих кодах
+
+    values[код] - строки type/request; uids - словарь uid (список или массив
+    pyarrow), декодируется только для строк с ошибками через decode.
+    """
+
+    predicted: Columns
+    truth: Columns
+    uids: Any
+    values: list[str]
+
+
+def read_columns(path: Path) -> dict[str, Any]:
+    """Прочитать колонки uid/type/request: массивы pyarrow или списки строк без pyarrow"""
+    try:
+        import pyarrow as pa
+        from pyarrow import csv as pa_csv
+    except ImportError:
+        columns: dict[str, list[str]] = {name: [] for name in COLUMNS}
+        with open(path, encoding="utf-8") as f:
+            for row in csv.DictReader(f, delimiter=";"):
+                for name in COLUMNS:
+                    columns[name].append(row[name])
+        return columns
+
+    table = pa_csv.read_csv(
+        path,
+        parse_options=pa_csv.ParseOptions(delimiter=";"),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=list(COLUMNS),
+            column_types=dict.fromkeys(COLUMNS, pa.string()),
+            strings_can_be_null=False,
+        ),
+    )
+    return {name: table.column(name) for name in COLUMNS}
+
+
+def encode(columns: list[Any]) -> tuple[list[np.ndarray], Any]:
+    """
+    Закодировать несколько строковых колонок общим словарем
+
+    Returns:
+        (codes, dictionary): массив кодов для каждой колонки и строки по кодам
+        (массив pyarrow для колонок pyarrow, иначе список)
+    """
+    lengths = [len(column) for column in columns]
+    if columns and not isinstance(columns[0], list):
+        import pyarrow as pa
+
+        chunks = [chunk for column in columns for chunk in column.chunks]
+        encoded = pa.chunked_array(chunks, type=pa.string()).combine_chunks().dictionary_encode()
+        codes = encoded.indices.to_numpy(zero_copy_only=False).astype(np.int64)
+        dictionary = encoded.dictionary
+    else:
+        table: dict[str, int] = {}
+        values = (value for column in columns for value in column)
+        codes = np.fromiter((table.setdefault(v, len(table)) for v in values), dtype=np.int64, count=sum(lengths))
+        dictionary = list(table)
+    return np.split(codes, np.cumsum(lengths)[:-1]), dictionary
+
+
+def decode(dictionary: Any, codes: np.ndarray) -> list[str]:
+    """Строки по кодам из словаря encode"""
+    if isinstance(dictionary, list):
+        return [dictionary[code] for code in codes.tolist()]
+    return dictionary.take(codes).to_pylist()
+
+
+def last_rows(uid: np.ndarray, size: int) -> np.ndarray:
+    """
+    Строки, остающиеся после удаления дублей uid
+
+    Как в load_csv: побеждает последняя строка uid, порядок - по первому появлению.
+    """
+    _, first = np.unique(uid, return_index=True)
+    last = np.full(size, -1, dtype=np.int64)
+    np.maximum.at(last, uid, np.arange(len(uid)))
+    return last[uid[np.sort(first)]]
+
+
+def load_pair(pred_file: Path, true_file: Path) -> EncodedPair:
+    """Загрузить предсказания и эталон в общих кодах"""
+    pred, true = read_columns(pred_file), read_columns(true_file)
+    (pred_uid, true_uid), uids = encode([pred["uid"], true["uid"]])
+    (pred_type, pred_request, true_type, true_request), values = encode([
+        pred["type"],
+        pred["request"],
+        true["type"],
+        true["request"],
+    ])
+    values = values if isinstance(values, list) else values.to_pylist()
+    pred_keep = last_rows(pred_uid, len(uids))
+    true_keep = last_rows(true_uid, len(uids))
+    return EncodedPair(
+        Columns(pred_uid[pred_keep], pred_type[pred_keep], pred_request[pred_keep]),
+        Columns(true_uid[true_keep], true_type[true_keep], true_request[true_keep]),
+        uids,
+        values,
+    )
+
+
+def template_ids(types: np.ndarray, requests: np.ndarray, values: list[str]) -> tuple[np.ndarray, list[str]]:
+    """
+    Шаблон эндпоинта для каждой строки (например, GET /v1/instruments/{symbol}/bars)
+
+    Returns:
+        (ids, labels): ids[i] - номер шаблона строки i в labels
+    """
+    from src.app.adapters.finam_endpoints import canonicalize
+
+    pairs, inverse = np.unique(types * len(values) + requests, return_inverse=True)
+
+    label_ids: dict[str, int] = {}
+    pair_ids = np.empty(len(pairs), dtype=np.int64)
+    for i, pair in enumerate(pairs.tolist()):
+        type_code, request_code = divmod(pair, len(values))
+        canonical = canonicalize(values[type_code], values[request_code])
+        label = canonical[0] if canonical else UNKNOWN_TEMPLATE
+        pair_ids[i] = label_ids.setdefault(label, len(label_ids))
+    return pair_ids[inverse.reshape(-1)], list(label_ids)
+
+
+def align(pair: EncodedPair) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Присоединить предсказания к строкам эталона по uid
+
+    Returns:
+        (found, pred_type, pred_request): есть ли предсказание и его коды;
+        для отсутствующих предсказаний код -1 не совпадает ни с одной строкой
+    """
+    predicted, truth = pair.predicted, pair.truth
+    position = np.full(len(pair.uids), -1, dtype=np.int64)
+    position[predicted.uid] = np.arange(len(predicted))
+    index = position[truth.uid]
+    found = index >= 0
+    pred_type = np.full(len(truth), -1, dtype=np.int64)
+    pred_request = np.full(len(truth), -1, dtype=np.int64)
+    pred_type[found] = predicted.type[index[found]]
+    pred_request[found] = predicted.request[index[found]]
+    return found, pred_type, pred_request
+
+
+def compare_columns(pair: EncodedPair, by_template: bool = False, max_errors: int | None = None) -> dict[str, Any]:
+    """
+    Сравнить предсказания с эталоном операциями над массивами
+
+    Args:
+        by_template: Добавить разбивку по шаблонам эндпоинтов ("templates")
+        max_errors: Ограничить число записей об ошибках (None - все)
+
+    Returns:
+        dict: статистика в формате calculate_accuracy, но "type_stats" содержит
+        только счетчики tp/fp/fn (метрики считает calculate_metrics.type_scores)
+    """
+    truth, values = pair.truth, pair.values
+    total = len(truth)
+    found, pred_type, pred_request = align(pair)
+
+    type_match = pred_type == truth.type
+    request_match = pred_request == truth.request
+    exact = type_match & request_match
+
+    codes = {value: code for code, value in enumerate(values) if value in METHODS}
+    type_stats = {}
+    for method in METHODS:
+        code = codes.get(method, -2)
+        is_true = truth.type == code
+        type_stats[method] = {
+            "tp": int(np.count_nonzero(is_true & exact)),
+            "fp": int(np.count_nonzero(found & ~type_match & (pred_type == code))),
+            "fn": int(np.count_nonzero(is_true & ~type_match)),
+        }
+
+    error_index = np.flatnonzero(~exact)
+    if max_errors is not None:
+        error_index = error_index[:max_errors]
+    errors = []
+    for i, uid in zip(error_index.tolist(), decode(pair.uids, truth.uid[error_index]), strict=True):
+        error = {
+            "uid": uid,
+            "error": "mismatch" if found[i] else "missing",
+            "true_type": values[truth.type[i]],
+            "true_request": values[truth.request[i]],
+            "pred_type": values[pred_type[i]] if found[i] else None,
+            "pred_request": values[pred_request[i]] if found[i] else None,
+        }
+        if found[i]:
+            error["type_match"] = "yes" if type_match[i] else "no"
+            error["request_match"] = "yes" if request_match[i] else "no"
+        errors.append(error)
+
+    correct = int(np.count_nonzero(exact))
+    correct_type = int(np.count_nonzero(type_match))
+    correct_request = int(np.count_nonzero(request_match))
+    stats: dict[str, Any] = {
+        "total": total,
+        "correct": correct,
+        "correct_type": correct_type,
+        "correct_request": correct_request,
+        "type_accuracy": correct_type / total if total > 0 else 0.0,
+        "request_accuracy": correct_request / total if total > 0 else 0.0,
+        "errors": errors,
+        "error_count": total - correct,
+        "type_stats": type_stats,
+    }
+
+    if by_template and total:
+        ids, labels = template_ids(truth.type, truth.request, values)
+        counts = np.bincount(ids, minlength=len(labels))
+        hits = np.bincount(ids, weights=exact, minlength=len(labels))
+        type_hits = np.bincount(ids, weights=type_match, minlength=len(labels))
+        stats["templates"] = {
+            label: {
+                "total": int(counts[i]),
+                "correct": int(hits[i]),
+                "accuracy": float(hits[i] / counts[i]),
+                "type_accuracy": float(type_hits[i] / counts[i]),
+            }
+            for i, label in enumerate(labels)
+        }
+
+    return stats
@@ -0,0 +1,270 @@
+"""
+Аналитика ошибок по шаблонам эндпоинтов
+
+Каждый запрос приводится к шаблону (GET /v1/instruments/{symbol}/bars) и
+значениям слотов (symbol, timeframe, start, ...) через
+finam_endpoints.canonicalize. По этим данным строятся:
+- accuracy и число ошибок по шаблонам эталона;
+- матрица ошибок (confusion matrix) эталонный шаблон -> предсказанный;
+- статистика слотов для ошибок с верным шаблоном: какой слот неверный,
+  пропущен или лишний (неверный тикер vs таймфрейм vs даты);
+- ошибки только форматирования (шаблон и слоты совпали, строка - нет).
+
+Канонизация выполняется один раз на уникальный запрос, агрегация - на массивах
+NumPy поверх кодов из scripts/columnar.py, поэтому отчет строится за секунды
+и на регрессионных наборах в миллионы строк.
+
+Используется в calculate_metrics.py (--report DIR): сохраняет report.html и
+templates.csv / confusion.csv / slots.csv.
+"""
+
+import csv
+import html
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+try:
+    from scripts.columnar import UNKNOWN_TEMPLATE, EncodedPair, align
+except ImportError:  # запуск как python scripts/calculate_metrics.py без корня проекта в PYTHONPATH
+    from columnar import UNKNOWN_TEMPLATE, EncodedPair, align  # type: ignore[no-redef]
+
+MISSING_TEMPLATE = "<missing>"
+
+# Группы слотов для сводки: даты интервала считаются вместе
+SLOT_GROUPS = {"start": "dates", "end": "dates"}
+
+SLOT_ERRORS = ("wrong", "missing", "extra")
+
+
+@dataclass
+class ErrorReport:
+    """Отчет об ошибках по шаблонам эндпоинтов"""
+
+    total: int
+    correct: int
+    # Шаблон эталона -> {total, correct, errors, accuracy}
+    templates: dict[str, dict[str, Any]]
+    # (шаблон эталона, предсказанный шаблон) -> количество строк, включая верные
+    confusion: dict[tuple[str, str], int]
+    # (шаблон, слот) -> {"wrong": n, "missing": n, "extra": n}
+    slots: dict[tuple[str, str], Counter] = field(default_factory=dict)
+    # Группа слотов (symbol, timeframe, dates, ...) -> строк с ошибкой в группе
+    slot_groups: Counter = field(default_factory=Counter)
+    # Ошибки с совпавшими шаблоном и слотами (порядок query, префикс метода, ...)
+    format_only: int = 0
+
+    @property
+    def template_errors(self) -> list[tuple[str, str, int]]:
+        """Ячейки матрицы вне диагонали по убыванию: (эталон, предсказание, количество)"""
+        cells = [(t, p, n) for (t, p), n in self.confusion.items() if t != p]
+        return sorted(cells, key=lambda cell: -cell[2])
+
+
+def _canonical_keys(keys: np.ndarray, values: list[str]) -> tuple[np.ndarray, list[str], list[dict[str, str]]]:
+    """
+    Канонизировать уникальные ключи (type * len(values) + request)
+
+    Returns:
+        (label_ids, labels, slots): номер шаблона и слоты для каждого ключа
+    """
+    from src.app.adapters.finam_endpoints import canonicalize
+
+    label_index: dict[str, int] = {}
+    label_ids = np.empty(len(keys), dtype=np.int64)
+    slots: list[dict[str, str]] = []
+    for i, key in enumerate(keys.tolist()):
+        type_code, request_code = divmod(key, len(values))
+        canonical = canonicalize(values[type_code], values[request_code])
+        label, key_slots = canonical if canonical else (UNKNOWN_TEMPLATE, ())
+        label_ids[i] = label_index.setdefault(label, len(label_index))
+        slots.append(dict(key_slots))
+    return label_ids, list(label_index), slots
+
+
+def build_report(pair: EncodedPair) -> ErrorReport:
+    """Построить отчет об ошибках по закодированным предсказаниям и эталону (columnar.load_pair)"""
+    truth, size = pair.truth, len(pair.values)
+    total = len(truth)
+    found, pred_type, pred_request = align(pair)
+    exact = (pred_type == truth.type) & (pred_request == truth.request)
+
+    true_key = truth.type * size + truth.request
+    pred_key = pred_type[found] * size + pred_request[found]
+    keys, inverse = np.unique(np.concatenate([true_key, pred_key]), return_inverse=True)
+    inverse = inverse.reshape(-1)
+    key_labels, labels, key_slots = _canonical_keys(keys, pair.values)
+    labels.append(MISSING_TEMPLATE)
+
+    true_index = inverse[:total]
+    pred_index = np.full(total, -1, dtype=np.int64)
+    pred_index[found] = inverse[total:]
+    true_label = key_labels[true_index]
+    pred_label = np.full(total, len(labels) - 1, dtype=np.int64)
+    pred_label[found] = key_labels[pred_index[found]]
+
+    # Accuracy по шаблонам эталона
+    counts = np.bincount(true_label, minlength=len(labels))
+    hits = np.bincount(true_label, weights=exact, minlength=len(labels))
+    templates = {
+        labels[i]: {
+            "total": int(counts[i]),
+            "correct": int(hits[i]),
+            "errors": int(counts[i] - hits[i]),
+            "accuracy": float(hits[i] / counts[i]),
+        }
+        for i in np.flatnonzero(counts).tolist()
+    }
+
+    # Матрица ошибок: уникальные пары (эталон, предсказание) с количеством
+    cells, cell_counts = np.unique(true_label * len(labels) + pred_label, return_counts=True)
+    confusion = {
+        (labels[cell // len(labels)], labels[cell % len(labels)]): int(n)
+        for cell, n in zip(cells.tolist(), cell_counts.tolist(), strict=True)
+    }
+
+    report = ErrorReport(total=total, correct=int(np.count_nonzero(exact)), templates=templates, confusion=confusion)
+
+    # Слоты: ошибки с верным (и известным) шаблоном, по уникальным парам запросов
+    unknown = labels.index(UNKNOWN_TEMPLATE) if UNKNOWN_TEMPLATE in labels else -1
+    same = ~exact & found & (true_label == pred_label) & (true_label != unknown)
+    pairs, pair_counts = np.unique(true_index[same] * len(keys) + pred_index[same], return_counts=True)
+    for key, n in zip(pairs.tolist(), pair_counts.tolist(), strict=True):
+        true_i, pred_i = divmod(key, len(keys))
+        template = labels[key_labels[true_i]]
+        expected, got = key_slots[true_i], key_slots[pred_i]
+        if expected == got:
+            report.format_only += n
+            continue
+        groups = set()
+        for slot in expected.keys() | got.keys():
+            if expected.get(slot) == got.get(slot):
+                continue
+            kind = "extra" if slot not in expected else "missing" if slot not in got else "wrong"
+            report.slots.setdefault((template, slot), Counter())[kind] += n
+            groups.add(SLOT_GROUPS.get(slot, slot))
+        for group in groups:
+            report.slot_groups[group] += n
+    return report
+
+
+def write_csv_reports(report: ErrorReport, output_dir: Path) -> list[Path]:
+    """Сохранить templates.csv, confusion.csv и slots.csv (разделитель ';')"""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    tables: dict[str, tuple[list[str], list[list[Any]]]] = {
+        "templates.csv": (
+            ["template", "total", "correct", "errors", "accuracy"],
+            [
+                [t, s["total"], s["correct"], s["errors"], f"{s['accuracy']:.4f}"]
+                for t, s in sorted(report.templates.items(), key=lambda item: -item[1]["errors"])
+            ],
+        ),
+        "confusion.csv": (
+            ["true_template", "pred_template", "count"],
+            [list(cell) for cell in sorted(((t, p, n) for (t, p), n in report.confusion.items()), key=lambda c: -c[2])],
+        ),
+        "slots.csv": (
+            ["template", "slot", *SLOT_ERRORS],
+            [[t, slot, *(kinds[k] for k in SLOT_ERRORS)] for (t, slot), kinds in sorted(report.slots.items())],
+        ),
+    }
+    paths = []
+    for name, (header, rows) in tables.items():
+        path = output_dir / name
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f, delimiter=";")
+            writer.writerow(header)
+            writer.writerows(rows)
+        paths.append(path)
+    return paths
+
+
+def render_html(report: ErrorReport) -> str:
+    """Самодостаточный HTML отчет: сводка, таблица шаблонов, матрица ошибок, слоты"""
+    esc = html.escape
+    accuracy = report.correct / report.total if report.total else 0.0
+
+    template_rows = "".join(
+        f"<tr><td>{esc(t)}</td><td>{s['total']}</td><td>{s['correct']}</td><td>{s['errors']}</td>"
+        f"<td>{s['accuracy']:.1%}</td></tr>"
+        for t, s in sorted(report.templates.items(), key=lambda item: -item[1]["errors"])
+    )
+
+    # Матрица: строки - шаблоны эталона, столбцы - предсказанные; цвет - доля строки
+    rows = sorted(report.templates, key=lambda t: -report.templates[t]["total"])
+    columns = rows + sorted({p for _, p in report.confusion} - set(rows))
+    header = "".join(f'<th title="{esc(c)}">{i}</th>' for i, c in enumerate(columns, 1))
+    matrix_rows = []
+    for i, t in enumerate(rows, 1):
+        row_total = report.templates[t]["total"]
+        cells = []
+        for p in columns:
+            n = report.confusion.get((t, p), 0)
+            share = n / row_total if row_total else 0.0
+            color = "rgba(46,160,67,{:.2f})" if p == t else "rgba(218,54,51,{:.2f})"
+            style = f' style="background:{color.format(0.15 + 0.85 * share)}"' if n else ""
+            cells.append(f'<td{style} title="{esc(t)} -> {esc(p)}">{n or ""}</td>')
+        matrix_rows.append(f'<tr><th title="{esc(t)}">{i}</th>{"".join(cells)}</tr>')
+    legend = "".join(f"<li>{i}. {esc(c)}</li>" for i, c in enumerate(columns, 1))
+
+    group_rows = "".join(f"<tr><td>{esc(group)}</td><td>{n}</td></tr>" for group, n in report.slot_groups.most_common())
+    slot_rows = "".join(
+        f"<tr><td>{esc(t)}</td><td>{esc(slot)}</td>{''.join(f'<td>{kinds[k]}</td>' for k in SLOT_ERRORS)}</tr>"
+        for (t, slot), kinds in sorted(report.slots.items(), key=lambda item: -sum(item[1].values()))
+    )
+
+    return f"""<!DOCTYPE html>
+<html lang="ru">
+<head>
+<meta charset="utf-8">
+<title>Ошибки по шаблонам эндпоинтов</title>
+<style>
+body {{ font-family: -apple-system, Segoe UI, sans-serif; margin: 2em; color: #222; }}
+table {{ border-collapse: collapse; margin-bottom: 2em; }}
+th, td {{ border: 1px solid #ddd; padding: 4px 8px; text-align: right; }}
+td:first-child {{ text-align: left; }}
+.matrix td {{ min-width: 2.5em; text-align: center; }}
+ol, ul {{ font-size: 0.9em; }}
+</style>
+</head>
+<body>
+<h1>Ошибки по шаблонам эндпоинтов</h1>
+<p>Accuracy: <b>{report.correct}/{report.total} = {accuracy:.2%}</b>,
+ошибок: {report.total - report.correct}, из них только форматирование: {report.format_only}</p>
+
+<h2>Шаблоны</h2>
+<table>
+<tr><th>Шаблон</th><th>Всего</th><th>Верно</th><th>Ошибок</th><th>Accuracy</th></tr>
+{template_rows}
+</table>
+
+<h2>Матрица ошибок (строки - эталон, столбцы - предсказание)</h2>
+<table class="matrix">
+<tr><th></th>{header}</tr>
+{"".join(matrix_rows)}
+</table>
+<ul style="list-style: none; padding: 0">{legend}</ul>
+
+<h2>Слоты при верном шаблоне</h2>
+<table>
+<tr><th>Группа</th><th>Строк с ошибкой</th></tr>
+{group_rows}
+</table>
+<table>
+<tr><th>Шаблон</th><th>Слот</th><th>Неверный</th><th>Пропущен</th><th>Лишний</th></tr>
+{slot_rows}
+</table>
+</body>
+</html>
+"""
+
+
+def write_report(report: ErrorReport, output_dir: Path) -> list[Path]:
+    """Сохранить HTML и CSV отчеты в директорию"""
+    paths = write_csv_reports(report, output_dir)
+    html_path = output_dir / "report.html"
+    html_path.write_text(render_html(report), encoding="utf-8")
+    return [html_path, *paths]
@@ -7,6 +7,7 @@
 """
 
 import csv
+from collections import Counter
 from pathlib import Path
 
 
@@ -29,49 +30,27 @@ def load_csv_data(file_path: str) -> dict[str, dict[str, str]]:
     return data
 
 
-def validate_submission(  # noqa: C901
-    submission: dict[str, dict], required_uids: set[str]
-) -> tuple[bool, list[str]]:
-    """
-    СТРОГАЯ валидация submission перед подсчетом метрик
+VALID_HTTP_METHODS = {"GET", "POST", "DELETE", "PUT", "PATCH", "HEAD", "OPTIONS"}
 
-    Критерии валидности:
-    1. Наличие ВСЕХ required UID (из public + private)
-    2. Все поля заполнены (type и request)
-    3. HTTP методы валидны
-    4. API пути начинаются с /
 
-    Args:
-        submission: Словарь предсказаний {uid: {type, request}}
-        required_uids: Множество обязательных UID
+def count_submission_issues(submission: dict[str, dict], required_uids: set[str]) -> Counter[str]:
+    """
+    Посчитать нарушения критериев валидности submission
 
     Returns:
-        (is_valid, errors): True если все проверки прошли, иначе False со списком ошибок
+        Counter с ключами missing, extra, empty_type, empty_request, invalid_method, invalid_path
     """
-    errors: list[str] = []
-    valid_http_methods = {"GET", "POST", "DELETE", "PUT", "PATCH", "HEAD", "OPTIONS"}
+    issues: Counter[str] = Counter()
 
     # 1. Проверка наличия ВСЕХ required UID
     submission_uids = set(submission.keys())
-    missing_uids = required_uids - submission_uids
-    extra_uids = submission_uids - required_uids
-
-    if missing_uids:
-        errors.append(f"Missing {len(missing_uids)} required UIDs")
-        # НЕ показываем конкретные UID для избежания утечки данных
-
-    if extra_uids:
-        errors.append(f"Found {len(extra_uids)} extra UIDs not in test set")
+    issues["missing"] = len(required_uids - submission_uids)
+    issues["extra"] = len(submission_uids - required_uids)
 
     # 2-4. Проверка каждой записи
-    empty_type_count = 0
-    empty_request_count = 0
-    invalid_method_count = 0
-    invalid_path_count = 0
-
     for uid in required_uids:
         if uid not in submission:
-            continue  # Уже учтено в missing_uids
+            continue  # Уже учтено в missing
 
         data = submission[uid]
         method = data.get("type", "")
@@ -79,29 +58,59 @@ def validate_submission(  # noqa: C901
 
         # Проверка пустых полей
         if not method:
-            empty_type_count += 1
+            issues["empty_type"] += 1
         if not request:
-            empty_request_count += 1
+            issues["empty_request"] += 1
 
         # Проверка валидности HTTP метода
-        if method and method not in valid_http_methods:
-            invalid_method_count += 1
+        if method and method not in VALID_HTTP_METHODS:
+            issues["invalid_method"] += 1
 
         # Проверка формата API пути
         if request and not request.startswith("/"):
-            invalid_path_count += 1
+            issues["invalid_path"] += 1
 
-    if empty_type_count > 0:
-        errors.append(f"Empty 'type' field in {empty_type_count} predictions")
+    return issues
 
-    if empty_request_count > 0:
-        errors.append(f"Empty 'request' field in {empty_request_count} predictions")
 
-    if invalid_method_count > 0:
-        errors.append(f"Invalid HTTP method in {invalid_method_count} predictions (must be GET/POST/DELETE/etc)")
+def validation_errors(issues: Counter[str]) -> list[str]:
+    """Сообщения об ошибках валидации (без конкретных UID, чтобы избежать утечки данных)"""
+    errors: list[str] = []
+    if issues["missing"]:
+        errors.append(f"Missing {issues['missing']} required UIDs")
+    if issues["extra"]:
+        errors.append(f"Found {issues['extra']} extra UIDs not in test set")
+    if issues["empty_type"]:
+        errors.append(f"Empty 'type' field in {issues['empty_type']} predictions")
+    if issues["empty_request"]:
+        errors.append(f"Empty 'request' field in {issues['empty_request']} predictions")
+    if issues["invalid_method"]:
+        errors.append(
+            f"Invalid HTTP method in {issues['invalid_method']} predictions (must be GET/POST/DELETE/etc)"
+        )
+    if issues["invalid_path"]:
+        errors.append(f"Invalid API path in {issues['invalid_path']} predictions (must start with /)")
+    return errors
+
+
+def validate_submission(submission: dict[str, dict], required_uids: set[str]) -> tuple[bool, list[str]]:
+    """
+    СТРОГАЯ валидация submission перед подсчетом метрик
 
-    if invalid_path_count > 0:
-        errors.append(f"Invalid API path in {invalid_path_count} predictions (must start with /)")
+    Критерии валидности:
+    1. Наличие ВСЕХ required UID (из public + private)
+    2. Все поля заполнены (type и request)
+    3. HTTP методы валидны
+    4. API пути начинаются с /
+
+    Args:
+        submission: Словарь предсказаний {uid: {type, request}}
+        required_uids: Множество обязательных UID
+
+    Returns:
+        (is_valid, errors): True если все проверки прошли, иначе False со списком ошибок
+    """
+    errors = validation_errors(count_submission_issues(submission, required_uids))
 
     # Submission валиден только если нет ошибок
     is_valid = len(errors) == 0
@@ -109,22 +118,14 @@ def validate_submission(  # noqa: C901
     return is_valid, errors
 
 
-def calculate_accuracy(submission: dict[str, dict], ground_truth: dict[str, dict]) -> tuple[float, dict]:
+def count_matches(submission: dict[str, dict], ground_truth: dict[str, dict]) -> Counter[str]:
     """
-    Рассчитать accuracy метрику (только для валидных submission)
-
-    Сравнение строго по UID, порядок строк не важен
+    Посчитать совпадения по UID
 
     Returns:
-        tuple: (accuracy_score, detailed_metrics)
+        Counter с ключами total, correct, correct_type, correct_request
     """
-    if not ground_truth:
-        return 0.0, {"error": "Ground truth is empty"}
-
-    total = len(ground_truth)
-    correct = 0
-    correct_type = 0
-    correct_request = 0
+    counts: Counter[str] = Counter(total=len(ground_truth))
 
     for uid, true_data in ground_truth.items():
         # Проверяем наличие UID в submission
@@ -133,31 +134,32 @@ def calculate_accuracy(submission: dict[str, dict], ground_truth: dict[str, dict
 
         pred_data = submission[uid]
 
-        # Извлекаем значения
-        true_type = true_data.get("type", "")
-        pred_type = pred_data.get("type", "")
-        true_request = true_data.get("request", "")
-        pred_request = pred_data.get("request", "")
-
         # Точное совпадение строк
-        type_match = true_type == pred_type
-        request_match = true_request == pred_request
+        type_match = true_data.get("type", "") == pred_data.get("type", "")
+        request_match = true_data.get("request", "") == pred_data.get("request", "")
 
         if type_match:
-            correct_type += 1
+            counts["correct_type"] += 1
         if request_match:
-            correct_request += 1
+            counts["correct_request"] += 1
         if type_match and request_match:
-            correct += 1
+            counts["correct"] += 1
+
+    return counts
+
+
+def accuracy_from_counts(counts: Counter[str]) -> tuple[float, dict]:
+    """Accuracy (0-100) и метрики по счетчикам count_matches"""
+    total = counts["total"]
 
     # Считаем проценты
-    accuracy = (correct / total * 100.0) if total > 0 else 0.0
-    type_accuracy = (correct_type / total * 100.0) if total > 0 else 0.0
-    request_accuracy = (correct_request / total * 100.0) if total > 0 else 0.0
+    accuracy = (counts["correct"] / total * 100.0) if total > 0 else 0.0
+    type_accuracy = (counts["correct_type"] / total * 100.0) if total > 0 else 0.0
+    request_accuracy = (counts["correct_request"] / total * 100.0) if total > 0 else 0.0
 
     metrics = {
         "total_samples": total,
-        "correct_predictions": correct,
+        "correct_predictions": counts["correct"],
         "type_accuracy": round(type_accuracy, 2),
         "request_accuracy": round(request_accuracy, 2),
     }
@@ -165,6 +167,21 @@ def calculate_accuracy(submission: dict[str, dict], ground_truth: dict[str, dict
     return accuracy, metrics
 
 
+def calculate_accuracy(submission: dict[str, dict], ground_truth: dict[str, dict]) -> tuple[float, dict]:
+    """
+    Рассчитать accuracy метрику (только для валидных submission)
+
+    Сравнение строго по UID, порядок строк не важен
+
+    Returns:
+        tuple: (accuracy_score, detailed_metrics)
+    """
+    if not ground_truth:
+        return 0.0, {"error": "Ground truth is empty"}
+
+    return accuracy_from_counts(count_matches(submission, ground_truth))
+
+
 def evaluate(submission_path: str, private_test_path: str, public_test_path: str) -> dict:  # noqa: C901
     """
     Standard evaluation interface with public/private leaderboard split.
@@ -316,18 +333,105 @@ def evaluate(submission_path: str, private_test_path: str, public_test_path: str
         }
 
 
+def evaluate_streaming(
+    submission_path: str, private_test_path: str, public_test_path: str, bucket_rows: int | None = None
+) -> dict:
+    """
+    Потоковый вариант evaluate для очень больших файлов (тот же формат результата)
+
+    Файлы раскладываются по бакетам на диске по hash(uid) и валидируются /
+    сравниваются побакетно, поэтому память ограничена размером одного бакета,
+    а не суммарным размером файлов.
+    """
+    try:
+        from scripts.streaming import DEFAULT_BUCKET_ROWS, bucket_count, iter_buckets, partition_files
+    except ImportError:  # запуск как python scripts/evaluate.py без корня проекта в PYTHONPATH
+        from streaming import DEFAULT_BUCKET_ROWS, bucket_count, iter_buckets, partition_files  # type: ignore[no-redef]
+
+    for path, message in (
+        (submission_path, "Submission file not found"),
+        (public_test_path, "Public test file not found (internal error)"),
+        (private_test_path, "Private test file not found (internal error)"),
+    ):
+        if not Path(path).exists():
+            return {"public_score": 0.0, "private_score": 0.0, "metrics": {}, "errors": [message]}
+
+    files = {"submission": Path(submission_path), "public": Path(public_test_path), "private": Path(private_test_path)}
+    issues: Counter[str] = Counter()
+    public_counts: Counter[str] = Counter()
+    private_counts: Counter[str] = Counter()
+    submission_size = 0
+    required_size = 0
+
+    try:
+        buckets = bucket_count(list(files.values()), bucket_rows or DEFAULT_BUCKET_ROWS)
+        with partition_files(files, buckets) as tmp_dir:
+            for bucket in iter_buckets(tmp_dir, list(files), buckets):
+                submission = {uid: {"type": t, "request": r} for uid, (t, r) in bucket["submission"].items()}
+                public_test = {uid: {"type": t, "request": r} for uid, (t, r) in bucket["public"].items()}
+                private_test = {uid: {"type": t, "request": r} for uid, (t, r) in bucket["private"].items()}
+                required_uids = set(public_test) | set(private_test)
+
+                submission_size += len(submission)
+                required_size += len(required_uids)
+                issues.update(count_submission_issues(submission, required_uids))
+                public_counts.update(count_matches(submission, public_test))
+                private_counts.update(count_matches(submission, private_test))
+    except Exception as e:
+        return {
+            "public_score": 0.0,
+            "private_score": 0.0,
+            "metrics": {},
+            "errors": [f"Failed to parse CSV files: {e!s}"],
+        }
+
+    if not submission_size:
+        return {"public_score": 0.0, "private_score": 0.0, "metrics": {}, "errors": ["Submission file is empty"]}
+
+    validation = validation_errors(issues)
+    if validation:
+        return {
+            "public_score": 0.0,
+            "private_score": 0.0,
+            "metrics": {
+                "validation_failed": True,
+                "submission_size": submission_size,
+                "required_size": required_size,
+            },
+            "errors": validation,
+        }
+
+    public_score, public_metrics = accuracy_from_counts(public_counts) if public_counts["total"] else (0.0, {})
+    private_score, private_metrics = accuracy_from_counts(private_counts) if private_counts["total"] else (0.0, {})
+
+    return {
+        "public_score": round(public_score, 2),
+        "private_score": round(private_score, 2),
+        "metrics": {
+            "public_metrics": public_metrics,
+            "private_metrics": private_metrics,
+            "submission_size": submission_size,
+            "validation_passed": True,
+        },
+        "errors": [],
+    }
+
+
 if __name__ == "__main__":
     # Пример использования
     import sys
 
-    if len(sys.argv) != 4:
-        print("Usage: python evaluate.py <submission.csv> <private.csv> <public.csv>")
+    args = [arg for arg in sys.argv[1:] if arg != "--streaming"]
+    if len(args) != 3:
+        print("Usage: python evaluate.py <submission.csv> <private.csv> <public.csv> [--streaming]")
         print()
         print("Example:")
         print("  python evaluate.py data/processed/submission.csv data/interim/private.csv data/interim/public.csv")
+        print()
+        print("  --streaming  потоковая оценка с ограниченной памятью для файлов на миллионы строк")
         sys.exit(1)
 
-    result = evaluate(sys.argv[1], sys.argv[2], sys.argv[3])
+    result = (evaluate_streaming if "--streaming" in sys.argv else evaluate)(*args)
 
     print("=" * 70)
     print("EVALUATION RESULTS")
@@ -14,44 +14,52 @@
     --output-file PATH    Путь к submission.csv (по умолчанию: data/processed/submission.csv)
     --num-examples INT    Количество примеров для few-shot (по умолчанию: 10)
     --batch-size INT      Размер батча для обработки (по умолчанию: 5)
+    --structured          Structured output: ответ LLM в JSON по схеме эндпоинтов
+    --ensemble-models M   Модели ансамбля через запятую (голосование большинством)
+    --samples INT         Сэмплов на модель ансамбля (по умолчанию: 1)
+    --agree-k INT         Досрочный выход, если первые K ответов совпали (по умолчанию: 2)
+    --max-attempts INT    Попыток на вызов LLM с экспоненциальной задержкой (по умолчанию: 4)
+    --question-timeout S  Дедлайн на все попытки по одному вопросу, сек (по умолчанию: 120)
+    --max-failures INT    Бюджет неудач: после N упавших вопросов LLM больше не вызывается (по умолчанию: 20)
+    --fallback-model M    Более дешевая модель, которой задается вопрос после неудачи основной
+    --retry-failed        Повторить вопросы, на которые LLM не ответила (ответ получен через fallback)
+    --fresh               Начать заново, очистив журнал результатов
+    --workers INT         Количество вопросов, обрабатываемых параллельно (по умолчанию: 1)
+
+Каждый ответ сразу дописывается в журнал <output>.journal.jsonl. При повторном
+запуске уже отвеченные uid пропускаются, а submission.csv собирается из журнала.
 """
 
 import csv
 import random
+import statistics
+import time
+from collections import Counter
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, replace
 from pathlib import Path
 
 import click
 from tqdm import tqdm  # type: ignore[import-untyped]
 
+from src.app.adapters.finam_endpoints import TIMEFRAMES, get_router, render_endpoint_docs
+from src.app.core.journal import CheckpointJournal
 from src.app.core.llm import call_llm
+from src.app.core.pricing import calculate_cost
+from src.app.core.retry import FailureBudget, RetryError, RetryPolicy, call_with_retry
+from src.app.core.rule_matcher import match_question
+from src.app.core.structured_output import (
+    STRUCTURED_INSTRUCTIONS,
+    STRUCTURED_MAX_TOKENS,
+    api_call_response_format,
+    parse_api_call,
+)
+from src.app.core.temporal import annotate_period
+from src.app.core.ticker_resolver import annotate_question
 
-
-def calculate_cost(usage: dict, model: str) -> float:
-    """Рассчитать стоимость запроса на основе usage и модели"""
-    # Цены OpenRouter (примерные, в $ за 1M токенов)
-    # Источник: https://openrouter.ai/models
-    pricing = {
-        "openai/gpt-4o-mini": {"prompt": 0.15, "completion": 0.60},
-        "openai/gpt-4o": {"prompt": 2.50, "completion": 10.00},
-        "openai/gpt-3.5-turbo": {"prompt": 0.50, "completion": 1.50},
-        "anthropic/claude-3-sonnet": {"prompt": 3.00, "completion": 15.00},
-        "anthropic/claude-3-haiku": {"prompt": 0.25, "completion": 1.25},
-        "google/gemini-2.5-pro": {"prompt": 1.25, "completion": 10},
-        "google/gemini-2.5-flash": {"prompt": 0.3, "completion": 2.5},
-        "x-ai/grok-code-fast-1": {"prompt": 0.20, "completion": 1.5}
-    }
-
-    # Получаем цены для модели (по умолчанию как для gpt-4o-mini)
-    prices = pricing.get(model, {"prompt": 0.15, "completion": 0.60})
-
-    prompt_tokens = usage.get("prompt_tokens", 0)
-    completion_tokens = usage.get("completion_tokens", 0)
-
-    # Считаем стоимость (цена за 1M токенов)
-    prompt_cost = (prompt_tokens / 1_000_000) * prices["prompt"]
-    completion_cost = (completion_tokens / 1_000_000) * prices["completion"]
-
-    return prompt_cost + completion_cost
+# Безопасный ответ, если не сработал ни один уровень fallback
+FALLBACK_API_CALL = {"type": "GET", "request": "/v1/assets"}
 
 
 def load_train_examples(train_file: Path, num_examples: int = 10) -> list[dict[str, str]]:
@@ -77,34 +85,22 @@ def load_train_examples(train_file: Path, num_examples: int = 10) -> list[dict[s
     return selected[:num_examples]
 
 
-def create_prompt(question: str, examples: list[dict[str, str]]) -> str:
-    """Создать промпт для LLM с few-shot примерами"""
-    prompt = r"""Ты - эксперт по Finam TradeAPI. Твоя задача - преобразовать вопрос на русском языке в HTTP запрос к API.
+def create_prompt(question: str, examples: list[dict[str, str]], structured: bool = False) -> str:
+    """Создать промпт для LLM с few-shot примерами
+
+    Args:
+        structured: Промпт для structured output (ответ в JSON по схеме)
+
+    К названиям компаний в вопросе дописываются их символы ("Сбербанка (SBER@MISX)"),
+    к периодам - границы интервала в ISO 8601 (core/temporal.py).
+    """
+    prompt = f"""\
+Ты - эксперт по Finam TradeAPI. Твоя задача - преобразовать вопрос на русском языке в HTTP запрос к API.
 
 API Documentation:
-- GET /v1/exchanges - список бирж
-- GET /v1/assets - поиск инструментов
-- GET /v1/assets/{symbol} - информация об инструменте
-- GET /v1/assets/{symbol}/params - параметры инструмента для счета
-- GET /v1/assets/{symbol}/schedule - расписание торгов
-- GET /v1/assets/{symbol}/options - опционы на базовый актив
-- GET /v1/instruments/{symbol}/quotes/latest - последняя котировка
-- GET /v1/instruments/{symbol}/orderbook - биржевой стакан
-- GET /v1/instruments/{symbol}/trades/latest - лента сделок
-- GET /v1/instruments/{symbol}/bars - исторические свечи
-  (параметры: timeframe, interval.start_time, interval.end_time)
-- GET /v1/accounts/{account_id} - информация о счете
-- GET /v1/accounts/{account_id}/orders - список ордеров
-- GET /v1/accounts/{account_id}/orders/{order_id} - информация об ордере
-- GET /v1/accounts/{account_id}/trades - история сделок
-- GET /v1/accounts/{account_id}/transactions - транзакции по счету
-- POST /v1/sessions - создание новой сессии
-- POST /v1/sessions/details - детали текущей сессии
-- POST /v1/accounts/{account_id}/orders - создание ордера
-- DELETE /v1/accounts/{account_id}/orders/{order_id} - отмена ордера
-
-Timeframes: TIME_FRAME_M1, TIME_FRAME_M5, TIME_FRAME_M15, TIME_FRAME_M30,
-TIME_FRAME_H1, TIME_FRAME_H4, TIME_FRAME_D, TIME_FRAME_W, TIME_FRAME_MN
+{render_endpoint_docs()}
+
+Timeframes: {", ".join(TIMEFRAMES)}
 
 Примеры:
 
@@ -114,8 +110,11 @@ TIME_FRAME_H1, TIME_FRAME_H4, TIME_FRAME_D, TIME_FRAME_W, TIME_FRAME_MN
         prompt += f'Вопрос: "{ex["question"]}"\n'
         prompt += f"Ответ: {ex['type']} {ex['request']}\n\n"
 
-    prompt += f'Вопрос: "{question}"\n'
-    prompt += "Ответ (только HTTP метод и путь, без объяснений):"
+    prompt += f'Вопрос: "{annotate_period(annotate_question(question))}"\n'
+    if structured:
+        prompt += STRUCTURED_INSTRUCTIONS
+    else:
+        prompt += "Ответ (только HTTP метод и путь, без объяснений):"
 
     return prompt
 
@@ -145,6 +144,11 @@ def parse_llm_response(response: str) -> tuple[str, str]:
                 request = part
                 break
 
+    # Валидируем и нормализуем путь по реестру эндпоинтов
+    normalized = get_router().normalize(method, request)
+    if normalized:
+        return normalized
+
     # Fallback на безопасный вариант
     if not request.startswith("/"):
         request = "/v1/assets"
@@ -152,34 +156,291 @@ def parse_llm_response(response: str) -> tuple[str, str]:
     return method, request
 
 
-def generate_api_call(question: str, examples: list[dict[str, str]], model: str) -> tuple[dict[str, str], float]:
+def parse_structured_response(response: str) -> tuple[str, str]:
+    """Парсинг structured (JSON) ответа LLM в (type, request)
+
+    Если JSON не соответствует схеме, используется обычный текстовый парсер.
+    """
+    try:
+        api_call = parse_api_call(response)
+    except ValueError:
+        return parse_llm_response(response)
+    if api_call is None:
+        return parse_llm_response(response)
+    return api_call.to_request()
+
+
+def generate_api_call(
+    question: str,
+    examples: list[dict[str, str]],
+    model: str,
+    structured: bool = False,
+    temperature: float = 0.0,
+    policy: RetryPolicy | None = None,
+) -> tuple[dict[str, str], float]:
     """Сгенерировать API запрос для вопроса
 
+    Args:
+        model: Модель OpenRouter, которой задается вопрос
+        structured: Использовать structured output (JSON schema) вместо свободного текста
+        temperature: Температура сэмплирования (>0 для ансамбля из нескольких сэмплов одной модели)
+        policy: Политика повторных попыток (по умолчанию RetryPolicy())
+
     Returns:
         tuple: (result_dict, cost_in_dollars)
+
+    Raises:
+        RetryError: Если LLM не ответила за отведенные попытки / время
+            (в e.cost - стоимость уже полученных ответов)
     """
-    prompt = create_prompt(question, examples)
+    prompt = create_prompt(question, examples, structured=structured)
 
     messages = [{"role": "user", "content": prompt}]
+    # Стоимость считается по каждому полученному ответу, в том числе без пригодного content
+    cost = 0.0
+
+    def attempt(timeout: float) -> str:
+        nonlocal cost
+        if structured:
+            response = call_llm(
+                messages,
+                temperature=temperature,
+                max_tokens=STRUCTURED_MAX_TOKENS,
+                response_format=api_call_response_format(),
+                model=model,
+                timeout=timeout,
+            )
+        else:
+            response = call_llm(messages, temperature=temperature, max_tokens=20000, model=model, timeout=timeout)
+        cost += calculate_cost(response.get("usage", {}), model)
+        return response["choices"][-1]["message"]["content"].strip()
+
+    def log_retry(attempt_number: int, error: BaseException, delay: float) -> None:
+        click.echo(
+            f"⚠️  Попытка {attempt_number} для вопроса '{question[:50]}...' не удалась: {error}. "
+            f"Повтор через {delay:.1f}s",
+            err=True,
+        )
+
+    try:
+        llm_answer = call_with_retry(attempt, policy or RetryPolicy(), on_retry=log_retry)
+    except RetryError as e:
+        e.cost = cost
+        raise
+
+    if structured:
+        method, request = parse_structured_response(llm_answer)
+    else:
+        method, request = parse_llm_response(llm_answer)
+
+    return {"type": method, "request": request}, cost
+
+
+def rule_based_call(question: str) -> dict[str, str]:
+    """Ответ без LLM: rule-based сопоставление вопроса с эндпоинтом"""
+    match = match_question(question)
+    if match is None:
+        return dict(FALLBACK_API_CALL)
+    method, request = match.to_request()
+    return {"type": method, "request": request}
+
+
+def generate_with_fallback(
+    question: str,
+    primary: Callable[[str], tuple[dict[str, str], float]],
+    examples: list[dict[str, str]],
+    budget: FailureBudget,
+    policy: RetryPolicy,
+    fallback_model: str | None = None,
+    structured: bool = False,
+) -> tuple[dict[str, str], float, str, str | None]:
+    """Сгенерировать API запрос с цепочкой fallback
+
+    Уровни: primary(question) (модель или ансамбль) -> fallback_model -> rule-based
+    сопоставление -> FALLBACK_API_CALL. Неудача основного уровня расходует бюджет;
+    когда бюджет исчерпан, LLM не вызывается и сразу используются правила.
+
+    Returns:
+        tuple: (result_dict, cost_in_dollars, source, error) - source это "llm",
+        "fallback_model" или "rules"; error - текст последней ошибки LLM.
+        Стоимость включает неудачные уровни
+    """
+    if budget.exhausted:
+        return rule_based_call(question), 0.0, "rules", "failure budget exhausted"
+
+    try:
+        api_call, cost = primary(question)
+        return api_call, cost, "llm", None
+    except RetryError as e:
+        error, spent = str(e), e.cost
+
+    if budget.record_failure():
+        click.echo(f"\n🛑 Бюджет неудач исчерпан ({budget.max_failures}), дальше используются только правила", err=True)
 
-    while True:
+    if fallback_model and not budget.exhausted:
         try:
-            response = call_llm(messages, temperature=0.0, max_tokens=20000)
-            # print(response)
-            llm_answer = response["choices"][-1]["message"]["content"].strip()
+            api_call, cost = generate_api_call(question, examples, fallback_model, structured=structured, policy=policy)
+            return api_call, spent + cost, "fallback_model", error
+        except RetryError as e:
+            error, spent = str(e), spent + e.cost
+
+    return rule_based_call(question), spent, "rules", error
+
+
+def journal_path(output_file: Path) -> Path:
+    """Путь к журналу результатов рядом с submission.csv"""
+    return output_file.with_name(f"{output_file.stem}.journal.jsonl")
+
+
+def select_pending(
+    questions: list[dict[str, str]], done: dict[str, dict], retry_failed: bool = False
+) -> list[dict[str, str]]:
+    """Вопросы, которые нужно (пере)генерировать
+
+    Пропускаются uid, для которых в журнале уже есть ответ на тот же вопрос.
+    Неудачные (ответ получен через fallback) повторяются только с retry_failed.
+    """
+    pending = []
+    for item in questions:
+        record = done.get(item["uid"])
+        if record is None or record["question"] != item["question"] or (retry_failed and record["status"] == "failed"):
+            pending.append(item)
+    return pending
+
 
-            method, request = parse_llm_response(llm_answer)
+def canonical_key(method: str, request: str) -> tuple[str, str]:
+    """Канонический вид запроса для голосования (через роутер эндпоинтов)"""
+    return get_router().normalize(method, request) or (method, request)
 
-            # Рассчитываем стоимость
-            usage = response.get("usage", {})
-            cost = calculate_cost(usage, model)
 
-            return {"type": method, "request": request}, cost
+def majority_vote(answers: list[tuple[str, str]]) -> tuple[tuple[str, str], int]:
+    """
+    Голосование большинством по каноническому (type, request)
+
+    При равенстве голосов побеждает ответ, полученный раньше.
+
+    Returns:
+        (winner, votes)
+    """
+    counts = Counter(answers)
+    winner = max(counts, key=lambda key: (counts[key], -answers.index(key)))
+    return winner, counts[winner]
+
+
+@dataclass
+class EnsembleStats:
+    """Статистика ансамбля по одному вопросу"""
+
+    answers: int
+    votes: int
+    cost: float
+    latency: float
+    early_exit: bool
+
+    @property
+    def agreement(self) -> float:
+        return self.votes / self.answers if self.answers else 0.0
+
+
+def generate_ensemble_call(
+    question: str,
+    examples: list[dict[str, str]],
+    members: list[str],
+    executor: ThreadPoolExecutor,
+    agree_k: int = 2,
+    structured: bool = False,
+    temperature: float = 0.7,
+    policy: RetryPolicy | None = None,
+) -> tuple[dict[str, str], EnsembleStats]:
+    """Сгенерировать API запрос ансамблем моделей / сэмплов с голосованием
+
+    Сначала параллельно запрашиваются первые agree_k участников. Если их ответы
+    совпали, остальные не запрашиваются (early exit), иначе параллельно
+    запрашиваются оставшиеся и выбирается ответ большинства. Участники, которые
+    не ответили за отведенные попытки, в голосовании не учитываются, но их
+    стоимость входит в итог. Дедлайн policy.timeout общий на весь вопрос.
+
+    Args:
+        members: Модель для каждого сэмпла (одна модель может повторяться)
+        executor: Общий пул потоков для запросов к LLM
+        agree_k: Сколько первых совпавших ответов достаточно для досрочного выхода
+        temperature: Температура для повторяющихся моделей (уникальные спрашиваются с 0.0)
+        policy: Политика повторных попыток для каждого участника (timeout - на весь вопрос)
+
+    Returns:
+        tuple: (result_dict, stats)
+
+    Raises:
+        RetryError: Если не ответил ни один участник (в e.cost - стоимость их ответов)
+    """
+    repeated = {m for m in members if members.count(m) > 1}
+    policy = policy or RetryPolicy()
+    deadline = time.monotonic() + policy.timeout if policy.timeout is not None else None
+
+    def ask(model: str) -> tuple[dict[str, str] | None, float]:
+        # Участник получает остаток общего дедлайна на момент старта (в том числе после ожидания в пуле)
+        member_policy = policy
+        if deadline is not None:
+            member_policy = replace(policy, timeout=max(0.0, deadline - time.monotonic()))
+        try:
+            return generate_api_call(
+                question,
+                examples,
+                model,
+                structured=structured,
+                temperature=temperature if model in repeated else 0.0,
+                policy=member_policy,
+            )
+        except RetryError as e:
+            click.echo(f"⚠️  Участник ансамбля {model} не ответил: {e}", err=True)
+            return None, e.cost
+
+    started = time.perf_counter()
+    answers: list[tuple[str, str]] = []
+    cost = 0.0
+
+    first_wave, rest = members[:agree_k], members[agree_k:]
+    asked = 0
+    for wave in (first_wave, rest):
+        if deadline is not None and time.monotonic() >= deadline:
+            break
+        for api_call, call_cost in executor.map(ask, wave):
+            asked += 1
+            cost += call_cost
+            if api_call is not None:
+                answers.append(canonical_key(api_call["type"], api_call["request"]))
+        if wave is first_wave and len(answers) == len(first_wave) and len(set(answers)) == 1:
+            break
 
-        except Exception as e:
-            click.echo(f"⚠️  Ошибка при генерации для вопроса '{question[:50]}...': {e}", err=True)
-            # Возвращаем fallback
-            # return {"type": "GET", "request": "/v1/assets"}, 0.0
+    if not answers:
+        raise RetryError(f"All {asked} ensemble members failed", asked, cost=cost)
+
+    (method, request), votes = majority_vote(answers)
+    stats = EnsembleStats(
+        answers=len(answers),
+        votes=votes,
+        cost=cost,
+        latency=time.perf_counter() - started,
+        early_exit=asked < len(members),
+    )
+    return {"type": method, "request": request}, stats
+
+
+def print_ensemble_summary(rows: list[dict], members: int) -> None:
+    """Вывести agreement, early exit, стоимость и латентность ансамбля"""
+    agreements = [float(r["agreement"]) for r in rows]
+    latencies = sorted(float(r["latency_s"]) for r in rows)
+    answers = [int(r["answers"]) for r in rows]
+    p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+
+    click.echo("\n🗳  Статистика ансамбля:")
+    click.echo(f"   Средний agreement:        {statistics.mean(agreements):.3f}")
+    unanimous = sum(int(r["votes"]) == int(r["answers"]) for r in rows)
+    click.echo(f"   Единогласных вопросов:    {unanimous}/{len(rows)}")
+    click.echo(f"   Early exit:               {sum(r['early_exit'] == 'yes' for r in rows)}/{len(rows)}")
+    click.echo(f"   Ответов на вопрос:        {statistics.mean(answers):.2f} из {members}")
+    click.echo(f"   Стоимость на вопрос:      ${statistics.mean(float(r['cost']) for r in rows):.6f}")
+    click.echo(f"   Латентность (p50 / p95):  {statistics.median(latencies):.2f}s / {p95:.2f}s")
 
 
 @click.command()
@@ -202,7 +463,51 @@ def generate_api_call(question: str, examples: list[dict[str, str]], model: str)
     help="Путь к submission.csv",
 )
 @click.option("--num-examples", type=int, default=10, help="Количество примеров для few-shot")
-def main(test_file: Path, train_file: Path, output_file: Path, num_examples: int) -> None:
+@click.option(
+    "--structured/--free-text",
+    default=False,
+    help="Structured output: LLM возвращает JSON по схеме эндпоинтов вместо свободного текста",
+)
+@click.option(
+    "--ensemble-models",
+    default=None,
+    help="Модели ансамбля через запятую (по умолчанию только OPENROUTER_MODEL)",
+)
+@click.option("--samples", type=int, default=1, help="Количество сэмплов на каждую модель ансамбля")
+@click.option("--agree-k", type=int, default=2, help="Досрочный выход, если первые K ответов совпали")
+@click.option("--ensemble-temperature", type=float, default=0.7, help="Температура для повторных сэмплов одной модели")
+@click.option(
+    "--ensemble-report",
+    type=click.Path(path_type=Path),
+    default=None,
+    help="Сохранить статистику ансамбля по вопросам в CSV",
+)
+@click.option("--max-attempts", type=int, default=4, help="Попыток на вызов LLM (экспоненциальная задержка)")
+@click.option("--question-timeout", type=float, default=120.0, help="Дедлайн на все попытки по одному вопросу, сек")
+@click.option("--max-failures", type=int, default=20, help="После N упавших вопросов LLM больше не вызывается")
+@click.option("--fallback-model", default=None, help="Более дешевая модель для вопросов, на которых упала основная")
+@click.option("--retry-failed", is_flag=True, help="Повторить вопросы, на которые LLM не ответила (по журналу)")
+@click.option("--fresh", is_flag=True, help="Очистить журнал <output>.journal.jsonl и сгенерировать все заново")
+@click.option("--workers", type=int, default=1, help="Количество вопросов, обрабатываемых параллельно")
+def main(  # noqa: C901
+    test_file: Path,
+    train_file: Path,
+    output_file: Path,
+    num_examples: int,
+    structured: bool,
+    ensemble_models: str | None,
+    samples: int,
+    agree_k: int,
+    ensemble_temperature: float,
+    ensemble_report: Path | None,
+    max_attempts: int,
+    question_timeout: float,
+    max_failures: int,
+    fallback_model: str | None,
+    retry_failed: bool,
+    fresh: bool,
+    workers: int,
+) -> None:
     """Генерация submission.csv для хакатона"""
     from src.app.core.config import get_settings
 
@@ -217,6 +522,17 @@ def main(test_file: Path, train_file: Path, output_file: Path, num_examples: int
     examples = load_train_examples(train_file, num_examples)
     click.echo(f"✅ Загружено {len(examples)} примеров для few-shot learning")
     click.echo(f"🤖 Используется модель: {model}")
+    if structured:
+        click.echo("🧩 Режим structured output (JSON schema)")
+
+    # Участники ансамбля: модели чередуются, чтобы первая волна была разнообразной
+    models = [m.strip() for m in ensemble_models.split(",") if m.strip()] if ensemble_models else [model]
+    members = models * max(samples, 1)
+    use_ensemble = len(members) > 1
+    if use_ensemble:
+        click.echo(
+            f"🗳  Ансамбль: {len(members)} ответов на вопрос ({', '.join(models)}), early exit при {agree_k} совпадениях"
+        )
 
     # Читаем тестовый набор
     click.echo(f"📖 Чтение {test_file}...")
@@ -228,20 +544,96 @@ def main(test_file: Path, train_file: Path, output_file: Path, num_examples: int
 
     click.echo(f"✅ Найдено {len(test_questions)} вопросов для обработки")
 
+    # Журнал результатов: последняя запись по uid, уже отвеченные вопросы пропускаются
+    journal = CheckpointJournal(journal_path(output_file))
+    if fresh:
+        journal.reset()
+    done = journal.load()
+    pending = select_pending(test_questions, done, retry_failed=retry_failed)
+    if done:
+        click.echo(f"📒 Журнал {journal.path}: {len(done)} записей, к генерации {len(pending)} вопросов")
+
+    policy = RetryPolicy(max_attempts=max_attempts, timeout=question_timeout)
+    budget = FailureBudget(max_failures)
+
     # Генерируем ответы
     click.echo("\n🤖 Генерация API запросов с помощью LLM...")
-    results = []
     total_cost = 0.0
 
-    # Используем tqdm с postfix для отображения стоимости
-    progress_bar = tqdm(test_questions, desc="Обработка")
-    for item in progress_bar:
-        api_call, cost = generate_api_call(item["question"], examples, model)
-        total_cost += cost
-        results.append({"uid": item["uid"], "type": api_call["type"], "request": api_call["request"]})
+    ensemble_rows = []
+    executor = ThreadPoolExecutor(max_workers=len(members) * workers) if use_ensemble else None
+
+    def process(item: dict[str, str]) -> tuple[dict, EnsembleStats | None]:
+        """Сгенерировать ответ на вопрос и сразу записать его в журнал"""
+        ensemble_stats: list[EnsembleStats] = []
+
+        def primary(question: str) -> tuple[dict[str, str], float]:
+            """Основной уровень: одна модель или ансамбль"""
+            if executor is None:
+                return generate_api_call(question, examples, model, structured=structured, policy=policy)
+            api_call, stats = generate_ensemble_call(
+                question,
+                examples,
+                members,
+                executor,
+                agree_k=agree_k,
+                structured=structured,
+                temperature=ensemble_temperature,
+                policy=policy,
+            )
+            ensemble_stats.append(stats)
+            return api_call, stats.cost
+
+        api_call, cost, source, error = generate_with_fallback(
+            item["question"],
+            primary,
+            examples,
+            budget,
+            policy,
+            fallback_model=fallback_model,
+            structured=structured,
+        )
+        record = {
+            **item,
+            **api_call,
+            "status": "ok" if source == "llm" else "failed",
+            "source": source,
+            "error": error,
+            "cost": cost,
+        }
+        journal.append(record)
+        return record, (ensemble_stats[0] if ensemble_stats else None)
 
-        # Обновляем postfix с текущей стоимостью
-        progress_bar.set_postfix({"cost": f"${total_cost:.4f}"})
+    # Используем tqdm с postfix для отображения стоимости
+    progress_bar = tqdm(total=len(pending), desc="Обработка")
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        futures = [pool.submit(process, item) for item in pending]
+        for future in as_completed(futures):
+            record, stats = future.result()
+            total_cost += record["cost"]
+            if stats is not None:
+                ensemble_rows.append({
+                    "uid": record["uid"],
+                    "answers": stats.answers,
+                    "votes": stats.votes,
+                    "agreement": f"{stats.agreement:.3f}",
+                    "early_exit": "yes" if stats.early_exit else "no",
+                    "cost": f"{stats.cost:.6f}",
+                    "latency_s": f"{stats.latency:.3f}",
+                })
+
+            # Обновляем postfix с текущей стоимостью
+            progress_bar.update()
+            progress_bar.set_postfix({"cost": f"${total_cost:.4f}"})
+    progress_bar.close()
+
+    if executor is not None:
+        executor.shutdown()
+
+    # Собираем submission.csv из журнала в порядке test.csv
+    records = journal.load()
+    answered = [records[item["uid"]] for item in test_questions if item["uid"] in records]
+    results = [{"uid": r["uid"], "type": r["type"], "request": r["request"]} for r in answered]
 
     # Записываем в submission.csv
     click.echo(f"\n💾 Сохранение результатов в {output_file}...")
@@ -253,8 +645,9 @@ def main(test_file: Path, train_file: Path, output_file: Path, num_examples: int
         writer.writerows(results)
 
     click.echo(f"✅ Готово! Создано {len(results)} записей в {output_file}")
-    click.echo(f"\n💰 Общая стоимость генерации: ${total_cost:.4f}")
-    click.echo(f"   Средняя стоимость на запрос: ${total_cost / len(results):.6f}")
+    click.echo(f"\n💰 Стоимость генерации в этом запуске: ${total_cost:.4f}")
+    if pending:
+        click.echo(f"   Средняя стоимость на запрос: ${total_cost / len(pending):.6f}")
     click.echo("\n📊 Статистика по типам запросов:")
     type_counts: dict[str, int] = {}
     for r in results:
@@ -262,6 +655,23 @@ def main(test_file: Path, train_file: Path, output_file: Path, num_examples: int
     for method, count in sorted(type_counts.items()):
         click.echo(f"  {method}: {count}")
 
+    sources = Counter(r["source"] for r in answered)
+    if sources["llm"] < len(answered):
+        click.echo("\n🛟 Источники ответов:")
+        for source, count in sources.most_common():
+            click.echo(f"  {source}: {count}")
+        click.echo(f"⚠️  Неудачные вопросы отмечены в {journal.path}, повтор: --retry-failed")
+
+    if ensemble_rows:
+        print_ensemble_summary(ensemble_rows, len(members))
+        if ensemble_report:
+            ensemble_report.parent.mkdir(parents=True, exist_ok=True)
+            with open(ensemble_report, "w", encoding="utf-8", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=list(ensemble_rows[0]), delimiter=";")
+                writer.writeheader()
+                writer.writerows(ensemble_rows)
+            click.echo(f"\n💾 Статистика ансамбля сохранена в {ensemble_report}")
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""
+Параллельный прогон экспериментов: модели x шаблоны промптов x число примеров
+
+Вместо ручных последовательных запусков generate-submission и calculate-metrics
+прогоняет всю матрицу вариантов одной командой: вопросы всех вариантов
+выполняются параллельно с общим кэшем ответов LLM и глобальным ограничением
+частоты запросов, а в конце печатается leaderboard (accuracy, стоимость,
+средняя и p95 латентность, токены).
+
+Вопросы для оценки - случайная выборка (--limit, --seed) из размеченного файла,
+few-shot примеры берутся из остальных строк того же файла, чтобы вопрос не
+попадал в собственные примеры.
+
+Шаблоны промптов:
+    default       create_prompt из generate_submission
+    structured    create_prompt + structured output (JSON schema)
+    name=path     свой шаблон из файла с плейсхолдерами
+                  {docs}, {timeframes}, {examples}, {question}
+
+Использование:
+    poetry run run-experiments --models openai/gpt-4o-mini,google/gemini-2.5-flash \\
+        --prompts default,structured --k-examples 5,20 --limit 50 --workers 8 --rate-limit 5
+    poetry run run-experiments --prompts default,short=prompts/short.txt --k-examples 10,all
+
+Повторный запуск берет ответы из кэша (--cache), поэтому добавление одного
+варианта в матрицу не оплачивает заново остальные. Латентность ответов из кэша
+- это латентность исходного вызова.
+"""
+
+import csv
+import hashlib
+import itertools
+import json
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import click
+from tqdm import tqdm  # type: ignore[import-untyped]
+
+from scripts.calculate_metrics import calculate_accuracy
+from scripts.generate_submission import create_prompt, parse_llm_response, parse_structured_response
+from src.app.adapters.finam_endpoints import TIMEFRAMES, render_endpoint_docs
+from src.app.core.config import get_settings
+from src.app.core.journal import CheckpointJournal
+from src.app.core.llm import call_llm
+from src.app.core.pricing import calculate_cost
+from src.app.core.retry import RateLimiter, RetryError, RetryPolicy, call_with_retry
+from src.app.core.structured_output import STRUCTURED_MAX_TOKENS, api_call_response_format
+
+BUILTIN_PROMPTS = ("default", "structured")
+
+# max_tokens для текстового ответа, как в generate_submission.generate_api_call
+TEXT_MAX_TOKENS = 20000
+
+LEADERBOARD_FIELDS = [
+    "variant",
+    "model",
+    "prompt",
+    "k",
+    "accuracy",
+    "type_accuracy",
+    "cost",
+    "latency_mean_s",
+    "latency_p95_s",
+    "prompt_tokens",
+    "completion_tokens",
+    "errors",
+    "cache_hits",
+]
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    """Шаблон промпта: встроенный (default / structured) или текст из файла"""
+
+    name: str
+    text: str | None = None
+
+    @property
+    def structured(self) -> bool:
+        return self.text is None and self.name == "structured"
+
+    def render(self, question: str, examples: list[dict[str, str]]) -> str:
+        if self.text is None:
+            return create_prompt(question, examples, structured=self.structured)
+        shots = "".join(f'Вопрос: "{ex["question"]}"\nОтвет: {ex["type"]} {ex["request"]}\n\n' for ex in examples)
+        return self.text.format(
+            docs=render_endpoint_docs(), timeframes=", ".join(TIMEFRAMES), examples=shots, question=question
+        )
+
+
+@dataclass(frozen=True)
+class Variant:
+    """Вариант эксперимента: модель, шаблон промпта и число few-shot примеров (None - все)"""
+
+    model: str
+    prompt: PromptTemplate
+    k: int | None
+
+    @property
+    def name(self) -> str:
+        return f"{self.model} | {self.prompt.name} | k={'all' if self.k is None else self.k}"
+
+
+@dataclass
+class Outcome:
+    """Результат одного вопроса в одном варианте"""
+
+    uid: str
+    type: str
+    request: str
+    latency: float
+    prompt_tokens: int
+    completion_tokens: int
+    cost: float
+    cached: bool
+    error: str | None = None
+
+
+class ResponseCache:
+    """
+    Общий для всех вариантов кэш ответов LLM (потокобезопасный)
+
+    Ключ - хеш полного запроса (модель, сообщения, параметры). С path записи
+    сохраняются в JSONL журнал и переживают перезапуск.
+    """
+
+    def __init__(self, path: Path | None = None):
+        self._journal = CheckpointJournal(path, key="key") if path else None
+        self._items = self._journal.load() if self._journal else {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(payload: dict[str, Any]) -> str:
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        with self._lock:
+            return self._items.get(key)
+
+    def put(self, record: dict[str, Any]) -> None:
+        with self._lock:
+            self._items[record["key"]] = record
+        if self._journal:
+            self._journal.append(record)
+
+
+def parse_prompts(value: str) -> list[PromptTemplate]:
+    """Разобрать --prompts: встроенные имена или name=path"""
+    prompts = []
+    for spec in filter(None, (s.strip() for s in value.split(","))):
+        name, sep, path = spec.partition("=")
+        if sep:
+            prompts.append(PromptTemplate(name, Path(path).read_text(encoding="utf-8")))
+        elif name in BUILTIN_PROMPTS:
+            prompts.append(PromptTemplate(name))
+        else:
+            raise click.BadParameter(
+                f"неизвестный шаблон '{name}', доступны {', '.join(BUILTIN_PROMPTS)} или name=path"
+            )
+    return prompts
+
+
+def parse_k(value: str) -> list[int | None]:
+    """Разобрать --k-examples: числа через запятую, 'all' - все примеры"""
+    return [None if k.strip() == "all" else int(k) for k in value.split(",") if k.strip()]
+
+
+def select_examples(pool: list[dict[str, str]], k: int | None, seed: int = 0) -> list[dict[str, str]]:
+    """Сбалансированный набор из k примеров (как load_train_examples), детерминированный по seed"""
+    if k is None or k >= len(pool):
+        return list(pool)
+    rng = random.Random(seed)
+    by_type = {m: [e for e in pool if e["type"] == m] for m in ("GET", "POST", "DELETE")}
+    selected = rng.sample(by_type["POST"], min(2, len(by_type["POST"]), k))
+    selected += rng.sample(by_type["DELETE"], min(1, len(by_type["DELETE"]), k - len(selected)))
+    selected += rng.sample(by_type["GET"], min(k - len(selected), len(by_type["GET"])))
+    rng.shuffle(selected)
+    return selected
+
+
+def run_question(
+    variant: Variant,
+    item: dict[str, str],
+    examples: list[dict[str, str]],
+    cache: ResponseCache,
+    limiter: RateLimiter,
+    policy: RetryPolicy,
+) -> Outcome:
+    """Задать вопрос в варианте (через кэш и общий rate limit) и разобрать ответ"""
+    structured = variant.prompt.structured
+    messages = [{"role": "user", "content": variant.prompt.render(item["question"], examples)}]
+    payload: dict[str, Any] = {
+        "model": variant.model,
+        "messages": messages,
+        "temperature": 0.0,
+        "max_tokens": STRUCTURED_MAX_TOKENS if structured else TEXT_MAX_TOKENS,
+        "response_format": api_call_response_format() if structured else None,
+    }
+    key = ResponseCache.key(payload)
+    record = cache.get(key)
+    cached = record is not None
+
+    if record is None:
+
+        def attempt(timeout: float) -> tuple[dict[str, Any], float]:
+            limiter.acquire()
+            started = time.perf_counter()
+            response = call_llm(
+                messages,
+                temperature=0.0,
+                max_tokens=payload["max_tokens"],
+                response_format=payload["response_format"],
+                model=variant.model,
+                timeout=timeout,
+            )
+            return response, time.perf_counter() - started
+
+        try:
+            response, latency = call_with_retry(attempt, policy)
+        except RetryError as e:
+            return Outcome(item["uid"], "", "", 0.0, 0, 0, 0.0, False, str(e))
+        record = {
+            "key": key,
+            "content": response["choices"][-1]["message"]["content"].strip(),
+            "usage": response.get("usage", {}),
+            "latency": latency,
+        }
+        cache.put(record)
+
+    parse = parse_structured_response if structured else parse_llm_response
+    method, request = parse(record["content"])
+    usage = record["usage"]
+    return Outcome(
+        uid=item["uid"],
+        type=method,
+        request=request,
+        latency=record["latency"],
+        prompt_tokens=usage.get("prompt_tokens", 0),
+        completion_tokens=usage.get("completion_tokens", 0),
+        cost=calculate_cost(usage, variant.model),
+        cached=cached,
+    )
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Перцентиль (nearest rank)"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def summarize(variant: Variant, outcomes: list[Outcome], truth: dict[str, dict[str, str]]) -> dict[str, Any]:
+    """Строка leaderboard: точность по calculate_accuracy, стоимость, латентность, токены"""
+    predicted = {o.uid: {"type": o.type, "request": o.request} for o in outcomes if o.error is None}
+    accuracy, stats = calculate_accuracy(predicted, {o.uid: truth[o.uid] for o in outcomes})
+    latencies = [o.latency for o in outcomes if o.error is None]
+    return {
+        "variant": variant.name,
+        "model": variant.model,
+        "prompt": variant.prompt.name,
+        "k": "all" if variant.k is None else variant.k,
+        "accuracy": round(accuracy, 4),
+        "type_accuracy": round(stats["type_accuracy"], 4),
+        "cost": round(sum(o.cost for o in outcomes), 6),
+        "latency_mean_s": round(statistics.fmean(latencies), 3) if latencies else 0.0,
+        "latency_p95_s": round(percentile(latencies, 0.95), 3),
+        "prompt_tokens": sum(o.prompt_tokens for o in outcomes),
+        "completion_tokens": sum(o.completion_tokens for o in outcomes),
+        "errors": sum(o.error is not None for o in outcomes),
+        "cache_hits": sum(o.cached for o in outcomes),
+    }
+
+
+def print_leaderboard(rows: list[dict[str, Any]]) -> None:
+    click.echo(
+        f"\n{'#':<3} {'Вариант':<52} {'Accuracy':>9} {'Cost $':>10} {'Mean s':>7} {'p95 s':>7} "
+        f"{'Tokens in/out':>16} {'Err':>4} {'Cache':>6}"
+    )
+    click.echo("-" * 121)
+    for i, row in enumerate(rows, 1):
+        tokens = f"{row['prompt_tokens']}/{row['completion_tokens']}"
+        click.echo(
+            f"{i:<3} {row['variant'][:52]:<52} {row['accuracy'] * 100:>8.2f}% {row['cost']:>10.4f} "
+            f"{row['latency_mean_s']:>7.2f} {row['latency_p95_s']:>7.2f} {tokens:>16} {row['errors']:>4} "
+            f"{row['cache_hits']:>6}"
+        )
+
+
+@click.command()
+@click.option("--models", default=None, help="Модели через запятую (по умолчанию OPENROUTER_MODEL)")
+@click.option("--prompts", default="default", help="Шаблоны промптов через запятую: default, structured, name=path")
+@click.option("--k-examples", default="10", help="Число few-shot примеров через запятую ('all' - все)")
+@click.option(
+    "--questions-file",
+    type=click.Path(exists=True, path_type=Path),
+    default="data/processed/train.csv",
+    help="Размеченные вопросы (uid;question;type;request)",
+)
+@click.option("--limit", type=int, default=50, help="Вопросов для оценки в каждом варианте")
+@click.option("--seed", type=int, default=0, help="Seed выборки вопросов и примеров")
+@click.option("--workers", type=int, default=8, help="Параллельных запросов на все варианты")
+@click.option("--rate-limit", type=float, default=5.0, help="Не более N запросов к LLM в секунду (0 - без ограничения)")
+@click.option("--max-attempts", type=int, default=4, help="Попыток на вызов LLM")
+@click.option(
+    "--cache",
+    "cache_file",
+    type=click.Path(path_type=Path),
+    default="data/interim/experiments_cache.jsonl",
+    help="Общий кэш ответов LLM (JSONL)",
+)
+@click.option("--no-cache", is_flag=True, help="Не читать и не сохранять кэш на диске")
+@click.option(
+    "--output",
+    type=click.Path(path_type=Path),
+    default="data/interim/leaderboard.csv",
+    help="Leaderboard в CSV",
+)
+@click.option(
+    "--predictions-dir",
+    type=click.Path(path_type=Path),
+    default=None,
+    help="Сохранить предсказания каждого варианта (uid;type;request) для calculate-metrics --report",
+)
+def main(
+    models: str | None,
+    prompts: str,
+    k_examples: str,
+    questions_file: Path,
+    limit: int,
+    seed: int,
+    workers: int,
+    rate_limit: float,
+    max_attempts: int,
+    cache_file: Path,
+    no_cache: bool,
+    output: Path,
+    predictions_dir: Path | None,
+) -> None:
+    """Прогнать матрицу (модель, промпт, k примеров) и построить leaderboard"""
+    model_list = [m.strip() for m in (models or get_settings().openrouter_model).split(",") if m.strip()]
+    variants = [
+        Variant(model, prompt, k)
+        for model, prompt, k in itertools.product(model_list, parse_prompts(prompts), parse_k(k_examples))
+    ]
+
+    with open(questions_file, encoding="utf-8") as f:
+        rows = list(csv.DictReader(f, delimiter=";"))
+    for i, row in enumerate(rows):
+        row.setdefault("uid", str(i))
+    rng = random.Random(seed)
+    questions = rng.sample(rows, min(limit, len(rows)))
+    asked = {row["uid"] for row in questions}
+    pool = [
+        {"question": r["question"], "type": r["type"], "request": r["request"]} for r in rows if r["uid"] not in asked
+    ]
+    truth = {row["uid"]: {"type": row["type"], "request": row["request"]} for row in questions}
+
+    click.echo(f"🧪 Вариантов: {len(variants)}, вопросов в каждом: {len(questions)}, примеров в пуле: {len(pool)}")
+    click.echo(f"⚙️  Потоков: {workers}, лимит: {rate_limit or '∞'} запр/с")
+
+    cache = ResponseCache(None if no_cache else cache_file)
+    limiter = RateLimiter(rate_limit)
+    policy = RetryPolicy(max_attempts=max_attempts)
+    examples = {variant: select_examples(pool, variant.k, seed) for variant in variants}
+    outcomes: dict[Variant, list[Outcome]] = {variant: [] for variant in variants}
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool_executor:
+        futures = {
+            pool_executor.submit(run_question, variant, item, examples[variant], cache, limiter, policy): variant
+            for variant in variants
+            for item in questions
+        }
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Эксперименты"):
+            outcomes[futures[future]].append(future.result())
+    elapsed = time.perf_counter() - started
+
+    leaderboard = sorted(
+        (summarize(variant, outcomes[variant], truth) for variant in variants),
+        key=lambda row: (-row["accuracy"], row["cost"]),
+    )
+    print_leaderboard(leaderboard)
+    click.echo(f"\n⏱️  Время прогона: {elapsed:.1f}s")
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=LEADERBOARD_FIELDS, delimiter=";")
+        writer.writeheader()
+        writer.writerows(leaderboard)
+    click.echo(f"💾 Leaderboard сохранен в {output}")
+
+    if predictions_dir:
+        predictions_dir.mkdir(parents=True, exist_ok=True)
+        for i, variant in enumerate(variants, 1):
+            path = predictions_dir / f"variant_{i:02d}.csv"
+            with open(path, "w", encoding="utf-8", newline="") as f:
+                writer = csv.writer(f, delimiter=";")
+                writer.writerow(["uid", "type", "request"])
+                writer.writerows((o.uid, o.type, o.request) for o in outcomes[variant] if o.error is None)
+            click.echo(f"   {path.name}: {variant.name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Потоковая оценка submission с ограниченной памятью
+
+Для файлов на миллионы строк словари {uid: row} по всем файлам не помещаются
+в память. Здесь используется hash join на диске: каждый CSV потоково
+раскладывается по K бакетам по crc32(uid) % K, затем бакеты с одинаковым
+номером сравниваются по очереди. В памяти одновременно находится только один
+бакет (~bucket_rows строк), ошибки собираются в reservoir sample фиксированного
+размера.
+
+Используется в calculate_metrics.py (--streaming) и evaluate.evaluate_streaming.
+"""
+
+import csv
+import random
+import tempfile
+import zlib
+from collections.abc import Iterator
+from contextlib import ExitStack, contextmanager, suppress
+from pathlib import Path
+from typing import Any
+
+# Строк в одном бакете по умолчанию (~десятки МБ памяти на бакет)
+DEFAULT_BUCKET_ROWS = 200_000
+
+# Размер выборки ошибок по умолчанию
+DEFAULT_ERROR_SAMPLE = 100
+
+Row = tuple[str, str]
+
+
+class ErrorReservoir:
+    """Равномерная выборка фиксированного размера из потока ошибок (Algorithm R)"""
+
+    def __init__(self, capacity: int = DEFAULT_ERROR_SAMPLE, seed: int = 0):
+        self.capacity = capacity
+        self.seen = 0
+        self.items: list[dict[str, Any]] = []
+        self._rng = random.Random(seed)
+
+    def add(self, item: dict[str, Any]) -> None:
+        self.seen += 1
+        if len(self.items) < self.capacity:
+            self.items.append(item)
+            return
+        index = self._rng.randrange(self.seen)
+        if index < self.capacity:
+            self.items[index] = item
+
+
+def count_rows(path: Path) -> int:
+    """Количество строк данных в CSV (без заголовка), потоково"""
+    lines = 0
+    last = b"\n"
+    with open(path, "rb") as f:
+        while chunk := f.read(1 << 20):
+            lines += chunk.count(b"\n")
+            last = chunk[-1:]
+    if last != b"\n":
+        lines += 1
+    return max(lines - 1, 0)
+
+
+def bucket_count(paths: list[Path], bucket_rows: int = DEFAULT_BUCKET_ROWS) -> int:
+    """Число бакетов, чтобы самый большой файл давал ~bucket_rows строк на бакет"""
+    largest = max((count_rows(p) for p in paths), default=0)
+    return max(1, -(-largest // bucket_rows))
+
+
+def bucket_of(uid: str, buckets: int) -> int:
+    """Стабильный номер бакета для uid"""
+    return zlib.crc32(uid.encode()) % buckets
+
+
+@contextmanager
+def partition_files(files: dict[str, Path], buckets: int, strip: bool = True) -> Iterator[Path]:
+    """
+    Разложить CSV файлы (uid;type;request) по бакетам во временной директории
+
+    Args:
+        files: {имя: путь к CSV}; имя используется в load_bucket / iter_buckets
+        strip: Очищать значения от пробелов по краям и пропускать пустые uid
+            (как evaluate.load_csv_data); без strip значения сравниваются как есть
+    """
+    with tempfile.TemporaryDirectory(prefix="eval_buckets_") as tmp:
+        tmp_dir = Path(tmp)
+        for name, path in files.items():
+            # ExitStack закрывает уже открытые файлы бакетов, даже если очередной open упал
+            with ExitStack() as stack, open(path, encoding="utf-8") as f:
+                writers = [
+                    csv.writer(
+                        stack.enter_context(open(tmp_dir / f"{name}_{i}.csv", "w", encoding="utf-8", newline="")),
+                        delimiter=";",
+                    )
+                    for i in range(buckets)
+                ]
+                for row in csv.DictReader(f, delimiter=";"):
+                    values = (row.get("uid") or "", row.get("type") or "", row.get("request") or "")
+                    if strip:
+                        values = tuple(v.strip() for v in values)  # type: ignore[assignment]
+                        if not values[0]:
+                            continue
+                    writers[bucket_of(values[0], buckets)].writerow(values)
+        yield tmp_dir
+
+
+def load_bucket(tmp_dir: Path, name: str, index: int) -> dict[str, Row]:
+    """Загрузить один бакет файла в словарь {uid: (type, request)} (последняя строка по uid побеждает)"""
+    data: dict[str, Row] = {}
+    with suppress(FileNotFoundError), open(tmp_dir / f"{name}_{index}.csv", encoding="utf-8", newline="") as f:
+        for uid, method, request in csv.reader(f, delimiter=";"):
+            data[uid] = (method, request)
+    return data
+
+
+def iter_buckets(tmp_dir: Path, names: list[str], buckets: int) -> Iterator[dict[str, dict[str, Row]]]:
+    """Последовательно выдать бакеты всех файлов с одинаковым номером"""
+    for index in range(buckets):
+        yield {name: load_bucket(tmp_dir, name, index) for name in names}
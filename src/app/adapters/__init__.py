@@ -1,3 +1,4 @@
 from .finam_client import FinamAPIClient
+from .finam_endpoints import ENDPOINTS, Endpoint, EndpointRouter, get_router
 
-__all__ = ["FinamAPIClient"]
+__all__ = ["ENDPOINTS", "Endpoint", "EndpointRouter", "FinamAPIClient", "get_router"]
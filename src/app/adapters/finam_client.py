@@ -3,12 +3,27 @@
 https://tradeapi.finam.ru/
 """
 
+import inspect
 import os
+from collections.abc import Callable
+from contextlib import AbstractContextManager
 from typing import Any
 
 import requests
-from transliterate import translit
-from Levenshtein import distance
+
+from .finam_endpoints import ENDPOINTS, ENDPOINTS_BY_NAME, Endpoint, get_router
+
+# Наблюдатель запросов: по имени эндпоинта возвращает контекст со спаном (поля status и attributes).
+# Адаптер не зависит от core, телеметрия подключается через set_request_observer (см. core/telemetry.py)
+RequestObserver = Callable[[str], AbstractContextManager[Any]]
+
+_request_observer: RequestObserver | None = None
+
+
+def set_request_observer(observer: RequestObserver | None) -> None:
+    """Подключить наблюдатель запросов ко всем клиентам (None - отключить)"""
+    global _request_observer
+    _request_observer = observer
 
 
 class FinamAPIClient:
@@ -51,6 +66,23 @@ class FinamAPIClient:
         Raises:
             requests.HTTPError: Если запрос завершился с ошибкой
         """
+        observer = _request_observer
+        if observer is None:
+            return self._send_request(method, path, **kwargs)
+
+        # Спан именуется шаблоном эндпоинта, чтобы телеметрия не дробилась по тикерам и счетам
+        route = get_router().match(method, path)
+        name = route.label if route else f"{method.upper()} <unknown>"
+        with observer(name) as request_span:
+            result = self._send_request(method, path, **kwargs)
+            if isinstance(result, dict) and "error" in result:
+                request_span.status = "error"
+                if result.get("status_code") is not None:
+                    request_span.attributes["status_code"] = result["status_code"]
+        return result
+
+    def _send_request(self, method: str, path: str, **kwargs: Any) -> dict[str, Any]:  # noqa: ANN401
+        """HTTP запрос без телеметрии; ошибки возвращаются словарем с ключом error"""
         url = f"{self.base_url}{path}"
 
         try:
@@ -79,60 +111,30 @@ class FinamAPIClient:
         except Exception as e:
             return {"error": str(e), "type": type(e).__name__}
 
-    # Удобные методы для частых операций
-
-    def get_quote(self, symbol: str) -> dict[str, Any]:
-        """Получить текущую котировку инструмента"""
-        return self.execute_request("GET", f"/v1/instruments/{symbol}/quotes/latest")
-
-    def get_orderbook(self, symbol: str, depth: int = 10) -> dict[str, Any]:
-        """Получить биржевой стакан"""
-        return self.execute_request("GET", f"/v1/instruments/{symbol}/orderbook", params={"depth": depth})
-
-    def get_candles(
-        self, symbol: str, timeframe: str = "D", start: str | None = None, end: str | None = None
-    ) -> dict[str, Any]:
-        """Получить исторические свечи"""
-        params = {"timeframe": timeframe}
-        if start:
-            params["interval.start_time"] = start
-        if end:
-            params["interval.end_time"] = end
-        return self.execute_request("GET", f"/v1/instruments/{symbol}/bars", params=params)
-
-    def get_account(self, account_id: str) -> dict[str, Any]:
-        """Получить информацию о счете"""
-        return self.execute_request("GET", f"/v1/accounts/{account_id}")
-
-    def get_orders(self, account_id: str) -> dict[str, Any]:
-        """Получить список ордеров"""
-        return self.execute_request("GET", f"/v1/accounts/{account_id}/orders")
-
-    def get_order(self, account_id: str, order_id: str) -> dict[str, Any]:
-        """Получить информацию об ордере"""
-        return self.execute_request("GET", f"/v1/accounts/{account_id}/orders/{order_id}")
-
-    def create_order(self, account_id: str, order_data: dict[str, Any]) -> dict[str, Any]:
-        """Создать новый ордер"""
-        return self.execute_request("POST", f"/v1/accounts/{account_id}/orders", json=order_data)
-
-    def cancel_order(self, account_id: str, order_id: str) -> dict[str, Any]:
-        """Отменить ордер"""
-        return self.execute_request("DELETE", f"/v1/accounts/{account_id}/orders/{order_id}")
-
-    def get_trades(self, account_id: str, start: str | None = None, end: str | None = None) -> dict[str, Any]:
-        """Получить историю сделок"""
-        params = {}
-        if start:
-            params["interval.start_time"] = start
-        if end:
-            params["interval.end_time"] = end
-        return self.execute_request("GET", f"/v1/accounts/{account_id}/trades", params=params)
+    def call_endpoint(self, name: str, **kwargs: Any) -> dict[str, Any]:  # noqa: ANN401
+        """
+        Вызвать эндпоинт из реестра ENDPOINTS по имени
+
+        Args:
+            name: Имя эндпоинта (например, get_quote)
+            **kwargs: Параметры эндпоинта (path, query и body)
+        """
+        endpoint = ENDPOINTS_BY_NAME[name]
+        path, params, body = endpoint.build_request(**kwargs)
+        request_kwargs: dict[str, Any] = {}
+        if params:
+            request_kwargs["params"] = params
+        if body is not None:
+            request_kwargs["json"] = body
+        return self.execute_request(endpoint.method, path, **request_kwargs)
+
+    # Методы для каждого эндпоинта (get_quote, get_candles, ...) генерируются
+    # из реестра ENDPOINTS, см. _install_endpoint_methods ниже
 
     def get_positions(self, account_id: str) -> dict[str, Any]:
         """Получить открытые позиции"""
-        # Позиции обычно включены в ответ get_account
-        return self.execute_request("GET", f"/v1/accounts/{account_id}")
+        # Позиции включены в ответ get_account
+        return self.call_endpoint("get_account", account_id=account_id)
 
     def get_session_details(self) -> dict[str, Any]:
         """Получить детали текущей сессии"""
@@ -156,6 +158,10 @@ class FinamAPIClient:
             >>> find_asset_name("appl")
             ['AAPL', 'APPLX', ...]
         """
+        # Импортируем лениво: нужны только для поиска, а не для старта приложения
+        from Levenshtein import distance
+        from transliterate import translit
+
         all_assets = self.execute_request("GET", "/v1/assets")
 
         candidates = []
@@ -193,4 +199,44 @@ class FinamAPIClient:
                 unique_closest.append(a)
                 seen.add(a["name"])
 
-        return unique_closest
\ No newline at end of file
+        return unique_closest
+
+
+_PARAM_ANNOTATIONS = {"string": str, "integer": int, "object": dict[str, Any]}
+
+
+def _make_endpoint_method(endpoint: Endpoint) -> Callable[..., dict[str, Any]]:
+    """Создать метод клиента для эндпоинта с сигнатурой из реестра"""
+
+    def method(self: FinamAPIClient, *args: Any, **kwargs: Any) -> dict[str, Any]:  # noqa: ANN401
+        bound = method.__signature__.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        arguments = dict(bound.arguments)
+        arguments.pop("self")
+        return self.call_endpoint(endpoint.name, **arguments)
+
+    parameters = [inspect.Parameter("self", inspect.Parameter.POSITIONAL_OR_KEYWORD)]
+    # Обязательные параметры идут первыми, как в обычной сигнатуре Python
+    for param in sorted(endpoint.params, key=lambda p: not p.required):
+        annotation = _PARAM_ANNOTATIONS.get(param.type, Any)
+        parameters.append(
+            inspect.Parameter(
+                param.name,
+                inspect.Parameter.POSITIONAL_OR_KEYWORD,
+                default=inspect.Parameter.empty if param.required else param.default,
+                annotation=annotation if param.required else annotation | None,
+            )
+        )
+    method.__signature__ = inspect.Signature(parameters, return_annotation=dict[str, Any])  # type: ignore[attr-defined]
+    method.__name__ = endpoint.name
+    method.__qualname__ = f"FinamAPIClient.{endpoint.name}"
+    method.__doc__ = f"{endpoint.summary.capitalize()} ({endpoint.method} {endpoint.path})"
+    return method
+
+
+def _install_endpoint_methods() -> None:
+    for endpoint in ENDPOINTS:
+        setattr(FinamAPIClient, endpoint.name, _make_endpoint_method(endpoint))
+
+
+_install_endpoint_methods()
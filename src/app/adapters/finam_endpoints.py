@@ -0,0 +1,491 @@
+"""
+Декларативный реестр эндпоинтов Finam TradeAPI
+
+Единственный источник правды о доступных эндпоинтах: из него генерируются
+методы FinamAPIClient, инструменты агентов, документация в промптах,
+а также компилируется роутер для валидации и нормализации путей от LLM.
+"""
+
+from dataclasses import dataclass, field
+from functools import cached_property, lru_cache
+from typing import Any
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+HTTP_METHODS = ("GET", "POST", "DELETE", "PUT", "PATCH")
+
+TIMEFRAMES = (
+    "TIME_FRAME_M1",
+    "TIME_FRAME_M5",
+    "TIME_FRAME_M15",
+    "TIME_FRAME_M30",
+    "TIME_FRAME_H1",
+    "TIME_FRAME_H4",
+    "TIME_FRAME_D",
+    "TIME_FRAME_W",
+    "TIME_FRAME_MN",
+)
+
+
+@dataclass(frozen=True)
+class EndpointParam:
+    """Параметр эндпоинта"""
+
+    name: str  # имя аргумента метода клиента / инструмента
+    location: str  # "path", "query" или "body"
+    description: str
+    type: str = "string"  # тип в терминах JSON schema (string, integer, object)
+    api_name: str | None = None  # имя параметра в API, если отличается от name
+    required: bool = True
+    default: Any = None
+
+    @property
+    def key(self) -> str:
+        """Имя параметра в запросе к API"""
+        return self.api_name or self.name
+
+
+@dataclass(frozen=True)
+class Endpoint:
+    """Описание эндпоинта Finam TradeAPI"""
+
+    name: str  # имя метода FinamAPIClient
+    method: str
+    path: str  # шаблон пути, например /v1/instruments/{symbol}/quotes/latest
+    summary: str  # краткое описание для промптов (рус.)
+    description: str  # описание для инструментов агента (англ.)
+    params: tuple[EndpointParam, ...] = field(default_factory=tuple)
+    cache_ttl: float | None = None  # сколько секунд ответ можно переиспользовать; None - не кэшируется
+
+    @property
+    def cacheable(self) -> bool:
+        return self.cache_ttl is not None
+
+    # cached_property пишет в __dict__ экземпляра в обход frozen: роутер обращается к ним на каждый запрос
+    @cached_property
+    def path_params(self) -> tuple[EndpointParam, ...]:
+        return tuple(p for p in self.params if p.location == "path")
+
+    @cached_property
+    def query_params(self) -> tuple[EndpointParam, ...]:
+        return tuple(p for p in self.params if p.location == "query")
+
+    @property
+    def body_param(self) -> EndpointParam | None:
+        return next((p for p in self.params if p.location == "body"), None)
+
+    def build_request(self, **kwargs: Any) -> tuple[str, dict[str, Any], Any]:  # noqa: ANN401
+        """
+        Собрать запрос из аргументов метода
+
+        Returns:
+            (path, query_params, json_body)
+        """
+        path = self.path
+        for p in self.path_params:
+            path = path.replace(f"{{{p.name}}}", str(kwargs[p.name]))
+
+        query: dict[str, Any] = {}
+        for p in self.query_params:
+            value = kwargs.get(p.name, p.default)
+            if value is not None:
+                query[p.key] = value
+
+        body_param = self.body_param
+        body = kwargs.get(body_param.name) if body_param else None
+        return path, query, body
+
+    def format_path(self, **kwargs: Any) -> str:  # noqa: ANN401
+        """
+        Собрать строку запроса в формате датасета: путь + query-параметры
+
+        В отличие от build_request значения по умолчанию не подставляются,
+        а отсутствующие path-параметры остаются плейсхолдерами ({account_id}).
+        """
+        path = self.path
+        for p in self.path_params:
+            if kwargs.get(p.name) is not None:
+                path = path.replace(f"{{{p.name}}}", str(kwargs[p.name]))
+        query = [(p.key, str(kwargs[p.name])) for p in self.query_params if kwargs.get(p.name) is not None]
+        if query:
+            path = f"{path}?{urlencode(query, safe=':@{}')}"
+        return path
+
+
+_SYMBOL = EndpointParam("symbol", "path", "The instrument symbol, e.g. SBER@MISX.")
+_ACCOUNT_ID = EndpointParam("account_id", "path", "The account ID.")
+_ORDER_ID = EndpointParam("order_id", "path", "The order ID.")
+_START = EndpointParam(
+    "start", "query", "The start time for the data in ISO format.", api_name="interval.start_time", required=False
+)
+_END = EndpointParam(
+    "end", "query", "The end time for the data in ISO format.", api_name="interval.end_time", required=False
+)
+
+ENDPOINTS: tuple[Endpoint, ...] = (
+    Endpoint(
+        "get_exchanges",
+        "GET",
+        "/v1/exchanges",
+        "список бирж",
+        "Get the list of available exchanges.",
+        cache_ttl=24 * 3600,
+    ),
+    Endpoint(
+        "get_assets",
+        "GET",
+        "/v1/assets",
+        "поиск инструментов",
+        "Get the list of available assets.",
+        cache_ttl=3600,
+    ),
+    Endpoint(
+        "get_asset",
+        "GET",
+        "/v1/assets/{symbol}",
+        "информация об инструменте",
+        "Get information about an asset.",
+        (_SYMBOL, EndpointParam("account_id", "query", "The account ID.", required=False)),
+        cache_ttl=3600,
+    ),
+    Endpoint(
+        "get_asset_params",
+        "GET",
+        "/v1/assets/{symbol}/params",
+        "параметры инструмента для счета",
+        "Get trading parameters of an asset for an account.",
+        (_SYMBOL, EndpointParam("account_id", "query", "The account ID.", required=False)),
+        cache_ttl=300,
+    ),
+    Endpoint(
+        "get_asset_schedule",
+        "GET",
+        "/v1/assets/{symbol}/schedule",
+        "расписание торгов",
+        "Get the trading schedule of an asset.",
+        (_SYMBOL,),
+        cache_ttl=3600,
+    ),
+    Endpoint(
+        "get_asset_options",
+        "GET",
+        "/v1/assets/{symbol}/options",
+        "опционы на базовый актив",
+        "Get options chain for an underlying asset.",
+        (_SYMBOL,),
+        cache_ttl=300,
+    ),
+    Endpoint(
+        "get_quote",
+        "GET",
+        "/v1/instruments/{symbol}/quotes/latest",
+        "последняя котировка",
+        "Get the current quote for a financial instrument.",
+        (_SYMBOL,),
+        cache_ttl=5,
+    ),
+    Endpoint(
+        "get_orderbook",
+        "GET",
+        "/v1/instruments/{symbol}/orderbook",
+        "биржевой стакан",
+        "Get the order book for a financial instrument.",
+        (
+            _SYMBOL,
+            EndpointParam("depth", "query", "The depth of the order book.", "integer", required=False, default=10),
+        ),
+        cache_ttl=1,
+    ),
+    Endpoint(
+        "get_latest_trades",
+        "GET",
+        "/v1/instruments/{symbol}/trades/latest",
+        "лента сделок",
+        "Get the latest trades for a financial instrument.",
+        (_SYMBOL,),
+        cache_ttl=5,
+    ),
+    Endpoint(
+        "get_candles",
+        "GET",
+        "/v1/instruments/{symbol}/bars",
+        "исторические свечи",
+        "Get historical candle data for a financial instrument.",
+        (
+            _SYMBOL,
+            EndpointParam(
+                "timeframe",
+                "query",
+                f"The timeframe of the candles, one of {', '.join(TIMEFRAMES)}.",
+                required=False,
+                default="TIME_FRAME_D",
+            ),
+            _START,
+            _END,
+        ),
+        cache_ttl=60,
+    ),
+    Endpoint(
+        "get_account",
+        "GET",
+        "/v1/accounts/{account_id}",
+        "информация о счете и позициях",
+        "Get information about a trading account, including positions.",
+        (_ACCOUNT_ID,),
+    ),
+    Endpoint(
+        "get_orders",
+        "GET",
+        "/v1/accounts/{account_id}/orders",
+        "список ордеров",
+        "Get a list of orders for a trading account.",
+        (_ACCOUNT_ID,),
+    ),
+    Endpoint(
+        "get_order",
+        "GET",
+        "/v1/accounts/{account_id}/orders/{order_id}",
+        "информация об ордере",
+        "Get information about a specific order.",
+        (_ACCOUNT_ID, _ORDER_ID),
+    ),
+    Endpoint(
+        "get_trades",
+        "GET",
+        "/v1/accounts/{account_id}/trades",
+        "история сделок",
+        "Get the trade history for a trading account.",
+        (_ACCOUNT_ID, _START, _END),
+    ),
+    Endpoint(
+        "get_transactions",
+        "GET",
+        "/v1/accounts/{account_id}/transactions",
+        "транзакции по счету",
+        "Get the transactions for a trading account.",
+        (
+            _ACCOUNT_ID,
+            _START,
+            _END,
+            EndpointParam("limit", "query", "Maximum number of transactions.", "integer", required=False),
+        ),
+    ),
+    Endpoint(
+        "create_session",
+        "POST",
+        "/v1/sessions",
+        "создание новой сессии",
+        "Create a new API session.",
+        (EndpointParam("payload", "body", "The request body, e.g. {'secret': '...'}.", "object", required=False),),
+    ),
+    Endpoint(
+        "get_session_details",
+        "POST",
+        "/v1/sessions/details",
+        "детали текущей сессии",
+        "Get details about the current API session.",
+    ),
+    Endpoint(
+        "create_order",
+        "POST",
+        "/v1/accounts/{account_id}/orders",
+        "создание ордера",
+        "Create a new order.",
+        (_ACCOUNT_ID, EndpointParam("order_data", "body", "The order data as a dictionary.", "object")),
+    ),
+    Endpoint(
+        "cancel_order",
+        "DELETE",
+        "/v1/accounts/{account_id}/orders/{order_id}",
+        "отмена ордера",
+        "Cancel an existing order.",
+        (_ACCOUNT_ID, _ORDER_ID),
+    ),
+)
+
+ENDPOINTS_BY_NAME: dict[str, Endpoint] = {ep.name: ep for ep in ENDPOINTS}
+ENDPOINTS_BY_ROUTE: dict[tuple[str, str], Endpoint] = {(ep.method, ep.path): ep for ep in ENDPOINTS}
+
+
+def render_endpoint_docs(endpoints: tuple[Endpoint, ...] = ENDPOINTS) -> str:
+    """Документация эндпоинтов для промптов: '- METHOD /path - описание'"""
+    lines = []
+    for ep in endpoints:
+        lines.append(f"- {ep.method} {ep.path} - {ep.summary}")
+        if ep.query_params:
+            lines.append(f"  (параметры: {', '.join(p.key for p in ep.query_params)})")
+    return "\n".join(lines)
+
+
+@dataclass(frozen=True)
+class RouteMatch:
+    """Результат сопоставления запроса с эндпоинтом"""
+
+    endpoint: Endpoint
+    path_params: dict[str, str]
+    query: tuple[tuple[str, str], ...]
+
+    @property
+    def method(self) -> str:
+        return self.endpoint.method
+
+    @property
+    def template(self) -> str:
+        return self.endpoint.path
+
+    @property
+    def label(self) -> str:
+        """Метод и шаблон пути, например 'GET /v1/instruments/{symbol}/bars'"""
+        return f"{self.endpoint.method} {self.endpoint.path}"
+
+    @property
+    def slots(self) -> dict[str, str]:
+        """Значения path- и query-параметров по именам реестра (symbol, timeframe, start, ...)"""
+        names = {p.key: p.name for p in self.endpoint.query_params}
+        return {**self.path_params, **{names[key]: value for key, value in self.query}}
+
+    @property
+    def path(self) -> str:
+        """Нормализованный путь с query-параметрами в порядке реестра"""
+        path = self.endpoint.path
+        for name, value in self.path_params.items():
+            path = path.replace(f"{{{name}}}", value)
+        if self.query:
+            path = f"{path}?{urlencode(self.query, safe=':@{}')}"
+        return path
+
+
+class _TrieNode:
+    __slots__ = ("children", "endpoints", "param", "param_child")
+
+    def __init__(self) -> None:
+        self.children: dict[str, _TrieNode] = {}
+        self.param: str | None = None
+        self.param_child: _TrieNode | None = None
+        self.endpoints: dict[str, Endpoint] = {}
+
+
+def split_request(text: str) -> tuple[str | None, str]:
+    """Разделить строку вида 'GET /v1/path' на (метод, путь); метод может отсутствовать"""
+    text = text.strip().strip("`'\"").strip()
+    parts = text.split(maxsplit=1)
+    if len(parts) == 2 and parts[0].upper() in HTTP_METHODS:
+        return parts[0].upper(), parts[1].strip()
+    return None, text
+
+
+class EndpointRouter:
+    """
+    Роутер путей Finam TradeAPI на основе префиксного дерева сегментов
+
+    Сопоставление занимает O(число сегментов пути): литеральные сегменты
+    проверяются раньше параметров, поэтому /v1/assets/{symbol}/params
+    не путается с /v1/assets/{symbol}.
+    """
+
+    def __init__(self, endpoints: tuple[Endpoint, ...] = ENDPOINTS) -> None:
+        self._root = _TrieNode()
+        for ep in endpoints:
+            node = self._root
+            for segment in ep.path.strip("/").split("/"):
+                if segment.startswith("{") and segment.endswith("}"):
+                    if node.param_child is None:
+                        node.param_child = _TrieNode()
+                        node.param = segment[1:-1]
+                    node = node.param_child
+                else:
+                    node = node.children.setdefault(segment, _TrieNode())
+            node.endpoints[ep.method] = ep
+
+    def _lookup(self, path: str) -> tuple[_TrieNode, dict[str, str]] | None:
+        node = self._root
+        path_params: dict[str, str] = {}
+        for segment in path.strip("/").split("/"):
+            child = node.children.get(segment)
+            if child is not None:
+                node = child
+            elif node.param_child is not None and node.param and segment:
+                path_params[node.param] = segment
+                node = node.param_child
+            else:
+                return None
+        if not node.endpoints:
+            return None
+        return node, path_params
+
+    def match(self, method: str | None, path: str) -> RouteMatch | None:
+        """
+        Сопоставить запрос с эндпоинтом
+
+        Если метод не указан или не подходит к пути, а путь однозначно
+        соответствует одному эндпоинту, используется метод этого эндпоинта.
+        Неизвестные query-параметры отбрасываются, известные упорядочиваются
+        как в реестре.
+        """
+        path = _clean_path(path)
+        raw_path, _, raw_query = path.partition("?")
+        found = self._lookup(raw_path)
+        if found is None:
+            return None
+        node, path_params = found
+
+        endpoint = node.endpoints.get((method or "").upper())
+        if endpoint is None:
+            if len(node.endpoints) != 1:
+                return None
+            endpoint = next(iter(node.endpoints.values()))
+
+        given = dict(parse_qsl(raw_query, keep_blank_values=False))
+        query = tuple((p.key, given[p.key]) for p in endpoint.query_params if p.key in given)
+        return RouteMatch(endpoint, path_params, query)
+
+    def normalize(self, method: str | None, path: str) -> tuple[str, str] | None:
+        """Вернуть нормализованные (метод, путь) или None, если запрос не соответствует API"""
+        route = self.match(method, path)
+        if route is None:
+            return None
+        return route.method, route.path
+
+
+def _clean_path(path: str) -> str:
+    """Убрать хост, пробелы, кавычки, хвостовую пунктуацию и дублирующиеся слэши"""
+    path = path.strip().strip("`'\"").rstrip(".,;")
+    if path.startswith(("http://", "https://")):
+        parts = urlsplit(path)
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+    path = path.split()[0] if path else path
+    raw_path, sep, query = path.partition("?")
+    while "//" in raw_path:
+        raw_path = raw_path.replace("//", "/")
+    raw_path = "/" + raw_path.strip("/")
+    return f"{raw_path}{sep}{query}"
+
+
+@lru_cache
+def get_router() -> EndpointRouter:
+    """Общий экземпляр роутера, компилируется один раз"""
+    return EndpointRouter()
+
+
+Slots = tuple[tuple[str, str], ...]
+
+
+@lru_cache(maxsize=65536)
+def canonicalize(method: str | None, request: str) -> tuple[str, Slots] | None:
+    """
+    Привести запрос к шаблону эндпоинта и значениям слотов
+
+    ('GET', '/v1/instruments/SBER@MISX/bars?timeframe=TIME_FRAME_D') ->
+    ('GET /v1/instruments/{symbol}/bars', (('symbol', 'SBER@MISX'), ('timeframe', 'TIME_FRAME_D')))
+
+    Метод из префикса запроса ('GET /v1/...', как бывает в датасете) важнее
+    переданного. В отличие от EndpointRouter.match метод не подбирается по
+    пути: 'POST /v1/assets' - не запрос к GET /v1/assets, а None, как и любой
+    запрос, не соответствующий API. Результаты кэшируются: в регрессионных
+    наборах запросы повторяются.
+    """
+    prefix, path = split_request(request)
+    method = (prefix or method or "").upper()
+    route = get_router().match(method, path)
+    if route is None or route.method != method:
+        return None
+    return route.label, tuple(route.slots.items())
@@ -1,7 +1,21 @@
 """Основная логика приложения"""
 
+from typing import TYPE_CHECKING, Any
+
 from .config import Settings, get_settings
 from .llm import call_llm, call_smolagents
-from .smolagents_wrapper import create_smolagent
+
+if TYPE_CHECKING:
+    from .smolagents_wrapper import create_smolagent
+
+
+def __getattr__(name: str) -> Any:  # noqa: ANN401
+    # smolagents_wrapper тянет smolagents/openai, поэтому грузим его лениво
+    if name == "create_smolagent":
+        from .smolagents_wrapper import create_smolagent
+
+        return create_smolagent
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = ["Settings", "call_llm", "get_settings", "call_smolagents", "create_smolagent"]
@@ -0,0 +1,278 @@
+"""
+Профилировщик шагов агентов smolagents
+
+instrument_agent() оборачивает агент и его managed_agents: запуск агента,
+каждый шаг, вызовы модели, выполнение кода (python_executor) и вызовы
+инструментов записываются деревом узлов ProfileNode. По дереву считаются
+разбивка времени шага (модель / выполнение кода / инструменты / управляемые
+агенты) и число вызовов инструментов по агентам (manager_agent, finam_agent,
+plot_agent) - так видно, какие шаги стоит убрать.
+
+Код агента smolagents выполняет в отдельном потоке (таймаут выполнения), куда
+не переходят contextvars, поэтому инструменты и управляемые агенты
+привязываются к узлу выполнения кода своего агента явно. Ход диалога
+телеметрии (telemetry.turn) переносится в этот поток, чтобы спаны Finam API
+из инструментов попадали в тот же ход.
+
+Профили запусков верхнего уровня хранятся в ограниченном буфере
+get_profiler(); чат строит по ним flame-таймлайн (flame_rows) и сводку за
+сессию (summarize_runs).
+"""
+
+import time
+from collections import Counter, deque
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import lru_cache, wraps
+from typing import Any
+
+from .telemetry import current_turn, turn
+
+DEFAULT_CAPACITY = 200
+
+# Составляющие времени шага (step_breakdown)
+STEP_COMPONENTS = ("model", "code", "tools", "agents", "other")
+
+_current: ContextVar["ProfileNode | None"] = ContextVar("agent_profile_node", default=None)
+
+
+@dataclass
+class ProfileNode:
+    """Интервал выполнения агента: запуск, шаг, вызов модели, код или инструмент"""
+
+    kind: str  # "agent", "step", "model", "code" или "tool"
+    name: str  # имя агента, "step N", модель, "python" или имя инструмента
+    agent: str  # агент, в контексте которого выполнялся узел
+    start: float  # time.perf_counter()
+    end: float = 0.0
+    status: str = "ok"  # "ok" или "error"
+    turn: str | None = None
+    children: list["ProfileNode"] = field(default_factory=list)
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+    def walk(self, depth: int = 0) -> Iterator[tuple["ProfileNode", int]]:
+        """Обход дерева в глубину: (узел, глубина)"""
+        yield self, depth
+        for child in self.children:
+            yield from child.walk(depth + 1)
+
+
+class AgentProfiler:
+    """Буфер профилей последних запусков агентов верхнего уровня"""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY) -> None:
+        self._runs: deque[ProfileNode] = deque(maxlen=capacity)
+
+    @contextmanager
+    def section(
+        self, kind: str, name: str, agent: str | None = None, parent: ProfileNode | None = None
+    ) -> Iterator[ProfileNode | None]:
+        """
+        Записать узел профиля
+
+        Args:
+            parent: Родитель, если блок выполняется в потоке без текущего узла
+                (инструмент внутри кода агента)
+
+        Вне запуска агента узлы кроме "agent" не записываются (yield None).
+        """
+        parent = _current.get() or parent
+        if parent is None and kind != "agent":
+            yield None
+            return
+
+        turn_id = current_turn() or (parent.turn if parent else None)
+        node = ProfileNode(kind, name, agent or parent.agent, time.perf_counter(), turn=turn_id)  # type: ignore[union-attr]
+        if parent is not None:
+            parent.children.append(node)
+        token = _current.set(node)
+        try:
+            with turn(turn_id) if turn_id and current_turn() is None else nullcontext():
+                yield node
+        except BaseException:
+            node.status = "error"
+            raise
+        finally:
+            node.end = time.perf_counter()
+            try:
+                _current.reset(token)
+            except ValueError:
+                # Генератор шага закрыт в другом контексте (например, сборщиком мусора)
+                _current.set(parent)
+            if parent is None:
+                self._runs.append(node)
+
+    def runs(self, turns: set[str] | None = None) -> list[ProfileNode]:
+        """Профили запусков, опционально только для заданных ходов диалога"""
+        runs = list(self._runs)
+        return runs if turns is None else [run for run in runs if run.turn in turns]
+
+    def clear(self) -> None:
+        self._runs.clear()
+
+
+@lru_cache
+def get_profiler() -> AgentProfiler:
+    """Общий профилировщик процесса"""
+    return AgentProfiler()
+
+
+class _ProfiledExecutor:
+    """Обертка python_executor агента: замеряет выполнение кода и хранит текущий узел"""
+
+    def __init__(self, executor: Any, profiler: AgentProfiler, agent: str) -> None:  # noqa: ANN401
+        self._executor = executor
+        self._profiler = profiler
+        self._agent = agent
+        # Узел выполняемого кода: родитель для инструментов из потока выполнения
+        self.active: ProfileNode | None = None
+
+    def __call__(self, code_action: str) -> Any:  # noqa: ANN401
+        with self._profiler.section("code", "python", self._agent) as node:
+            self.active = node
+            try:
+                return self._executor(code_action)
+            finally:
+                self.active = None
+
+    def __getattr__(self, name: str) -> Any:  # noqa: ANN401
+        return getattr(self._executor, name)
+
+
+def _wrap_call(
+    func: Callable[..., Any],
+    profiler: AgentProfiler,
+    kind: str,
+    name: str,
+    agent: str,
+    owner: _ProfiledExecutor | None,
+) -> Callable[..., Any]:
+    @wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:  # noqa: ANN401
+        with profiler.section(kind, name, agent, parent=owner.active if owner else None):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def _wrap_steps(step_stream: Callable[..., Iterator[Any]], profiler: AgentProfiler, agent: str) -> Callable[..., Any]:
+    @wraps(step_stream)
+    def wrapper(memory_step: Any) -> Iterator[Any]:  # noqa: ANN401
+        with profiler.section("step", f"step {memory_step.step_number}", agent):
+            yield from step_stream(memory_step)
+
+    return wrapper
+
+
+def _instrument(agent: Any, profiler: AgentProfiler, owner: _ProfiledExecutor | None) -> None:  # noqa: ANN401
+    if getattr(agent, "_profiler", None) is not None:
+        return
+    agent._profiler = profiler
+    name = agent.name or type(agent).__name__
+
+    executor = None
+    if getattr(agent, "python_executor", None) is not None:
+        executor = _ProfiledExecutor(agent.python_executor, profiler, name)
+        agent.python_executor = executor
+
+    # Методы подменяются на экземпляре: класс агента и другие агенты не меняются
+    agent.run = _wrap_call(agent.run, profiler, "agent", name, name, owner)
+    agent._step_stream = _wrap_steps(agent._step_stream, profiler, name)
+
+    model = agent.model
+    if not getattr(model, "_profiled", False):
+        model._profiled = True
+        model.generate = _wrap_call(model.generate, profiler, "model", model.model_id or "model", None, None)  # type: ignore[arg-type]
+
+    for tool_name, tool in agent.tools.items():
+        # final_answer - служебный инструмент, в статистику вызовов не попадает
+        if tool_name != "final_answer":
+            tool.forward = _wrap_call(tool.forward, profiler, "tool", tool_name, name, executor)
+    for managed in agent.managed_agents.values():
+        _instrument(managed, profiler, executor)
+
+
+def instrument_agent(agent: Any, profiler: AgentProfiler | None = None) -> Any:  # noqa: ANN401
+    """Подключить профилировщик к агенту и его управляемым агентам (повторный вызов ничего не делает)"""
+    _instrument(agent, profiler or get_profiler(), None)
+    return agent
+
+
+def step_breakdown(step: ProfileNode) -> dict[str, float]:
+    """
+    Разбивка времени шага, сек
+
+    model - вызовы модели; code - выполнение кода без вложенных вызовов;
+    tools - инструменты; agents - управляемые агенты; other - остальное
+    (разбор ответа, память, логирование).
+    """
+    parts = dict.fromkeys(STEP_COMPONENTS, 0.0)
+    for child in step.children:
+        if child.kind == "model":
+            parts["model"] += child.duration
+        elif child.kind == "code":
+            nested = {"tools": 0.0, "agents": 0.0}
+            for call in child.children:
+                nested["tools" if call.kind == "tool" else "agents"] += call.duration
+            parts["code"] += child.duration - nested["tools"] - nested["agents"]
+            parts["tools"] += nested["tools"]
+            parts["agents"] += nested["agents"]
+    parts["other"] = max(step.duration - sum(parts.values()), 0.0)
+    return parts
+
+
+def tool_calls(run: ProfileNode) -> dict[str, Counter]:
+    """Вызовы инструментов по агентам; вызов управляемого агента считается вызовом инструмента"""
+    calls: dict[str, Counter] = {}
+    for node, _ in run.walk():
+        for child in node.children:
+            if child.kind == "tool" or (child.kind == "agent" and node.kind == "code"):
+                calls.setdefault(node.agent, Counter())[child.name] += 1
+    return calls
+
+
+def summarize_runs(runs: list[ProfileNode]) -> dict[str, dict[str, float]]:
+    """
+    Сводка по агентам за несколько запусков
+
+    Returns:
+        {агент: {runs, steps, duration, tool_calls, model, code, tools, agents, other}}
+    """
+    summary: dict[str, dict[str, float]] = {}
+    for run in runs:
+        for node, _ in run.walk():
+            if node.kind == "agent":
+                stats = summary.setdefault(
+                    node.name, dict.fromkeys(("runs", "steps", "duration", "tool_calls", *STEP_COMPONENTS), 0.0)
+                )
+                stats["runs"] += 1
+                stats["duration"] += node.duration
+            elif node.kind == "step":
+                stats = summary[node.agent]
+                stats["steps"] += 1
+                for component, seconds in step_breakdown(node).items():
+                    stats[component] += seconds
+        for agent, counts in tool_calls(run).items():
+            summary[agent]["tool_calls"] += sum(counts.values())
+    return summary
+
+
+def flame_rows(run: ProfileNode) -> list[dict[str, Any]]:
+    """Узлы запуска для flame-таймлайна: глубина, смещение от начала и длительность, сек"""
+    return [
+        {
+            "depth": depth,
+            "start": node.start - run.start,
+            "duration": node.duration,
+            "kind": node.kind,
+            "name": node.name,
+            "agent": node.agent,
+            "status": node.status,
+        }
+        for node, depth in run.walk()
+    ]
@@ -0,0 +1,329 @@
+"""
+Серверное построение графиков по короткой спецификации
+
+Вместо Plotly JSON, который пишет LLM (тысячи выходных токенов на график и
+ломкий разбор из текста), модель передает только ChartSpec - тип графика,
+тикеры, таймфрейм и период. Данные запрашиваются напрямую через
+FinamAPIClient, фигуры строятся детерминированно:
+
+- candles    свечи с объемом (get_candles)
+- portfolio  sunburst портфеля: биржа -> инструмент, размер - стоимость позиции (get_account)
+- equity     стоимость позиции по инструменту со сделками счета на графике (get_candles + get_trades)
+- scanner    таблица инструментов: цена, изменение и sparkline (get_candles)
+
+Агенты вызывают инструмент finam_chart и вставляют в ответ строку
+CHART_SPEC: {...}; чат находит ее (extract_chart_specs) и строит график.
+
+Длинные ряды прореживаются до бюджета точек (core/decimation.py), чтобы в
+браузер не уходили сотни тысяч минутных свечей; max_points=None отключает.
+"""
+
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import UTC, datetime
+from typing import Any
+
+import numpy as np
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+from ..adapters.finam_client import FinamAPIClient
+from .decimation import CANDLE_BUDGET, LINE_BUDGET, SPARKLINE_BUDGET, aggregate_ohlc, lttb_indices, minmax_indices
+from .temporal import infer_timeframe, parse_iso
+
+CHART_TYPES = ("candles", "portfolio", "equity", "scanner")
+
+CHART_SPEC_PREFIX = "CHART_SPEC:"
+
+_SPEC_RE = re.compile(rf"^\s*{CHART_SPEC_PREFIX}\s*(\{{.*\}})\s*$", re.MULTILINE)
+
+UP_COLOR = "#26a69a"
+DOWN_COLOR = "#ef5350"
+
+# Параллельных запросов свечей для scanner
+SCANNER_WORKERS = 8
+
+
+class ChartError(ValueError):
+    """Спецификация неверна или данных для графика нет"""
+
+
+def default_timeframe(start: str | None, end: str | None) -> str:
+    """Таймфрейм по длине интервала графика; без интервала - дневные свечи"""
+    if not start:
+        return "TIME_FRAME_D"
+    try:
+        return infer_timeframe(parse_iso(start), parse_iso(end) if end else datetime.now(UTC))
+    except ValueError:
+        return "TIME_FRAME_D"
+
+
+@dataclass
+class ChartSpec:
+    """Спецификация графика: все, что нужно передать от LLM"""
+
+    chart: str
+    symbols: list[str] = field(default_factory=list)
+    timeframe: str = "TIME_FRAME_D"
+    start: str | None = None  # ISO 8601
+    end: str | None = None
+    account_id: str | None = None
+
+    def validate(self) -> "ChartSpec":
+        if self.chart not in CHART_TYPES:
+            raise ChartError(f"Неизвестный тип графика {self.chart!r}, доступны: {', '.join(CHART_TYPES)}")
+        if self.chart in {"candles", "equity", "scanner"} and not self.symbols:
+            raise ChartError(f"Для графика {self.chart} нужен хотя бы один тикер")
+        if self.chart in {"portfolio", "equity"} and not self.account_id:
+            raise ChartError(f"Для графика {self.chart} нужен account_id")
+        return self
+
+    def to_json(self) -> str:
+        return json.dumps({k: v for k, v in asdict(self).items() if v not in (None, [])}, ensure_ascii=False)
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "ChartSpec":
+        symbols = data.get("symbols") or ([data["symbol"]] if data.get("symbol") else [])
+        return cls(
+            chart=str(data.get("chart", "")),
+            symbols=[str(s) for s in symbols],
+            timeframe=data.get("timeframe") or default_timeframe(data.get("start"), data.get("end")),
+            start=data.get("start"),
+            end=data.get("end"),
+            account_id=data.get("account_id"),
+        ).validate()
+
+
+def extract_chart_specs(text: str) -> list[ChartSpec]:
+    """Найти строки CHART_SPEC: {...} в ответе; некорректные спецификации пропускаются"""
+    specs = []
+    for raw in _SPEC_RE.findall(text):
+        try:
+            specs.append(ChartSpec.from_dict(json.loads(raw)))
+        except (ValueError, TypeError):
+            continue
+    return specs
+
+
+def strip_chart_specs(text: str) -> str:
+    """Убрать строки CHART_SPEC из текста для показа пользователю"""
+    return _SPEC_RE.sub("", text).strip()
+
+
+def _number(value: Any) -> float:  # noqa: ANN401
+    """Число из ответа Finam API: 12.5, "12.5" или {"value": "12.5"}"""
+    if isinstance(value, dict):
+        value = value.get("value")
+    return float(value) if value not in (None, "") else 0.0
+
+
+def _timestamp(value: Any) -> datetime:  # noqa: ANN401
+    """Время из ответа Finam API: ISO 8601 или unix timestamp"""
+    if isinstance(value, int | float):
+        return datetime.fromtimestamp(value, tz=UTC)
+    return datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+
+
+def _times(values: list[Any]) -> np.ndarray:
+    """Время свечей как datetime64[ms] (UTC)"""
+    if values and all(isinstance(v, int | float) for v in values):
+        return (np.asarray(values, dtype=np.float64) * 1000).astype("datetime64[ms]")
+    return np.array([_timestamp(v).replace(tzinfo=None) for v in values], dtype="datetime64[ms]")
+
+
+def _bars(response: dict[str, Any]) -> dict[str, np.ndarray]:
+    """Свечи из ответа get_candles в виде колонок NumPy"""
+    if "error" in response:
+        raise ChartError(f"Ошибка Finam API: {response['error']}")
+    bars = response.get("bars") or []
+    return {
+        "time": _times([b.get("timestamp") for b in bars]),
+        **{
+            key: np.array([_number(b.get(key)) for b in bars], dtype=np.float64)
+            for key in ("open", "high", "low", "close", "volume")
+        },
+    }
+
+
+def _fetch_bars(client: FinamAPIClient, spec: ChartSpec, symbol: str) -> dict[str, np.ndarray]:
+    kwargs = {"symbol": symbol, "timeframe": spec.timeframe, "start": spec.start, "end": spec.end}
+    return _bars(client.call_endpoint("get_candles", **{k: v for k, v in kwargs.items() if v is not None}))
+
+
+def candlestick_chart(bars: dict[str, np.ndarray], symbol: str, max_points: int | None = CANDLE_BUDGET) -> go.Figure:
+    """Свечи с объемом на нижней панели; свечи сверх max_points объединяются"""
+    if max_points:
+        bars = aggregate_ohlc(bars, max_points)
+    fig = make_subplots(rows=2, cols=1, shared_xaxes=True, row_heights=[0.75, 0.25], vertical_spacing=0.03)
+    fig.add_trace(
+        go.Candlestick(
+            x=bars["time"],
+            open=bars["open"],
+            high=bars["high"],
+            low=bars["low"],
+            close=bars["close"],
+            name=symbol,
+            increasing_line_color=UP_COLOR,
+            decreasing_line_color=DOWN_COLOR,
+        ),
+        row=1,
+        col=1,
+    )
+    colors = np.where(bars["close"] >= bars["open"], UP_COLOR, DOWN_COLOR)
+    fig.add_trace(go.Bar(x=bars["time"], y=bars["volume"], marker_color=colors, name="Объем"), row=2, col=1)
+    fig.update_layout(title=symbol, xaxis_rangeslider_visible=False, showlegend=False, margin={"t": 40, "b": 20})
+    return fig
+
+
+def portfolio_sunburst(account: dict[str, Any]) -> go.Figure:
+    """Sunburst портфеля: биржа -> инструмент, размер сектора - стоимость позиции"""
+    if "error" in account:
+        raise ChartError(f"Ошибка Finam API: {account['error']}")
+    values: dict[str, float] = {}
+    for position in account.get("positions") or []:
+        price = position.get("current_price") or position.get("average_price")
+        values[position["symbol"]] = values.get(position["symbol"], 0.0) + abs(
+            _number(position.get("quantity")) * _number(price)
+        )
+    if not values:
+        raise ChartError("На счете нет позиций")
+
+    markets: dict[str, float] = {}
+    for symbol, value in values.items():
+        market = symbol.partition("@")[2] or "—"
+        markets[market] = markets.get(market, 0.0) + value
+    root = f"Счет {account.get('account_id', '')}".strip()
+    ids = [root, *markets, *values]
+    return go.Figure(
+        go.Sunburst(
+            ids=ids,
+            labels=[root, *markets, *(s.partition("@")[0] for s in values)],
+            parents=["", *(root for _ in markets), *(s.partition("@")[2] or "—" for s in values)],
+            values=[sum(values.values()), *markets.values(), *values.values()],
+            branchvalues="total",
+            hovertemplate="%{label}: %{value:,.2f} (%{percentRoot:.1%})<extra></extra>",
+        ),
+        layout={"margin": {"t": 10, "b": 10, "l": 10, "r": 10}},
+    )
+
+
+def equity_curve(
+    bars: dict[str, np.ndarray], trades: list[dict[str, Any]], symbol: str, max_points: int | None = LINE_BUDGET
+) -> go.Figure:
+    """
+    Стоимость позиции по инструменту во времени со сделками счета
+
+    Позиция восстанавливается по сделкам (покупка +, продажа -) и
+    оценивается по цене закрытия каждой свечи; линии прореживаются min/max
+    до max_points точек.
+    """
+    fills = sorted(
+        (
+            _timestamp(t.get("timestamp")).replace(tzinfo=None),
+            _number(t.get("size") or t.get("quantity")) * (-1 if "SELL" in str(t.get("side", "")).upper() else 1),
+            _number(t.get("price")),
+        )
+        for t in trades
+        if t.get("symbol") == symbol
+    )
+
+    # Сделка учитывается с первой свечи, время которой не раньше сделки
+    times = bars["time"]
+    delta = np.zeros(len(times) + 1)
+    if fills:
+        fill_times = np.array([f[0] for f in fills], dtype="datetime64[ms]")
+        np.add.at(delta, np.searchsorted(times, fill_times, side="left"), [f[1] for f in fills])
+    equity = np.cumsum(delta)[:-1] * bars["close"]
+
+    equity_idx = close_idx = slice(None)
+    if max_points:
+        equity_idx, close_idx = minmax_indices(equity, max_points), minmax_indices(bars["close"], max_points)
+
+    fig = make_subplots(specs=[[{"secondary_y": True}]])
+    fig.add_trace(
+        go.Scatter(x=times[equity_idx], y=equity[equity_idx], name="Стоимость позиции", fill="tozeroy"),
+        secondary_y=False,
+    )
+    fig.add_trace(
+        go.Scatter(x=times[close_idx], y=bars["close"][close_idx], name=symbol, line={"width": 1}), secondary_y=True
+    )
+    for side, color, marker in (("Покупка", UP_COLOR, "triangle-up"), ("Продажа", DOWN_COLOR, "triangle-down")):
+        points = [f for f in fills if (f[1] > 0) == (side == "Покупка")]
+        if points:
+            fig.add_trace(
+                go.Scatter(
+                    x=[p[0] for p in points],
+                    y=[p[2] for p in points],
+                    mode="markers",
+                    name=side,
+                    marker={"color": color, "symbol": marker, "size": 11},
+                ),
+                secondary_y=True,
+            )
+    fig.update_layout(title=f"{symbol}: позиция и сделки", margin={"t": 40, "b": 20}, legend={"orientation": "h"})
+    return fig
+
+
+def scanner_table(rows: dict[str, dict[str, np.ndarray]], max_points: int | None = SPARKLINE_BUDGET) -> go.Figure:
+    """Таблица инструментов: последняя цена, изменение за период и sparkline закрытий (LTTB до max_points)"""
+    fig = make_subplots(
+        rows=len(rows),
+        cols=2,
+        column_widths=[0.45, 0.55],
+        specs=[[{"type": "table"}, {"type": "xy"}] for _ in rows],
+        vertical_spacing=0.02,
+        horizontal_spacing=0.02,
+    )
+    for row, (symbol, bars) in enumerate(rows.items(), 1):
+        closes = bars["close"]
+        last = float(closes[-1]) if len(closes) else 0.0
+        change = (last / closes[0] - 1) if len(closes) and closes[0] else 0.0
+        color = UP_COLOR if change >= 0 else DOWN_COLOR
+        fig.add_trace(
+            go.Table(
+                cells={
+                    "values": [[symbol], [f"{last:,.2f}"], [f"{change:+.2%}"]],
+                    "font": {"color": ["black", "black", color], "size": 13},
+                    "height": 30,
+                    "fill_color": "white",
+                },
+                header={
+                    "values": ["Тикер", "Цена", "Изм."] if row == 1 else ["", "", ""],
+                    "height": 0 if row > 1 else 24,
+                },
+            ),
+            row=row,
+            col=1,
+        )
+        idx = lttb_indices(closes, max_points) if max_points else slice(None)
+        fig.add_trace(
+            go.Scatter(
+                x=bars["time"][idx], y=closes[idx], mode="lines", line={"color": color, "width": 1.5}, hoverinfo="skip"
+            ),
+            row=row,
+            col=2,
+        )
+    fig.update_xaxes(visible=False)
+    fig.update_yaxes(visible=False)
+    fig.update_layout(height=80 + 60 * len(rows), showlegend=False, margin={"t": 10, "b": 10, "l": 10, "r": 10})
+    return fig
+
+
+def build_chart(spec: ChartSpec, client: FinamAPIClient) -> go.Figure:
+    """Запросить данные через FinamAPIClient и построить график по спецификации"""
+    spec.validate()
+    if spec.chart == "candles":
+        return candlestick_chart(_fetch_bars(client, spec, spec.symbols[0]), spec.symbols[0])
+    if spec.chart == "portfolio":
+        return portfolio_sunburst(client.call_endpoint("get_account", account_id=spec.account_id))
+    if spec.chart == "equity":
+        symbol = spec.symbols[0]
+        kwargs = {k: v for k, v in {"start": spec.start, "end": spec.end}.items() if v is not None}
+        trades = client.call_endpoint("get_trades", account_id=spec.account_id, **kwargs)
+        return equity_curve(_fetch_bars(client, spec, symbol), trades.get("trades") or [], symbol)
+
+    with ThreadPoolExecutor(max_workers=min(SCANNER_WORKERS, len(spec.symbols))) as pool:
+        bars = pool.map(lambda symbol: _fetch_bars(client, spec, symbol), spec.symbols)
+        return scanner_table(dict(zip(spec.symbols, bars, strict=True)))
@@ -1,19 +1,25 @@
 import os
 from functools import lru_cache
+from typing import Any
 
 from dotenv import load_dotenv
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 load_dotenv()
 
 
+def _env(name: str, default: str = "") -> Any:  # noqa: ANN401
+    """Значение переменной окружения на момент создания Settings (а не импорта модуля)"""
+    return Field(default_factory=lambda: os.getenv(name, default))
+
+
 class Settings(BaseModel):
-    openrouter_api_key: str = os.getenv("OPENROUTER_API_KEY", "")
-    openrouter_base: str = os.getenv("OPENROUTER_BASE", "https://openrouter.ai/api/v1")
-    openrouter_model: str = os.getenv("OPENROUTER_MODEL", "openai/gpt-4o-mini")
-    finam_api_key: str = os.getenv("FINAM_API_KEY", "")
-    finam_api_base: str = os.getenv("FINAM_API_BASE", "https://api.finam.ru")
-    debug: bool = os.getenv("APP_DEBUG", "false").lower() in {"1", "true", "yes"}
+    openrouter_api_key: str = _env("OPENROUTER_API_KEY")
+    openrouter_base: str = _env("OPENROUTER_BASE", "https://openrouter.ai/api/v1")
+    openrouter_model: str = _env("OPENROUTER_MODEL", "openai/gpt-4o-mini")
+    finam_api_key: str = _env("FINAM_API_KEY")
+    finam_api_base: str = _env("FINAM_API_BASE", "https://api.finam.ru")
+    debug: bool = Field(default_factory=lambda: os.getenv("APP_DEBUG", "false").lower() in {"1", "true", "yes"})
 
 
 @lru_cache
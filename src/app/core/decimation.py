@@ -0,0 +1,113 @@
+"""
+Прореживание длинных ценовых рядов для графиков
+
+Месяц минутных свечей - десятки тысяч точек, которые уходят в браузер через
+Plotly JSON, хотя на экране помещается порядка тысячи пикселей по ширине.
+Функции уменьшают ряд до бюджета точек на NumPy, сохраняя экстремумы:
+
+- aggregate_ohlc  свечи объединяются в корзины (open первой, close последней,
+                  high/low - максимум/минимум, объем - сумма): пики и провалы
+                  сохраняются точно;
+- minmax_indices  для линий: минимум и максимум каждой корзины, полностью векторно;
+- lttb_indices    Largest-Triangle-Three-Buckets: визуально точнее min/max для
+                  гладких рядов, цикл по корзинам с векторным выбором внутри.
+
+Используется в core/charts.py автоматически; benchmarks/charts.py сравнивает
+размер JSON и время построения графиков с прореживанием и без.
+"""
+
+import numpy as np
+
+# Бюджеты по умолчанию: ~1000 px по ширине графика
+CANDLE_BUDGET = 1000
+LINE_BUDGET = 2000
+SPARKLINE_BUDGET = 120
+
+OHLC_COLUMNS = ("open", "high", "low", "close", "volume")
+
+
+def bucket_starts(n: int, buckets: int) -> np.ndarray:
+    """Начала buckets корзин почти равного размера для ряда длины n"""
+    return (np.arange(buckets, dtype=np.int64) * n) // buckets
+
+
+def aggregate_ohlc(columns: dict[str, np.ndarray], max_bars: int = CANDLE_BUDGET) -> dict[str, np.ndarray]:
+    """
+    Объединить свечи в не более чем max_bars свечей
+
+    Args:
+        columns: Колонки time, open, high, low, close, volume одинаковой длины
+
+    Returns:
+        Колонки того же вида; время свечи - время первой свечи корзины
+    """
+    n = len(columns["close"])
+    if n <= max_bars:
+        return columns
+    starts = bucket_starts(n, max_bars)
+    ends = np.append(starts[1:], n) - 1
+    return {
+        "time": columns["time"][starts],
+        "open": columns["open"][starts],
+        "high": np.maximum.reduceat(columns["high"], starts),
+        "low": np.minimum.reduceat(columns["low"], starts),
+        "close": columns["close"][ends],
+        "volume": np.add.reduceat(columns["volume"], starts),
+    }
+
+
+def minmax_indices(y: np.ndarray, max_points: int = LINE_BUDGET) -> np.ndarray:
+    """
+    Индексы точек min/max по корзинам (не больше max_points, плюс первая и последняя)
+
+    Ряд дополняется последним значением до кратной длины и разворачивается в
+    матрицу (корзина, точка), argmin/argmax считаются одним вызовом.
+    """
+    n = len(y)
+    if n <= max_points:
+        return np.arange(n)
+    buckets = max(max_points // 2, 1)
+    size = -(-n // buckets)
+    padded = np.pad(np.asarray(y, dtype=np.float64), (0, buckets * size - n), mode="edge").reshape(buckets, size)
+    offsets = np.arange(buckets, dtype=np.int64) * size
+    picked = np.concatenate([[0, n - 1], offsets + padded.argmin(axis=1), offsets + padded.argmax(axis=1)])
+    return np.unique(np.minimum(picked, n - 1))
+
+
+def lttb_indices(y: np.ndarray, max_points: int = LINE_BUDGET, x: np.ndarray | None = None) -> np.ndarray:
+    """
+    Индексы точек по алгоритму Largest-Triangle-Three-Buckets
+
+    Первая и последняя точки сохраняются; из каждой корзины выбирается точка,
+    образующая наибольший треугольник с выбранной точкой предыдущей корзины и
+    средним следующей.
+
+    Args:
+        x: Координаты по горизонтали (по умолчанию - номера точек)
+    """
+    n = len(y)
+    if n <= max_points or max_points < 3:
+        return np.arange(n)
+    y = np.asarray(y, dtype=np.float64)
+    x = np.arange(n, dtype=np.float64) if x is None else np.asarray(x, dtype=np.float64)
+
+    # Внутренние точки 1..n-2 делятся на max_points-2 корзины
+    bounds = 1 + bucket_starts(n - 2, max_points - 2)
+    bounds = np.append(bounds, n - 1)
+    # Средние корзин через кумулятивные суммы - без цикла
+    cx, cy = np.concatenate([[0.0], np.cumsum(x)]), np.concatenate([[0.0], np.cumsum(y)])
+    sizes = np.diff(bounds)
+    avg_x = (cx[bounds[1:]] - cx[bounds[:-1]]) / sizes
+    avg_y = (cy[bounds[1:]] - cy[bounds[:-1]]) / sizes
+    avg_x, avg_y = np.append(avg_x, x[-1]), np.append(avg_y, y[-1])
+
+    picked = np.empty(max_points, dtype=np.int64)
+    picked[0], picked[-1] = 0, n - 1
+    a = 0
+    for i in range(max_points - 2):
+        lo, hi = bounds[i], bounds[i + 1]
+        # Удвоенная площадь треугольника (a, точка корзины, среднее следующей корзины)
+        area = np.abs((x[a] - avg_x[i + 1]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y[i + 1] - y[a]))
+        a = lo + int(area.argmax())
+        picked[i + 1] = a
+    return picked
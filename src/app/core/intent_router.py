@@ -0,0 +1,118 @@
+"""
+Intent router перед иерархией агентов
+
+Простой вопрос ("Какая цена SBER@MISX?") не требует manager_agent ->
+finam_agent: это минимум четыре вызова LLM с планированием на каждом уровне.
+route_question() по правилам rule_matcher определяет, что вопрос сводится к
+одному читающему (GET) эндпоинту со всеми path-параметрами; такой вопрос
+обслуживается одним вызовом Finam API и одним вызовом LLM для ответа
+(answer_routed). Все остальное - визуализация, сравнения, несколько
+инструментов, создание и отмена ордеров, неизвестные тикеры и периоды, которые
+не разобрал core/temporal.py, - уходит агентам.
+"""
+
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Any
+
+from ..adapters.finam_client import FinamAPIClient
+from ..adapters.finam_endpoints import Endpoint
+from .llm import call_llm
+from .rule_matcher import find_symbols, match_question
+
+# Признаки сложного запроса: график, сравнение, анализ, несколько действий
+COMPLEX_RE = re.compile(
+    r"график|построй|нарисуй|визуализ|сравни|сравнен|динамик|проанализ|анализ|почему|стратеги|прогноз|"
+    r"\bесли\b|а также|и затем|после этого|потом\b"
+)
+
+# Признаки периода в вопросе (даты, месяцы, кварталы): если temporal не разобрал интервал, вопрос уходит агентам
+PERIOD_RE = re.compile(
+    r"\b(19|20)\d{2}\b|\b\d{1,2}[./]\d{1,2}\b|\bq[1-4]\b|квартал|вчера|недел[юи]\b|месяц|\bгод\b|"
+    r"январ|феврал|\bмарт|апрел|\bма[йя]\b|\bиюн|\bиюл|август|сентябр|октябр|ноябр|декабр"
+)
+
+ROUTED_METHODS = frozenset({"GET"})
+
+
+@dataclass
+class RoutedRequest:
+    """Вопрос, сводящийся к одному вызову эндпоинта"""
+
+    endpoint: Endpoint
+    slots: dict[str, Any] = field(default_factory=dict)
+
+    def to_request(self) -> tuple[str, str]:
+        """(method, path) для отображения и логов"""
+        return self.endpoint.method, self.endpoint.format_path(**self.slots)
+
+
+@dataclass
+class RoutedAnswer:
+    """Ответ прямого пути: запрос, ответ Finam API и итоговый текст"""
+
+    output: str
+    method: str
+    path: str
+    response: dict[str, Any]
+
+
+def route_question(question: str, account_id: str | None = None) -> RoutedRequest | None:
+    """
+    Определить, можно ли ответить на вопрос одним вызовом эндпоинта
+
+    Args:
+        account_id: Счет из настроек, подставляется если в вопросе его нет
+
+    Returns:
+        RoutedRequest или None, если вопрос нужно отдать агентам
+    """
+    if question.count("?") > 1 or COMPLEX_RE.search(question.lower()):
+        return None
+    if len(find_symbols(question)) > 1:
+        return None
+
+    match = match_question(question)
+    if match is None or match.endpoint.method not in ROUTED_METHODS:
+        return None
+
+    slots: dict[str, Any] = dict(match.slots)
+    if account_id and "account_id" not in slots and any(p.name == "account_id" for p in match.endpoint.params):
+        slots["account_id"] = account_id
+    if any(p.name not in slots for p in match.endpoint.path_params):
+        return None
+    # Период, который temporal не разобрал или который эндпоинт не принимает
+    # ("цена открытия в этом месяце" - это свечи, а не последняя котировка)
+    if "start" not in slots and PERIOD_RE.search(question.lower()):
+        return None
+    return RoutedRequest(match.endpoint, slots)
+
+
+def answer_routed(
+    route: RoutedRequest,
+    client: FinamAPIClient,
+    history: list[dict[str, str]],
+    temperature: float = 0.3,
+    response: dict[str, Any] | None = None,
+) -> RoutedAnswer:
+    """
+    Ответить по прямому пути: вызов эндпоинта и один вызов LLM с результатом
+
+    Args:
+        history: Диалог (system + сообщения) с вопросом пользователя последним
+        response: Уже полученный ответ эндпоинта (например, справочник из кэша чата)
+    """
+    method, path = route.to_request()
+    if response is None:
+        response = client.call_endpoint(route.endpoint.name, **route.slots)
+    messages = [
+        *history,
+        {"role": "assistant", "content": f"API_REQUEST: {method} {path}"},
+        {
+            "role": "user",
+            "content": f"Результат API запроса: {json.dumps(response, ensure_ascii=False)}\n\nПроанализируй это.",
+        },
+    ]
+    completion = call_llm(messages, temperature=temperature)
+    return RoutedAnswer(completion["choices"][0]["message"]["content"], method, path, response)
@@ -0,0 +1,285 @@
+"""
+Фоновые задачи для запусков агентов
+
+Streamlit выполняет скрипт чата в потоке сессии: пока агент думает, сессия
+заблокирована и не перерисовывается. JobRunner выполняет задачи в общем пуле
+потоков процесса, с очередью на сессию: задачи одной сессии идут по порядку,
+задачи разных сессий - параллельно. Чат опрашивает статус задачи (fragment с
+run_every) и показывает промежуточные обновления шагов (Job.updates).
+
+Отмена: задача в очереди снимается сразу; у выполняемой выставляется флаг
+отмены и вызываются обработчики on_cancel. Для агентов attach_job подключает
+задачу к графу агентов: каждый шаг (ActionStep) любого агента пишется в
+Job.updates, при отмене все агенты графа прерываются (agent.interrupt())
+перед следующим шагом.
+
+Граф агентов хранит память текущего запуска, поэтому параллельные задачи
+берут разные экземпляры из ResourcePool.
+"""
+
+import contextvars
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any
+
+DEFAULT_WORKERS = 4
+# Завершенных задач на сессию, которые помнит JobRunner
+DEFAULT_HISTORY = 20
+# Сессий, для которых помнятся завершенные задачи (давно не активные забываются)
+DEFAULT_SESSIONS = 1000
+# Длина текста обновления шага
+UPDATE_TEXT_LIMIT = 300
+
+FINISHED = frozenset({"done", "error", "cancelled"})
+
+
+class JobCancelled(Exception):
+    """Задача отменена пользователем"""
+
+
+@dataclass
+class JobUpdate:
+    """Промежуточное обновление задачи: завершенный шаг агента"""
+
+    time: float  # time.time()
+    agent: str
+    step: int
+    text: str
+
+
+@dataclass
+class Job:
+    """Фоновая задача сессии"""
+
+    id: str
+    session: str
+    description: str
+    fn: Callable[["Job"], Any]
+    status: str = "queued"  # "queued", "running", "done", "error" или "cancelled"
+    result: Any = None
+    error: str | None = None
+    updates: list[JobUpdate] = field(default_factory=list)
+    created: float = field(default_factory=time.time)
+    started: float | None = None
+    finished: float | None = None
+    _cancel: threading.Event = field(default_factory=threading.Event, repr=False)
+    _on_cancel: list[Callable[[], None]] = field(default_factory=list, repr=False)
+
+    @property
+    def done(self) -> bool:
+        return self.status in FINISHED
+
+    @property
+    def cancelled(self) -> bool:
+        """Запрошена ли отмена; долгие задачи проверяют флаг между шагами"""
+        return self._cancel.is_set()
+
+    @property
+    def elapsed(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    def emit(self, agent: str, step: int, text: str) -> None:
+        """Добавить обновление (вызывается из потока задачи)"""
+        self.updates.append(JobUpdate(time.time(), agent, step, text[:UPDATE_TEXT_LIMIT]))
+
+    def on_cancel(self, callback: Callable[[], None]) -> None:
+        """Вызвать callback при отмене (сразу, если отмена уже запрошена)"""
+        self._on_cancel.append(callback)
+        if self.cancelled:
+            callback()
+
+    def check_cancelled(self) -> None:
+        if self.cancelled:
+            raise JobCancelled(self.id)
+
+
+class JobRunner:
+    """Пул потоков с очередью задач на сессию"""
+
+    def __init__(
+        self, max_workers: int = DEFAULT_WORKERS, history: int = DEFAULT_HISTORY, sessions: int = DEFAULT_SESSIONS
+    ) -> None:
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._history = history
+        self._sessions = sessions
+        self._lock = threading.Lock()
+        self._queues: dict[str, deque[Job]] = {}
+        self._running: dict[str, Job] = {}
+        self._jobs: dict[str, Job] = {}
+        # Завершенные задачи по сессиям, от давно не активной сессии к последней
+        self._finished: OrderedDict[str, deque[str]] = OrderedDict()
+
+    def submit(self, session: str, fn: Callable[[Job], Any], description: str = "") -> Job:
+        """
+        Поставить задачу в очередь сессии
+
+        Args:
+            fn: Функция задачи, получает Job (обновления, флаг отмены) и возвращает результат
+
+        contextvars вызывающего (ход диалога телеметрии) переносятся в поток задачи.
+        """
+        context = contextvars.copy_context()
+        job = Job(uuid.uuid4().hex[:12], session, description, lambda j: context.run(fn, j))
+        with self._lock:
+            self._jobs[job.id] = job
+            if session in self._running:
+                self._queues.setdefault(session, deque()).append(job)
+            else:
+                self._start(job)
+        return job
+
+    def _start(self, job: Job) -> None:
+        # Вызывается под self._lock
+        self._running[job.session] = job
+        job.status = "running"
+        job.started = time.time()
+        self._pool.submit(self._execute, job)
+
+    def _execute(self, job: Job) -> None:
+        try:
+            job.check_cancelled()
+            job.result = job.fn(job)
+            job.status = "cancelled" if job.cancelled else "done"
+        except BaseException as e:
+            if job.cancelled:
+                job.status = "cancelled"
+            else:
+                job.status = "error"
+                job.error = str(e) or type(e).__name__
+        finally:
+            job.finished = time.time()
+            with self._lock:
+                self._remember(job)
+                del self._running[job.session]
+                queue = self._queues.get(job.session)
+                if queue:
+                    self._start(queue.popleft())
+                if not queue:
+                    self._queues.pop(job.session, None)
+
+    def _remember(self, job: Job) -> None:
+        # Помнятся последние history задач сессии и последние sessions сессий,
+        # поэтому память не растет ни с длиной сессии, ни с числом сессий
+        finished = self._finished.setdefault(job.session, deque())
+        self._finished.move_to_end(job.session)
+        finished.append(job.id)
+        while len(finished) > self._history:
+            self._jobs.pop(finished.popleft(), None)
+        while len(self._finished) > self._sessions:
+            _, stale = self._finished.popitem(last=False)
+            for job_id in stale:
+                self._jobs.pop(job_id, None)
+
+    def cancel(self, job_id: str) -> bool:
+        """Отменить задачу; False, если она не найдена или уже завершена"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.done:
+                return False
+            queue = self._queues.get(job.session)
+            if job.status == "queued" and queue and job in queue:
+                queue.remove(job)
+                job._cancel.set()
+                job.status = "cancelled"
+                job.finished = time.time()
+                self._remember(job)
+                return True
+            job._cancel.set()
+            callbacks = list(job._on_cancel)
+        for callback in callbacks:
+            callback()
+        return True
+
+    def get(self, job_id: str) -> Job | None:
+        return self._jobs.get(job_id)
+
+    def jobs(self, session: str) -> list[Job]:
+        """Задачи сессии в порядке создания"""
+        with self._lock:
+            return sorted((j for j in self._jobs.values() if j.session == session), key=lambda j: j.created)
+
+
+@lru_cache
+def get_runner() -> JobRunner:
+    """Общий пул задач процесса (размер - JOB_WORKERS)"""
+    return JobRunner(max_workers=int(os.getenv("JOB_WORKERS", str(DEFAULT_WORKERS))))
+
+
+class ResourcePool:
+    """Пул переиспользуемых объектов, которые нельзя делить между потоками (граф агентов)"""
+
+    def __init__(self, factory: Callable[[], Any]) -> None:
+        self._factory = factory
+        self._idle: deque[Any] = deque()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def checkout(self) -> Iterator[Any]:
+        """Взять свободный объект или создать новый; после блока он возвращается в пул"""
+        with self._lock:
+            item = self._idle.pop() if self._idle else None
+        if item is None:
+            item = self._factory()
+        try:
+            yield item
+        finally:
+            with self._lock:
+                self._idle.append(item)
+
+
+def _graph(agent: Any) -> Iterator[Any]:  # noqa: ANN401
+    yield agent
+    for managed in agent.managed_agents.values():
+        yield from _graph(managed)
+
+
+def _step_text(step: Any) -> str:  # noqa: ANN401
+    """Краткое описание шага агента: ошибка, вызванные инструменты или вывод кода"""
+    if step.error is not None:
+        return f"❌ {step.error}"
+    tools = [call.name for call in step.tool_calls or [] if call.name != "python_interpreter"]
+    text = str(step.observations or step.model_output or "").removeprefix("Execution logs:").strip()
+    return " | ".join(part for part in (", ".join(tools), text) if part)
+
+
+def _on_step(step: Any, agent: Any) -> None:  # noqa: ANN401
+    job: Job | None = getattr(agent, "_job", None)
+    if job is None:
+        return
+    job.emit(agent.name or type(agent).__name__, step.step_number, _step_text(step))
+    # Управляемый агент, запущенный после отмены, сбрасывает interrupt_switch в run()
+    if job.cancelled:
+        agent.interrupt()
+
+
+@contextmanager
+def attach_job(agent: Any, job: Job) -> Iterator[Any]:  # noqa: ANN401
+    """
+    Подключить задачу к графу агентов smolagents на время запуска
+
+    Шаги всех агентов графа пишутся в job.updates, отмена задачи прерывает их.
+    """
+    from smolagents.memory import ActionStep
+
+    agents = list(_graph(agent))
+    for item in agents:
+        if not getattr(item, "_job_callback", False):
+            item.step_callbacks.register(ActionStep, _on_step)
+            item._job_callback = True
+        item._job = job
+    job.on_cancel(lambda: [item.interrupt() for item in agents])
+    try:
+        yield agent
+    finally:
+        for item in agents:
+            item._job = None
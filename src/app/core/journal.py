@@ -0,0 +1,73 @@
+"""
+Append-only журнал результатов (JSONL)
+
+Каждая запись дописывается в конец файла и сразу сбрасывается на диск, поэтому
+после падения процесса теряется максимум строка, которая писалась в момент
+сбоя. Актуальным считается последняя запись по ключу (uid).
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any
+
+
+class CheckpointJournal:
+    """
+    Потокобезопасный JSONL журнал с последней записью на ключ
+
+    Пример:
+        journal = CheckpointJournal(Path("data/processed/submission.journal.jsonl"))
+        done = journal.load()
+        journal.append({"uid": "abc", "status": "ok", ...})
+    """
+
+    def __init__(self, path: Path, key: str = "uid") -> None:
+        self.path = path
+        self.key = key
+        self._lock = threading.Lock()
+        self._tail_checked = False
+
+    def load(self) -> dict[str, dict[str, Any]]:
+        """Прочитать журнал: {key: последняя запись}
+
+        Битые строки (например, недописанная при падении последняя строка) пропускаются.
+        """
+        latest: dict[str, dict[str, Any]] = {}
+        if not self.path.exists():
+            return latest
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(record, dict) and self.key in record:
+                    latest[record[self.key]] = record
+        return latest
+
+    def append(self, record: dict[str, Any]) -> None:
+        """Дописать запись и сбросить ее на диск"""
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            if not self._tail_checked:
+                # Недописанная при падении строка не должна склеиться с новой записью
+                if self.path.exists() and self.path.stat().st_size:
+                    with open(self.path, "rb") as f:
+                        f.seek(-1, os.SEEK_END)
+                        if f.read(1) != b"\n":
+                            line = "\n" + line
+                self._tail_checked = True
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def reset(self) -> None:
+        """Очистить журнал (новый прогон с нуля)"""
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_text("", encoding="utf-8")
+            self._tail_checked = True
@@ -3,36 +3,79 @@ from typing import Any
 import requests
 
 from .config import get_settings
-from .smolagents_wrapper import create_smolagent
+from .pricing import calculate_cost
+from .telemetry import span
+from .temporal import annotate_period
+from .ticker_resolver import TickerResolver, annotate_question
 
 
-def call_llm(messages: list[dict[str, str]], temperature: float = 0.2, max_tokens: int | None = None) -> dict[str, Any]:
-    """Простой вызов LLM без tools"""
+def call_llm(
+    messages: list[dict[str, str]],
+    temperature: float = 0.2,
+    max_tokens: int | None = None,
+    response_format: dict[str, Any] | None = None,
+    model: str | None = None,
+    timeout: float = 60,
+) -> dict[str, Any]:
+    """Простой вызов LLM без tools
+
+    Args:
+        response_format: OpenAI-совместимый response_format (например, json_schema
+            для structured output, см. structured_output.api_call_response_format)
+        model: Модель OpenRouter (по умолчанию OPENROUTER_MODEL из настроек)
+        timeout: Таймаут HTTP запроса, сек
+    """
     s = get_settings()
+    model = model or s.openrouter_model
     payload: dict[str, Any] = {
-        "model": s.openrouter_model,
+        "model": model,
         "messages": messages,
         "temperature": temperature,
         # "plugins": [{ "id": "web" }]
     }
     if max_tokens:
         payload["max_tokens"] = max_tokens
-        
-    r = requests.post(
-        f"{s.openrouter_base}/chat/completions",
-        headers={
-            "Authorization": f"Bearer {s.openrouter_api_key}",
-            "Content-Type": "application/json",
-        },
-        json=payload,
-        timeout=60,
-    )
-    r.raise_for_status()
-    return r.json()
-
-def call_smolagents(messages: list[dict[str, str]], temperature: float = 0.2, max_tokens: int | None = None) -> dict[str, Any]:
-    """Простой вызов LLM без tools через smolagents"""
-    s = get_settings()
-    agent = create_smolagent(s)
-    r = agent.run(messages[-1]["content"], return_full_result=True)
-    return r
\ No newline at end of file
+    if response_format:
+        payload["response_format"] = response_format
+
+    with span("llm", model) as llm_span:
+        r = requests.post(
+            f"{s.openrouter_base}/chat/completions",
+            headers={
+                "Authorization": f"Bearer {s.openrouter_api_key}",
+                "Content-Type": "application/json",
+            },
+            json=payload,
+            timeout=timeout,
+        )
+        r.raise_for_status()
+        data = r.json()
+        usage = data.get("usage") or {}
+        llm_span.prompt_tokens = usage.get("prompt_tokens") or 0
+        llm_span.completion_tokens = usage.get("completion_tokens") or 0
+        llm_span.cost = calculate_cost(usage, model)
+    return data
+
+def call_smolagents(
+    messages: list[dict[str, str]],
+    temperature: float = 0.2,
+    max_tokens: int | None = None,
+    agent: Any = None,  # noqa: ANN401
+    resolver: TickerResolver | None = None,
+) -> dict[str, Any]:
+    """Простой вызов LLM без tools через smolagents
+
+    Args:
+        agent: Готовый агент (create_smolagent); без него граф агентов строится на каждый вызов
+        resolver: Словарь инструментов для вопроса (по умолчанию встроенный): агент
+            получает вопрос с уже найденными символами и не ищет их find_asset_name,
+            а относительные периоды - с готовыми границами ISO (core/temporal.py)
+    """
+    if agent is None:
+        # smolagents тяжелый, импортируем только при первом вызове агента
+        from .smolagents_wrapper import create_smolagent
+
+        agent = create_smolagent(get_settings())
+    task = annotate_period(annotate_question(messages[-1]["content"], resolver))
+    r = agent.run(task, return_full_result=True)
+    return r
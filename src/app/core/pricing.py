@@ -0,0 +1,47 @@
+"""
+Цены моделей OpenRouter и расчет стоимости вызовов LLM
+
+Цены примерные, в $ за 1M токенов (источник: https://openrouter.ai/models).
+Таблицу можно дополнить или переопределить JSON файлом из переменной
+окружения MODEL_PRICING_FILE:
+
+    {"openai/gpt-4o-mini": {"prompt": 0.15, "completion": 0.60}}
+"""
+
+import json
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+
+MODEL_PRICING: dict[str, dict[str, float]] = {
+    "openai/gpt-4o-mini": {"prompt": 0.15, "completion": 0.60},
+    "openai/gpt-4o": {"prompt": 2.50, "completion": 10.00},
+    "openai/gpt-3.5-turbo": {"prompt": 0.50, "completion": 1.50},
+    "anthropic/claude-3-sonnet": {"prompt": 3.00, "completion": 15.00},
+    "anthropic/claude-3-haiku": {"prompt": 0.25, "completion": 1.25},
+    "google/gemini-2.5-pro": {"prompt": 1.25, "completion": 10},
+    "google/gemini-2.5-flash": {"prompt": 0.3, "completion": 2.5},
+    "x-ai/grok-code-fast-1": {"prompt": 0.20, "completion": 1.5},
+}
+
+# Цены для моделей, которых нет в таблице (как у gpt-4o-mini)
+DEFAULT_PRICING = {"prompt": 0.15, "completion": 0.60}
+
+
+@lru_cache
+def get_pricing() -> dict[str, dict[str, float]]:
+    """Таблица цен с учетом MODEL_PRICING_FILE"""
+    pricing = dict(MODEL_PRICING)
+    path = os.getenv("MODEL_PRICING_FILE")
+    if path:
+        pricing.update(json.loads(Path(path).read_text(encoding="utf-8")))
+    return pricing
+
+
+def calculate_cost(usage: dict[str, Any], model: str) -> float:
+    """Рассчитать стоимость запроса по usage (prompt_tokens / completion_tokens) и модели"""
+    prices = get_pricing().get(model, DEFAULT_PRICING)
+    prompt_cost = (usage.get("prompt_tokens") or 0) / 1_000_000 * prices["prompt"]
+    completion_cost = (usage.get("completion_tokens") or 0) / 1_000_000 * prices["completion"]
+    return prompt_cost + completion_cost
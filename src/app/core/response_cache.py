@@ -0,0 +1,295 @@
+"""
+Семантический кэш ответов чата
+
+Трейдеры весь день задают почти одинаковые вопросы ("цена Сбера", "какая цена
+у Сбербанка?"), и каждый из них заново проходит вызов API и LLM (или агентов).
+Кэш сравнивает не текст, а нормализованный вопрос: route_question() сводит его
+к эндпоинту (интент) и слотам - символу из ticker_resolver, интервалу из
+core/temporal.py, таймфрейму и счету. Вопросы с одним ключом - один и тот же
+запрос к Finam API.
+
+Кэшируются только эндпоинты с Endpoint.cache_ttl: справочники живут час и
+больше, котировки и лента - секунды, стакан - секунду. Ответ эндпоинта,
+полученный прямым путем, сохраняется вместе с длительностью хода; повторный
+вопрос в пределах TTL получает тот же ответ API и шаблонную сводку
+(SUMMARY_TEMPLATES) без вызовов LLM, агентов и Finam API.
+
+Каждый поиск по кэшу записывается спаном kind="cache": cache_hit - попадание,
+saved - сэкономленное время (длительность исходного хода минус поиск).
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+from .intent_router import RoutedRequest
+from .telemetry import span
+
+DEFAULT_MAX_ENTRIES = 1024
+
+# Сколько элементов списка (бирж, сессий расписания) перечислять в сводке
+LIST_PREVIEW = 5
+
+
+@dataclass(frozen=True)
+class CacheKey:
+    """Нормализованный вопрос: эндпоинт и значения его параметров"""
+
+    endpoint: str
+    slots: tuple[tuple[str, str], ...]
+
+    @classmethod
+    def from_route(cls, route: RoutedRequest) -> "CacheKey":
+        return cls(route.endpoint.name, tuple(sorted((k, str(v)) for k, v in route.slots.items() if v is not None)))
+
+
+@dataclass
+class CacheEntry:
+    response: dict[str, Any]
+    fetched_at: float  # time.monotonic() получения ответа
+    expires_at: float
+    latency: float  # сек, длительность хода, который получил ответ
+
+
+@dataclass
+class CachedAnswer:
+    """Ответ из кэша: запрос, сохраненный ответ Finam API и шаблонная сводка"""
+
+    output: str
+    method: str
+    path: str
+    response: dict[str, Any]
+    age: float  # сек с момента получения ответа
+    saved: float  # сек, сэкономленные по сравнению с исходным ходом
+
+
+def _number(value: Any) -> float | None:  # noqa: ANN401
+    """Число из ответа API: 1.5, "1.5" или {"value": "1.5"}"""
+    if isinstance(value, dict):
+        value = value.get("value")
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _fmt(value: Any) -> str | None:  # noqa: ANN401
+    number = _number(value)
+    if number is None:
+        return None
+    return f"{number:,.0f}".replace(",", " ") if number.is_integer() else f"{number:,.4g}".replace(",", " ")
+
+
+def _join(title: str, fields: list[tuple[str, Any]]) -> str:
+    """Заголовок и поля "название значение" без пустых значений"""
+    parts = [f"{label} {value}".strip() for label, value in fields if value not in (None, "", [])]
+    return f"{title}: {', '.join(parts)}" if parts else title
+
+
+def _quote(response: dict[str, Any], slots: dict[str, Any]) -> str:
+    quote = response.get("quote") or {}
+    return _join(
+        f"Котировка {slots.get('symbol', '')}",
+        [
+            ("последняя цена", _fmt(quote.get("last"))),
+            ("бид", _fmt(quote.get("bid"))),
+            ("аск", _fmt(quote.get("ask"))),
+            ("изменение", _fmt(quote.get("change"))),
+            ("объем", _fmt(quote.get("volume"))),
+        ],
+    )
+
+
+def _orderbook(response: dict[str, Any], slots: dict[str, Any]) -> str:
+    rows = (response.get("orderbook") or {}).get("rows") or []
+    prices = [p for p in (_number(row.get("price")) for row in rows) if p is not None]
+    bids = [_number(r.get("price")) for r in rows if r.get("buy_size") is not None or r.get("action") == "ACTION_BUY"]
+    asks = [_number(r.get("price")) for r in rows if r.get("sell_size") is not None or r.get("action") == "ACTION_SELL"]
+    return _join(
+        f"Стакан {slots.get('symbol', '')}",
+        [
+            ("уровней", len(rows)),
+            ("лучший бид", _fmt(max((b for b in bids if b is not None), default=None))),
+            ("лучший аск", _fmt(min((a for a in asks if a is not None), default=None))),
+            ("цены от", _fmt(min(prices)) if prices else None),
+            ("до", _fmt(max(prices)) if prices else None),
+        ],
+    )
+
+
+def _candles(response: dict[str, Any], slots: dict[str, Any]) -> str:
+    bars = response.get("bars") or []
+    title = f"Свечи {slots.get('symbol', '')} {slots.get('timeframe', '')}".rstrip()
+    if not bars:
+        return f"{title}: за период свечей нет"
+    first, last = _number(bars[0].get("open")), _number(bars[-1].get("close"))
+    change = f"{(last / first - 1) * 100:+.2f}%" if first and last is not None else None
+    highs = [h for h in (_number(b.get("high")) for b in bars) if h is not None]
+    lows = [low for low in (_number(b.get("low")) for b in bars) if low is not None]
+    return _join(
+        title,
+        [
+            ("свечей", len(bars)),
+            ("открытие", _fmt(first)),
+            ("закрытие", _fmt(last)),
+            ("изменение", change),
+            ("максимум", _fmt(max(highs)) if highs else None),
+            ("минимум", _fmt(min(lows)) if lows else None),
+        ],
+    )
+
+
+def _trades(response: dict[str, Any], slots: dict[str, Any]) -> str:
+    trades = response.get("trades") or []
+    last = trades[-1] if trades else {}
+    return _join(
+        f"Последние сделки {slots.get('symbol', '')}",
+        [("сделок", len(trades)), ("цена последней", _fmt(last.get("price") or last.get("close")))],
+    )
+
+
+def _asset(response: dict[str, Any], slots: dict[str, Any]) -> str:
+    return _join(
+        f"{response.get('name') or slots.get('symbol', '')}",
+        [
+            ("тикер", response.get("ticker")),
+            ("биржа", response.get("mic")),
+            ("тип", response.get("type")),
+            ("ISIN", response.get("isin")),
+            ("лот", _fmt(response.get("lot_size"))),
+            ("экспирация", response.get("expiration_date")),
+        ],
+    )
+
+
+def _asset_params(response: dict[str, Any], slots: dict[str, Any]) -> str:
+    def status(value: Any) -> Any:  # noqa: ANN401
+        return value.get("value") if isinstance(value, dict) else value
+
+    return _join(
+        f"Параметры {slots.get('symbol', '')}",
+        [
+            ("торгуется", response.get("tradeable")),
+            ("лонг", status(response.get("longable"))),
+            ("шорт", status(response.get("shortable"))),
+        ],
+    )
+
+
+def _schedule(response: dict[str, Any], slots: dict[str, Any]) -> str:
+    sessions = response.get("sessions") or []
+    preview = []
+    for session in sessions[:LIST_PREVIEW]:
+        interval = session.get("interval") or {}
+        start, end = interval.get("start_time", ""), interval.get("end_time", "")
+        preview.append(f"{session.get('type', '')} {start} - {end}".strip())
+    return _join(f"Расписание {slots.get('symbol', '')}", [("сессий", len(sessions)), ("", "; ".join(preview))])
+
+
+def _exchanges(response: dict[str, Any], _slots: dict[str, Any]) -> str:
+    exchanges = response.get("exchanges") or []
+    names = ", ".join(e.get("mic") or e.get("name", "") for e in exchanges[:LIST_PREVIEW])
+    return _join("Биржи", [("всего", len(exchanges)), ("в том числе", names)])
+
+
+def _collection(key: str, title: str) -> Callable[[dict[str, Any], dict[str, Any]], str]:
+    def render(response: dict[str, Any], slots: dict[str, Any]) -> str:
+        return _join(f"{title} {slots.get('symbol', '')}".rstrip(), [("всего", len(response.get(key) or []))])
+
+    return render
+
+
+# Шаблоны сводки по имени эндпоинта: (ответ API, слоты) -> текст
+SUMMARY_TEMPLATES: dict[str, Callable[[dict[str, Any], dict[str, Any]], str]] = {
+    "get_quote": _quote,
+    "get_orderbook": _orderbook,
+    "get_candles": _candles,
+    "get_latest_trades": _trades,
+    "get_asset": _asset,
+    "get_asset_params": _asset_params,
+    "get_asset_schedule": _schedule,
+    "get_exchanges": _exchanges,
+    "get_assets": _collection("assets", "Инструменты"),
+    "get_asset_options": _collection("options", "Опционы на"),
+}
+
+
+def render_summary(route: RoutedRequest, response: dict[str, Any], age: float) -> str:
+    """Шаблонная сводка ответа эндпоинта с возрастом данных"""
+    template = SUMMARY_TEMPLATES.get(route.endpoint.name)
+    if template is not None:
+        text = template(response, route.slots)
+    else:
+        text = f"{route.endpoint.summary.capitalize()}: поля {', '.join(response)}"
+    return f"{text}. Данные получены {age:.0f} с назад."
+
+
+class ResponseCache:
+    """Ответы кэшируемых эндпоинтов по нормализованному вопросу (LRU, потокобезопасно)"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, clock: Callable[[], float] = time.monotonic) -> None:
+        self._max_entries = max_entries
+        self._clock = clock
+        self._entries: OrderedDict[CacheKey, CacheEntry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, route: RoutedRequest) -> CachedAnswer | None:
+        """
+        Ответ на вопрос из кэша
+
+        Returns:
+            CachedAnswer или None, если эндпоинт не кэшируется или свежего ответа нет
+        """
+        if not route.endpoint.cacheable:
+            return None
+        key = CacheKey.from_route(route)
+        started = time.perf_counter()
+        with span("cache", f"{route.endpoint.method} {route.endpoint.path}") as lookup_span:
+            with self._lock:
+                entry = self._entries.get(key)
+                now = self._clock()
+                if entry is not None and entry.expires_at <= now:
+                    del self._entries[key]
+                    entry = None
+                if entry is not None:
+                    self._entries.move_to_end(key)
+            if entry is None:
+                return None
+            method, path = route.to_request()
+            age = now - entry.fetched_at
+            output = render_summary(route, entry.response, age)
+            lookup_span.cache_hit = True
+            lookup_span.saved = max(0.0, entry.latency - (time.perf_counter() - started))
+        return CachedAnswer(output, method, path, entry.response, age, lookup_span.saved)
+
+    def store(self, route: RoutedRequest, response: dict[str, Any], latency: float) -> bool:
+        """
+        Сохранить ответ эндпоинта, полученный на вопрос
+
+        Args:
+            latency: Длительность хода, который получил ответ (сек) - столько экономит попадание
+
+        Returns:
+            False, если эндпоинт не кэшируется или ответ с ошибкой
+        """
+        if not route.endpoint.cacheable or "error" in response:
+            return False
+        now = self._clock()
+        entry = CacheEntry(response, now, now + route.endpoint.cache_ttl, latency)
+        key = CacheKey.from_route(route)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,163 @@
+"""
+Повторные попытки вызовов LLM / API
+
+Ограниченное число попыток с экспоненциальной задержкой и jitter, общий
+дедлайн на вопрос и глобальный бюджет неудач: если ошибок слишком много
+(например, неверный ключ или исчерпан баланс), дальнейшие запросы к LLM
+не выполняются, и скрипты переходят на fallback. RateLimiter ограничивает
+общую частоту запросов нескольких потоков (например, в run-experiments).
+"""
+
+import random
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import TypeVar
+
+import requests
+
+T = TypeVar("T")
+
+# HTTP статусы, при которых имеет смысл повторить запрос
+RETRYABLE_STATUSES = frozenset({408, 409, 425, 429, 500, 502, 503, 504})
+
+
+class RetryError(Exception):
+    """Все попытки исчерпаны или истек дедлайн"""
+
+    def __init__(self, message: str, attempts: int, last_error: BaseException | None = None, cost: float = 0.0) -> None:
+        super().__init__(message)
+        self.attempts = attempts
+        self.last_error = last_error
+        # Стоимость ответов LLM, полученных до неудачи ($): заполняет вызывающий код
+        self.cost = cost
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    Политика повторных попыток
+
+    Attributes:
+        max_attempts: Максимальное число попыток (включая первую)
+        base_delay: Задержка перед второй попыткой, сек (далее удваивается)
+        max_delay: Верхняя граница задержки, сек
+        timeout: Общий дедлайн на все попытки, сек (None - без ограничения)
+        request_timeout: Таймаут одного HTTP запроса, сек
+    """
+
+    max_attempts: int = 4
+    base_delay: float = 1.0
+    max_delay: float = 20.0
+    timeout: float | None = 120.0
+    request_timeout: float = 60.0
+
+    def delay(self, attempt: int) -> float:
+        """Задержка после неудачной попытки attempt (нумерация с 1), full jitter"""
+        cap = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return random.uniform(0, cap)
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Можно ли повторить запрос после этой ошибки"""
+    if isinstance(error, requests.HTTPError):
+        response = error.response
+        return response is None or response.status_code in RETRYABLE_STATUSES
+    return isinstance(error, requests.ConnectionError | requests.Timeout)
+
+
+def call_with_retry(
+    fn: Callable[[float], T],
+    policy: RetryPolicy,
+    on_retry: Callable[[int, BaseException, float], None] | None = None,
+) -> T:
+    """
+    Вызвать fn с повторными попытками
+
+    Args:
+        fn: Функция, принимающая таймаут запроса (с учетом оставшегося дедлайна)
+        policy: Политика повторов
+        on_retry: Колбэк (attempt, error, delay) перед каждой повторной попыткой
+
+    Raises:
+        RetryError: Если попытки исчерпаны, истек дедлайн или ошибка не повторяемая
+    """
+    deadline = time.monotonic() + policy.timeout if policy.timeout is not None else None
+    last_error: BaseException | None = None
+
+    for attempt in range(1, policy.max_attempts + 1):
+        request_timeout = policy.request_timeout
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise RetryError(f"Deadline exceeded after {attempt - 1} attempts", attempt - 1, last_error)
+            request_timeout = min(request_timeout, remaining)
+        try:
+            return fn(request_timeout)
+        except Exception as e:
+            last_error = e
+            if not is_retryable(e):
+                raise RetryError(f"Non-retryable error: {e}", attempt, e) from e
+            if attempt == policy.max_attempts:
+                break
+            delay = policy.delay(attempt)
+            if deadline is not None:
+                delay = min(delay, max(0.0, deadline - time.monotonic()))
+            if on_retry is not None:
+                on_retry(attempt, e, delay)
+            time.sleep(delay)
+
+    raise RetryError(f"Failed after {policy.max_attempts} attempts: {last_error}", policy.max_attempts, last_error)
+
+
+class FailureBudget:
+    """
+    Глобальный бюджет неудач (потокобезопасный)
+
+    После max_failures неудачных вопросов бюджет считается исчерпанным,
+    и вызывающий код должен перестать обращаться к LLM.
+    """
+
+    def __init__(self, max_failures: int) -> None:
+        self.max_failures = max_failures
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def record_failure(self) -> bool:
+        """Учесть неудачу; вернуть True, если бюджет исчерпан"""
+        with self._lock:
+            self.failures += 1
+            return self.failures >= self.max_failures
+
+    @property
+    def exhausted(self) -> bool:
+        with self._lock:
+            return self.failures >= self.max_failures
+
+
+class RateLimiter:
+    """
+    Глобальное ограничение частоты запросов (потокобезопасное)
+
+    Запросы равномерно разносятся во времени: не чаще rate в секунду на все
+    потоки вместе. rate <= 0 отключает ограничение.
+    """
+
+    def __init__(self, rate: float) -> None:
+        self.rate = rate
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Дождаться своей очереди; вернуть время ожидания, сек"""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + 1.0 / self.rate
+        wait = slot - now
+        if wait > 0:
+            time.sleep(wait)
+        return wait
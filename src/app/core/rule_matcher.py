@@ -0,0 +1,161 @@
+"""
+Rule-based сопоставление вопроса с эндпоинтом Finam TradeAPI
+
+Дешевый детерминированный fallback для случаев, когда LLM недоступна:
+ключевые слова определяют эндпоинт, регулярные выражения извлекают
+тикеры, номера счетов и ордеров; тикер по названию компании ("Сбербанка")
+находит ticker_resolver, интервал по выражению периода ("за прошлую неделю") -
+temporal. Точность ниже, чем у LLM, зато ответ
+строится за микросекунды и без сетевых вызовов.
+"""
+
+import re
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from ..adapters.finam_endpoints import ENDPOINTS_BY_NAME, Endpoint
+from .temporal import resolve_period
+from .ticker_resolver import get_resolver
+
+SYMBOL_RE = re.compile(r"\b([A-Za-z][A-Za-z0-9_.\-]*@[A-Z]{3,6})\b")
+ORDER_ID_RE = re.compile(r"\b(ORD[A-Z0-9]+)\b")
+ACCOUNT_ID_RE = re.compile(r"\b([A-Z]{1,4}-\d{2,}(?:-[A-Z])?|[A-Z]\d{4,})\b")
+NUMERIC_ACCOUNT_RE = re.compile(r"(?:сч[её]т[еау]?|счета)\s+(?:№\s*)?(\d{4,})", re.IGNORECASE)
+LIMIT_RE = re.compile(r"последни[ех]\s+(\d+)")
+
+# Таймфрейм свечей по ключевым словам (проверяются по порядку: "30-минутные" раньше "минутные");
+# без явного таймфрейма он подбирается по длине интервала (temporal.infer_timeframe)
+TIMEFRAME_RULES: tuple[tuple[str, str], ...] = (
+    (r"\b5[\s-]?(минут|min)|\bm5\b", "TIME_FRAME_M5"),
+    (r"\b15[\s-]?(минут|min)|\bm15\b", "TIME_FRAME_M15"),
+    (r"\b30[\s-]?(минут|min)|\bm30\b", "TIME_FRAME_M30"),
+    (r"\b1[\s-]?(минут|min)|\bминутн|\bm1\b|\bminute", "TIME_FRAME_M1"),
+    (r"четырехчас|4[\s-]?(час|hour)|\bh4\b", "TIME_FRAME_H4"),
+    (r"часов|\bчас\w*\s+интервал|\bh1\b|hourly|\b1[\s-]?hour", "TIME_FRAME_H1"),
+    (r"недельн|\bw\b|weekly", "TIME_FRAME_W"),
+    (r"месячн|\bmn\b|monthly", "TIME_FRAME_MN"),
+    (r"дневн|1 день|\bd\b|daily", "TIME_FRAME_D"),
+)
+
+# (регулярное выражение по вопросу в нижнем регистре, эндпоинт); первое совпадение побеждает
+INTENT_RULES: tuple[tuple[str, str], ...] = (
+    (r"\bотмени(ть|те)?\b|\bотзов|\bотзыв|удали\w* заявк|сними\w* .*заявк", "cancel_order"),
+    (
+        r"^(купи|купить|продай|продать|покупка|продажа)\b|выстав\w* .*(ордер|заявк|стоп)|"
+        r"созда\w* .*(ордер|заявк|стоп)|стоп-лосс|стоп-лимит|стоп-маркет|тейк-профит|рыночн\w+ (продажа|покупка)",
+        "create_order",
+    ),
+    (r"нов\w+ токен|новую сесси", "create_session"),
+    (
+        r"токен|уровень (доступа|котировок)|доступ\w* к (данным|котировкам)|depth of book|без задержки|"
+        r"запрещен\w* .*доступ",
+        "get_session_details",
+    ),
+    (r"опцион", "get_asset_options"),
+    (r"стакан|глубин\w* рынка", "get_orderbook"),
+    (r"свеч|\bбар|таймфрейм|истори\w* (цен|данн)|исторические|график", "get_candles"),
+    (r"транзакц|\bсписан|комисси|пополнен|штраф|пени|движение денежных|дивиденд", "get_transactions"),
+    (r"расписани|во сколько|в какое время|торговые сессии|вечерн\w+ сесси|клиринг", "get_asset_schedule"),
+    (
+        r"можно ли (купить|открыть)|доступна ли покупка|ставка риска|гарантийн\w+ обеспечени\w+ для лонга|"
+        r"коротк\w+ продаж|торговые параметры|длинн\w+ позици\w+ по",
+        "get_asset_params",
+    ),
+    (r"isin|\bлот|шаг цены|информаци\w* (по|об) инструмент|основную информаци|истекает", "get_asset"),
+    (r"бирж(и|ах)\b|торговых площад|все биржи", "get_exchanges"),
+    (r"все активы|тикеры|какими инструментами", "get_assets"),
+    (r"цен\w* последн\w+ сделк|последнего трейда", "get_quote"),
+    (r"лент\w|поток сделок|последние сделки по|истори\w* торгов", "get_latest_trades"),
+    (r"ордер|заявк", "get_orders"),
+    (r"сдел(к|ок)", "get_trades"),
+    (r"сч[её]т|позици|портфел|баланс|маржа|средств|убыт|прибыл", "get_account"),
+    (r"цен|котировк|объем|что по|спред", "get_quote"),
+)
+
+_COMPILED_INTENTS = tuple((re.compile(pattern), name) for pattern, name in INTENT_RULES)
+_COMPILED_TIMEFRAMES = tuple((re.compile(pattern), tf) for pattern, tf in TIMEFRAME_RULES)
+
+
+@dataclass
+class RuleMatch:
+    """Эндпоинт и извлеченные из вопроса значения параметров"""
+
+    endpoint: Endpoint
+    slots: dict[str, str | int] = field(default_factory=dict)
+
+    def to_request(self) -> tuple[str, str]:
+        """Вернуть (type, request) в формате submission"""
+        return self.endpoint.method, self.endpoint.format_path(**self.slots)
+
+
+def find_symbols(question: str) -> list[str]:
+    """Символы инструментов в вопросе: явные (SBER@MISX) и найденные по названиям"""
+    return list(dict.fromkeys(SYMBOL_RE.findall(question) + get_resolver().resolve(question)))
+
+
+def extract_slots(question: str, now: datetime | None = None) -> dict[str, str | int]:
+    """
+    Извлечь тикер, счет, ордер, таймфрейм, интервал и лимит из вопроса
+
+    Args:
+        now: Текущий момент для относительных периодов (по умолчанию temporal.reference_now())
+
+    Таймфрейм без явного указания подбирается по длине интервала.
+    """
+    slots: dict[str, str | int] = {}
+    lowered = question.lower()
+    if match := SYMBOL_RE.search(question):
+        slots["symbol"] = match.group(1)
+    elif symbols := get_resolver().resolve(question):
+        slots["symbol"] = symbols[0]
+    if match := ORDER_ID_RE.search(question):
+        slots["order_id"] = match.group(1)
+    match = ACCOUNT_ID_RE.search(question.replace(slots.get("symbol", ""), ""))  # type: ignore[arg-type]
+    if match and not str(match.group(1)).startswith("ORD"):
+        slots["account_id"] = match.group(1)
+    if "account_id" not in slots and (match := NUMERIC_ACCOUNT_RE.search(question)):
+        slots["account_id"] = match.group(1)
+    if match := LIMIT_RE.search(lowered):
+        slots["limit"] = int(match.group(1))
+    slots.update(_period_slots(question, now))
+    return slots
+
+
+def _period_slots(question: str, now: datetime | None) -> dict[str, str | int]:
+    """Таймфрейм и интервал: явный таймфрейм важнее подобранного по длине интервала"""
+    slots: dict[str, str | int] = {}
+    lowered = question.lower()
+    for pattern, timeframe in _COMPILED_TIMEFRAMES:
+        if pattern.search(lowered):
+            slots["timeframe"] = timeframe
+            break
+    if period := resolve_period(question, now):
+        slots["start"] = period.start_iso
+        slots["end"] = period.end_iso
+        slots.setdefault("timeframe", period.timeframe)
+    return slots
+
+
+def match_question(question: str, now: datetime | None = None) -> RuleMatch | None:
+    """
+    Сопоставить вопрос с эндпоинтом по правилам
+
+    Args:
+        now: Текущий момент для относительных периодов
+
+    Returns:
+        RuleMatch или None, если ни одно правило не сработало
+    """
+    lowered = question.lower().strip()
+    slots = extract_slots(question, now)
+
+    for pattern, name in _COMPILED_INTENTS:
+        if not pattern.search(lowered):
+            continue
+        # Ордер с конкретным номером - это информация об ордере, а не список
+        if name == "get_orders" and "order_id" in slots:
+            name = "get_order"
+        endpoint = ENDPOINTS_BY_NAME[name]
+        allowed = {p.name for p in endpoint.params}
+        return RuleMatch(endpoint, {k: v for k, v in slots.items() if k in allowed})
+    return None
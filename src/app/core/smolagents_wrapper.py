@@ -1,290 +1,272 @@
-import smolagents
-from smolagents import CodeAgent, OpenAIModel, WebSearchTool, tool, Tool
-from typing import Any, Dict, List
-# from config import get_settings
-from app.adapters.finam_client import FinamAPIClient
-# from Levenshtein import distance
-# from transliterate import translit
+import contextvars
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from textwrap import dedent
+from typing import TYPE_CHECKING, Any, ClassVar
+
+from smolagents import ChatMessage, CodeAgent, OpenAIModel, Tool
+
+from ..adapters.finam_client import FinamAPIClient
+from ..adapters.finam_endpoints import ENDPOINTS, Endpoint, render_endpoint_docs
+from .agent_profiler import instrument_agent
+from .charts import CHART_SPEC_PREFIX, CHART_TYPES, ChartSpec
+from .pricing import calculate_cost
+from .telemetry import span
+
+if TYPE_CHECKING:
+    from .config import Settings
+
+
+def _endpoint_tool_spec(endpoint: Endpoint) -> tuple[str, str, dict[str, Any]]:
+    """Build a tool spec from an endpoint of the Finam API registry."""
+    inputs: dict[str, Any] = {}
+    for param in endpoint.params:
+        spec: dict[str, Any] = {"type": param.type, "description": param.description}
+        if not param.required:
+            spec["nullable"] = True
+        inputs[param.name] = spec
+    return endpoint.name, endpoint.description, inputs
+
+
+# Declarative spec of the Finam tools exposed to the agents:
+# (client method name, description, inputs).
+# Endpoint tools are derived from the ENDPOINTS registry; the remaining ones are
+# client helpers that are not plain endpoints.
+# Optional inputs are marked "nullable" and default to None in `forward`,
+# in which case the client method default is used.
+FINAM_TOOL_SPECS: list[tuple[str, str, dict[str, Any]]] = [
+    (
+        "find_asset_name",
+        "Find the closest matching asset names.",
+        {"string": {"type": "string", "description": "Company name or ticker symbol."}},
+    ),
+    *(_endpoint_tool_spec(endpoint) for endpoint in ENDPOINTS),
+    (
+        "get_positions",
+        "Get the open positions for a trading account.",
+        {"account_id": {"type": "string", "description": "The account ID."}},
+    ),
+]
+
+
+def _create_forward(method_name: str, inputs: dict[str, Any]) -> Callable[..., Any]:
+    """
+    Build a `forward` method whose signature matches `inputs`.
+
+    smolagents validates the forward signature against the declared inputs,
+    so the function is compiled from source once per tool class.
+    """
+    params = ["self"] + [f"{name}=None" if spec.get("nullable") else name for name, spec in inputs.items()]
+    call_args = ", ".join(f"{name}={name}" for name in inputs)
+    source = dedent(f"""
+        def forward({", ".join(params)}):
+            kwargs = dict({call_args})
+            kwargs = {{k: v for k, v in kwargs.items() if v is not None}}
+            return self.client.{method_name}(**kwargs)
+    """)
+    local_scope: dict[str, Any] = {}
+    exec(source, {}, local_scope)
+    return local_scope["forward"]
+
+
+def _tool_init(self: Tool, client: FinamAPIClient) -> None:
+    self.client = client
+    Tool.__init__(self)
+
+
+def _create_tool_class(method_name: str, description: str, inputs: dict[str, Any]) -> type[Tool]:
+    """Create a smol-agent Tool class for a FinamAPIClient method."""
+    tool_class_name = f"Finam{method_name.replace('_', ' ').title().replace(' ', '')}Tool"
+    return type(
+        tool_class_name,
+        (Tool,),
+        {
+            "name": f"finam_{method_name}",
+            "description": description,
+            "inputs": inputs,
+            "output_type": "object",
+            "forward": _create_forward(method_name, inputs),
+            "__init__": _tool_init,
+        },
+    )
+
+
+# Tool classes are generated once at import time; agents only instantiate them.
+FINAM_TOOL_CLASSES: list[type[Tool]] = [
+    _create_tool_class(method_name, description, inputs) for method_name, description, inputs in FINAM_TOOL_SPECS
+]
+
+
+# Upper bound on concurrent Finam calls from finam_batch across all agents.
+BATCH_MAX_WORKERS = 8
+
+
+@lru_cache
+def _batch_pool() -> ThreadPoolExecutor:
+    """Thread pool shared by all finam_batch tools (created on first use)."""
+    return ThreadPoolExecutor(max_workers=BATCH_MAX_WORKERS, thread_name_prefix="finam-batch")
+
+
+class FinamBatchTool(Tool):
+    """
+    Run several Finam tools concurrently in one step.
+
+    Calls are submitted to a shared thread pool, so the step takes roughly as
+    long as the slowest call instead of the sum. Each call runs in a copy of the
+    caller's context, so telemetry spans and profiler nodes stay attached to the
+    current turn and step. A failing call is reported in its own result and does
+    not abort the others.
+    """
+
+    name = "finam_batch"
+    description = (
+        "Call several Finam tools at once and get all results together, e.g. quote, orderbook and account "
+        "for one answer. Much faster than calling the tools one by one. Returns a dict: key -> tool result."
+    )
+    inputs: ClassVar[dict[str, Any]] = {
+        "calls": {
+            "type": "array",
+            "description": (
+                'List of calls: {"tool": "finam_get_quote", "args": {"symbol": "SBER@MISX"}, "key": "quote"}. '
+                '"key" is optional and defaults to the tool name.'
+            ),
+        }
+    }
+    output_type = "object"
+
+    def __init__(self, tools: list[Tool]) -> None:
+        self.tools = {tool.name: tool for tool in tools}
+        super().__init__()
+
+    def _resolve(self, name: str) -> Tool:
+        tool = self.tools.get(name) or self.tools.get(f"finam_{name}")
+        if tool is None:
+            raise ValueError(f"Unknown tool {name!r}. Available: {', '.join(sorted(self.tools))}")
+        return tool
+
+    def _call(self, call: dict[str, Any]) -> Any:  # noqa: ANN401
+        try:
+            return self._resolve(call["tool"])(**(call.get("args") or {}))
+        except Exception as e:
+            return {"error": str(e), "type": type(e).__name__}
+
+    def forward(self, calls: list[dict[str, Any]]) -> dict[str, Any]:
+        keys: list[str] = []
+        for call in calls:
+            key = base = str(call.get("key") or call.get("tool"))
+            # Repeated keys (same tool for several symbols) get a numeric suffix
+            # that does not clash with keys given by the caller
+            suffix = len(keys)
+            while key in keys:
+                key = f"{base}_{suffix}"
+                suffix += 1
+            keys.append(key)
+        futures = [_batch_pool().submit(contextvars.copy_context().run, self._call, call) for call in calls]
+        return {key: future.result() for key, future in zip(keys, futures, strict=True)}
+
+
+class FinamChartTool(Tool):
+    """
+    Describe a chart instead of drawing it.
+
+    The model passes a small spec; the chat app fetches the data from the Finam
+    API and builds the figure server-side (core/charts.py), so no Plotly JSON
+    goes through the model output.
+    """
+
+    name = "finam_chart"
+    description = (
+        "Request a chart for the user. Returns a line 'CHART_SPEC: {...}' that must be copied verbatim "
+        "into the final answer; the app draws the chart from live Finam data. Chart types: "
+        "candles (candlesticks with volume for one symbol), portfolio (positions sunburst, needs account_id), "
+        "equity (position value with account trades for one symbol, needs account_id), "
+        "scanner (price, change and sparkline for several symbols)."
+    )
+    inputs: ClassVar[dict[str, Any]] = {
+        "chart": {"type": "string", "description": f"Chart type, one of {', '.join(CHART_TYPES)}."},
+        "symbols": {"type": "array", "description": "Symbols, e.g. ['SBER@MISX'].", "nullable": True},
+        "timeframe": {
+            "type": "string",
+            "description": "Candle timeframe; by default chosen from the range length (TIME_FRAME_D without a range).",
+            "nullable": True,
+        },
+        "start": {"type": "string", "description": "Start of the range in ISO format.", "nullable": True},
+        "end": {"type": "string", "description": "End of the range in ISO format.", "nullable": True},
+        "account_id": {"type": "string", "description": "Account ID for portfolio and equity.", "nullable": True},
+    }
+    output_type = "string"
+
+    def forward(
+        self,
+        chart: str,
+        symbols: list[str] | None = None,
+        timeframe: str | None = None,
+        start: str | None = None,
+        end: str | None = None,
+        account_id: str | None = None,
+    ) -> str:
+        spec = ChartSpec.from_dict({
+            "chart": chart,
+            "symbols": symbols,
+            "timeframe": timeframe,
+            "start": start,
+            "end": end,
+            "account_id": account_id,
+        })
+        return f"{CHART_SPEC_PREFIX} {spec.to_json()}"
+
 
-# _s = get_settings()
-# _finam_client = FinamAPIClient(_s.finam_api_key, _s.finam_api_base)
-
-# @tool
-# def find_asset_name(string: str) -> str:
-#     """
-#     Finds the closest matching asset symbol names to a given input string.
-
-#     Args:
-#         string (str): The input string to match against available asset names.
-
-#     Returns:
-#         List[str]: A list of up to 10 asset names most similar to the input string, sorted by similarity.
-
-#     Note:
-#         This function queries the Finam API for all available assets and uses a string distance metric
-#         to determine the closest matches.
-
-#     Example:
-#         >>> find_asset_name("appl")
-#         ['AAPL', 'APPLX', ...]
-#     """
-#     all_assets = _finam_client.execute_request("GET", "/v1/assets")
-#     # print(all_assets)
-#     # Try transliteration if input is Russian or English
-
-#     candidates = []
-#     # Original input
-#     # candidates.append(string)
-#     # Transliterate Russian to English
-#     try:
-#         candidates.append(translit(string, 'ru', reversed=True))
-#     except Exception:
-#         pass
-#     # Transliterate English to Russian
-#     try:
-#         candidates.append(translit(string, 'ru'))
-#     except Exception:
-#         pass
-
-#     # Remove duplicates and empty
-#     candidates = list({c for c in candidates if c and isinstance(c, str)})
-
-#     # print(candidates)
-
-#     # Find closest for each candidate
-#     closest_names = []
-#     for cand in candidates:
-#         closest = sorted(
-#             all_assets.get("assets", []),
-#             key=lambda a: distance(a["name"].lower(), cand.lower())
-#         )[:3]
-#         closest_names.extend(closest)
-
-#     # Remove duplicates by asset name
-#     seen = set()
-#     unique_closest = []
-#     for a in closest_names:
-#         if a["name"] not in seen:
-#             unique_closest.append(a)
-#             seen.add(a["name"])
-
-#     return unique_closest
-
-
-# Corrected Toolkit Implementation
 class FinamAPIToolkit:
     """
     A toolkit for creating smol-agent tools from the FinamAPIClient.
     """
 
-    def __init__(self, client: FinamAPIClient):
+    def __init__(self, client: FinamAPIClient) -> None:
         self.client = client
 
-    def get_tools(self) -> List[Tool]:
-        """
-        Returns a list of smol-agent tools for each method of the FinamAPIClient.
-        """
-        tools = [
-            self._create_tool_for_method(
-                method_name="find_asset_name",
-                description="Find the closest matching asset names.",
-                inputs={"string": {"type": "string", "description": "Company name or ticker symbol."}},
-            ),
-            self._create_tool_for_method(
-                method_name="get_quote",
-                description="Get the current quote for a financial instrument.",
-                inputs={"symbol": {"type": "string", "description": "The instrument symbol."}},
-            ),
-            self._create_tool_for_method(
-                method_name="get_orderbook",
-                description="Get the order book for a financial instrument.",
-                inputs={
-                    "symbol": {"type": "string", "description": "The instrument symbol."},
-                    "depth": {"type": "integer", "description": "The depth of the order book.", "default": 10},
-                },
-            ),
-            self._create_tool_for_method(
-                method_name="get_candles",
-                description="Get historical candle data for a financial instrument.",
-                inputs={
-                    "symbol": {"type": "string", "description": "The instrument symbol."},
-                    "timeframe": {"type": "string", "description": "The timeframe of the candles (e.g., 'D' for daily).", "default": "D"},
-                    "start": {"type": "string", "description": "The start time for the data in ISO format.", "required": False},
-                    "end": {"type": "string", "description": "The end time for the data in ISO format.", "required": False},
-                },
-            ),
-            self._create_tool_for_method(
-                method_name="get_account",
-                description="Get information about a trading account.",
-                inputs={"account_id": {"type": "string", "description": "The account ID."}},
-            ),
-            self._create_tool_for_method(
-                method_name="get_orders",
-                description="Get a list of orders for a trading account.",
-                inputs={"account_id": {"type": "string", "description": "The account ID."}},
-            ),
-            self._create_tool_for_method(
-                method_name="get_order",
-                description="Get information about a specific order.",
-                inputs={
-                    "account_id": {"type": "string", "description": "The account ID."},
-                    "order_id": {"type": "string", "description": "The order ID."},
-                },
-            ),
-            self._create_tool_for_method(
-                method_name="create_order",
-                description="Create a new order.",
-                inputs={
-                    "account_id": {"type": "string", "description": "The account ID."},
-                    "order_data": {"type": "object", "description": "The order data as a dictionary."},
-                },
-            ),
-            self._create_tool_for_method(
-                method_name="cancel_order",
-                description="Cancel an existing order.",
-                inputs={
-                    "account_id": {"type": "string", "description": "The account ID."},
-                    "order_id": {"type": "string", "description": "The order ID to cancel."},
-                },
-            ),
-            self._create_tool_for_method(
-                method_name="get_trades",
-                description="Get the trade history for a trading account.",
-                inputs={
-                    "account_id": {"type": "string", "description": "The account ID."},
-                    "start": {"type": "string", "description": "The start time for the data in ISO format.", "required": False},
-                    "end": {"type": "string", "description": "The end time for the data in ISO format.", "required": False},
-                },
-            ),
-            self._create_tool_for_method(
-                method_name="get_positions",
-                description="Get the open positions for a trading account.",
-                inputs={"account_id": {"type": "string", "description": "The account ID."}},
-            ),
-            self._create_tool_for_method(
-                method_name="get_session_details",
-                description="Get details about the current API session.",
-                inputs={},
-            ),
-        ]
-        return tools
-
-    def _create_tool_for_method(
-        self, method_name: str, description: str, inputs: Dict[str, Any]
-    ) -> Tool:
+    def get_tools(self) -> list[Tool]:
         """
-        A factory method to dynamically create a smol-agent Tool class with the
-        correct `forward` method signature for a given FinamAPIClient method.
+        Returns a list of smol-agent tools for each method of the FinamAPIClient,
+        plus finam_batch to run several of them concurrently.
         """
-        client_method = getattr(self.client, method_name)
-        arg_names = list(inputs.keys())
-        
-        # Define the forward method with the correct signature dynamically
-        def create_forward_method(method):
-            # Create the source code for the forward method
-            # Example: "def forward(self, symbol):\n    return method(symbol=symbol)"
-            args_for_signature = ", ".join(['self'] + arg_names)
-            args_for_call = ", ".join(f"{name}={name}" for name in arg_names)
-            
-            # Using dedent to keep formatting clean
-            forward_method_code = dedent(f"""
-                def forward({args_for_signature}):
-                    return method({args_for_call})
-            """)
-
-            # Execute the code in a specific namespace to "compile" the function
-            local_scope = {}
-            exec(forward_method_code, {'method': method}, local_scope)
-            return local_scope['forward']
-
-        # Create the custom Tool class using the type factory
-        tool_class_name = f"Finam{method_name.replace('_', ' ').title().replace(' ', '')}Tool"
-        
-        ToolClass = type(
-            tool_class_name,
-            (Tool,),
-            {
-                "name": f"finam_{method_name}",
-                "description": description,
-                "inputs": inputs,
-                "output_type": "object",
-                "forward": create_forward_method(client_method),
-                # The __init__ is necessary to call the parent's __init__
-                "__init__": lambda self: Tool.__init__(self),
-            }
-        )
-
-        return ToolClass()
-# print(find_asset_name("Сбербанк"))
-# exit()
-
-# print("Using model:", _s.openrouter_model)
-# _model = OpenAIModel(
-#     model_id=_s.openrouter_model, 
-#     api_base=_s.openrouter_base,
-#     api_key=_s.openrouter_api_key)
-
-# _plot_agent = CodeAgent(
-#     instructions="You are an expert in data visualization. Create plots using plotly based on user requests. Return plots as plotly JSON.",
-#     tools=[], model=_model, additional_authorized_imports=["plotly"],
-#     name="plot_agent",
-#     description="Can create and show plots using plotly. Return plotly json"
-# )
-
-# toolkit = FinamAPIToolkit(_finam_client)
-
-# # 3. Get the list of tools
-# finam_tools = toolkit.get_tools()
-# _finam_agent = CodeAgent(
-#     instructions="""You are an expert in Finam TradeAPI. Answer questions about stocks, ETFs, bonds, currencies, and other assets traded using only the Finam TradeAPI. Use the provided tool to find correct asset symbol names when needed. Output API requests in the format: API_REQUEST: METHOD /path. Use GET, POST, DELETE methods as needed. If the request is not related to Finam TradeAPI, respond that you can only answer questions related to Finam TradeAPI.""",
-#     tools=[find_asset_name] + finam_tools, model=_model,
-#     name="finam_agent",
-#     description="Can query Finam TradeAPI. Use find_asset_name to get correct asset symbol names",
-#     additional_authorized_imports=["requests"]
-# )
-
-# _manager_agent = CodeAgent(
-#     instructions="""You are a manager agent that can manage other agents. You have access to the following agents: finam_agent, plot_agent. Based on user requests, decide which agent to delegate the task to. If the request involves data visualization, use the plot_agent. For all other Finam TradeAPI related queries, use the finam_agent. If unsure, default to finam_agent.
-#     Ты - AI ассистент трейдера, работающий с Finam TradeAPI.
-
-# Твоя задача - помогать пользователю анализировать рынки и управлять портфелем.
-
-# Когда пользователь задает вопрос, ты должен:
-# 1. Определить, какой API запрос нужен
-# 2. Сформулировать запрос в формате: HTTP_METHOD /api/path
-# 3. Я выполню этот запрос и верну результат
-# 4. Ты должен проанализировать результат и дать понятный ответ пользователю
-
-# Доступные API endpoints:
-# - GET /v1/instruments/{symbol}/quotes/latest - текущая котировка
-# - GET /v1/instruments/{symbol}/orderbook - биржевой стакан
-# - GET /v1/instruments/{symbol}/bars - исторические свечи
-# - GET /v1/accounts/{account_id} - информация о счете и позициях
-# - GET /v1/accounts/{account_id}/orders - список ордеров
-# - POST /v1/accounts/{account_id}/orders - создание ордера
-# - DELETE /v1/accounts/{account_id}/orders/{order_id} - отмена ордера
-
-# Формат твоего ответа должен быть таким:
-# ```
-# API_REQUEST: GET /v1/instruments/SBER@MISX/quotes/latest
-
-# <После получения ответа от API, проанализируй его и дай понятное объяснение>
-# ```
-
-# Отвечай на русском языке, будь полезным и дружелюбным.""",
-#     tools=[], model=_model, managed_agents=[_finam_agent, _plot_agent],
-#     name="manager_agent",
-#     description="Can manage other agents"
-# )
-
-
-# # a = _manager_agent.run("Что в стакане по Газпрому?", return_full_result=True)
-# # print(a)
-
-def create_smolagent(s):
-    _model = OpenAIModel(
-        model_id=s.openrouter_model, 
+        tools = [tool_class(self.client) for tool_class in FINAM_TOOL_CLASSES]
+        return [*tools, FinamBatchTool(tools), FinamChartTool()]
+
+
+class InstrumentedOpenAIModel(OpenAIModel):
+    """OpenAIModel that records a telemetry span (latency, tokens, cost) for every completion."""
+
+    def generate(
+        self,
+        messages: list[ChatMessage | dict[str, Any]],
+        stop_sequences: list[str] | None = None,
+        response_format: dict[str, str] | None = None,
+        tools_to_call_from: list[Tool] | None = None,
+        **kwargs: Any,  # noqa: ANN401
+    ) -> ChatMessage:
+        with span("agent_llm", self.model_id) as model_span:
+            message = super().generate(
+                messages,
+                stop_sequences=stop_sequences,
+                response_format=response_format,
+                tools_to_call_from=tools_to_call_from,
+                **kwargs,
+            )
+            usage = message.token_usage
+            if usage is not None:
+                model_span.prompt_tokens = usage.input_tokens
+                model_span.completion_tokens = usage.output_tokens
+                model_span.cost = calculate_cost(
+                    {"prompt_tokens": usage.input_tokens, "completion_tokens": usage.output_tokens}, self.model_id
+                )
+        return message
+
+
+def create_smolagent(s: "Settings", client: FinamAPIClient | None = None) -> CodeAgent:
+    """Build the manager -> finam_agent / plot_agent graph; `client` is reused by the Finam tools if given."""
+    _model = InstrumentedOpenAIModel(
+        model_id=s.openrouter_model,
         api_base=s.openrouter_base,
         api_key=s.openrouter_api_key)
 
@@ -296,12 +278,12 @@ def create_smolagent(s):
         return_full_result=True
     )
 
-    toolkit = FinamAPIToolkit(FinamAPIClient(s.finam_api_key, s.finam_api_base))
+    toolkit = FinamAPIToolkit(client or FinamAPIClient(s.finam_api_key, s.finam_api_base))
 
     # 3. Get the list of tools
     finam_tools = toolkit.get_tools()
     _finam_agent = CodeAgent(
-        instructions="""You are an expert in Finam TradeAPI. Answer questions about stocks, ETFs, bonds, currencies, and other assets traded using only the Finam TradeAPI. Use the provided tool to find correct asset symbol names when needed. Output API requests in the format: API_REQUEST: METHOD /path. Use GET, POST, DELETE methods as needed. If the request is not related to Finam TradeAPI, respond that you can only answer questions related to Finam TradeAPI.""",
+        instructions="""You are an expert in Finam TradeAPI. Answer questions about stocks, ETFs, bonds, currencies, and other assets traded using only the Finam TradeAPI. Company names in the question are already resolved to symbols in parentheses, e.g. "Сбербанка (SBER@MISX)": use these symbols as is. Relative periods are resolved the same way, e.g. "за прошлую неделю (2025-09-22T00:00:00Z - 2025-09-28T23:59:59Z)": pass these bounds as start and end. Use the provided tool to find correct asset symbol names only for instruments without a resolved symbol. When an answer needs data from several tools (e.g. quote, orderbook and account), call them together with finam_batch instead of one by one. Output API requests in the format: API_REQUEST: METHOD /path. Use GET, POST, DELETE methods as needed. If the request is not related to Finam TradeAPI, respond that you can only answer questions related to Finam TradeAPI.""",
         tools=finam_tools, model=_model,
         name="finam_agent",
         description="Can query Finam TradeAPI. Use find_asset_name to get correct asset symbol names",
@@ -322,13 +304,7 @@ def create_smolagent(s):
     4. Ты должен проанализировать результат и дать понятный ответ пользователю
 
     Доступные API endpoints:
-    - GET /v1/instruments/{symbol}/quotes/latest - текущая котировка
-    - GET /v1/instruments/{symbol}/orderbook - биржевой стакан
-    - GET /v1/instruments/{symbol}/bars - исторические свечи
-    - GET /v1/accounts/{account_id} - информация о счете и позициях
-    - GET /v1/accounts/{account_id}/orders - список ордеров
-    - POST /v1/accounts/{account_id}/orders - создание ордера
-    - DELETE /v1/accounts/{account_id}/orders/{order_id} - отмена ордера
+""" + render_endpoint_docs() + """
 
     Формат твоего ответа должен быть таким:
     ```
@@ -337,19 +313,21 @@ def create_smolagent(s):
     <После получения ответа от API, проанализируй его и дай понятное объяснение>
     ```
 
-    Если plot_agent вернул json с графиком, вставь его в ответ в формате:
+    Для графиков свечей, портфеля, стоимости позиции и сканера тикеров вызови инструмент
+    finam_chart и вставь возвращенную строку CHART_SPEC: {...} в ответ без изменений -
+    график построит приложение по данным Finam API. plot_agent используй только для
+    нестандартных графиков; если он вернул json с графиком, вставь его в ответ в формате:
     ```
     PLOTLY_JSON: {json}
     ```
     Отвечай на русском языке, будь полезным и дружелюбным.
     """,
-        tools=[], model=_model, managed_agents=[_finam_agent, _plot_agent],
+        tools=[FinamChartTool()], model=_model, managed_agents=[_finam_agent, _plot_agent],
         name="manager_agent",
         description="Can manage other agents",
         return_full_result=True,
         additional_authorized_imports=["plotly", "ast", "json", "pandas", "numpy"]
     )
-    return _manager_agent
+    # Step profiling (model / code / tool time per step), see core/agent_profiler.py
+    return instrument_agent(_manager_agent)
 
-# agent = create_smolagent(FinamAPIClient(_s.finam_api_key, _s.finam_api_base))
-# print(agent.run("Что в стакане по Газпрому?"))
\ No newline at end of file
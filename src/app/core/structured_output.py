@@ -0,0 +1,164 @@
+"""
+Structured output для генерации API запросов
+
+Вместо свободного текста LLM возвращает JSON по строгой схеме: HTTP метод и
+шаблон пути из небольшого enum (строится по реестру эндпоинтов) плюс значения
+параметров. Ответ сразу парсится в типизированный ApiCall, без эвристик.
+"""
+
+import json
+from typing import Any, Literal
+
+from pydantic import BaseModel, ConfigDict, ValidationError
+
+from ..adapters.finam_endpoints import ENDPOINTS, ENDPOINTS_BY_ROUTE, TIMEFRAMES, Endpoint, EndpointParam
+from .llm import call_llm
+
+# На JSON ответ по схеме хватает нескольких десятков токенов
+STRUCTURED_MAX_TOKENS = 256
+
+
+class ApiCall(BaseModel):
+    """Типизированный API запрос, полученный от LLM"""
+
+    model_config = ConfigDict(extra="ignore")
+
+    method: Literal["GET", "POST", "DELETE"]
+    path_template: str
+    # Значения параметров эндпоинтов (имена как в реестре ENDPOINTS)
+    symbol: str | None = None
+    account_id: str | None = None
+    order_id: str | None = None
+    timeframe: str | None = None
+    start: str | None = None
+    end: str | None = None
+    limit: int | None = None
+    depth: int | None = None
+
+    @property
+    def endpoint(self) -> Endpoint:
+        endpoint = ENDPOINTS_BY_ROUTE.get((self.method, self.path_template))
+        if endpoint is None:
+            # Метод не подходит к шаблону: берем единственный эндпоинт с этим путем
+            candidates = [ep for ep in ENDPOINTS if ep.path == self.path_template]
+            if len(candidates) != 1:
+                raise ValueError(f"Unknown endpoint: {self.method} {self.path_template}")
+            endpoint = candidates[0]
+        return endpoint
+
+    def to_request(self) -> tuple[str, str]:
+        """Вернуть (type, request) в формате submission"""
+        endpoint = self.endpoint
+        return endpoint.method, endpoint.format_path(**self.model_dump(exclude={"method", "path_template"}))
+
+
+def _slot_params() -> dict[str, EndpointParam]:
+    """Все path/query параметры реестра (body не генерируется моделью)"""
+    slots: dict[str, EndpointParam] = {}
+    for ep in ENDPOINTS:
+        for param in ep.params:
+            if param.location != "body":
+                slots.setdefault(param.name, param)
+    return slots
+
+
+def build_api_call_schema(allow_none: bool = False) -> dict[str, Any]:
+    """
+    JSON schema ответа (strict-совместимая: все поля обязательные, null разрешен)
+
+    Args:
+        allow_none: Разрешить method/path_template = null, если API запрос не нужен
+            (используется в чатах для вопросов, не требующих обращения к API)
+    """
+    methods: list[Any] = sorted({ep.method for ep in ENDPOINTS})
+    templates: list[Any] = list(dict.fromkeys(ep.path for ep in ENDPOINTS))
+    if allow_none:
+        methods.append(None)
+        templates.append(None)
+
+    properties: dict[str, Any] = {
+        "method": {"type": ["string", "null"] if allow_none else "string", "enum": methods},
+        "path_template": {"type": ["string", "null"] if allow_none else "string", "enum": templates},
+    }
+    for name, param in _slot_params().items():
+        if name == "timeframe":
+            properties[name] = {"type": ["string", "null"], "enum": [*TIMEFRAMES, None]}
+        else:
+            properties[name] = {"type": [param.type, "null"], "description": param.description}
+
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False,
+    }
+
+
+def api_call_response_format(allow_none: bool = False) -> dict[str, Any]:
+    """response_format для call_llm"""
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": "api_call", "strict": True, "schema": build_api_call_schema(allow_none)},
+    }
+
+
+STRUCTURED_INSTRUCTIONS = """Верни ответ строго в JSON по схеме:
+- method и path_template - HTTP метод и шаблон пути из документации (с плейсхолдерами вида {symbol});
+- symbol, account_id, order_id - значения плейсхолдеров (null, если в вопросе их нет);
+- timeframe, start, end, limit, depth - query-параметры (null, если не нужны);
+- даты в ISO 8601 (2025-01-01T00:00:00Z)."""
+
+STRUCTURED_CHAT_INSTRUCTIONS = (
+    STRUCTURED_INSTRUCTIONS + "\nЕсли вопрос не требует запроса к API, верни method = null и path_template = null."
+)
+
+
+def parse_api_call(content: str) -> ApiCall | None:
+    """
+    Распарсить JSON ответ LLM в ApiCall
+
+    Returns:
+        ApiCall или None, если модель ответила, что API запрос не нужен
+
+    Raises:
+        ValueError: Если ответ не соответствует схеме
+    """
+    try:
+        data = json.loads(content)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"LLM returned invalid JSON: {e}") from e
+    if not isinstance(data, dict):
+        raise ValueError("LLM returned JSON that is not an object")
+    if data.get("method") is None or data.get("path_template") is None:
+        return None
+    try:
+        api_call = ApiCall.model_validate(data)
+    except ValidationError as e:
+        raise ValueError(f"LLM response does not match schema: {e}") from e
+    # Проверяем, что пара (method, path_template) существует в реестре
+    api_call.endpoint  # noqa: B018
+    return api_call
+
+
+def request_api_call(
+    messages: list[dict[str, str]], temperature: float = 0.0, allow_none: bool = False
+) -> tuple[ApiCall | None, dict[str, Any]]:
+    """
+    Запросить у LLM API вызов в structured режиме
+
+    Args:
+        messages: История диалога; инструкции по формату JSON добавляются автоматически
+        allow_none: Разрешить ответ "запрос к API не нужен"
+
+    Returns:
+        (api_call, raw_response) - api_call равен None, если запрос к API не нужен
+    """
+    instructions = STRUCTURED_CHAT_INSTRUCTIONS if allow_none else STRUCTURED_INSTRUCTIONS
+    response = call_llm(
+        [*messages, {"role": "system", "content": instructions}],
+        temperature=temperature,
+        max_tokens=STRUCTURED_MAX_TOKENS,
+        response_format=api_call_response_format(allow_none),
+    )
+    content = response["choices"][-1]["message"]["content"]
+    return parse_api_call(content), response
@@ -0,0 +1,263 @@
+"""
+Телеметрия вызовов LLM, агентов и Finam TradeAPI
+
+Каждый вызов оформляется как спан (длительность, токены, стоимость, статус,
+попадание в кэш и сэкономленное им время) и записывается в кольцевой буфер в
+памяти процесса, поэтому накладные расходы - доли микросекунды на вызов и
+память ограничена. Спаны привязываются к ходу диалога через turn(): так чат
+показывает разбивку по каждому ответу.
+
+Инструментированы call_llm (kind="llm"), модель агентов smolagents
+(kind="agent_llm"), FinamAPIClient.execute_request (kind="finam", наблюдатель
+подключается при импорте модуля) и поиск в семантическом кэше ответов
+(kind="cache", core/response_cache.py).
+
+Экспорт (опционально, через переменные окружения):
+    TELEMETRY_BUFFER_SIZE      размер кольцевого буфера (по умолчанию 2000)
+    TELEMETRY_PROMETHEUS_PORT  отдавать накопленные счетчики в формате Prometheus на /metrics
+    TELEMETRY_OTEL=1           дублировать спаны в OpenTelemetry (нужен пакет opentelemetry-api)
+"""
+
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+from ..adapters.finam_client import set_request_observer
+
+DEFAULT_BUFFER_SIZE = 2000
+
+METRICS_PREFIX = "finam_assistant"
+
+_current_turn: ContextVar[str | None] = ContextVar("telemetry_turn", default=None)
+
+
+# Накопительные счетчики по спанам (Telemetry.totals, summarize)
+TOTAL_FIELDS = ("calls", "errors", "duration", "prompt_tokens", "completion_tokens", "cost", "cache_hits", "saved")
+
+
+@dataclass
+class Span:
+    """Один вызов внешнего сервиса"""
+
+    kind: str  # "llm", "agent_llm", "finam" или "cache"
+    name: str  # модель или шаблон эндпоинта (GET /v1/instruments/{symbol}/quotes/latest)
+    started_at: float  # time.time() начала
+    duration: float = 0.0  # сек
+    status: str = "ok"  # "ok" или "error"
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost: float = 0.0  # $
+    cache_hit: bool = False
+    saved: float = 0.0  # сек, сэкономленные ответом из кэша
+    turn: str | None = None
+    attributes: dict[str, Any] = field(default_factory=dict)
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+def _accumulate(totals: dict[str, float], s: Span) -> None:
+    totals["calls"] += 1
+    totals["errors"] += s.status != "ok"
+    totals["duration"] += s.duration
+    totals["prompt_tokens"] += s.prompt_tokens
+    totals["completion_tokens"] += s.completion_tokens
+    totals["cost"] += s.cost
+    totals["cache_hits"] += s.cache_hit
+    totals["saved"] += s.saved
+
+
+class Telemetry:
+    """
+    Кольцевой буфер последних спанов и накопительные счетчики (потокобезопасно)
+
+    Счетчики не теряются при вытеснении спанов из буфера и используются
+    экспортером Prometheus. Экспортеры вызываются на каждый записанный спан.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_BUFFER_SIZE) -> None:
+        self._spans: deque[Span] = deque(maxlen=capacity)
+        self._totals: dict[tuple[str, str], dict[str, float]] = {}
+        self._exporters: list[Callable[[Span], None]] = []
+        self._lock = threading.Lock()
+
+    def record(self, span: Span) -> None:
+        with self._lock:
+            self._spans.append(span)
+            _accumulate(self._totals.setdefault((span.kind, span.name), dict.fromkeys(TOTAL_FIELDS, 0.0)), span)
+            exporters = list(self._exporters)
+        for export in exporters:
+            try:
+                export(span)
+            except Exception:
+                # Экспорт телеметрии не должен ломать вызов, который она измеряет
+                continue
+
+    def add_exporter(self, export: Callable[[Span], None]) -> None:
+        with self._lock:
+            self._exporters.append(export)
+
+    def spans(self, turns: set[str] | None = None) -> list[Span]:
+        """Спаны из буфера, опционально только для заданных ходов диалога"""
+        with self._lock:
+            spans = list(self._spans)
+        return spans if turns is None else [s for s in spans if s.turn in turns]
+
+    def totals(self) -> dict[tuple[str, str], dict[str, float]]:
+        """Накопленные счетчики по (kind, name)"""
+        with self._lock:
+            return {key: dict(values) for key, values in self._totals.items()}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._spans.clear()
+            self._totals.clear()
+
+
+def summarize(spans: list[Span]) -> dict[str, dict[str, float]]:
+    """Сводка спанов по kind: вызовы, ошибки, время, токены, стоимость, попадания в кэш и сэкономленное время"""
+    summary: dict[str, dict[str, float]] = {}
+    for s in spans:
+        _accumulate(summary.setdefault(s.kind, dict.fromkeys(TOTAL_FIELDS, 0.0)), s)
+    return summary
+
+
+def current_turn() -> str | None:
+    """Текущий ход диалога или None вне turn()"""
+    return _current_turn.get()
+
+
+@contextmanager
+def turn(turn_id: str | None = None) -> Iterator[str]:
+    """Привязать спаны внутри блока к ходу диалога"""
+    turn_id = turn_id or uuid.uuid4().hex[:12]
+    token = _current_turn.set(turn_id)
+    try:
+        yield turn_id
+    finally:
+        _current_turn.reset(token)
+
+
+@contextmanager
+def span(kind: str, name: str, **attributes: Any) -> Iterator[Span]:  # noqa: ANN401
+    """
+    Измерить вызов и записать спан
+
+    Внутри блока можно дополнить спан токенами, стоимостью, cache_hit;
+    исключение помечает спан как error и пробрасывается дальше.
+    """
+    current = Span(kind, name, time.time(), turn=_current_turn.get(), attributes=attributes)
+    started = time.perf_counter()
+    try:
+        yield current
+    except BaseException:
+        current.status = "error"
+        raise
+    finally:
+        current.duration = time.perf_counter() - started
+        get_telemetry().record(current)
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def render_prometheus(telemetry: Telemetry) -> str:
+    """Накопленные счетчики в текстовом формате Prometheus"""
+    metrics = {
+        "calls_total": ("counter", "Количество вызовов", "calls"),
+        "errors_total": ("counter", "Количество неудачных вызовов", "errors"),
+        "duration_seconds_total": ("counter", "Суммарная длительность вызовов, сек", "duration"),
+        "prompt_tokens_total": ("counter", "Входные токены LLM", "prompt_tokens"),
+        "completion_tokens_total": ("counter", "Выходные токены LLM", "completion_tokens"),
+        "cost_dollars_total": ("counter", "Стоимость вызовов LLM, $", "cost"),
+        "cache_hits_total": ("counter", "Ответы из кэша", "cache_hits"),
+        "saved_seconds_total": ("counter", "Время, сэкономленное ответами из кэша, сек", "saved"),
+    }
+    totals = telemetry.totals()
+    lines = []
+    for metric, (metric_type, help_text, key) in metrics.items():
+        full_name = f"{METRICS_PREFIX}_{metric}"
+        lines.append(f"# HELP {full_name} {help_text}")
+        lines.append(f"# TYPE {full_name} {metric_type}")
+        for (kind, name), values in sorted(totals.items()):
+            lines.append(f'{full_name}{{kind="{_label(kind)}",name="{_label(name)}"}} {values[key]:g}')
+    return "\n".join(lines) + "\n"
+
+
+def start_prometheus_server(telemetry: Telemetry, port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Отдавать метрики на http://host:port/metrics из фонового потока"""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.rstrip("/") != "/metrics":
+                self.send_error(404)
+                return
+            body = render_prometheus(telemetry).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: Any) -> None:  # noqa: ANN401
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="telemetry-prometheus", daemon=True).start()
+    return server
+
+
+def otel_exporter() -> Callable[[Span], None] | None:
+    """Экспортер спанов в OpenTelemetry или None, если opentelemetry не установлен"""
+    try:
+        from opentelemetry import trace
+    except ImportError:
+        return None
+
+    tracer = trace.get_tracer("finam-assistant")
+
+    def export(s: Span) -> None:
+        start_ns = int(s.started_at * 1e9)
+        attributes = {
+            "kind": s.kind,
+            "tokens.prompt": s.prompt_tokens,
+            "tokens.completion": s.completion_tokens,
+            "cost": s.cost,
+            "cache_hit": s.cache_hit,
+            "cache.saved": s.saved,
+            **{k: v for k, v in s.attributes.items() if isinstance(v, (str, int, float, bool))},
+        }
+        otel_span = tracer.start_span(f"{s.kind} {s.name}", start_time=start_ns, attributes=attributes)
+        if s.status != "ok":
+            otel_span.set_status(trace.Status(trace.StatusCode.ERROR))
+        otel_span.end(end_time=start_ns + int(s.duration * 1e9))
+
+    return export
+
+
+@lru_cache
+def get_telemetry() -> Telemetry:
+    """Общий экземпляр телеметрии процесса; экспортеры подключаются по переменным окружения"""
+    telemetry = Telemetry(int(os.getenv("TELEMETRY_BUFFER_SIZE", DEFAULT_BUFFER_SIZE)))
+    port = os.getenv("TELEMETRY_PROMETHEUS_PORT")
+    if port:
+        start_prometheus_server(telemetry, int(port))
+    if os.getenv("TELEMETRY_OTEL", "").lower() in {"1", "true", "yes"}:
+        export = otel_exporter()
+        if export is not None:
+            telemetry.add_exporter(export)
+    return telemetry
+
+
+# Запросы FinamAPIClient измеряются спанами kind="finam"; адаптер о телеметрии не знает
+set_request_observer(lambda name: span("finam", name))
@@ -0,0 +1,432 @@
+"""
+Разбор относительных дат и периодов в вопросе до вызова LLM
+
+"за последнюю неделю", "с начала квартала", "в августе 2025", "last 3 days" -
+для get_candles, get_trades и get_transactions модель должна сама посчитать
+interval.start_time / interval.end_time: лишние токены рассуждений, шаги агента
+и ошибки в датах. resolve_period() детерминированно переводит русские и
+английские выражения в интервал UTC относительно текущего момента,
+infer_timeframe() подбирает таймфрейм свечей по длине интервала.
+
+Соглашения совпадают с train.csv:
+- "вчера", "сегодня", конкретная дата - сутки 00:00:00 - 23:59:59;
+- "прошлая/последняя неделя", "прошлый месяц", "прошлый год" - предыдущий
+  календарный период целиком;
+- "последний квартал" - текущий квартал целиком; "этот месяц", "с начала
+  года" и т.п. - от начала периода до конца сегодняшнего дня;
+- "последние N дней/недель/месяцев/лет", "последний год" - от той же даты N
+  периодов назад до конца сегодняшнего дня; минуты и часы - от now - N до now.
+
+Текущий момент - datetime.now(UTC) или REFERENCE_DATE из окружения
+(YYYY-MM-DD или ISO 8601), чтобы воспроизводить ответы на фиксированном наборе
+вопросов (train.csv собран на 2025-09-29).
+"""
+
+import os
+import re
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import UTC, date, datetime, time, timedelta
+
+ISO_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+# "За все время" в train.csv начинается с 2014 года
+ALL_TIME_START = date(2014, 1, 1)
+
+# Таймфрейм по длине интервала: самый мелкий, при котором баров не больше ~500
+TIMEFRAME_BY_SPAN: tuple[tuple[timedelta, str], ...] = (
+    (timedelta(hours=6), "TIME_FRAME_M1"),
+    (timedelta(days=1), "TIME_FRAME_M5"),
+    (timedelta(days=5), "TIME_FRAME_M15"),
+    (timedelta(days=20), "TIME_FRAME_H1"),
+    (timedelta(days=80), "TIME_FRAME_H4"),
+    (timedelta(days=500), "TIME_FRAME_D"),
+    (timedelta(days=3650), "TIME_FRAME_W"),
+)
+
+MONTHS: dict[str, int] = {
+    "январ": 1,
+    "феврал": 2,
+    "март": 3,
+    "апрел": 4,
+    "ма": 5,
+    "июн": 6,
+    "июл": 7,
+    "август": 8,
+    "сентябр": 9,
+    "октябр": 10,
+    "ноябр": 11,
+    "декабр": 12,
+    "january": 1,
+    "february": 2,
+    "march": 3,
+    "april": 4,
+    "may": 5,
+    "june": 6,
+    "july": 7,
+    "august": 8,
+    "september": 9,
+    "october": 10,
+    "november": 11,
+    "december": 12,
+}
+ORDINALS: dict[str, int] = {
+    "перв": 1,
+    "втор": 2,
+    "трет": 3,
+    "четверт": 4,
+    "first": 1,
+    "second": 2,
+    "third": 3,
+    "fourth": 4,
+}
+
+_MONTH = (
+    r"(январ|феврал|март|апрел|ма(?=[йяе]\b)|июн|июл|август|сентябр|октябр|ноябр|декабр)[а-я]*|"
+    r"(january|february|march|april|may(?=\s+(?:19|20)\d{2})|june|july|august|september|october|november|december)"
+)
+_YEAR = r"((?:19|20)\d{2})"
+_DATE = rf"(\d{{4}}-\d{{2}}-\d{{2}}|\d{{1,2}}\.\d{{1,2}}\.\d{{4}}|\d{{1,2}}\s+(?:{_MONTH})(?:\s+{_YEAR})?)"
+_UNIT = r"(минут|мин|час|дн|ден|сут|недел|месяц|мес|год|лет|minute|min|hour|day|week|month|year)[a-zа-я]*"
+_NUMBER = (
+    r"(\d+|двадцат|тридцат|одн|один|два|две|три|четыре|пять|шесть|семь|десять|"
+    r"one|two|three|four|five|six|seven|ten)[а-я]*"
+)
+NUMBER_WORDS: dict[str, int] = {
+    "двадцат": 20,
+    "тридцат": 30,
+    "одн": 1,
+    "один": 1,
+    "два": 2,
+    "две": 2,
+    "три": 3,
+    "четыре": 4,
+    "пять": 5,
+    "шесть": 6,
+    "семь": 7,
+    "десять": 10,
+    "one": 1,
+    "two": 2,
+    "three": 3,
+    "four": 4,
+    "five": 5,
+    "six": 6,
+    "seven": 7,
+    "ten": 10,
+}
+
+
+@dataclass(frozen=True)
+class Period:
+    """Интервал из вопроса и выражение, из которого он получен"""
+
+    start: datetime
+    end: datetime
+    text: str
+    position: tuple[int, int]
+
+    @property
+    def start_iso(self) -> str:
+        return self.start.strftime(ISO_FORMAT)
+
+    @property
+    def end_iso(self) -> str:
+        return self.end.strftime(ISO_FORMAT)
+
+    @property
+    def timeframe(self) -> str:
+        return infer_timeframe(self.start, self.end)
+
+
+def reference_now() -> datetime:
+    """Текущий момент: REFERENCE_DATE из окружения или datetime.now(UTC)"""
+    value = os.getenv("REFERENCE_DATE")
+    if not value:
+        return datetime.now(UTC)
+    parsed = parse_iso(value)
+    if len(value) <= 10:
+        # Только дата: полдень, чтобы "последний час" не уходил в предыдущие сутки
+        parsed = parsed.replace(hour=12)
+    return parsed
+
+
+def parse_iso(value: str) -> datetime:
+    """ISO 8601 ("2025-09-22T00:00:00Z") в datetime с часовым поясом (UTC по умолчанию)"""
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=UTC)
+
+
+def infer_timeframe(start: datetime, end: datetime) -> str:
+    """Таймфрейм свечей для интервала (TIME_FRAME_M1 ... TIME_FRAME_MN)"""
+    span = end - start
+    for limit, timeframe in TIMEFRAME_BY_SPAN:
+        if span <= limit:
+            return timeframe
+    return "TIME_FRAME_MN"
+
+
+def _day_start(day: date) -> datetime:
+    return datetime.combine(day, time.min, tzinfo=UTC)
+
+
+def _day_end(day: date) -> datetime:
+    return datetime.combine(day, time(23, 59, 59), tzinfo=UTC)
+
+
+def _days(first: date, last: date) -> tuple[datetime, datetime]:
+    return _day_start(first), _day_end(last)
+
+
+def _add_months(day: date, months: int) -> date:
+    index = day.year * 12 + day.month - 1 + months
+    year, month = divmod(index, 12)
+    month += 1
+    last = (date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)).day
+    return date(year, month, min(day.day, last))
+
+
+def _month(year: int, month: int) -> tuple[date, date]:
+    first = date(year, month, 1)
+    return first, _add_months(first, 1) - timedelta(days=1)
+
+
+def _quarter(year: int, quarter: int) -> tuple[date, date]:
+    first = date(year, 3 * (quarter - 1) + 1, 1)
+    return first, _add_months(first, 3) - timedelta(days=1)
+
+
+def _month_number(match: re.Match[str], group: int) -> int:
+    name = (match.group(group) or match.group(group + 1)).lower()
+    return next(number for prefix, number in MONTHS.items() if name.startswith(prefix))
+
+
+def _past_year(year: str | None, month: int, today: date) -> int:
+    """Год без явного указания: последний, в котором месяц уже наступил"""
+    if year:
+        return int(year)
+    return today.year if month <= today.month else today.year - 1
+
+
+def _parse_date(value: str, today: date) -> date | None:
+    value = value.strip().lower()
+    try:
+        if re.fullmatch(r"\d{4}-\d{2}-\d{2}", value):
+            return date.fromisoformat(value)
+        if match := re.fullmatch(r"(\d{1,2})\.(\d{1,2})\.(\d{4})", value):
+            return date(int(match.group(3)), int(match.group(2)), int(match.group(1)))
+        if match := re.fullmatch(rf"(\d{{1,2}})\s+(?:{_MONTH})(?:\s+{_YEAR})?", value):
+            month = _month_number(match, 2)
+            return date(_past_year(match.group(4), month, today), month, int(match.group(1)))
+    except ValueError:
+        return None
+    return None
+
+
+def _number(value: str) -> int:
+    value = value.lower()
+    if value.isdigit():
+        return int(value)
+    return next(number for prefix, number in NUMBER_WORDS.items() if value.startswith(prefix))
+
+
+def _last_units(count: int, unit: str, now: datetime) -> tuple[datetime, datetime]:
+    """Последние count единиц: минуты и часы - от now, остальное - целыми днями"""
+    unit = unit.lower()
+    today = now.date()
+    if unit.startswith(("мин", "min")):
+        return now - timedelta(minutes=count), now
+    if unit.startswith(("час", "hour")):
+        return now - timedelta(hours=count), now
+    if unit.startswith(("сут",)):
+        return now - timedelta(days=count), now
+    if unit.startswith(("дн", "ден", "day")):
+        return _days(today - timedelta(days=count), today)
+    if unit.startswith(("недел", "week")):
+        return _days(today - timedelta(weeks=count), today)
+    if unit.startswith(("мес", "month")):
+        return _days(_add_months(today, -count), today)
+    return _days(_add_months(today, -12 * count), today)
+
+
+def _since_start(unit: str, now: datetime) -> tuple[datetime, datetime]:
+    today = now.date()
+    if unit.startswith(("недел", "week")):
+        first = today - timedelta(days=today.weekday())
+    elif unit.startswith(("мес", "month")):
+        first = today.replace(day=1)
+    elif unit.startswith(("квартал", "quarter")):
+        first = _quarter(today.year, (today.month - 1) // 3 + 1)[0]
+    else:
+        first = today.replace(month=1, day=1)
+    return _days(first, today)
+
+
+def _previous(unit: str, now: datetime) -> tuple[datetime, datetime]:
+    today = now.date()
+    if unit.startswith(("недел", "week")):
+        monday = today - timedelta(days=today.weekday() + 7)
+        return _days(monday, monday + timedelta(days=6))
+    if unit.startswith(("мес", "month")):
+        first = _add_months(today.replace(day=1), -1)
+        return _days(*_month(first.year, first.month))
+    if unit.startswith(("квартал", "quarter")):
+        quarter = (today.month - 1) // 3
+        return _days(*(_quarter(today.year, quarter) if quarter else _quarter(today.year - 1, 4)))
+    return _days(date(today.year - 1, 1, 1), date(today.year - 1, 12, 31))
+
+
+Resolver = Callable[[re.Match[str], datetime], tuple[datetime, datetime] | None]
+
+
+def _explicit_range(match: re.Match[str], now: datetime) -> tuple[datetime, datetime] | None:
+    # В _DATE четыре группы: вторая дата - пятая группа
+    first, last = _parse_date(match.group(1), now.date()), _parse_date(match.group(5), now.date())
+    if first is None or last is None or last < first:
+        return None
+    return _days(first, last)
+
+
+def _day_range(match: re.Match[str], now: datetime) -> tuple[datetime, datetime] | None:
+    month = _month_number(match, 3)
+    year = _past_year(match.group(5), month, now.date())
+    try:
+        return _days(date(year, month, int(match.group(1))), date(year, month, int(match.group(2))))
+    except ValueError:
+        return None
+
+
+def _single_date(match: re.Match[str], now: datetime) -> tuple[datetime, datetime] | None:
+    day = _parse_date(match.group(1), now.date())
+    return _days(day, day) if day else None
+
+
+def _quarter_of_year(match: re.Match[str], now: datetime) -> tuple[datetime, datetime]:
+    quarter = int(match.group(1)) if match.group(1).isdigit() else ORDINALS[match.group(1).lower()]
+    year = match.group(2)
+    if year is None:
+        current = (now.month - 1) // 3 + 1
+        year = now.year if quarter <= current else now.year - 1
+    return _days(*_quarter(int(year), quarter))
+
+
+def _month_of_year(match: re.Match[str], now: datetime) -> tuple[datetime, datetime]:
+    month = _month_number(match, 1)
+    return _days(*_month(_past_year(match.group(3), month, now.date()), month))
+
+
+def _year(match: re.Match[str], _now: datetime) -> tuple[datetime, datetime]:
+    year = int(match.group(1) or match.group(2))
+    return _days(date(year, 1, 1), date(year, 12, 31))
+
+
+def _relative_day(offset: int) -> Resolver:
+    return lambda _m, now: _days(now.date() - timedelta(days=offset), now.date() - timedelta(days=offset))
+
+
+# (выражение по тексту в нижнем регистре, разбор); побеждает самое раннее совпадение,
+# при одинаковом начале - правило выше по списку. "ё" в тексте заменяется на "е"
+PERIOD_RULES: tuple[tuple[str, Resolver], ...] = (
+    (rf"(?:с|между|from|between)\s+{_DATE}\s+(?:по|до|и|to|and|-|—)\s+{_DATE}", _explicit_range),
+    (rf"(?:с\s+)?(\d{{1,2}})\s*(?:по|-|—)\s*(\d{{1,2}})\s+(?:{_MONTH})(?:\s+{_YEAR})?", _day_range),
+    (_DATE, _single_date),
+    (r"(?:за\s+)?все\s+время|all[\s-]time|since inception", lambda _m, now: _days(ALL_TIME_START, now.date())),
+    (
+        rf"с\s+начала\s+{_YEAR}|since the start of {_YEAR}",
+        lambda m, now: _days(date(int(m.group(1) or m.group(2)), 1, 1), now.date()),
+    ),
+    (
+        r"с\s+начала\s+(недел|месяц|квартал|год)|since the start of the (week|month|quarter|year)",
+        lambda m, now: _since_start(m.group(1) or m.group(2), now),
+    ),
+    (r"\b(ytd|year to date)\b", lambda _m, now: _since_start("год", now)),
+    (rf"\bq([1-4])\b(?:\s*{_YEAR})?", _quarter_of_year),
+    (rf"\b([1-4]|перв|втор|трет|четверт)[-а-я]*\s+квартал[а-я]*(?:\s+{_YEAR})?", _quarter_of_year),
+    (rf"\b(first|second|third|fourth)\s+quarter(?:\s+(?:of\s+)?{_YEAR})?", _quarter_of_year),
+    (rf"\b(?:{_MONTH})(?:\s+{_YEAR})?", _month_of_year),
+    # Голое число - это чаще сумма или количество ("на 2000 рублей"), поэтому год нужен с "год"/"г."
+    # или в конце фразы после "за"/"in"/"for". Предлог входит в совпадение: иначе "за 2023 год"
+    # раньше перехватит правило "за N лет"
+    (
+        rf"(?:\b(?:за|в|во|in|for)\s+)?\b{_YEAR}\s*(?:год|г\b)[а-я]*"
+        rf"|\b(?:за|in|for|during)\s+{_YEAR}(?=\s*(?:[.,;:!?)]|$))",
+        _year,
+    ),
+    (r"\bпозавчера\b|day before yesterday", _relative_day(2)),
+    (r"\bвчера\b|yesterday", _relative_day(1)),
+    (r"\bсегодня|\btoday\b", _relative_day(0)),
+    (
+        rf"(?:последн[а-я]*|прошедш[а-я]*|за|last|past)\s+{_NUMBER}\s+{_UNIT}",
+        lambda m, now: _last_units(_number(m.group(1)), m.group(2), now),
+    ),
+    (
+        r"(?:последн|прошедш)[а-я]*\s+(минут|час|сутк|сут)|(?:last|past)\s+(minute|hour|24 hours)",
+        lambda m, now: _last_units(1, m.group(1) or m.group(2), now),
+    ),
+    (
+        r"(?:последн|прошедш)[а-я]*\s+(месяц|год)|(?:past|last 12)\s+(month|year)",
+        lambda m, now: _last_units(1, m.group(1) or m.group(2), now),
+    ),
+    (r"(?:последн|прошл)[а-я]*\s+недел|(?:last|previous)\s+week", lambda _m, now: _previous("недел", now)),
+    (
+        r"прошл[а-я]*\s+(месяц|квартал|год)|(?:last|previous)\s+(month|quarter|year)",
+        lambda m, now: _previous(m.group(1) or m.group(2), now),
+    ),
+    (r"последн[а-я]*\s+квартал", lambda _m, now: _days(*_quarter(now.year, (now.month - 1) // 3 + 1))),
+    (
+        r"(?:эт|текущ|нынешн)[а-я]*\s+(недел|месяц|квартал|год)|this\s+(week|month|quarter|year)",
+        lambda m, now: _since_start(m.group(1) or m.group(2), now),
+    ),
+)
+
+_COMPILED_RULES = tuple((re.compile(pattern), resolver) for pattern, resolver in PERIOD_RULES)
+
+
+def _inside_identifier(text: str, match: re.Match[str]) -> bool:
+    """Цифры совпадения продолжают идентификатор: ORD-2025-01-01, ACC2024, 2025-09-01_v2"""
+    start, end = match.span()
+    before, after = text[max(start - 1, 0) : start], text[end : end + 1]
+    return (text[start].isdigit() and _glued(before)) or (text[end - 1].isdigit() and _glued(after))
+
+
+def _glued(char: str) -> bool:
+    return char.isalnum() or (char != "" and char in "-_@/")
+
+
+def resolve_period(text: str, now: datetime | None = None) -> Period | None:
+    """
+    Найти в тексте период и перевести его в интервал UTC
+
+    Args:
+        now: Текущий момент (по умолчанию reference_now())
+
+    Returns:
+        Period или None, если в тексте нет распознанного периода
+    """
+    now = now or reference_now()
+    lowered = text.lower().replace("ё", "е")
+    best: Period | None = None
+    for pattern, resolver in _COMPILED_RULES:
+        match = next((m for m in pattern.finditer(lowered) if not _inside_identifier(lowered, m)), None)
+        if match is None or (best is not None and match.start() >= best.position[0]):
+            continue
+        interval = resolver(match, now)
+        if interval is not None:
+            # Выражения заканчиваются на основе слова ("последнюю недел"): берем слово целиком
+            end = match.end()
+            while end < len(lowered) and lowered[end].isalpha():
+                end += 1
+            best = Period(*interval, text[match.start() : end], (match.start(), end))
+    return best
+
+
+def annotate_period(text: str, now: datetime | None = None) -> str:
+    """
+    Дописать интервал после выражения периода
+
+    "свечи за прошлую неделю" -> "свечи за прошлую неделю
+    (2025-09-22T00:00:00Z - 2025-09-28T23:59:59Z)".
+    """
+    period = resolve_period(text, now)
+    if period is None:
+        return text
+    end = period.position[1]
+    return f"{text[:end]} ({period.start_iso} - {period.end_iso}){text[end:]}"
@@ -0,0 +1,442 @@
+"""
+Распознавание упоминаний инструментов в вопросе до вызова LLM
+
+Вопросы чаще называют компанию ("Сбербанка", "по Газпрому", "фьючерс на
+нефть"), чем тикер. Агент тратил на это целый шаг с find_asset_name, а rule
+matcher и intent router без тикера отдавали вопрос агентам.
+
+TickerResolver - автомат Ахо-Корасик над словами вопроса: словарь названий
+(встроенный COMPANY_ALIASES, его транслитерация, тикеры и, если передан,
+каталог /v1/assets) строится один раз, вопрос проходится за один проход по
+словам. Слова приводятся к основе легким стеммингом (отбрасывается
+падежное окончание), поэтому "Сбербанк", "Сбербанка" и "Сбербанку" совпадают с
+одним шаблоном. Из пересекающихся совпадений берется самое длинное
+("Газпром нефть", а не "Газпром"). Тикеры без рынка ("SBER") совпадают только
+в исходном регистре.
+
+Названия, совпадающие с обычными словами (AMBIGUOUS_ALIASES: "какой магнит
+лучше", "на полюсе"), считаются упоминанием компании только с заглавной буквы
+или рядом со словом об инструменте ("акции магнита", "сколько стоит озон").
+
+Коды фьючерсов меняются при каждой экспирации, поэтому FUTURES_ALIASES задает
+названия для базового кода ("RI", "Si"), а контракт - ближайший неистекший из
+каталога /v1/assets. Без каталога названия фьючерсов не распознаются.
+
+annotate() дописывает символ после упоминания: "акций Сбербанка (SBER@MISX)" -
+дальше его видят LLM, правила и регулярные выражения SYMBOL_RE.
+"""
+
+import re
+from collections import deque
+from collections.abc import Iterable
+from dataclasses import dataclass
+from datetime import date
+from functools import lru_cache
+from itertools import product
+from typing import Any
+
+from .temporal import reference_now
+
+# Символ с рынком - одно слово, которое не совпадает ни с одним шаблоном
+TOKEN_RE = re.compile(r"[A-Za-z][\w.\-]*@[A-Z]{3,6}|\w+")
+
+# Падежные окончания (длинные раньше коротких) и минимальная длина основы
+ENDINGS = tuple(
+    sorted(
+        (
+            "ами",
+            "ями",
+            "ого",
+            "его",
+            "ому",
+            "ему",
+            "ыми",
+            "ими",
+            "ой",
+            "ей",
+            "ом",
+            "ем",
+            "ам",
+            "ям",
+            "ах",
+            "ях",
+            "ов",
+            "ев",
+            "ую",
+            "юю",
+            "ая",
+            "яя",
+            "ое",
+            "ее",
+            "ые",
+            "ие",
+            "ый",
+            "ий",
+            "а",
+            "я",
+            "у",
+            "ю",
+            "е",
+            "ы",
+            "и",
+            "о",
+            "ь",
+            "й",
+        ),
+        key=len,
+        reverse=True,
+    )
+)
+MIN_STEM = 3
+
+COMPANY_ALIASES: dict[str, tuple[str, ...]] = {
+    "SBER@MISX": ("сбербанк", "сбер", "sberbank"),
+    "GAZP@MISX": ("газпром", "gazprom"),
+    "LKOH@MISX": ("лукойл", "lukoil"),
+    "ROSN@MISX": ("роснефть", "rosneft"),
+    "GMKN@MISX": ("норникель", "норильский никель", "nornickel"),
+    "NVTK@MISX": ("новатэк", "новатек", "novatek"),
+    "SNGS@MISX": ("сургутнефтегаз", "surgutneftegas"),
+    "SIBN@MISX": ("газпром нефть", "газпромнефть"),
+    "TATN@MISX": ("татнефть", "tatneft"),
+    "TRNFP@MISX": ("транснефть", "transneft"),
+    "YNDX@MISX": ("яндекс", "yandex"),
+    "VTBR@MISX": ("втб", "vtb"),
+    "MOEX@MISX": ("мосбиржа", "московская биржа", "moscow exchange"),
+    "MGNT@MISX": ("магнит", "magnit"),
+    "MTSS@MISX": ("мтс",),
+    "AFLT@MISX": ("аэрофлот", "aeroflot"),
+    "PLZL@MISX": ("полюс", "полюс золото", "polyus"),
+    "ALRS@MISX": ("алроса", "alrosa"),
+    "CHMF@MISX": ("северсталь", "severstal"),
+    "NLMK@MISX": ("нлмк", "новолипецкий металлургический комбинат"),
+    "MAGN@MISX": ("ммк", "магнитогорский металлургический комбинат"),
+    "MTLR@MISX": ("мечел", "mechel"),
+    "PHOR@MISX": ("фосагро", "phosagro"),
+    "HYDR@MISX": ("русгидро", "rushydro"),
+    "RTKM@MISX": ("ростелеком", "rostelecom"),
+    "IRAO@MISX": ("интер рао",),
+    "AFKS@MISX": ("афк система",),
+    "OZON@MISX": ("озон", "ozon"),
+    "AAPL@XNGS": ("apple", "эппл", "эпл"),
+    "TSLA@XNGS": ("tesla", "тесла"),
+    "MSFT@XNGS": ("microsoft", "майкрософт"),
+    "NVDA@XNGS": ("nvidia", "нвидиа"),
+    "AMZN@XNGS": ("amazon", "амазон"),
+}
+
+# Названия-существительные: совпадают только с заглавной буквы или рядом со словом об инструменте
+AMBIGUOUS_ALIASES = frozenset({"магнит", "полюс", "озон"})
+# Слова об инструменте (основы и начала основ) и сколько слов по обе стороны названия проверяется
+INSTRUMENT_STEMS = frozenset({"цен", "курс"})
+INSTRUMENT_PREFIXES = (
+    "акци",
+    "бумаг",
+    "компани",
+    "тикер",
+    "котиров",
+    "стоимост",
+    "стоит",
+    "свеч",
+    "стакан",
+    "дивиденд",
+    "капитализ",
+    "эмитент",
+    "инструмент",
+    "сделк",
+    "торг",
+    "лент",
+)
+CONTEXT_WINDOW = 3
+
+# Фьючерсы по базовому коду контракта; символ - ближайший контракт из каталога /v1/assets
+FUTURES_ALIASES: dict[str, tuple[str, ...]] = {
+    "RI": ("фьючерс на индекс ртс", "фьючерс на ртс", "фьючерс ртс"),
+    "Si": ("фьючерс si", "фьючерс на доллар", "фьючерс на доллар рубль"),
+    "CR": ("фьючерс на юань", "фьючерс cny"),
+    "BR": ("фьючерс на нефть", "фьючерс на brent", "фьючерс на нефть brent"),
+    "GD": ("фьючерс на золото",),
+    "SV": ("фьючерс на серебро",),
+    "NG": ("фьючерс на газ", "фьючерс на природный газ"),
+}
+# Код месяца исполнения в коротком коде контракта (RIZ5 - декабрь 2025)
+MONTH_CODES = "FGHJKMNQUVXZ"
+FUTURES_CODE_RE = re.compile(
+    rf"^(?P<base>[A-Za-z]{{2}})(?:(?P<letter>[{MONTH_CODES}])(?P<digit>\d)|-(?P<month>\d{{1,2}})\.(?P<year>\d{{2}}))$"
+)
+
+
+@lru_cache(maxsize=65536)
+def stem(word: str) -> str:
+    """Основа слова: нижний регистр, е вместо ё, без падежного окончания (только кириллица)"""
+    word = word.lower().replace("ё", "е")
+    if word.isascii():
+        return word
+    for ending in ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM:
+            return word[: -len(ending)]
+    return word
+
+
+def is_instrument_word(word: str) -> bool:
+    """Слово об инструменте: "акции", "котировки", "цена" и т.п."""
+    key = stem(word)
+    return key in INSTRUMENT_STEMS or key.startswith(INSTRUMENT_PREFIXES)
+
+
+def contract_month(ticker: str, today: date) -> tuple[str, int, int] | None:
+    """
+    Базовый код, год и месяц исполнения фьючерса по короткому коду
+
+    "RIZ5" -> ("RI", 2025, 12), "BR-10.25" -> ("BR", 2025, 10). Год по одной
+    цифре берется ближайший, не раньше текущего; None, если это не код фьючерса.
+    """
+    match = FUTURES_CODE_RE.match(ticker)
+    if match is None:
+        return None
+    if match.group("letter"):
+        month = MONTH_CODES.index(match.group("letter")) + 1
+        year = today.year - today.year % 10 + int(match.group("digit"))
+        if year < today.year:
+            year += 10
+    else:
+        month, year = int(match.group("month")), 2000 + int(match.group("year"))
+        if not 1 <= month <= 12:
+            return None
+    return match.group("base"), year, month
+
+
+def front_month_futures(assets: Iterable[dict[str, Any]], today: date | None = None) -> dict[str, str]:
+    """
+    Ближайшие контракты на базы FUTURES_ALIASES из каталога /v1/assets
+
+    Returns:
+        {базовый код: символ} для контрактов с месяцем исполнения не раньше текущего
+    """
+    today = today or reference_now().date()
+    nearest: dict[str, tuple[tuple[int, int], str]] = {}
+    for asset in assets:
+        symbol = asset.get("symbol") or ""
+        if "@" not in symbol:
+            continue
+        parsed = contract_month(asset.get("ticker") or symbol.split("@")[0], today)
+        if parsed is None or parsed[0] not in FUTURES_ALIASES:
+            continue
+        base, year, month = parsed
+        if (year, month) < (today.year, today.month):
+            continue
+        if base not in nearest or (year, month) < nearest[base][0]:
+            nearest[base] = ((year, month), symbol)
+    return {base: symbol for base, (_, symbol) in nearest.items()}
+
+
+def transliterations(alias: str) -> set[str]:
+    """Латинское написание русского названия ("газпром" -> "gazprom")"""
+    if alias.isascii():
+        return set()
+    try:
+        from transliterate import translit
+
+        return {translit(alias, "ru", reversed=True).replace("'", "")}
+    except Exception:
+        return set()
+
+
+@dataclass(frozen=True)
+class TickerMention:
+    """Упоминание инструмента: символ и позиция в исходном тексте"""
+
+    symbol: str
+    text: str
+    start: int
+    end: int
+
+
+@dataclass(frozen=True)
+class _Pattern:
+    symbol: str
+    length: int  # Число слов
+    exact: tuple[str, ...] | None  # Слова в исходном регистре (тикеры)
+    ambiguous: bool = False  # Название-существительное из AMBIGUOUS_ALIASES
+
+
+class TickerResolver:
+    """Автомат Ахо-Корасик по словам над названиями и тикерами инструментов"""
+
+    def __init__(
+        self,
+        aliases: Iterable[tuple[str, str]],
+        tickers: Iterable[tuple[str, str]] = (),
+        ambiguous: Iterable[str] = AMBIGUOUS_ALIASES,
+    ) -> None:
+        """
+        Args:
+            aliases: Пары (название, символ); совпадают по основам слов без учета регистра
+            tickers: Пары (тикер, символ); совпадают только в исходном регистре
+            ambiguous: Названия, которым нужна заглавная буква или слово об инструменте рядом
+
+        При повторе названия побеждает первая пара.
+        """
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[list[_Pattern]] = [[]]
+        self._seen: set[tuple[tuple[str, ...], bool]] = set()
+        self._ambiguous = {alias.lower().replace("ё", "е") for alias in ambiguous}
+        self.size = 0
+        for alias, symbol in aliases:
+            self._add([m.group() for m in TOKEN_RE.finditer(alias)], symbol, exact=False)
+        for ticker, symbol in tickers:
+            self._add([m.group() for m in TOKEN_RE.finditer(ticker)], symbol, exact=True)
+        self._link()
+
+    @classmethod
+    def from_aliases(
+        cls,
+        table: dict[str, tuple[str, ...]] | None = None,
+        assets: Iterable[dict[str, Any]] = (),
+        today: date | None = None,
+    ) -> "TickerResolver":
+        """
+        Построить автомат по словарю {символ: названия} и каталогу активов
+
+        Args:
+            table: Словарь названий; по умолчанию COMPANY_ALIASES и FUTURES_ALIASES
+                для ближайших контрактов из каталога
+            assets: Элементы ответа /v1/assets ({"symbol", "name", ...}); словарь важнее каталога
+            today: Дата для выбора ближайших фьючерсов (по умолчанию reference_now())
+        """
+        assets = list(assets)
+        if table is None:
+            futures = front_month_futures(assets, today)
+            table = {**COMPANY_ALIASES, **{futures[base]: FUTURES_ALIASES[base] for base in futures}}
+        aliases = []
+        tickers = []
+        for symbol, names in table.items():
+            for name in names:
+                aliases.append((name, symbol))
+                aliases.extend((variant, symbol) for variant in transliterations(name))
+            tickers.append((symbol.split("@")[0], symbol))
+        for asset in assets:
+            symbol = asset.get("symbol") or ""
+            if "@" not in symbol:
+                continue
+            if asset.get("name"):
+                aliases.append((asset["name"], symbol))
+            tickers.append((asset.get("ticker") or symbol.split("@")[0], symbol))
+        return cls(aliases, tickers)
+
+    def _add(self, words: list[str], symbol: str, exact: bool) -> None:
+        # Начальная форма сама может кончаться на "окончание" ("газпр-ом"): слово
+        # названия добавляется и основой, и целиком, чтобы совпали все падежи
+        variants = [{stem(w)} if exact else {stem(w), w.lower().replace("ё", "е")} for w in words]
+        ambiguous = not exact and " ".join(w.lower().replace("ё", "е") for w in words) in self._ambiguous
+        for keys in product(*variants):
+            if not keys or (keys, exact) in self._seen:
+                continue
+            self._seen.add((keys, exact))
+            state = 0
+            for key in keys:
+                nxt = self._goto[state].get(key)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][key] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = nxt
+            self._out[state].append(_Pattern(symbol, len(keys), tuple(words) if exact else None, ambiguous))
+            self.size += 1
+
+    def _link(self) -> None:
+        # Суффиксные ссылки обходом в ширину; выходы состояния дополняются выходами по ссылке
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for key, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and key not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(key, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find(self, text: str) -> list[TickerMention]:
+        """
+        Непересекающиеся упоминания инструментов в порядке появления
+
+        Из пересекающихся совпадений берется начинающееся раньше, при равном
+        начале - самое длинное.
+        """
+        tokens = list(TOKEN_RE.finditer(text))
+        candidates: list[tuple[int, int, str]] = []
+        state = 0
+        for i, token in enumerate(tokens):
+            key = stem(token.group())
+            while state and key not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(key, 0)
+            for pattern in self._out[state]:
+                first = i - pattern.length + 1
+                if pattern.exact is not None and tuple(t.group() for t in tokens[first : i + 1]) != pattern.exact:
+                    continue
+                # "фьючерс на нефть BRZ5@FORTS": символ уже указан сразу после названия
+                if i + 1 < len(tokens) and "@" in tokens[i + 1].group():
+                    continue
+                if pattern.ambiguous and not self._company_context(tokens, first, i):
+                    continue
+                candidates.append((first, i, pattern.symbol))
+
+        mentions = []
+        last = -1
+        for first, i, symbol in sorted(candidates, key=lambda c: (c[0], c[0] - c[1])):
+            if first <= last:
+                continue
+            start, end = tokens[first].start(), tokens[i].end()
+            mentions.append(TickerMention(symbol, text[start:end], start, end))
+            last = i
+        return mentions
+
+    @staticmethod
+    def _company_context(tokens: list[re.Match[str]], first: int, last: int) -> bool:
+        # "Магнит", "акции магнита", но не "какой магнит лучше"
+        if tokens[first].group()[:1].isupper():
+            return True
+        nearby = tokens[max(0, first - CONTEXT_WINDOW) : first] + tokens[last + 1 : last + 1 + CONTEXT_WINDOW]
+        return any(is_instrument_word(token.group()) for token in nearby)
+
+    def resolve(self, text: str) -> list[str]:
+        """Символы упомянутых инструментов без повторов"""
+        return list(dict.fromkeys(m.symbol for m in self.find(text)))
+
+    def annotate(self, text: str) -> str:
+        """
+        Дописать символ после каждого упоминания инструмента
+
+        "Что по Газпрому?" -> "Что по Газпрому (GAZP@MISX)?". Символы, которые
+        уже есть в тексте, не дописываются.
+        """
+        parts = []
+        position = 0
+        added: set[str] = set()
+        for mention in self.find(text):
+            if mention.symbol in text or mention.symbol in added:
+                continue
+            added.add(mention.symbol)
+            parts.append(text[position : mention.end])
+            parts.append(f" ({mention.symbol})")
+            position = mention.end
+        if not parts:
+            return text
+        return "".join(parts) + text[position:]
+
+
+@lru_cache
+def get_resolver() -> TickerResolver:
+    """Автомат по встроенному словарю (строится один раз на процесс)"""
+    return TickerResolver.from_aliases()
+
+
+def annotate_question(question: str, resolver: TickerResolver | None = None) -> str:
+    """Вопрос с символами упомянутых инструментов (resolver по умолчанию - get_resolver())"""
+    return (resolver or get_resolver()).annotate(question)
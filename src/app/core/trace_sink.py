@@ -0,0 +1,163 @@
+"""
+Журнал шагов агентов (трейсы) без записи на диск в ходе диалога
+
+Раньше чат после каждого ответа агента синхронно писал response.steps с
+indent=2 в smolagents_response.json в текущей директории: блокирующий ввод-вывод
+во время хода, растущий с числом шагов, и общий файл для всех сессий.
+
+TraceSink.write() только кладет запись в очередь; фоновый поток сериализует
+записи в JSON и дописывает их строками в сжатый файл своей сессии
+<TRACE_DIR>/<session>.jsonl.gz (каждая пачка - отдельный gzip member, файл
+читается gzip.open целиком). Когда файл превышает TRACE_MAX_BYTES, он
+переименовывается в <session>.1.jsonl.gz (старые сдвигаются, хранится
+TRACE_BACKUPS штук), как в logging.handlers.RotatingFileHandler.
+
+Очередь ограничена: при переполнении записи отбрасываются (счетчик dropped),
+ход диалога не ждет диска. TRACE_ENABLED=false отключает журнал.
+"""
+
+import atexit
+import gzip
+import json
+import os
+import queue
+import re
+import threading
+import time
+from collections import defaultdict
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+
+DEFAULT_DIR = "data/traces"
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024
+DEFAULT_BACKUPS = 5
+DEFAULT_QUEUE_SIZE = 1000
+
+_SESSION_RE = re.compile(r"[^\w-]+")
+
+
+class TraceSink:
+    """Фоновая запись трейсов по сессиям в сжатые JSONL файлы с ротацией"""
+
+    def __init__(
+        self,
+        directory: str | Path = DEFAULT_DIR,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        backups: int = DEFAULT_BACKUPS,
+        enabled: bool = True,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+    ) -> None:
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.enabled = enabled
+        self.dropped = 0
+        self.written = 0
+        self._queue: queue.Queue[Any] = queue.Queue(maxsize=queue_size)
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def write(self, session: str, record: dict[str, Any]) -> bool:
+        """
+        Поставить запись в очередь (не блокируется)
+
+        Запись сериализуется в потоке записи: после передачи ее нельзя менять.
+
+        Returns:
+            False, если журнал отключен или очередь переполнена
+        """
+        if not self.enabled:
+            return False
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait((session, {"ts": time.time(), "session": session, **record}))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def flush(self, timeout: float | None = None) -> None:
+        """Дождаться записи всего, что уже в очереди (тесты, завершение процесса)"""
+        if self._thread is None:
+            return
+        done = threading.Event()
+        self._queue.put((None, done))
+        done.wait(timeout)
+
+    def path(self, session: str, index: int = 0) -> Path:
+        """Файл сессии; index > 0 - архивы после ротации"""
+        name = _SESSION_RE.sub("_", session) or "default"
+        suffix = f".{index}" if index else ""
+        return self.directory / f"{name}{suffix}.jsonl.gz"
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="trace-sink", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            # Берем все, что накопилось: одна пачка - один gzip member на сессию
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            by_session: dict[str, list[str]] = defaultdict(list)
+            waiters = []
+            for session, record in batch:
+                if session is None:
+                    waiters.append(record)
+                else:
+                    by_session[session].append(json.dumps(record, ensure_ascii=False, default=str))
+            for session, lines in by_session.items():
+                try:
+                    self._append(session, lines)
+                    self.written += len(lines)
+                except OSError:
+                    self.dropped += len(lines)
+            for waiter in waiters:
+                waiter.set()
+
+    def _append(self, session: str, lines: list[str]) -> None:
+        path = self.path(session)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with gzip.open(path, "at", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        if path.stat().st_size >= self.max_bytes:
+            self._rotate(session)
+
+    def _rotate(self, session: str) -> None:
+        if self.backups <= 0:
+            self.path(session).unlink(missing_ok=True)
+            return
+        for index in range(self.backups - 1, 0, -1):
+            source = self.path(session, index)
+            if source.exists():
+                source.replace(self.path(session, index + 1))
+        self.path(session).replace(self.path(session, 1))
+
+
+def read_traces(path: str | Path) -> list[dict[str, Any]]:
+    """Прочитать записи из файла трейсов"""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+@lru_cache
+def get_trace_sink() -> TraceSink:
+    """Общий журнал процесса (TRACE_DIR, TRACE_MAX_BYTES, TRACE_BACKUPS, TRACE_ENABLED)"""
+    sink = TraceSink(
+        directory=os.getenv("TRACE_DIR", DEFAULT_DIR),
+        max_bytes=int(os.getenv("TRACE_MAX_BYTES", str(DEFAULT_MAX_BYTES))),
+        backups=int(os.getenv("TRACE_BACKUPS", str(DEFAULT_BACKUPS))),
+        enabled=os.getenv("TRACE_ENABLED", "true").lower() not in {"0", "false", "no"},
+    )
+    atexit.register(sink.flush, 5)
+    return sink
@@ -0,0 +1,495 @@
+#!/usr/bin/env python3
+"""
+HTTP / WebSocket сервис чата с AI ассистентом трейдера
+
+Streamlit и chat-cli выполняют LLM, агентов и запросы к Finam API в своем
+процессе. Сервис выносит это за API: сессии диалога, выполнение ответа в
+пуле фоновых задач (core/jobs.py) и потоковая выдача шагов агентов (SSE или
+WebSocket), так что интерфейсы становятся тонкими клиентами (chat-cli --server).
+
+    POST   /v1/sessions                 создать сессию ({"account_id": ...})
+    GET    /v1/sessions/{id}            история сессии
+    DELETE /v1/sessions/{id}            закрыть сессию и отменить ее задачи
+    POST   /v1/sessions/{id}/messages   вопрос -> задача ответа (202, {"job_id": ...})
+    GET    /v1/jobs/{id}                статус, шаги агентов и ответ
+    GET    /v1/jobs/{id}/events         SSE: шаги агентов (update), затем итог (done/error/cancelled)
+    DELETE /v1/jobs/{id}                отменить задачу
+    WS     /v1/sessions/{id}/ws         {"content": ...} или {"cancel": job_id} -> поток тех же событий
+    GET    /healthz, /metrics           проверка живости и метрики телеметрии (Prometheus)
+
+Пользователь определяется заголовком X-Finam-Token (токен Finam API), запрос
+без токена получает 401. Токен сервиса из FINAM_ACCESS_TOKEN используется для
+запросов без заголовка только с API_ALLOW_ENV_TOKEN=true (локальная разработка:
+иначе любой клиент работал бы со счетами владельца сервиса). У каждого токена
+свой FinamAPIClient (requests.Session - пул соединений), свой пул графов агентов
+и свой кэш ответов на простые вопросы (core/response_cache.py). Сессии хранятся
+в памяти процесса: при нескольких процессах uvicorn нужна привязка клиента к
+процессу (sticky sessions), параллельность внутри процесса дает пул задач
+(JOB_WORKERS).
+
+Использование:
+    poetry run api-server --port 8000
+    python -m src.app.interfaces.api_server --host 0.0.0.0 --port 8000
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Annotated, Any
+
+import click
+import uvicorn
+from fastapi import APIRouter, Depends, FastAPI, Header, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+
+from src.app.adapters import FinamAPIClient
+from src.app.core import call_llm, call_smolagents, get_settings
+from src.app.core.charts import ChartError, build_chart, extract_chart_specs, strip_chart_specs
+from src.app.core.intent_router import answer_routed, route_question
+from src.app.core.jobs import Job, ResourcePool, attach_job, get_runner
+from src.app.core.response_cache import ResponseCache
+from src.app.core.structured_output import request_api_call
+from src.app.core.telemetry import current_turn, get_telemetry, render_prometheus, summarize, turn
+from src.app.core.ticker_resolver import TickerResolver, get_resolver
+from src.app.core.trace_sink import get_trace_sink
+from src.app.interfaces.chat_cli import create_system_prompt, extract_api_request
+
+SESSION_TTL = float(os.getenv("API_SESSION_TTL", "3600"))
+MAX_SESSIONS = int(os.getenv("API_MAX_SESSIONS", "1000"))
+# Обслуживать запросы без X-Finam-Token токеном сервиса из FINAM_ACCESS_TOKEN (по умолчанию 401)
+ALLOW_ENV_TOKEN = os.getenv("API_ALLOW_ENV_TOKEN", "false").lower() in {"1", "true", "yes"}
+# Токенов, для которых держатся клиент Finam API и графы агентов
+MAX_USERS = 256
+# Сколько последних сообщений сессии передается LLM
+HISTORY_WINDOW = 20
+# Период опроса задачи при потоковой выдаче событий, сек
+EVENT_POLL_INTERVAL = 0.2
+
+# auto - кэш ответов или прямой запрос (intent router), иначе агенты; agent - всегда агенты;
+# structured - API запрос как JSON по схеме эндпоинтов, без агентов
+MODES = ("auto", "agent", "structured")
+
+
+class SessionCreate(BaseModel):
+    account_id: str | None = None
+
+
+class MessageCreate(BaseModel):
+    content: str
+    mode: str = "auto"
+
+
+@dataclass
+class ChatSession:
+    """Диалог пользователя"""
+
+    id: str
+    user: str
+    token: str
+    account_id: str | None
+    messages: list[dict[str, str]] = field(default_factory=list)
+    jobs: list[str] = field(default_factory=list)
+    created: float = field(default_factory=time.time)
+    last_seen: float = field(default_factory=time.time)
+
+    def history(self, question: str) -> list[dict[str, str]]:
+        """Контекст для LLM: системный промпт, последние сообщения и вопрос"""
+        return [
+            {"role": "system", "content": create_system_prompt()},
+            *self.messages[-HISTORY_WINDOW:],
+            {"role": "user", "content": question},
+        ]
+
+
+@dataclass
+class UserResources:
+    """Ресурсы пользователя: клиент Finam API (пул соединений), графы агентов на нем и кэш ответов"""
+
+    client: FinamAPIClient
+    agents: ResourcePool
+    cache: ResponseCache = field(default_factory=ResponseCache)
+    _resolver: TickerResolver | None = field(default=None, repr=False)
+
+    def ticker_resolver(self) -> TickerResolver:
+        """Словарь инструментов с каталогом /v1/assets (загружается при первом вопросе агентам)"""
+        if self._resolver is None:
+            response = self.client.call_endpoint("get_assets")
+            if "error" in response:
+                # Каталог недоступен: встроенный словарь, повторная попытка при следующем вопросе
+                return get_resolver()
+            self._resolver = TickerResolver.from_aliases(assets=response.get("assets", []))
+        return self._resolver
+
+
+def user_key(token: str) -> str:
+    """Идентификатор пользователя по токену (сам токен в ответах и логах не фигурирует)"""
+    return hashlib.sha256(token.encode()).hexdigest()[:16] if token else "anonymous"
+
+
+class UserRegistry:
+    """Ресурсы последних MAX_USERS пользователей"""
+
+    def __init__(self, capacity: int = MAX_USERS) -> None:
+        self._capacity = capacity
+        self._users: OrderedDict[str, UserResources] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> UserResources:
+        with self._lock:
+            resources = self._users.get(token)
+            if resources is None:
+                from src.app.core import create_smolagent
+
+                client = FinamAPIClient(access_token=token or None)
+                resources = UserResources(client, ResourcePool(lambda: create_smolagent(get_settings(), client)))
+                self._users[token] = resources
+                if len(self._users) > self._capacity:
+                    self._users.popitem(last=False)
+            self._users.move_to_end(token)
+            return resources
+
+
+class SessionStore:
+    """Сессии в памяти процесса; неактивные дольше SESSION_TTL удаляются"""
+
+    def __init__(self, ttl: float = SESSION_TTL, capacity: int = MAX_SESSIONS) -> None:
+        self._ttl = ttl
+        self._capacity = capacity
+        self._sessions: dict[str, ChatSession] = {}
+        self._lock = threading.Lock()
+
+    def create(self, token: str, account_id: str | None) -> ChatSession:
+        with self._lock:
+            self._expire()
+            if len(self._sessions) >= self._capacity:
+                raise HTTPException(503, "Слишком много активных сессий")
+            session = ChatSession(uuid.uuid4().hex, user_key(token), token, account_id)
+            self._sessions[session.id] = session
+            return session
+
+    def get(self, session_id: str, token: str) -> ChatSession:
+        session = self._sessions.get(session_id)
+        if session is None or session.user != user_key(token):
+            raise HTTPException(404, "Сессия не найдена")
+        session.last_seen = time.time()
+        return session
+
+    def delete(self, session_id: str, token: str) -> ChatSession:
+        session = self.get(session_id, token)
+        with self._lock:
+            self._sessions.pop(session.id, None)
+        return session
+
+    def _expire(self) -> None:
+        # Вызывается под self._lock
+        deadline = time.time() - self._ttl
+        for session_id in [s.id for s in self._sessions.values() if s.last_seen < deadline]:
+            del self._sessions[session_id]
+
+
+def answer_question(
+    session: ChatSession, question: str, mode: str, resources: UserResources, job: Job
+) -> dict[str, Any]:
+    """
+    Ответ на вопрос: прямой запрос, structured output или агенты, затем API запрос и анализ
+
+    Выполняется в потоке пула задач; шаги пишутся в job.updates.
+    """
+    history = session.history(question)
+    client = resources.client
+    api_request = None
+    source = mode
+
+    routed = route_question(question, session.account_id) if mode == "auto" else None
+    cached = resources.cache.lookup(routed) if routed is not None else None
+    if cached is not None:
+        job.emit("cache", 1, f"{cached.method} {cached.path} ({cached.age:.0f} с назад)")
+        api_request = {"method": cached.method, "path": cached.path, "response": cached.response}
+        return {"content": cached.output, "api_request": api_request, "charts": [], "source": "cache"}
+    if routed is not None:
+        started = time.perf_counter()
+        direct = answer_routed(routed, client, history)
+        resources.cache.store(routed, direct.response, time.perf_counter() - started)
+        job.emit("router", 1, f"{direct.method} {direct.path}")
+        api_request = {"method": direct.method, "path": direct.path, "response": direct.response}
+        return {"content": direct.output, "api_request": api_request, "charts": [], "source": "routed"}
+
+    if mode == "structured":
+        try:
+            api_call, _ = request_api_call(history, temperature=0.3, allow_none=True)
+        except ValueError:
+            api_call = None
+        if api_call is not None:
+            assistant_message = "API_REQUEST: {} {}".format(*api_call.to_request())
+        else:
+            assistant_message = call_llm(history, temperature=0.3)["choices"][0]["message"]["content"]
+    else:
+        with resources.agents.checkout() as agent, attach_job(agent, job):
+            result = call_smolagents(history, temperature=0.3, agent=agent, resolver=resources.ticker_resolver())
+        get_trace_sink().write(session.id, {"turn": current_turn(), "steps": result.steps})
+        assistant_message = str(result.output)
+        source = "agent"
+    job.check_cancelled()
+
+    # Графики по спецификации агента строятся здесь же и отдаются как Plotly JSON
+    charts = []
+    for spec in extract_chart_specs(assistant_message):
+        try:
+            charts.append({"spec": spec.to_json(), "figure": json.loads(build_chart(spec, client).to_json())})
+        except ChartError as e:
+            charts.append({"spec": spec.to_json(), "error": str(e)})
+    assistant_message = strip_chart_specs(assistant_message)
+
+    method, path = extract_api_request(assistant_message)
+    if method and path:
+        if session.account_id and "{account_id}" in path:
+            path = path.replace("{account_id}", session.account_id)
+        job.emit("api", 1, f"{method} {path}")
+        api_response = client.execute_request(method, path)
+        api_request = {"method": method, "path": path, "response": api_response}
+        messages = [
+            *history,
+            {"role": "assistant", "content": assistant_message},
+            {
+                "role": "user",
+                "content": f"Результат API: {json.dumps(api_response, ensure_ascii=False)}\n\nПроанализируй.",
+            },
+        ]
+        assistant_message = call_llm(messages, temperature=0.3)["choices"][0]["message"]["content"]
+
+    return {"content": assistant_message, "api_request": api_request, "charts": charts, "source": source}
+
+
+def job_view(job: Job) -> dict[str, Any]:
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "elapsed": round(job.elapsed, 3),
+        "updates": [asdict(u) for u in job.updates],
+        "reply": job.result,
+        "error": job.error,
+    }
+
+
+async def job_events(job: Job) -> Any:  # noqa: ANN401
+    """События задачи по мере появления: ("update", шаг), затем (статус, итог)"""
+    sent = 0
+    while True:
+        done = job.done
+        updates = job.updates[sent:]
+        sent += len(updates)
+        for update in updates:
+            yield "update", asdict(update)
+        if done:
+            yield job.status, job_view(job)
+            return
+        await asyncio.sleep(EVENT_POLL_INTERVAL)
+
+
+class ChatService:
+    """Сессии, ресурсы пользователей и задачи ответов одного приложения"""
+
+    def __init__(self, allow_env_token: bool = ALLOW_ENV_TOKEN) -> None:
+        self.sessions = SessionStore()
+        self.users = UserRegistry()
+        self.runner = get_runner()
+        self.allow_env_token = allow_env_token
+
+    def check_token(self, token: str) -> str:
+        """Токен пользователя; пустой допускается только с API_ALLOW_ENV_TOKEN"""
+        if not token and not self.allow_env_token:
+            raise HTTPException(401, "Нужен заголовок X-Finam-Token с токеном Finam API")
+        return token
+
+    def submit(self, session: ChatSession, body: MessageCreate) -> Job:
+        if body.mode not in MODES:
+            raise HTTPException(422, f"mode должен быть одним из: {', '.join(MODES)}")
+        resources = self.users.get(session.token)
+
+        def run(job: Job) -> dict[str, Any]:
+            reply = answer_question(session, body.content, body.mode, resources, job)
+            # Задачи сессии выполняются по очереди, поэтому история дописывается без гонок
+            session.messages.append({"role": "user", "content": body.content})
+            session.messages.append({"role": "assistant", "content": reply["content"]})
+            reply["telemetry"] = summarize(get_telemetry().spans({current_turn()}))
+            return reply
+
+        with turn():
+            job = self.runner.submit(session.id, run, description=body.content)
+        session.jobs.append(job.id)
+        return job
+
+    def owned_job(self, job_id: str, token: str) -> Job:
+        job = self.runner.get(job_id)
+        if job is None:
+            raise HTTPException(404, "Задача не найдена")
+        self.sessions.get(job.session, token)
+        return job
+
+    def cancel_session_job(self, session: ChatSession, job_id: str) -> Job:
+        """Отменить задачу из WebSocket сессии: чужие задачи не видны, как и в owned_job"""
+        job = self.runner.get(job_id)
+        if job is None or job.session != session.id:
+            raise HTTPException(404, "Задача не найдена")
+        self.runner.cancel(job.id)
+        return job
+
+
+router = APIRouter()
+
+
+def chat_service(request: Request) -> ChatService:
+    return request.app.state.chat
+
+
+Service = Annotated[ChatService, Depends(chat_service)]
+
+
+def user_token(service: Service, x_finam_token: Annotated[str, Header()] = "") -> str:
+    return service.check_token(x_finam_token)
+
+
+Token = Annotated[str, Depends(user_token)]
+
+
+@router.get("/healthz")
+def healthz() -> dict[str, str]:
+    return {"status": "ok"}
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics() -> str:
+    return render_prometheus(get_telemetry())
+
+
+@router.post("/v1/sessions", status_code=201)
+def create_session(body: SessionCreate, token: Token, service: Service) -> dict[str, Any]:
+    session = service.sessions.create(token, body.account_id)
+    return {"session_id": session.id, "account_id": session.account_id}
+
+
+@router.get("/v1/sessions/{session_id}")
+def get_session(session_id: str, token: Token, service: Service) -> dict[str, Any]:
+    session = service.sessions.get(session_id, token)
+    return {"session_id": session.id, "account_id": session.account_id, "messages": session.messages}
+
+
+@router.delete("/v1/sessions/{session_id}", status_code=204)
+def delete_session(session_id: str, token: Token, service: Service) -> None:
+    for job_id in service.sessions.delete(session_id, token).jobs:
+        service.runner.cancel(job_id)
+
+
+@router.post("/v1/sessions/{session_id}/messages", status_code=202)
+def post_message(
+    session_id: str,
+    body: MessageCreate,
+    token: Token,
+    service: Service,
+) -> dict[str, Any]:
+    return job_view(service.submit(service.sessions.get(session_id, token), body))
+
+
+@router.get("/v1/jobs/{job_id}")
+def get_job(job_id: str, token: Token, service: Service) -> dict[str, Any]:
+    return job_view(service.owned_job(job_id, token))
+
+
+@router.delete("/v1/jobs/{job_id}")
+def cancel_job(job_id: str, token: Token, service: Service) -> dict[str, Any]:
+    job = service.owned_job(job_id, token)
+    service.runner.cancel(job.id)
+    return job_view(job)
+
+
+@router.get("/v1/jobs/{job_id}/events")
+def stream_job(job_id: str, token: Token, service: Service) -> StreamingResponse:
+    job = service.owned_job(job_id, token)
+
+    async def stream() -> Any:  # noqa: ANN401
+        async for event, data in job_events(job):
+            yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+async def handle_ws_message(
+    websocket: WebSocket,
+    service: ChatService,
+    session: ChatSession,
+    message: Any,  # noqa: ANN401
+) -> Job | None:
+    """Сообщение WebSocket: отмена своей задачи или вопрос; ошибки уходят клиенту событием error"""
+    try:
+        if not isinstance(message, dict):
+            raise ValueError('Ожидается объект {"content": ...} или {"cancel": job_id}')
+        if "cancel" in message:
+            service.cancel_session_job(session, str(message["cancel"]))
+            return None
+        job = service.submit(session, MessageCreate(**message))
+    except (HTTPException, ValueError) as e:
+        await websocket.send_json({"type": "error", "error": str(getattr(e, "detail", e))})
+        return None
+    await websocket.send_json({"type": "accepted", "job_id": job.id})
+    return job
+
+
+@router.websocket("/v1/sessions/{session_id}/ws")
+async def chat_ws(websocket: WebSocket, session_id: str) -> None:
+    service: ChatService = websocket.app.state.chat
+    # Браузер не передает заголовки в WebSocket: токен можно указать в ?token=
+    token = websocket.headers.get("x-finam-token") or websocket.query_params.get("token", "")
+    try:
+        session = service.sessions.get(session_id, service.check_token(token))
+    except HTTPException as e:
+        await websocket.close(code=4000 + e.status_code)
+        return
+    await websocket.accept()
+
+    async def forward(job: Job) -> None:
+        async for event, data in job_events(job):
+            await websocket.send_json({"type": event, "job_id": job.id, **data})
+
+    streams: set[asyncio.Task] = set()
+    try:
+        while True:
+            job = await handle_ws_message(websocket, service, session, await websocket.receive_json())
+            if job is not None:
+                task = asyncio.create_task(forward(job))
+                streams.add(task)
+                task.add_done_callback(streams.discard)
+    except WebSocketDisconnect:
+        for task in streams:
+            task.cancel()
+
+
+def create_app() -> FastAPI:
+    """Приложение FastAPI со своими хранилищами сессий и ресурсов пользователей"""
+    app = FastAPI(title="AI Ассистент Трейдера (Finam)", version="0.1.0")
+    app.state.chat = ChatService()
+    app.include_router(router)
+    return app
+
+
+@click.command()
+@click.option("--host", default="127.0.0.1", help="Адрес для прослушивания")
+@click.option("--port", type=int, default=8000, help="Порт")
+@click.option("--workers", type=int, default=1, help="Процессов uvicorn (сессии не разделяются между процессами)")
+@click.option("--reload", is_flag=True, default=False, help="Перезапуск при изменении кода (разработка)")
+def main(host: str, port: int, workers: int, reload: bool) -> None:
+    """Запустить HTTP / WebSocket сервис чата"""
+    click.echo(f"🚀 API сервис чата: http://{host}:{port} (документация: /docs)")
+    uvicorn.run(
+        "src.app.interfaces.api_server:create_app", factory=True, host=host, port=port, workers=workers, reload=reload
+    )
+
+
+if __name__ == "__main__":
+    main()
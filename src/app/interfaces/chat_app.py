@@ -8,18 +8,116 @@ Streamlit веб-интерфейс для AI ассистента трейде
 """
 
 import json
-from pprint import pprint
-import streamlit as st
+import time
+import uuid
+from collections.abc import Callable
+from typing import Any
+
 import plotly
-import plotly.express as px
+import plotly.graph_objects as go
+import streamlit as st
 
 from app.adapters import FinamAPIClient
+from app.adapters.finam_endpoints import get_router, render_endpoint_docs, split_request
 from app.core import call_llm, call_smolagents, get_settings
+from app.core.agent_profiler import STEP_COMPONENTS, ProfileNode, flame_rows, get_profiler, summarize_runs, tool_calls
+from app.core.charts import ChartError, build_chart, extract_chart_specs, strip_chart_specs
+from app.core.intent_router import answer_routed, route_question
+from app.core.jobs import Job, ResourcePool, attach_job, get_runner
+from app.core.response_cache import ResponseCache
+from app.core.structured_output import request_api_call
+from app.core.telemetry import get_telemetry, summarize, turn
+from app.core.ticker_resolver import TickerResolver, get_resolver
+from app.core.trace_sink import get_trace_sink
+
+# Справочные эндпоинты (биржи, инструменты, расписания) с cache_ttl от часа кэшируются на процесс
+REFERENCE_TTL = 3600
+# Сколько последних сообщений показывать сразу (LLM получает всю историю)
+HISTORY_WINDOW = 20
+# Период опроса фоновых запусков агентов, сек, и сколько последних шагов показывать
+JOB_POLL_INTERVAL = 1.0
+JOB_UPDATES_SHOWN = 8
+
+
+class _UncachedResponse(Exception):
+    """Ответ Finam API с ошибкой: возвращается вызывающему, но не попадает в кэш Streamlit"""
+
+    def __init__(self, response: dict[str, Any]) -> None:
+        super().__init__(response.get("error"))
+        self.response = response
+
+
+@st.cache_resource(show_spinner=False)
+def get_finam_client(access_token: str, base_url: str) -> FinamAPIClient:
+    """Клиент Finam API на процесс Streamlit: одна requests.Session на все перезапуски скрипта"""
+    return FinamAPIClient(access_token=access_token or None, base_url=base_url or None)
+
+
+@st.cache_resource(show_spinner=False)
+def get_agent_pool(access_token: str, base_url: str) -> ResourcePool:
+    """
+    Пул графов агентов smolagents
+
+    CodeAgent хранит память текущего запуска, поэтому параллельные запуски
+    берут разные графы; графы переиспользуются между запусками. Без введенного
+    токена агенты работают с ключом из настроек (FINAM_API_KEY), как и раньше.
+    """
+    from app.core import create_smolagent
+
+    client = get_finam_client(access_token, base_url) if access_token else None
+    return ResourcePool(lambda: create_smolagent(get_settings(), client))
+
+
+@st.cache_resource(show_spinner=False)
+def get_response_cache(access_token: str, base_url: str) -> ResponseCache:  # noqa: ARG001
+    """
+    Семантический кэш ответов на простые вопросы, общий для сессий с одним токеном
 
+    Аргументы нужны только как ключ st.cache_resource: у каждого токена свой кэш.
+    Имена без "_" - параметры с подчеркиванием Streamlit в ключ не включает.
+    """
+    return ResponseCache()
 
+
+@st.cache_data(ttl=REFERENCE_TTL, show_spinner=False)
+def fetch_reference(
+    access_token: str, base_url: str, endpoint: str, slots: tuple[tuple[str, Any], ...]
+) -> dict[str, Any]:
+    """Ответ справочного эндпоинта, общий для сессий на REFERENCE_TTL секунд"""
+    response = get_finam_client(access_token, base_url).call_endpoint(endpoint, **dict(slots))
+    if "error" in response:
+        raise _UncachedResponse(response)
+    return response
+
+
+def load_reference(access_token: str, base_url: str, endpoint: str, slots: dict[str, Any]) -> dict[str, Any]:
+    try:
+        return fetch_reference(access_token, base_url, endpoint, tuple(sorted(slots.items())))
+    except _UncachedResponse as e:
+        return e.response
+
+
+@st.cache_resource(ttl=REFERENCE_TTL, show_spinner=False)
+def build_ticker_resolver(access_token: str, base_url: str) -> TickerResolver:
+    """Словарь инструментов для вопросов агентам: встроенные названия и каталог /v1/assets"""
+    response = load_reference(access_token, base_url, "get_assets", {})
+    if "error" in response:
+        raise _UncachedResponse(response)
+    return TickerResolver.from_aliases(assets=response.get("assets", []))
+
+
+def get_ticker_resolver(access_token: str, base_url: str) -> TickerResolver:
+    """Словарь с каталогом; пока /v1/assets отвечает ошибкой - только встроенные названия, без кэширования"""
+    try:
+        return build_ticker_resolver(access_token, base_url)
+    except _UncachedResponse:
+        return get_resolver()
+
+
+@st.cache_data(show_spinner=False)
 def create_system_prompt() -> str:
     """Создать системный промпт для AI ассистента"""
-    return """Ты - AI ассистент трейдера, работающий с Finam TradeAPI.
+    return f"""Ты - AI ассистент трейдера, работающий с Finam TradeAPI.
 
 Когда пользователь задает вопрос о рынке, портфеле или хочет совершить действие:
 1. Определи нужный API endpoint
@@ -27,13 +125,7 @@ def create_system_prompt() -> str:
 3. После получения данных - проанализируй их и дай понятный ответ
 
 Доступные endpoints:
-- GET /v1/instruments/{symbol}/quotes/latest - котировка
-- GET /v1/instruments/{symbol}/orderbook - стакан
-- GET /v1/instruments/{symbol}/bars - свечи
-- GET /v1/accounts/{account_id} - счет и позиции
-- GET /v1/accounts/{account_id}/orders - ордера
-- POST /v1/accounts/{account_id}/orders - создать ордер
-- DELETE /v1/accounts/{account_id}/orders/{order_id} - отменить ордер
+{render_endpoint_docs()}
 
 Отвечай на русском, кратко и по делу."""
 
@@ -47,22 +139,347 @@ def extract_api_request(text: str) -> tuple[str | None, str | None]:
     for line in lines:
         if line.strip().startswith("API_REQUEST:"):
             request = line.replace("API_REQUEST:", "").strip()
-            parts = request.split(maxsplit=1)
-            if len(parts) == 2:
-                return parts[0], parts[1]
+            method, path = split_request(request)
+            # Запросы, которых нет в реестре API, не выполняем
+            normalized = get_router().normalize(method, path)
+            if normalized:
+                return normalized
     return None, None
 
+
 def extract_plotly_json(text: str) -> str | None:
     """Извлечь Plotly JSON из ответа LLM"""
     if "PLOTLY_JSON:" not in text:
         return None
 
-    lines = text.split("\n")
-    for line in lines:
-        if line.strip().startswith("PLOTLY_JSON:"):
-            json_part = line.replace("PLOTLY_JSON:", "").strip()
-            return json_part
-    return None
+    # JSON может занимать несколько строк: берем ровно один JSON объект после метки
+    json_part = text.split("PLOTLY_JSON:", 1)[1].lstrip()
+    try:
+        _, end = json.JSONDecoder().raw_decode(json_part)
+    except json.JSONDecodeError:
+        return None
+    return json_part[:end]
+
+
+def render_telemetry_panel(turns: list[str]) -> None:
+    """Панель телеметрии в sidebar: итоги сессии и спаны последнего хода"""
+    spans = get_telemetry().spans(set(turns))
+    summary = summarize(spans)
+    llm = [summary[kind] for kind in ("llm", "agent_llm") if kind in summary]
+    finam = summary.get("finam")
+    cache = summary.get("cache")
+
+    with st.sidebar, st.expander("📊 Телеметрия", expanded=False):
+        if not spans:
+            st.caption("Вызовов LLM и Finam API пока не было")
+            return
+
+        col1, col2 = st.columns(2)
+        col1.metric("Вызовов LLM", int(sum(s["calls"] for s in llm)))
+        col2.metric("Стоимость", f"${sum(s['cost'] for s in llm):.4f}")
+        col1.metric("Токенов", int(sum(s["prompt_tokens"] + s["completion_tokens"] for s in llm)))
+        col2.metric("Время LLM", f"{sum(s['duration'] for s in llm):.1f} с")
+        if finam:
+            col1.metric("Запросов Finam", int(finam["calls"]))
+            col2.metric("Время Finam", f"{finam['duration']:.2f} с")
+        if cache:
+            hits = f"{int(cache['cache_hits'])} из {int(cache['calls'])}"
+            col1.metric("Из кэша", f"{cache['cache_hits'] / cache['calls']:.0%}", hits, delta_color="off")
+            col2.metric("Сэкономлено", f"{cache['saved']:.1f} с")
+
+        st.markdown("**По ходам диалога**")
+        per_turn = []
+        for i, turn_id in enumerate(turns, 1):
+            turn_summary = summarize([s for s in spans if s.turn == turn_id])
+            per_turn.append({
+                "ход": i,
+                "вызовов": int(sum(s["calls"] for s in turn_summary.values())),
+                "время, с": round(sum(s["duration"] for s in turn_summary.values()), 2),
+                "токенов": int(sum(s["prompt_tokens"] + s["completion_tokens"] for s in turn_summary.values())),
+                "стоимость, $": round(sum(s["cost"] for s in turn_summary.values()), 5),
+            })
+        st.dataframe(per_turn, hide_index=True, use_container_width=True)
+
+        st.markdown("**Последний ход**")
+        st.dataframe(
+            [
+                {
+                    "тип": s.kind,
+                    "вызов": s.name,
+                    "мс": round(s.duration * 1000),
+                    "токенов": s.prompt_tokens + s.completion_tokens,
+                    "$": round(s.cost, 5),
+                    "статус": s.status,
+                }
+                for s in spans
+                if s.turn == turns[-1]
+            ],
+            hide_index=True,
+            use_container_width=True,
+        )
+
+
+# Цвета узлов flame-таймлайна по типу
+FLAME_COLORS = {"agent": "#6c8ebf", "step": "#b0bec5", "model": "#f0a030", "code": "#5aa469", "tool": "#d9534f"}
+
+
+def render_flame_chart(run: ProfileNode) -> go.Figure:
+    """Flame-таймлайн запуска агента: по горизонтали время, по вертикали вложенность"""
+    rows = flame_rows(run)
+    fig = go.Figure()
+    for kind, color in FLAME_COLORS.items():
+        kind_rows = [r for r in rows if r["kind"] == kind]
+        if not kind_rows:
+            continue
+        fig.add_trace(
+            go.Bar(
+                name=kind,
+                orientation="h",
+                y=[r["depth"] for r in kind_rows],
+                base=[r["start"] for r in kind_rows],
+                x=[r["duration"] for r in kind_rows],
+                marker_color=color,
+                text=[r["name"] for r in kind_rows],
+                textposition="inside",
+                insidetextanchor="start",
+                customdata=[[r["agent"], r["status"]] for r in kind_rows],
+                hovertemplate="%{text} (%{customdata[0]})<br>%{x:.3f} с, %{customdata[1]}<extra></extra>",
+            )
+        )
+    fig.update_layout(
+        barmode="overlay",
+        bargap=0.05,
+        height=80 + 28 * (max(r["depth"] for r in rows) + 1),
+        margin={"l": 10, "r": 10, "t": 10, "b": 30},
+        xaxis_title="сек",
+        yaxis={"autorange": "reversed", "showticklabels": False},
+        legend={"orientation": "h"},
+    )
+    return fig
+
+
+def render_agent_profile(turn_id: str) -> None:
+    """Профиль агентов за ход: flame-таймлайн и разбивка шагов"""
+    for run in get_profiler().runs({turn_id}):
+        with st.expander(f"⏱ Профиль агента: {run.duration:.2f} с"):
+            st.plotly_chart(render_flame_chart(run), use_container_width=True)
+            st.dataframe(
+                [
+                    {"агент": agent, "шагов": int(stats["steps"]), "вызовов инструментов": int(stats["tool_calls"])}
+                    | {component: round(stats[component], 3) for component in STEP_COMPONENTS}
+                    for agent, stats in summarize_runs([run]).items()
+                ],
+                hide_index=True,
+                use_container_width=True,
+            )
+
+
+def render_profile_panel(turns: list[str]) -> None:
+    """Сводка профилей агентов за сессию в sidebar"""
+    runs = get_profiler().runs(set(turns))
+    if not runs:
+        return
+
+    with st.sidebar, st.expander("⏱ Профиль агентов", expanded=False):
+        summary = summarize_runs(runs)
+        st.dataframe(
+            [
+                {
+                    "агент": agent,
+                    "запусков": int(stats["runs"]),
+                    "шагов": int(stats["steps"]),
+                    "шагов/запуск": round(stats["steps"] / stats["runs"], 1),
+                }
+                | {f"{component}, с": round(stats[component], 2) for component in STEP_COMPONENTS}
+                for agent, stats in summary.items()
+            ],
+            hide_index=True,
+            use_container_width=True,
+        )
+
+        calls: dict[tuple[str, str], int] = {}
+        for run in runs:
+            for agent, counts in tool_calls(run).items():
+                for tool, n in counts.items():
+                    calls[agent, tool] = calls.get((agent, tool), 0) + n
+        if calls:
+            st.markdown("**Вызовы инструментов**")
+            st.dataframe(
+                [
+                    {"агент": agent, "инструмент": tool, "вызовов": n}
+                    for (agent, tool), n in sorted(calls.items(), key=lambda item: -item[1])
+                ],
+                hide_index=True,
+                use_container_width=True,
+            )
+
+
+def render_message(message: dict[str, Any]) -> None:
+    """Сообщение истории чата с API запросом, если он был"""
+    with st.chat_message(message["role"]):
+        st.markdown(message["content"])
+
+        # Показываем API запросы
+        if "api_request" in message:
+            with st.expander("🔍 API запрос"):
+                st.code(f"{message['api_request']['method']} {message['api_request']['path']}", language="http")
+                st.json(message["api_request"]["response"])
+
+
+def agent_job(pool: ResourcePool, history: list[dict[str, str]], resolver: TickerResolver) -> Callable[[Job], Any]:
+    """Задача фонового запуска агентов: граф из пула, шаги и отмена через Job"""
+
+    def run(job: Job) -> Any:  # noqa: ANN401
+        with pool.checkout() as agent, attach_job(agent, job):
+            return call_smolagents(history, temperature=0.3, agent=agent, resolver=resolver)
+
+    return run
+
+
+def render_agent_steps(response: Any, turn_id: str) -> None:  # noqa: ANN401
+    """Шаги smolagents и профиль запуска под ответом агента"""
+    # Полный ответ smolagents пишется в журнал сессии фоновым потоком
+    get_trace_sink().write(st.session_state.session_id, {"turn": turn_id, "steps": response.steps})
+    with st.expander("Посмотреть полный ответ от smolagents"):
+        for step in response.steps:
+            if "step_number" not in step:
+                continue
+            with st.expander(f"Шаг: {step['step_number']}"):
+                for msg in step["model_input_messages"]:
+                    if msg["role"] in ["tool-call", "tool-response"]:
+                        with st.chat_message("assistant"):
+                            st.markdown(msg["content"][0]["text"])
+
+    render_agent_profile(turn_id)
+
+
+def finalize_reply(
+    assistant_message: str,
+    conversation_history: list[dict[str, str]],
+    finam_client: FinamAPIClient,
+    account_id: str,
+    api_data: dict[str, Any] | None = None,
+) -> dict[str, Any]:
+    """
+    Довести ответ до пользователя: графики, API запрос из ответа и его анализ
+
+    Returns:
+        Сообщение ассистента для истории чата
+    """
+    # Проверяем API запрос
+    method, path = extract_api_request(assistant_message)
+    plotly_json = extract_plotly_json(assistant_message)
+    if plotly_json:
+        try:
+            fig = plotly.io.from_json(plotly_json)
+            st.plotly_chart(fig, use_container_width=True)
+        except Exception as e:
+            st.error(f"❌ Ошибка при отображении графика: {e}")
+
+    # Графики по спецификации от агента строятся по данным Finam API, без участия LLM
+    for spec in extract_chart_specs(assistant_message):
+        try:
+            st.plotly_chart(build_chart(spec, finam_client), use_container_width=True)
+        except ChartError as e:
+            st.warning(f"📉 Не удалось построить график {spec.chart}: {e}")
+    assistant_message = strip_chart_specs(assistant_message)
+
+    if method and path:
+        # Подставляем account_id если есть
+        if account_id and "{account_id}" in path:  # noqa: RUF027
+            path = path.replace("{account_id}", account_id)
+
+        # Показываем что делаем запрос
+        st.info(f"🔍 Выполняю запрос: `{method} {path}`")
+
+        # Выполняем API запрос
+        api_response = finam_client.execute_request(method, path)
+
+        # Проверяем на ошибки
+        if "error" in api_response:
+            st.error(f"⚠️ Ошибка API: {api_response.get('error')}")
+            if "details" in api_response:
+                st.error(f"Детали: {api_response['details']}")
+
+        # Показываем результат
+        with st.expander("📡 Ответ API", expanded=False):
+            st.json(api_response)
+
+        api_data = {"method": method, "path": path, "response": api_response}
+
+        # Добавляем результат в контекст
+        conversation_history = [
+            *conversation_history,
+            {"role": "assistant", "content": assistant_message},
+            {
+                "role": "user",
+                "content": f"Результат API: {json.dumps(api_response, ensure_ascii=False)}\n\nПроанализируй.",
+            },
+        ]
+
+        # Получаем финальный ответ
+        response = call_llm(conversation_history, temperature=0.3)
+        assistant_message = response["choices"][0]["message"]["content"]
+
+    st.markdown(assistant_message)
+
+    # Сохраняем сообщение ассистента
+    message_data = {"role": "assistant", "content": assistant_message}
+    if api_data:
+        message_data["api_request"] = api_data
+    return message_data
+
+
+def collect_finished_jobs(finam_client: FinamAPIClient, account_id: str) -> None:
+    """Показать ответы завершившихся фоновых запусков и перенести их в историю"""
+    runner = get_runner()
+    pending = []
+    for item in st.session_state.pending_jobs:
+        job = runner.get(item["job"])
+        if job is not None and not job.done:
+            pending.append(item)
+            continue
+        with st.chat_message("assistant"), turn(item["turn"]):
+            if job is None:
+                message_data = {"role": "assistant", "content": "❌ Результат запроса потерян, повторите вопрос"}
+                st.error(message_data["content"])
+            elif job.status == "cancelled":
+                message_data = {"role": "assistant", "content": f"⏹ Запрос отменен: {item['prompt']}"}
+                st.warning(message_data["content"])
+            elif job.status == "error":
+                message_data = {"role": "assistant", "content": f"❌ Ошибка: {job.error}"}
+                st.error(message_data["content"])
+            else:
+                try:
+                    render_agent_steps(job.result, item["turn"])
+                    message_data = finalize_reply(job.result.output, item["history"], finam_client, account_id)
+                except Exception as e:
+                    message_data = {"role": "assistant", "content": f"❌ Ошибка: {e}"}
+                    st.error(message_data["content"])
+        st.session_state.messages.append(message_data)
+    st.session_state.pending_jobs = pending
+
+
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+def render_pending_jobs() -> None:
+    """Статус фоновых запусков агентов: опрос без перезапуска всего скрипта, отмена"""
+    runner = get_runner()
+    finished = False
+    for item in st.session_state.pending_jobs:
+        job = runner.get(item["job"])
+        if job is None or job.done:
+            finished = True
+            continue
+        with st.chat_message("assistant"):
+            label = "в очереди" if job.status == "queued" else f"выполняется {job.elapsed:.0f} с"
+            st.caption(f"⏳ Агенты: {label} - {item['prompt']}")
+            for update in job.updates[-JOB_UPDATES_SHOWN:]:
+                st.markdown(f"- **{update.agent}**, шаг {update.step}: {update.text}")
+            st.button("⏹ Отменить", key=f"cancel-{job.id}", on_click=runner.cancel, args=(job.id,))
+    if finished:
+        # Ответ дорисовывает полный перезапуск (collect_finished_jobs)
+        st.rerun()
+
 
 def main() -> None:  # noqa: C901
     """Главная функция Streamlit приложения"""
@@ -88,9 +505,29 @@ def main() -> None:  # noqa: C901
             api_base_url = st.text_input("API Base URL", value="https://api.finam.ru", help="Базовый URL API")
 
         account_id = st.text_input("ID счета", value="", help="Оставьте пустым если не требуется")
+        structured = st.toggle(
+            "⚡ Structured output",
+            value=False,
+            help="Генерировать API запрос как JSON по схеме эндпоинтов (один короткий вызов LLM вместо агента)",
+        )
+        use_router = st.toggle(
+            "🎯 Прямые запросы",
+            value=True,
+            help="Простые вопросы по одному эндпоинту (цена, стакан, счет) - один вызов API и LLM без агентов",
+        )
+        use_cache = st.toggle(
+            "🗃 Кэш ответов",
+            value=True,
+            disabled=not use_router,
+            help="Повтор простого вопроса (цена, стакан, справочник) в пределах TTL эндпоинта - ответ без LLM и API",
+        )
 
         if st.button("🔄 Очистить историю"):
+            for item in st.session_state.get("pending_jobs", []):
+                get_runner().cancel(item["job"])
+            st.session_state.pending_jobs = []
             st.session_state.messages = []
+            st.session_state.turns = []
             st.rerun()
 
         st.markdown("---")
@@ -107,9 +544,16 @@ def main() -> None:  # noqa: C901
     # Инициализация состояния
     if "messages" not in st.session_state:
         st.session_state.messages = []
+    if "pending_jobs" not in st.session_state:
+        # Фоновые запуски агентов: {job, turn, prompt, history}
+        st.session_state.pending_jobs = []
+        st.session_state.session_id = uuid.uuid4().hex
+    if "turns" not in st.session_state:
+        # Идентификаторы ходов диалога для панели телеметрии
+        st.session_state.turns = []
 
-    # Инициализация Finam API клиента
-    finam_client = FinamAPIClient(access_token=api_token or None, base_url=api_base_url if api_base_url else None)
+    # Клиент Finam API переживает перезапуски скрипта (keep-alive соединения)
+    finam_client = get_finam_client(api_token, api_base_url)
 
     # Проверка токена
     if not finam_client.access_token:
@@ -119,16 +563,16 @@ def main() -> None:  # noqa: C901
     else:
         st.sidebar.success("✅ Finam API токен установлен")
 
-    # Отображение истории сообщений
-    for message in st.session_state.messages:
-        with st.chat_message(message["role"]):
-            st.markdown(message["content"])
+    # Отображение истории сообщений: ранние сообщения не рисуются, пока их не попросят
+    messages = st.session_state.messages
+    hidden = len(messages) - HISTORY_WINDOW
+    if hidden > 0 and not st.toggle(f"📜 Показать ранние сообщения ({hidden})", value=False):
+        messages = messages[hidden:]
+    for message in messages:
+        render_message(message)
 
-            # Показываем API запросы
-            if "api_request" in message:
-                with st.expander("🔍 API запрос"):
-                    st.code(f"{message['api_request']['method']} {message['api_request']['path']}", language="http")
-                    st.json(message["api_request"]["response"])
+    # Ответы фоновых запусков агентов, завершившихся с прошлого перезапуска
+    collect_finished_jobs(finam_client, account_id)
 
     # Поле ввода
     if prompt := st.chat_input("Напишите ваш вопрос..."):
@@ -143,81 +587,79 @@ def main() -> None:  # noqa: C901
             conversation_history.append({"role": msg["role"], "content": msg["content"]})
 
         # Получаем ответ от ассистента
-        with st.chat_message("assistant"), st.spinner("Думаю..."):
+        with st.chat_message("assistant"), st.spinner("Думаю..."), turn() as turn_id:
+            st.session_state.turns.append(turn_id)
             try:
-                response = call_smolagents(conversation_history, temperature=0.3)
-                # Сохраняем полный ответ smolagents как JSON
-                with open("smolagents_response.json", "w", encoding="utf-8") as f:
-                    json.dump(response.steps, f, ensure_ascii=False, indent=2)
-                with st.expander("Посмотреть полный ответ от smolagents"):
-                    for step in response.steps:
-                        if "step_number" not in step:
-                            continue
-                        with st.expander(f"Шаг: {step["step_number"]}"):
-                            for msg in step["model_input_messages"]:
-                                if msg["role"] in ["tool-call", "tool-response"]:
-                                    with st.chat_message("assistant"):
-                                        st.markdown(msg["content"][0]["text"])
-
-                # Now, extract the message content to continue your app's logic
-                assistant_message = response.output
-
-                # Проверяем API запрос
-                method, path = extract_api_request(assistant_message)
-                plotly_json = extract_plotly_json(assistant_message)
-                if plotly_json:
-                    try:
-                        fig = plotly.io.from_json(plotly_json)
-                        st.plotly_chart(fig, use_container_width=True)
-                    except Exception as e:
-                        st.error(f"❌ Ошибка при отображении графика: {e}")
-
                 api_data = None
-                if method and path:
-                    # Подставляем account_id если есть
-                    if account_id and "{account_id}" in path:  # noqa: RUF027
-                        path = path.replace("{account_id}", account_id)
-
-                    # Показываем что делаем запрос
-                    st.info(f"🔍 Выполняю запрос: `{method} {path}`")
-
-                    # Выполняем API запрос
-                    api_response = finam_client.execute_request(method, path)
-
-                    # Проверяем на ошибки
-                    if "error" in api_response:
-                        st.error(f"⚠️ Ошибка API: {api_response.get('error')}")
-                        if "details" in api_response:
-                            st.error(f"Детали: {api_response['details']}")
-
-                    # Показываем результат
+                assistant_message = None
+                routed = route_question(prompt, account_id or None) if use_router and not structured else None
+                response_cache = get_response_cache(api_token, api_base_url)
+                cached = response_cache.lookup(routed) if routed is not None and use_cache else None
+                if cached is not None:
+                    # Тот же вопрос в пределах TTL эндпоинта: сохраненный ответ API и шаблонная сводка
+                    st.info(f"🗃 Из кэша ({cached.age:.0f} с назад): `{cached.method} {cached.path}`")
                     with st.expander("📡 Ответ API", expanded=False):
-                        st.json(api_response)
-
-                    api_data = {"method": method, "path": path, "response": api_response}
-
-                    # Добавляем результат в контекст
-                    conversation_history.append({"role": "assistant", "content": assistant_message})
-                    conversation_history.append({
-                        "role": "user",
-                        "content": f"Результат API: {json.dumps(api_response, ensure_ascii=False)}\n\nПроанализируй.",
+                        st.json(cached.response)
+                    api_data = {"method": cached.method, "path": cached.path, "response": cached.response}
+                    assistant_message = cached.output
+                elif routed is not None:
+                    # Простой запрос: один вызов эндпоинта и один вызов LLM вместо иерархии агентов
+                    started = time.perf_counter()
+                    response = None
+                    if (routed.endpoint.cache_ttl or 0) >= REFERENCE_TTL:
+                        response = load_reference(api_token, api_base_url, routed.endpoint.name, routed.slots)
+                    direct = answer_routed(routed, finam_client, conversation_history, response=response)
+                    response_cache.store(routed, direct.response, time.perf_counter() - started)
+                    st.info(f"🎯 Прямой запрос: `{direct.method} {direct.path}`")
+                    if "error" in direct.response:
+                        st.error(f"⚠️ Ошибка API: {direct.response.get('error')}")
+                    with st.expander("📡 Ответ API", expanded=False):
+                        st.json(direct.response)
+                    api_data = {"method": direct.method, "path": direct.path, "response": direct.response}
+                    assistant_message = direct.output
+                elif structured:
+                    # Structured output: API запрос в JSON по схеме, без агента
+                    try:
+                        api_call, _ = request_api_call(conversation_history, temperature=0.3, allow_none=True)
+                    except ValueError:
+                        # JSON не разобрался или не прошел схему: обычный текстовый ответ, как в chat-cli
+                        api_call = None
+                    if api_call is not None:
+                        api_method, api_path = api_call.to_request()
+                        assistant_message = f"API_REQUEST: {api_method} {api_path}"
+                    else:
+                        response = call_llm(conversation_history, temperature=0.3)
+                        assistant_message = response["choices"][0]["message"]["content"]
+                else:
+                    # Агенты работают в фоне: скрипт не блокируется, шаги показываются опросом
+                    pool = get_agent_pool(api_token, api_base_url)
+                    resolver = get_ticker_resolver(api_token, api_base_url)
+                    job = get_runner().submit(
+                        st.session_state.session_id,
+                        agent_job(pool, conversation_history, resolver),
+                        description=prompt,
+                    )
+                    st.session_state.pending_jobs.append({
+                        "job": job.id,
+                        "turn": turn_id,
+                        "prompt": prompt,
+                        "history": conversation_history,
                     })
 
-                    # Получаем финальный ответ
-                    response = call_llm(conversation_history, temperature=0.3)
-                    assistant_message = response["choices"][0]["message"]["content"]
-
-                st.markdown(assistant_message)
-
-                # Сохраняем сообщение ассистента
-                message_data = {"role": "assistant", "content": assistant_message}
-                if api_data:
-                    message_data["api_request"] = api_data
-                st.session_state.messages.append(message_data)
+                if assistant_message is not None:
+                    st.session_state.messages.append(
+                        finalize_reply(assistant_message, conversation_history, finam_client, account_id, api_data)
+                    )
 
             except Exception as e:
                 st.error(f"❌ Ошибка: {e}")
 
+    if st.session_state.pending_jobs:
+        render_pending_jobs()
+
+    render_telemetry_panel(st.session_state.turns)
+    render_profile_panel(st.session_state.turns)
+
 
 if __name__ == "__main__":
     main()
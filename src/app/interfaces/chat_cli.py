@@ -7,17 +7,27 @@
     python -m src.app.chat_cli
 """
 
+import json
+import os
 import sys
+from typing import TYPE_CHECKING
 
 import click
 
-from src.app.adapters import FinamAPIClient
-from src.app.core import call_llm, get_settings
+# requests, адаптеры и core (pydantic) импортируются внутри функций, чтобы
+# `chat-cli --help` и тонкий клиент стартовали быстро (benchmarks/import_time.py)
+if TYPE_CHECKING:
+    from src.app.adapters import FinamAPIClient
+
+# (connect, read) таймаут потока событий задачи на api-server
+SSE_TIMEOUT = (5, None)
 
 
 def create_system_prompt() -> str:
     """Создать системный промпт для AI ассистента"""
-    return """Ты - AI ассистент трейдера, работающий с Finam TradeAPI.
+    from src.app.adapters.finam_endpoints import render_endpoint_docs
+
+    return f"""Ты - AI ассистент трейдера, работающий с Finam TradeAPI.
 
 Твоя задача - помогать пользователю анализировать рынки и управлять портфелем.
 
@@ -28,13 +38,7 @@ def create_system_prompt() -> str:
 4. Ты должен проанализировать результат и дать понятный ответ пользователю
 
 Доступные API endpoints:
-- GET /v1/instruments/{symbol}/quotes/latest - текущая котировка
-- GET /v1/instruments/{symbol}/orderbook - биржевой стакан
-- GET /v1/instruments/{symbol}/bars - исторические свечи
-- GET /v1/accounts/{account_id} - информация о счете и позициях
-- GET /v1/accounts/{account_id}/orders - список ордеров
-- POST /v1/accounts/{account_id}/orders - создание ордера
-- DELETE /v1/accounts/{account_id}/orders/{order_id} - отмена ордера
+{render_endpoint_docs()}
 
 Формат твоего ответа должен быть таким:
 ```
@@ -48,6 +52,8 @@ API_REQUEST: GET /v1/instruments/SBER@MISX/quotes/latest
 
 def extract_api_request(text: str) -> tuple[str | None, str | None]:
     """Извлечь API запрос из ответа LLM"""
+    from src.app.adapters.finam_endpoints import get_router, split_request
+
     if "API_REQUEST:" not in text:
         return None, None
 
@@ -55,17 +61,168 @@ def extract_api_request(text: str) -> tuple[str | None, str | None]:
     for line in lines:
         if line.strip().startswith("API_REQUEST:"):
             request = line.replace("API_REQUEST:", "").strip()
-            parts = request.split(maxsplit=1)
-            if len(parts) == 2:
-                return parts[0], parts[1]
+            method, path = split_request(request)
+            # Запросы, которых нет в реестре API, не выполняем
+            normalized = get_router().normalize(method, path)
+            if normalized:
+                return normalized
     return None, None
 
 
+def get_assistant_reply(
+    conversation_history: list[dict[str, str]], structured: bool
+) -> tuple[str, str | None, str | None]:
+    """Получить ответ ассистента и API запрос из него
+
+    В structured режиме API запрос запрашивается как JSON по схеме эндпоинтов;
+    если запрос к API не нужен, делается обычный текстовый вызов.
+
+    Returns:
+        (assistant_message, method, path)
+    """
+    from src.app.core import call_llm
+    from src.app.core.structured_output import request_api_call
+
+    if structured:
+        try:
+            api_call, _ = request_api_call(conversation_history, temperature=0.3, allow_none=True)
+        except ValueError:
+            api_call = None
+        if api_call is not None:
+            method, path = api_call.to_request()
+            return f"API_REQUEST: {method} {path}", method, path
+
+    response = call_llm(conversation_history, temperature=0.3)
+    assistant_message = response["choices"][0]["message"]["content"]
+    method, path = extract_api_request(assistant_message)
+    return assistant_message, method, path
+
+
+def answer_turn(
+    conversation_history: list[dict[str, str]],
+    structured: bool,
+    finam_client: "FinamAPIClient",
+    account_id: str | None,
+) -> str:
+    """Один ход диалога: ответ LLM, API запрос из него и финальный ответ по результату"""
+    from src.app.core import call_llm
+
+    assistant_message, method, path = get_assistant_reply(conversation_history, structured)
+
+    if method and path:
+        # Подставляем account_id если есть
+        if account_id and "{account_id}" in path:  # noqa: RUF027
+            path = path.replace("{account_id}", account_id)
+
+        # Выполняем API запрос
+        click.echo(f"\n   🔍 Выполняю запрос: {method} {path}")
+        api_response = finam_client.execute_request(method, path)
+
+        # Проверяем на ошибки
+        if "error" in api_response:
+            click.echo(f"   ⚠️  Ошибка API: {api_response.get('error')}", err=True)
+            if "details" in api_response:
+                click.echo(f"   Детали: {api_response['details']}", err=True)
+        else:
+            click.echo(f"   📡 Ответ API: {api_response}\n")
+
+        # Добавляем результат API в контекст
+        conversation_history.append({"role": "assistant", "content": assistant_message})
+        conversation_history.append({
+            "role": "user",
+            "content": f"Результат API запроса: {api_response}\n\nПроанализируй это.",
+        })
+
+        # Получаем финальный ответ
+        response = call_llm(conversation_history, temperature=0.3)
+        assistant_message = response["choices"][0]["message"]["content"]
+
+    return assistant_message
+
+
+def format_turn_telemetry(turn_id: str) -> str:
+    """Строка телеметрии хода: вызовы LLM и Finam API, время, токены, стоимость"""
+    from src.app.core.telemetry import get_telemetry, summarize
+
+    return format_summary(summarize(get_telemetry().spans({turn_id})))
+
+
+def format_summary(summary: dict[str, dict[str, float]]) -> str:
+    """Строка телеметрии по сводке summarize()"""
+    llm = [summary[kind] for kind in ("llm", "agent_llm") if kind in summary]
+    finam = summary.get("finam")
+    parts = [
+        f"LLM: {int(sum(s['calls'] for s in llm))} выз., {sum(s['duration'] for s in llm):.2f} с, "
+        f"{int(sum(s['prompt_tokens'] + s['completion_tokens'] for s in llm))} ток., ${sum(s['cost'] for s in llm):.5f}"
+    ]
+    if finam:
+        parts.append(f"Finam: {int(finam['calls'])} запр., {finam['duration']:.2f} с, ошибок {int(finam['errors'])}")
+    cache = summary.get("cache")
+    if cache:
+        parts.append(f"Кэш: {int(cache['cache_hits'])}/{int(cache['calls'])}, сэкономлено {cache['saved']:.2f} с")
+    return "   📊 " + " | ".join(parts)
+
+
+def open_server_session(server: str, api_token: str | None, account_id: str | None) -> str:
+    """Создать сессию на API сервисе чата (src/app/interfaces/api_server.py)"""
+    import requests
+
+    response = requests.post(
+        f"{server}/v1/sessions", json={"account_id": account_id}, headers={"X-Finam-Token": api_token or ""}, timeout=10
+    )
+    response.raise_for_status()
+    return response.json()["session_id"]
+
+
+def ask_server(server: str, session_id: str, question: str, api_token: str | None, structured: bool) -> dict:
+    """Задать вопрос API сервису и печатать шаги агентов по мере выполнения (SSE)"""
+    import requests
+
+    headers = {"X-Finam-Token": api_token or ""}
+    response = requests.post(
+        f"{server}/v1/sessions/{session_id}/messages",
+        json={"content": question, "mode": "structured" if structured else "auto"},
+        headers=headers,
+        timeout=10,
+    )
+    response.raise_for_status()
+    job_id = response.json()["job_id"]
+
+    event = None
+    # Таймаут только на подключение: между шагами агентов поток может молчать долго
+    with requests.get(f"{server}/v1/jobs/{job_id}/events", headers=headers, stream=True, timeout=SSE_TIMEOUT) as stream:
+        for line in stream.iter_lines(decode_unicode=True):
+            if line.startswith("event:"):
+                event = line.removeprefix("event:").strip()
+            elif line.startswith("data:"):
+                data = json.loads(line.removeprefix("data:"))
+                if event == "update":
+                    text = " ".join(data["text"].split())[:120]
+                    click.echo(f"\n   ⏳ {data['agent']}, шаг {data['step']}: {text}", nl=False)
+                else:
+                    click.echo()
+                    return data
+    raise RuntimeError("Сервис закрыл поток событий без ответа")
+
+
 @click.command()
 @click.option("--account-id", default=None, help="ID счета для работы (опционально)")
 @click.option("--api-token", default=None, help="Finam API токен (или используйте FINAM_ACCESS_TOKEN)")
-def main(account_id: str | None, api_token: str | None) -> None:  # noqa: C901
+@click.option("--structured", is_flag=True, default=False, help="Structured output для генерации API запросов")
+@click.option("--telemetry", is_flag=True, default=False, help="Печатать время, токены и стоимость каждого ответа")
+@click.option("--server", default=None, help="URL API сервиса чата (api-server): CLI работает как тонкий клиент")
+def main(account_id: str | None, api_token: str | None, structured: bool, telemetry: bool, server: str | None) -> None:
     """Запустить интерактивный CLI чат с AI ассистентом"""
+    if server:
+        # Сервис не подставляет свой токен: клиент передает токен пользователя в X-Finam-Token
+        api_token = api_token or os.getenv("FINAM_ACCESS_TOKEN")
+        run_thin_client(server.rstrip("/"), account_id, api_token, structured, telemetry)
+        return
+
+    from src.app.adapters import FinamAPIClient
+    from src.app.core import get_settings
+    from src.app.core.telemetry import turn
+
     settings = get_settings()
 
     # Инициализируем клиент Finam API
@@ -111,44 +268,52 @@ def main(account_id: str | None, api_token: str | None) -> None:  # noqa: C901
             # Добавляем вопрос в историю
             conversation_history.append({"role": "user", "content": user_input})
 
-            # Получаем ответ от LLM
+            # Получаем ответ от LLM и проверяем, есть ли в нем API запрос
             click.echo("🤖 Ассистент: ", nl=False)
-            response = call_llm(conversation_history, temperature=0.3)
-            assistant_message = response["choices"][0]["message"]["content"]
-
-            # Проверяем, есть ли API запрос
-            method, path = extract_api_request(assistant_message)
-
-            if method and path:
-                # Подставляем account_id если есть
-                if account_id and "{account_id}" in path:  # noqa: RUF027
-                    path = path.replace("{account_id}", account_id)
-
-                # Выполняем API запрос
-                click.echo(f"\n   🔍 Выполняю запрос: {method} {path}")
-                api_response = finam_client.execute_request(method, path)
-
-                # Проверяем на ошибки
-                if "error" in api_response:
-                    click.echo(f"   ⚠️  Ошибка API: {api_response.get('error')}", err=True)
-                    if "details" in api_response:
-                        click.echo(f"   Детали: {api_response['details']}", err=True)
-                else:
-                    click.echo(f"   📡 Ответ API: {api_response}\n")
+            with turn() as turn_id:
+                assistant_message = answer_turn(conversation_history, structured, finam_client, account_id)
+            click.echo(f"{assistant_message}\n")
+            conversation_history.append({"role": "assistant", "content": assistant_message})
+            if telemetry:
+                click.echo(format_turn_telemetry(turn_id))
 
-                # Добавляем результат API в контекст
-                conversation_history.append({"role": "assistant", "content": assistant_message})
-                conversation_history.append({
-                    "role": "user",
-                    "content": f"Результат API запроса: {api_response}\n\nПроанализируй это.",
-                })
+        except KeyboardInterrupt:
+            click.echo("\n\n👋 До свидания!")
+            sys.exit(0)
+        except Exception as e:
+            click.echo(f"\n❌ Ошибка: {e}", err=True)
 
-                # Получаем финальный ответ
-                response = call_llm(conversation_history, temperature=0.3)
-                assistant_message = response["choices"][0]["message"]["content"]
 
-            click.echo(f"{assistant_message}\n")
-            conversation_history.append({"role": "assistant", "content": assistant_message})
+def run_thin_client(
+    server: str, account_id: str | None, api_token: str | None, structured: bool, telemetry: bool
+) -> None:
+    """Чат через API сервис: история, агенты и Finam API на стороне сервиса"""
+    session_id = open_server_session(server, api_token, account_id)
+    click.echo(f"✅ Подключено к {server} (сессия {session_id[:8]})")
+    click.echo("  - 'exit' или 'quit' - выход, 'clear' - новая сессия")
+
+    while True:
+        try:
+            user_input = click.prompt("\n👤 Вы", type=str, prompt_suffix=": ")
+            if user_input.lower() in ["exit", "quit", "выход"]:
+                click.echo("\n👋 До свидания!")
+                break
+            if user_input.lower() in ["clear", "очистить"]:
+                session_id = open_server_session(server, api_token, account_id)
+                click.echo("🔄 История очищена")
+                continue
+
+            click.echo("🤖 Ассистент: ", nl=False)
+            result = ask_server(server, session_id, user_input, api_token, structured)
+            if result["status"] != "done":
+                click.echo(f"❌ {result['status']}: {result.get('error') or ''}", err=True)
+                continue
+            reply = result["reply"]
+            if reply.get("api_request"):
+                click.echo(f"   🔍 {reply['api_request']['method']} {reply['api_request']['path']}")
+            click.echo(f"{reply['content']}\n")
+            if telemetry:
+                click.echo(f"{format_summary(reply.get('telemetry') or {})} | всего {result['elapsed']:.2f} с")
 
         except KeyboardInterrupt:
             click.echo("\n\n👋 До свидания!")
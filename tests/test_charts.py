@@ -0,0 +1,63 @@
+import pytest
+
+from src.app.core.charts import ChartError, ChartSpec, extract_chart_specs, strip_chart_specs
+
+ANSWER = """Вот график:
+CHART_SPEC: {"chart": "candles", "symbol": "SBER@MISX", "start": "2025-09-22T00:00:00Z", "end": "2025-09-28T23:59:59Z"}
+И структура портфеля:
+CHART_SPEC: {"chart": "portfolio", "account_id": "A1"}
+"""
+
+
+def test_extract_chart_specs() -> None:
+    specs = extract_chart_specs(ANSWER)
+
+    assert [s.chart for s in specs] == ["candles", "portfolio"]
+    assert specs[0].symbols == ["SBER@MISX"]
+    # Таймфрейм не задан: выбирается по длине интервала, как в core/temporal.py
+    assert specs[0].timeframe == "TIME_FRAME_H1"
+    assert specs[1].account_id == "A1"
+    assert specs[1].timeframe == "TIME_FRAME_D"
+
+
+@pytest.mark.parametrize(
+    "line",
+    [
+        'CHART_SPEC: {"chart": "pie", "symbols": ["SBER@MISX"]}',
+        'CHART_SPEC: {"chart": "candles"}',
+        'CHART_SPEC: {"chart": "equity", "symbols": ["SBER@MISX"]}',
+        'CHART_SPEC: {"chart": "candles", "symbols": ["SBER@MISX"]',
+        'CHART_SPEC: {"chart": "candles", "symbols": 5}',
+        'Текст CHART_SPEC: {"chart": "candles", "symbols": ["SBER@MISX"]}',
+    ],
+)
+def test_invalid_specs_skipped(line: str) -> None:
+    assert extract_chart_specs(line) == []
+
+
+def test_strip_chart_specs() -> None:
+    assert strip_chart_specs(ANSWER) == "Вот график:\n\nИ структура портфеля:"
+
+
+@pytest.mark.parametrize(
+    ("data", "message"),
+    [
+        ({"chart": "pie"}, "Неизвестный тип графика"),
+        ({"chart": "scanner"}, "хотя бы один тикер"),
+        ({"chart": "portfolio"}, "нужен account_id"),
+    ],
+)
+def test_from_dict_errors(data: dict[str, str], message: str) -> None:
+    with pytest.raises(ChartError, match=message):
+        ChartSpec.from_dict(data)
+
+
+def test_to_json_roundtrip() -> None:
+    spec = ChartSpec.from_dict({
+        "chart": "scanner",
+        "symbols": ["SBER@MISX", "GAZP@MISX"],
+        "timeframe": "TIME_FRAME_H4",
+    })
+
+    assert spec.to_json() == '{"chart": "scanner", "symbols": ["SBER@MISX", "GAZP@MISX"], "timeframe": "TIME_FRAME_H4"}'
+    assert extract_chart_specs(f"CHART_SPEC: {spec.to_json()}") == [spec]
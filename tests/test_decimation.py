@@ -0,0 +1,75 @@
+from collections.abc import Callable
+
+import numpy as np
+import pytest
+
+from src.app.core.decimation import aggregate_ohlc, bucket_starts, lttb_indices, minmax_indices
+
+
+def make_bars(n: int) -> dict[str, np.ndarray]:
+    rng = np.random.default_rng(0)
+    close = 100 + np.cumsum(rng.normal(size=n))
+    open_ = np.concatenate([[100.0], close[:-1]])
+    return {
+        "time": np.arange(n, dtype=np.int64),
+        "open": open_,
+        "high": np.maximum(open_, close) + 1,
+        "low": np.minimum(open_, close) - 1,
+        "close": close,
+        "volume": np.ones(n),
+    }
+
+
+def test_bucket_starts() -> None:
+    assert bucket_starts(10, 3).tolist() == [0, 3, 6]
+    assert bucket_starts(4, 4).tolist() == [0, 1, 2, 3]
+
+
+def test_aggregate_ohlc() -> None:
+    """Экстремумы и объем сохраняются точно, open/close - первой и последней свечи корзины"""
+    bars = make_bars(10_000)
+    result = aggregate_ohlc(bars, max_bars=100)
+
+    assert all(len(column) == 100 for column in result.values())
+    assert result["high"].max() == bars["high"].max()
+    assert result["low"].min() == bars["low"].min()
+    assert result["volume"].sum() == bars["volume"].sum()
+    assert (result["time"][0], result["open"][0], result["close"][-1]) == (0, bars["open"][0], bars["close"][-1])
+    assert result["close"][0] == bars["close"][99]
+
+
+def test_aggregate_ohlc_short_series() -> None:
+    bars = make_bars(50)
+    assert aggregate_ohlc(bars, max_bars=100) is bars
+
+
+@pytest.mark.parametrize("n", [5_001, 10_000, 123_457])
+def test_minmax_indices(n: int) -> None:
+    y = np.sin(np.linspace(0, 40, n)) * np.linspace(1, 2, n)
+    indices = minmax_indices(y, max_points=500)
+
+    assert len(indices) <= 502
+    assert (np.diff(indices) > 0).all()
+    assert (indices[0], indices[-1]) == (0, n - 1)
+    assert indices.max() < n
+    assert y[indices].max() == y.max()
+    assert y[indices].min() == y.min()
+
+
+@pytest.mark.parametrize("n", [5_001, 10_000])
+def test_lttb_indices(n: int) -> None:
+    y = np.cos(np.linspace(0, 30, n))
+    y[n // 3] = 10.0
+    indices = lttb_indices(y, max_points=300)
+
+    assert len(indices) == 300
+    assert (np.diff(indices) > 0).all()
+    assert (indices[0], indices[-1]) == (0, n - 1)
+    # Одиночный выброс образует наибольший треугольник в своей корзине
+    assert n // 3 in indices
+
+
+@pytest.mark.parametrize("decimate", [minmax_indices, lttb_indices])
+def test_short_series_untouched(decimate: Callable[..., np.ndarray]) -> None:
+    y = np.arange(10, dtype=np.float64)
+    assert decimate(y, max_points=100).tolist() == list(range(10))
@@ -0,0 +1,48 @@
+import csv
+from pathlib import Path
+
+import pytest
+
+from src.app.adapters.finam_endpoints import get_router, split_request
+
+TRAIN_CSV = Path(__file__).resolve().parents[1] / "data" / "processed" / "train.csv"
+
+
+def load_train() -> list[dict[str, str]]:
+    with open(TRAIN_CSV, encoding="utf-8") as f:
+        return list(csv.DictReader(f, delimiter=";"))
+
+
+@pytest.mark.parametrize("row", load_train(), ids=lambda row: row["uid"])
+def test_normalize_train_requests(row: dict[str, str]) -> None:
+    """Каждый эталонный запрос train.csv распознается с методом из колонки type, нормализация идемпотентна"""
+    method, path = split_request(row["request"])
+    normalized = get_router().normalize(method or row["type"], path)
+
+    assert normalized is not None
+    assert normalized[0] == row["type"]
+    assert get_router().normalize(*normalized) == normalized
+
+
+@pytest.mark.parametrize(
+    ("method", "path", "expected"),
+    [
+        ("GET", "/v1/instruments/SBER@MISX/quotes/latest", ("GET", "/v1/instruments/SBER@MISX/quotes/latest")),
+        ("get", "https://api.finam.ru/v1/assets/SBER@MISX", ("GET", "/v1/assets/SBER@MISX")),
+        ("GET", "`/v1//exchanges/`", ("GET", "/v1/exchanges")),
+        ("GET", " /v1/exchanges. ", ("GET", "/v1/exchanges")),
+        (None, "/v1/assets/SBER@MISX/params", ("GET", "/v1/assets/SBER@MISX/params")),
+        ("POST", "/v1/accounts/A1/orders", ("POST", "/v1/accounts/A1/orders")),
+        ("DELETE", "/v1/accounts/A1/orders/ORD1", ("DELETE", "/v1/accounts/A1/orders/ORD1")),
+        (
+            "GET",
+            "/v1/instruments/SBER@MISX/bars?interval.end_time=2025-01-02&foo=1&timeframe=TIME_FRAME_D",
+            ("GET", "/v1/instruments/SBER@MISX/bars?timeframe=TIME_FRAME_D&interval.end_time=2025-01-02"),
+        ),
+        ("GET", "/v1/unknown", None),
+        ("GET", "/v1/instruments/SBER@MISX", None),
+        ("GET", "", None),
+    ],
+)
+def test_normalize(method: str | None, path: str, expected: tuple[str, str] | None) -> None:
+    assert get_router().normalize(method, path) == expected
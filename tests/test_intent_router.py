@@ -0,0 +1,99 @@
+from typing import Any
+
+import pytest
+
+from src.app.core import intent_router
+from src.app.core.intent_router import answer_routed, route_question
+
+
+@pytest.fixture(autouse=True)
+def reference_date(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Относительные периоды считаются от даты, на которую собран train.csv"""
+    monkeypatch.setenv("REFERENCE_DATE", "2025-09-29")
+
+
+@pytest.mark.parametrize(
+    ("question", "request_"),
+    [
+        ("Биржевой стакан по Сургутнефтегазу.", "/v1/instruments/SNGS@MISX/orderbook"),
+        ("Цена последней сделки по ROSN@MISX.", "/v1/instruments/ROSN@MISX/quotes/latest"),
+        ("Какая цена открытия была сегодня у Магнита?", "/v1/instruments/MGNT@MISX/quotes/latest"),
+        ("Отобрази поток сделок для Газпрома.", "/v1/instruments/GAZP@MISX/trades/latest"),
+        ("Какое расписание торгов у акций Сбербанка?", "/v1/assets/SBER@MISX/schedule"),
+        ("Доступна ли покупка акций 'Мечел' на счете 77777?", "/v1/assets/MTLR@MISX/params?account_id=77777"),
+        ("Покажи все биржи.", "/v1/exchanges"),
+        ("Какие были последние 15 транзакций по счету ACC-001-A?", "/v1/accounts/ACC-001-A/transactions?limit=15"),
+        ("Покажи мне все мои активные заявки на счете A12345", "/v1/accounts/A12345/orders"),
+        (
+            "Выгрузи исторические данные по ROSN@MISX, таймфрейм H4, за Q2 2025.",
+            "/v1/instruments/ROSN@MISX/bars?timeframe=TIME_FRAME_H4"
+            "&interval.start_time=2025-04-01T00:00:00Z&interval.end_time=2025-06-30T23:59:59Z",
+        ),
+        (
+            "Получить историю сделок за прошлый месяц для счета USR-305-C",
+            "/v1/accounts/USR-305-C/trades?interval.start_time=2025-08-01T00:00:00Z&interval.end_time=2025-08-31T23:59:59Z",
+        ),
+    ],
+)
+def test_routed(question: str, request_: str) -> None:
+    route = route_question(question)
+
+    assert route is not None
+    assert route.to_request() == ("GET", request_)
+
+
+def test_account_id_from_settings() -> None:
+    """Счет из настроек подставляется, только если его нет в вопросе"""
+    assert route_question("Покажи мои активные заявки") is None
+    route = route_question("Покажи мои активные заявки", account_id="A1")
+    assert route is not None
+    assert route.to_request() == ("GET", "/v1/accounts/A1/orders")
+
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        # Визуализация, сравнение и несколько инструментов - агентам
+        "Построй график цены SBER@MISX",
+        "Сравни цены SBER@MISX и GAZP@MISX",
+        "Цена SBER@MISX и GAZP@MISX",
+        "Цена SBER@MISX? А стакан?",
+        # Изменяющие запросы не выполняются напрямую
+        "Купи 10 акций SBER@MISX на счете A1",
+        "Отмени заявку ORD1 на счете A1",
+        # Период, который эндпоинт не принимает: это свечи, а не последняя котировка
+        "Какой была цена открытия Газпрома в этом месяце?",
+        # Период, который temporal не разобрал
+        "Свечи SBER@MISX с 01.03 по 05.03",
+        "Цена Рога и копыта",
+        "Привет",
+    ],
+)
+def test_not_routed(question: str) -> None:
+    assert route_question(question) is None
+
+
+def test_answer_routed(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Один вызов эндпоинта и один вызов LLM с его результатом"""
+    route = route_question("Стакан по SBER@MISX")
+    assert route is not None
+    calls: list[tuple[str, dict[str, Any]]] = []
+    prompts: list[list[dict[str, str]]] = []
+
+    class Client:
+        def call_endpoint(self, name: str, **slots: Any) -> dict[str, Any]:  # noqa: ANN401
+            calls.append((name, slots))
+            return {"bids": []}
+
+    def fake_llm(messages: list[dict[str, str]], **_: Any) -> dict[str, Any]:  # noqa: ANN401
+        prompts.append(messages)
+        return {"choices": [{"message": {"content": "Стакан пуст"}}]}
+
+    monkeypatch.setattr(intent_router, "call_llm", fake_llm)
+    history = [{"role": "user", "content": "Стакан по SBER@MISX"}]
+    answer = answer_routed(route, Client(), history)  # type: ignore[arg-type]
+
+    assert (answer.output, answer.method, answer.path) == ("Стакан пуст", "GET", "/v1/instruments/SBER@MISX/orderbook")
+    assert answer.response == {"bids": []}
+    assert len(calls) == 1
+    assert prompts[0][-2] == {"role": "assistant", "content": "API_REQUEST: GET /v1/instruments/SBER@MISX/orderbook"}
@@ -0,0 +1,137 @@
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextvars import ContextVar
+from typing import Any
+
+import pytest
+
+from src.app.core.jobs import Job, JobRunner, ResourcePool
+
+TIMEOUT = 5.0
+
+request_id: ContextVar[str | None] = ContextVar("request_id", default=None)
+
+
+@pytest.fixture
+def runner() -> Iterator[JobRunner]:
+    runner = JobRunner(max_workers=4, history=3, sessions=2)
+    yield runner
+    runner._pool.shutdown(wait=True, cancel_futures=True)
+
+
+def wait_done(runner: JobRunner, job: Job) -> Job:
+    """Дождаться, пока задача завершится и runner переключит очередь ее сессии"""
+    deadline = time.monotonic() + TIMEOUT
+    while not job.done or runner._running.get(job.session) is job:
+        assert time.monotonic() < deadline, f"job {job.id} is still {job.status}"
+        time.sleep(0.005)
+    return job
+
+
+def blocking(gate: threading.Event, result: Any = None) -> Callable[[Job], Any]:  # noqa: ANN401
+    """Задача, которая ждет gate; проверяет отмену, как шаги агента"""
+
+    def run(job: Job) -> Any:  # noqa: ANN401
+        while not gate.wait(0.005):
+            job.check_cancelled()
+        return result
+
+    return run
+
+
+def test_session_queue_runs_in_order(runner: JobRunner) -> None:
+    """Задачи одной сессии по очереди, разных сессий - параллельно"""
+    gate = threading.Event()
+    first = runner.submit("s1", blocking(gate, 1))
+    second = runner.submit("s1", lambda _: 2)
+    other = wait_done(runner, runner.submit("s2", lambda _: 3))
+
+    assert (first.status, second.status, other.status) == ("running", "queued", "done")
+    gate.set()
+    assert (wait_done(runner, first).result, wait_done(runner, second).result) == (1, 2)
+    assert first.finished is not None
+    assert second.started is not None
+    assert second.started >= first.finished
+    assert [j.id for j in runner.jobs("s1")] == [first.id, second.id]
+
+
+def test_job_error_and_context(runner: JobRunner) -> None:
+    """Ошибка задачи сохраняется в Job; contextvars вызывающего видны в потоке задачи"""
+
+    def fail(_: Job) -> None:
+        raise RuntimeError("finam down")
+
+    token = request_id.set("turn-1")
+    try:
+        seen = wait_done(runner, runner.submit("s1", lambda _: request_id.get()))
+    finally:
+        request_id.reset(token)
+    failed = wait_done(runner, runner.submit("s1", fail))
+
+    assert seen.result == "turn-1"
+    assert (failed.status, failed.error) == ("error", "finam down")
+
+
+def test_cancel_queued(runner: JobRunner) -> None:
+    gate = threading.Event()
+    running = runner.submit("s1", blocking(gate))
+    queued = runner.submit("s1", lambda _: "never")
+
+    assert runner.cancel(queued.id)
+    assert queued.status == "cancelled"
+    gate.set()
+    wait_done(runner, running)
+    assert queued.result is None
+    assert not runner.cancel(queued.id)
+
+
+def test_cancel_running(runner: JobRunner) -> None:
+    """Выполняемая задача получает флаг отмены и обработчики on_cancel"""
+    gate = threading.Event()
+    interrupted: list[str] = []
+    job = runner.submit("s1", blocking(gate))
+    job.on_cancel(lambda: interrupted.append(job.id))
+
+    assert runner.cancel(job.id)
+    assert wait_done(runner, job).status == "cancelled"
+    assert interrupted == [job.id]
+    assert not runner.cancel("unknown")
+
+
+def test_finished_jobs_are_bounded(runner: JobRunner) -> None:
+    """Помнятся последние history задач сессии и последние sessions сессий"""
+    jobs = [wait_done(runner, runner.submit("s1", lambda _: None)) for _ in range(5)]
+    assert [j.id for j in runner.jobs("s1")] == [j.id for j in jobs[-3:]]
+    assert runner.get(jobs[0].id) is None
+
+    wait_done(runner, runner.submit("s2", lambda _: None))
+    wait_done(runner, runner.submit("s3", lambda _: None))
+    assert runner.jobs("s1") == []
+    assert len(runner.jobs("s2")) == len(runner.jobs("s3")) == 1
+    assert len(runner._jobs) == 2
+
+
+def test_resource_pool_reuses_items() -> None:
+    created: list[object] = []
+
+    def factory() -> object:
+        created.append(object())
+        return created[-1]
+
+    pool = ResourcePool(factory)
+    # Занятый объект не выдается второй раз
+    with pool.checkout() as first, pool.checkout() as second:
+        assert second is not first
+    with pool.checkout() as again:
+        assert again in (first, second)
+
+    assert len(created) == 2
+
+
+def test_resource_pool_returns_item_on_error() -> None:
+    pool = ResourcePool(object)
+    with pytest.raises(ValueError, match="agent failed"), pool.checkout() as item:
+        raise ValueError("agent failed")
+    with pool.checkout() as again:
+        assert again is item
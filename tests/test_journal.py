@@ -0,0 +1,91 @@
+import json
+import threading
+from pathlib import Path
+
+import pytest
+
+from scripts.generate_submission import select_pending
+from src.app.core.journal import CheckpointJournal
+
+
+def test_load_missing_file(tmp_path: Path) -> None:
+    assert CheckpointJournal(tmp_path / "missing.jsonl").load() == {}
+
+
+def test_last_record_per_key_wins(tmp_path: Path) -> None:
+    journal = CheckpointJournal(tmp_path / "run" / "journal.jsonl")
+    journal.append({"uid": "a", "status": "failed"})
+    journal.append({"uid": "b", "status": "ok"})
+    journal.append({"uid": "a", "status": "ok"})
+
+    assert journal.load() == {"a": {"uid": "a", "status": "ok"}, "b": {"uid": "b", "status": "ok"}}
+
+
+def test_resume_after_truncated_line(tmp_path: Path) -> None:
+    """Недописанная при падении строка пропускается, новая запись после перезапуска не склеивается с ней"""
+    path = tmp_path / "journal.jsonl"
+    path.write_text(json.dumps({"uid": "a", "status": "ok"}) + "\n" + '{"uid": "b", "sta', encoding="utf-8")
+
+    resumed = CheckpointJournal(path)
+    assert resumed.load() == {"a": {"uid": "a", "status": "ok"}}
+
+    resumed.append({"uid": "b", "status": "ok"})
+    assert CheckpointJournal(path).load() == {"a": {"uid": "a", "status": "ok"}, "b": {"uid": "b", "status": "ok"}}
+
+
+@pytest.mark.parametrize(
+    "garbage",
+    ["not json\n", "[1, 2]\n", '{"status": "no key"}\n', "\n"],
+)
+def test_load_skips_records_without_key(tmp_path: Path, garbage: str) -> None:
+    path = tmp_path / "journal.jsonl"
+    path.write_text(garbage + json.dumps({"uid": "a"}) + "\n", encoding="utf-8")
+
+    assert CheckpointJournal(path).load() == {"a": {"uid": "a"}}
+
+
+def test_reset(tmp_path: Path) -> None:
+    journal = CheckpointJournal(tmp_path / "journal.jsonl")
+    journal.append({"uid": "a"})
+    journal.reset()
+    journal.append({"uid": "b"})
+
+    assert journal.load() == {"b": {"uid": "b"}}
+
+
+def test_concurrent_appends(tmp_path: Path) -> None:
+    journal = CheckpointJournal(tmp_path / "journal.jsonl")
+    threads = [
+        threading.Thread(target=lambda n=n: [journal.append({"uid": f"{n}-{i}"}) for i in range(50)]) for n in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(journal.load()) == 200
+
+
+QUESTIONS = [{"uid": "a", "question": "Цена SBER@MISX?"}, {"uid": "b", "question": "Стакан GAZP@MISX"}]
+
+
+@pytest.mark.parametrize(
+    ("done", "retry_failed", "expected"),
+    [
+        ({}, False, ["a", "b"]),
+        ({"a": {"question": "Цена SBER@MISX?", "status": "ok"}}, False, ["b"]),
+        ({"a": {"question": "Цена SBER@MISX?", "status": "failed"}}, False, ["b"]),
+        ({"a": {"question": "Цена SBER@MISX?", "status": "failed"}}, True, ["a", "b"]),
+        ({"a": {"question": "Другой вопрос", "status": "ok"}}, False, ["a", "b"]),
+        (
+            {
+                "a": {"question": "Цена SBER@MISX?", "status": "ok"},
+                "b": {"question": "Стакан GAZP@MISX", "status": "ok"},
+            },
+            True,
+            [],
+        ),
+    ],
+)
+def test_select_pending(done: dict, retry_failed: bool, expected: list[str]) -> None:
+    assert [item["uid"] for item in select_pending(QUESTIONS, done, retry_failed)] == expected
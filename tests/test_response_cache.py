@@ -0,0 +1,134 @@
+import pytest
+
+from src.app.core.intent_router import RoutedRequest, route_question
+from src.app.core.response_cache import CacheKey, ResponseCache
+
+QUOTE = {"symbol": "SBER@MISX", "quote": {"last": {"value": "310.5"}, "bid": "310.4", "ask": "310.6"}}
+
+
+@pytest.fixture(autouse=True)
+def reference_date(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Относительные периоды считаются от даты, на которую собран train.csv"""
+    monkeypatch.setenv("REFERENCE_DATE", "2025-09-29")
+
+
+class Clock:
+    """Ручные часы вместо time.monotonic"""
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def route(question: str) -> RoutedRequest:
+    routed = route_question(question)
+    assert routed is not None
+    return routed
+
+
+def test_key_normalizes_question() -> None:
+    """Разные формулировки одного запроса дают один ключ, другой эндпоинт или слот - другой"""
+    key = CacheKey.from_route(route("Цена SBER@MISX"))
+
+    assert key == CacheKey("get_quote", (("symbol", "SBER@MISX"),))
+    assert CacheKey.from_route(route("Какая цена у Сбербанка?")) == key
+    assert CacheKey.from_route(route("Стакан по SBER@MISX")) != key
+    assert CacheKey.from_route(route("Цена GAZP@MISX")) != key
+
+
+def test_key_slots_sorted() -> None:
+    key = CacheKey.from_route(route("Выгрузи исторические данные по ROSN@MISX, таймфрейм H4, за Q2 2025."))
+
+    assert key.endpoint == "get_candles"
+    assert [name for name, _ in key.slots] == ["end", "start", "symbol", "timeframe"]
+    assert ("start", "2025-04-01T00:00:00Z") in key.slots
+    other = CacheKey.from_route(route("Выгрузи исторические данные по ROSN@MISX, таймфрейм D, за Q2 2025."))
+    assert other != key
+
+
+def test_hit_without_api_call() -> None:
+    clock = Clock()
+    cache = ResponseCache(clock=clock)
+    assert cache.lookup(route("Цена SBER@MISX")) is None
+    assert cache.store(route("Цена SBER@MISX"), QUOTE, latency=2.0)
+
+    clock.now += 3
+    cached = cache.lookup(route("Какая цена у Сбербанка?"))
+
+    assert cached is not None
+    assert (cached.method, cached.path, cached.response) == ("GET", "/v1/instruments/SBER@MISX/quotes/latest", QUOTE)
+    assert cached.age == 3
+    assert 0 < cached.saved <= 2.0
+    assert cached.output.startswith("Котировка SBER@MISX: последняя цена 310.5, бид 310.4, аск 310.6")
+    assert cached.output.endswith("Данные получены 3 с назад.")
+
+
+@pytest.mark.parametrize(
+    ("question", "ttl"),
+    [("Цена SBER@MISX", 5), ("Стакан по SBER@MISX", 1), ("Покажи все биржи.", 24 * 3600)],
+)
+def test_ttl_expiry(question: str, ttl: float) -> None:
+    """Ответ живет cache_ttl эндпоинта, просроченная запись удаляется при поиске"""
+    clock = Clock()
+    cache = ResponseCache(clock=clock)
+    cache.store(route(question), {"data": 1}, latency=1.0)
+
+    clock.now += ttl - 0.1
+    assert cache.lookup(route(question)) is not None
+    clock.now += 0.1
+    assert cache.lookup(route(question)) is None
+    assert len(cache) == 0
+
+
+@pytest.mark.parametrize(
+    "response",
+    [
+        {"error": "HTTP 500", "details": "Internal Server Error"},
+        {"error": "HTTP 429"},
+        {"error": "Request error: timeout"},
+    ],
+)
+def test_errors_never_cached(response: dict[str, str]) -> None:
+    cache = ResponseCache(clock=Clock())
+
+    assert not cache.store(route("Цена SBER@MISX"), response, latency=1.0)
+    assert len(cache) == 0
+    assert cache.lookup(route("Цена SBER@MISX")) is None
+
+
+def test_error_keeps_previous_answer() -> None:
+    """Ошибка не затирает свежий ответ, полученный раньше"""
+    cache = ResponseCache(clock=Clock())
+    cache.store(route("Цена SBER@MISX"), QUOTE, latency=1.0)
+    cache.store(route("Цена SBER@MISX"), {"error": "HTTP 503"}, latency=1.0)
+
+    cached = cache.lookup(route("Цена SBER@MISX"))
+    assert cached is not None
+    assert cached.response == QUOTE
+
+
+def test_not_cacheable_endpoint() -> None:
+    """Заявки счета меняются в любой момент: эндпоинт без cache_ttl не кэшируется"""
+    cache = ResponseCache(clock=Clock())
+    orders = route("Покажи мне все мои активные заявки на счете A12345")
+
+    assert not cache.store(orders, {"orders": []}, latency=1.0)
+    assert cache.lookup(orders) is None
+
+
+def test_lru_eviction() -> None:
+    cache = ResponseCache(max_entries=2, clock=Clock())
+    cache.store(route("Цена SBER@MISX"), QUOTE, latency=1.0)
+    cache.store(route("Цена GAZP@MISX"), QUOTE, latency=1.0)
+    # Попадание продлевает жизнь записи в LRU
+    assert cache.lookup(route("Цена SBER@MISX")) is not None
+    cache.store(route("Стакан по SBER@MISX"), {"orderbook": {"rows": []}}, latency=1.0)
+
+    assert len(cache) == 2
+    assert cache.lookup(route("Цена GAZP@MISX")) is None
+    assert cache.lookup(route("Цена SBER@MISX")) is not None
+
+    cache.clear()
+    assert len(cache) == 0
@@ -0,0 +1,117 @@
+from collections.abc import Callable
+
+import pytest
+import requests
+
+from src.app.core.retry import FailureBudget, RetryError, RetryPolicy, call_with_retry, is_retryable
+
+NO_DELAY = RetryPolicy(max_attempts=3, base_delay=0.0, max_delay=0.0, timeout=None, request_timeout=7.0)
+
+
+def http_error(status: int) -> requests.HTTPError:
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(f"HTTP {status}", response=response)
+
+
+def flaky(*outcomes: BaseException | str) -> tuple[list[float], Callable[[float], str]]:
+    """Функция, которая по очереди бросает исключения или возвращает значения; список таймаутов вызовов"""
+    timeouts: list[float] = []
+    queue = list(outcomes)
+
+    def fn(timeout: float) -> str:
+        timeouts.append(timeout)
+        outcome = queue.pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+    return timeouts, fn
+
+
+@pytest.mark.parametrize(
+    ("error", "expected"),
+    [
+        (http_error(429), True),
+        (http_error(503), True),
+        (http_error(400), False),
+        (http_error(401), False),
+        (requests.HTTPError("no response"), True),
+        (requests.ConnectionError(), True),
+        (requests.Timeout(), True),
+        (ValueError("bad json"), False),
+    ],
+)
+def test_is_retryable(error: BaseException, expected: bool) -> None:
+    assert is_retryable(error) is expected
+
+
+@pytest.mark.parametrize(
+    ("outcomes", "result", "attempts"),
+    [
+        (["ok"], "ok", 1),
+        ([http_error(503), "ok"], "ok", 2),
+        ([requests.ConnectionError(), http_error(429), "ok"], "ok", 3),
+    ],
+)
+def test_call_with_retry_recovers(outcomes: list, result: str, attempts: int) -> None:
+    retries: list[int] = []
+    timeouts, fn = flaky(*outcomes)
+
+    assert call_with_retry(fn, NO_DELAY, on_retry=lambda attempt, _error, _delay: retries.append(attempt)) == result
+    assert len(timeouts) == attempts
+    assert retries == list(range(1, attempts))
+    assert all(timeout == NO_DELAY.request_timeout for timeout in timeouts)
+
+
+@pytest.mark.parametrize(
+    ("outcomes", "attempts"),
+    [
+        ([http_error(400)], 1),
+        ([http_error(503), ValueError("bad json")], 2),
+        ([http_error(503), http_error(503), http_error(503), "never"], 3),
+    ],
+)
+def test_call_with_retry_gives_up(outcomes: list, attempts: int) -> None:
+    timeouts, fn = flaky(*outcomes)
+
+    with pytest.raises(RetryError) as info:
+        call_with_retry(fn, NO_DELAY)
+
+    assert info.value.attempts == attempts
+    assert len(timeouts) == attempts
+    assert info.value.last_error is not None
+
+
+def test_call_with_retry_deadline_limits_request_timeout() -> None:
+    policy = RetryPolicy(max_attempts=5, base_delay=0.0, max_delay=0.0, timeout=0.5, request_timeout=60.0)
+    timeouts, fn = flaky("ok")
+
+    assert call_with_retry(fn, policy) == "ok"
+    assert 0 < timeouts[0] <= 0.5
+
+
+def test_call_with_retry_expired_deadline() -> None:
+    policy = RetryPolicy(max_attempts=5, base_delay=0.0, max_delay=0.0, timeout=0.0)
+    timeouts, fn = flaky("ok")
+
+    with pytest.raises(RetryError) as info:
+        call_with_retry(fn, policy)
+
+    assert info.value.attempts == 0
+    assert timeouts == []
+
+
+@pytest.mark.parametrize("attempt", [1, 2, 3, 10])
+def test_policy_delay_is_capped(attempt: int) -> None:
+    policy = RetryPolicy(base_delay=1.0, max_delay=3.0)
+    assert 0 <= policy.delay(attempt) <= min(3.0, 2 ** (attempt - 1))
+
+
+def test_failure_budget() -> None:
+    budget = FailureBudget(2)
+
+    assert budget.record_failure() is False
+    assert budget.exhausted is False
+    assert budget.record_failure() is True
+    assert budget.exhausted is True
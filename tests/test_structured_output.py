@@ -0,0 +1,94 @@
+import json
+
+import pytest
+
+from src.app.adapters.finam_endpoints import ENDPOINTS, TIMEFRAMES
+from src.app.core.structured_output import ApiCall, build_api_call_schema, parse_api_call
+
+
+def api_json(**fields: object) -> str:
+    return json.dumps({"method": "GET", "path_template": "/v1/instruments/{symbol}/quotes/latest", **fields})
+
+
+def test_schema_is_strict() -> None:
+    """Strict-схема: все поля обязательные, лишние запрещены, шаблоны путей из реестра"""
+    schema = build_api_call_schema()
+    properties = schema["properties"]
+
+    assert schema["additionalProperties"] is False
+    assert schema["required"] == list(properties)
+    assert properties["method"]["enum"] == ["DELETE", "GET", "POST"]
+    assert set(properties["path_template"]["enum"]) == {ep.path for ep in ENDPOINTS}
+    assert properties["timeframe"]["enum"] == [*TIMEFRAMES, None]
+    assert {"symbol", "account_id", "order_id", "start", "end", "limit", "depth"} <= set(properties)
+
+
+def test_schema_allow_none() -> None:
+    schema = build_api_call_schema(allow_none=True)
+
+    assert schema["properties"]["method"]["type"] == ["string", "null"]
+    assert None in schema["properties"]["method"]["enum"]
+    assert None in schema["properties"]["path_template"]["enum"]
+    assert None not in build_api_call_schema()["properties"]["method"]["enum"]
+
+
+@pytest.mark.parametrize(
+    ("fields", "expected"),
+    [
+        (
+            {"method": "GET", "path_template": "/v1/instruments/{symbol}/quotes/latest", "symbol": "SBER@MISX"},
+            ("GET", "/v1/instruments/SBER@MISX/quotes/latest"),
+        ),
+        (
+            {
+                "method": "GET",
+                "path_template": "/v1/instruments/{symbol}/bars",
+                "symbol": "SBER@MISX",
+                "timeframe": "TIME_FRAME_D",
+                "start": "2025-09-01T00:00:00Z",
+            },
+            ("GET", "/v1/instruments/SBER@MISX/bars?timeframe=TIME_FRAME_D&interval.start_time=2025-09-01T00:00:00Z"),
+        ),
+        (
+            {"method": "DELETE", "path_template": "/v1/accounts/{account_id}/orders/{order_id}", "order_id": "ORD1"},
+            ("DELETE", "/v1/accounts/{account_id}/orders/ORD1"),
+        ),
+        # Метод не подходит к шаблону, но путь однозначен
+        (
+            {"method": "POST", "path_template": "/v1/instruments/{symbol}/quotes/latest", "symbol": "SBER@MISX"},
+            ("GET", "/v1/instruments/SBER@MISX/quotes/latest"),
+        ),
+    ],
+)
+def test_to_request(fields: dict[str, str], expected: tuple[str, str]) -> None:
+    assert ApiCall.model_validate(fields).to_request() == expected
+
+
+def test_parse_api_call() -> None:
+    api_call = parse_api_call(api_json(symbol="GAZP@MISX", extra_field="ignored"))
+
+    assert api_call is not None
+    assert api_call.symbol == "GAZP@MISX"
+    assert api_call.to_request() == ("GET", "/v1/instruments/GAZP@MISX/quotes/latest")
+
+
+def test_parse_api_call_none() -> None:
+    """method/path_template = null - запрос к API не нужен"""
+    assert parse_api_call(json.dumps({"method": None, "path_template": None})) is None
+
+
+@pytest.mark.parametrize(
+    ("content", "message"),
+    [
+        ("not json", "invalid JSON"),
+        ("[1, 2]", "not an object"),
+        (api_json(method="PATCH"), "does not match schema"),
+        (api_json(limit="many"), "does not match schema"),
+        (api_json(path_template="/v1/unknown"), "Unknown endpoint"),
+        # Путь с несколькими методами: неподходящий метод не угадываем
+        (api_json(method="DELETE", path_template="/v1/accounts/{account_id}/orders"), "Unknown endpoint"),
+    ],
+)
+def test_parse_api_call_errors(content: str, message: str) -> None:
+    with pytest.raises(ValueError, match=message):
+        parse_api_call(content)
@@ -0,0 +1,131 @@
+from collections.abc import Iterator
+from typing import Any
+
+import pytest
+
+from src.app.adapters.finam_client import FinamAPIClient
+from src.app.core.telemetry import (
+    Span,
+    Telemetry,
+    current_turn,
+    get_telemetry,
+    render_prometheus,
+    span,
+    summarize,
+    turn,
+)
+
+
+@pytest.fixture
+def telemetry() -> Iterator[Telemetry]:
+    """Общий экземпляр телеметрии, очищенный до и после теста"""
+    instance = get_telemetry()
+    instance.clear()
+    yield instance
+    instance.clear()
+
+
+def make_span(name: str = "model", **fields: Any) -> Span:  # noqa: ANN401
+    return Span("llm", name, 0.0, **fields)
+
+
+def test_ring_buffer_keeps_totals() -> None:
+    """Буфер хранит только последние спаны, счетчики считают все"""
+    instance = Telemetry(capacity=2)
+    for i in range(3):
+        instance.record(make_span(duration=1.0, prompt_tokens=10, cost=0.5, status="error" if i == 0 else "ok"))
+
+    assert len(instance.spans()) == 2
+    assert instance.totals()[("llm", "model")] == {
+        "calls": 3,
+        "errors": 1,
+        "duration": 3.0,
+        "prompt_tokens": 30,
+        "completion_tokens": 0,
+        "cost": 1.5,
+        "cache_hits": 0,
+        "saved": 0.0,
+    }
+
+
+def test_spans_by_turn() -> None:
+    instance = Telemetry()
+    instance.record(make_span(turn="a"))
+    instance.record(make_span(turn="b"))
+    instance.record(make_span())
+
+    assert [s.turn for s in instance.spans({"a"})] == ["a"]
+    assert len(instance.spans()) == 3
+
+
+def test_failing_exporter_does_not_break_record() -> None:
+    instance = Telemetry()
+    exported: list[Span] = []
+
+    def broken(_: Span) -> None:
+        raise RuntimeError("exporter down")
+
+    instance.add_exporter(broken)
+    instance.add_exporter(exported.append)
+    instance.record(make_span())
+
+    assert len(exported) == 1
+    assert len(instance.spans()) == 1
+
+
+def test_span_and_turn(telemetry: Telemetry) -> None:
+    with turn("t1") as turn_id:
+        assert current_turn() == "t1"
+        with span("llm", "model", route="chat") as current:
+            current.prompt_tokens = 7
+    assert current_turn() is None
+
+    (recorded,) = telemetry.spans()
+    assert (turn_id, recorded.turn, recorded.status) == ("t1", "t1", "ok")
+    assert recorded.prompt_tokens == 7
+    assert recorded.attributes == {"route": "chat"}
+    assert recorded.duration >= 0
+
+
+def test_span_error_status(telemetry: Telemetry) -> None:
+    """Исключение помечает спан как error и пробрасывается дальше"""
+    with pytest.raises(ValueError, match="boom"), span("finam", "GET /v1/assets"):
+        raise ValueError("boom")
+
+    (recorded,) = telemetry.spans()
+    assert recorded.status == "error"
+
+
+def test_summarize() -> None:
+    spans = [make_span(cost=0.25), make_span(cost=0.25, cache_hit=True, saved=2.0), Span("finam", "GET", 0.0)]
+    summary = summarize(spans)
+
+    assert summary["llm"]["calls"] == 2
+    assert summary["llm"]["cost"] == 0.5
+    assert summary["llm"]["cache_hits"] == 1
+    assert summary["llm"]["saved"] == 2.0
+    assert summary["finam"]["calls"] == 1
+
+
+def test_render_prometheus() -> None:
+    instance = Telemetry()
+    instance.record(Span("finam", 'GET /v1/"x"', 0.0, duration=0.5, status="error"))
+    text = render_prometheus(instance)
+
+    assert "# TYPE finam_assistant_calls_total counter" in text
+    assert 'finam_assistant_calls_total{kind="finam",name="GET /v1/\\"x\\""} 1' in text
+    assert 'finam_assistant_errors_total{kind="finam",name="GET /v1/\\"x\\""} 1' in text
+    assert 'finam_assistant_duration_seconds_total{kind="finam",name="GET /v1/\\"x\\""} 0.5' in text
+
+
+def test_finam_client_span(telemetry: Telemetry, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Запрос клиента пишет спан с шаблоном эндпоинта и статусом ошибки"""
+    client = FinamAPIClient(access_token="token", base_url="http://finam.invalid")
+    monkeypatch.setattr(client, "_send_request", lambda *_, **__: {"error": "HTTP 404", "status_code": 404})
+
+    client.execute_request("GET", "/v1/instruments/SBER@MISX/quotes/latest")
+
+    (recorded,) = telemetry.spans()
+    assert (recorded.kind, recorded.name) == ("finam", "GET /v1/instruments/{symbol}/quotes/latest")
+    assert recorded.status == "error"
+    assert recorded.attributes == {"status_code": 404}
@@ -0,0 +1,130 @@
+from datetime import UTC, datetime
+
+import pytest
+
+from src.app.core.temporal import annotate_period, infer_timeframe, reference_now, resolve_period
+
+# Понедельник, на эту дату собран train.csv
+NOW = datetime(2025, 9, 29, 12, 0, tzinfo=UTC)
+
+
+@pytest.mark.parametrize(
+    ("text", "start", "end"),
+    [
+        ("Свечи за вчера", "2025-09-28T00:00:00Z", "2025-09-28T23:59:59Z"),
+        ("Сделки позавчера", "2025-09-27T00:00:00Z", "2025-09-27T23:59:59Z"),
+        ("Что было сегодня", "2025-09-29T00:00:00Z", "2025-09-29T23:59:59Z"),
+        ("Свечи yesterday", "2025-09-28T00:00:00Z", "2025-09-28T23:59:59Z"),
+        ("Свечи за прошлую неделю", "2025-09-22T00:00:00Z", "2025-09-28T23:59:59Z"),
+        ("Сделки в прошлом месяце", "2025-08-01T00:00:00Z", "2025-08-31T23:59:59Z"),
+        ("Итоги за прошлый год", "2024-01-01T00:00:00Z", "2024-12-31T23:59:59Z"),
+        ("Прошлый квартал", "2025-04-01T00:00:00Z", "2025-06-30T23:59:59Z"),
+        ("Последний квартал", "2025-07-01T00:00:00Z", "2025-09-30T23:59:59Z"),
+        ("С начала года", "2025-01-01T00:00:00Z", "2025-09-29T23:59:59Z"),
+        ("Ytd доходность", "2025-01-01T00:00:00Z", "2025-09-29T23:59:59Z"),
+        ("В этом месяце", "2025-09-01T00:00:00Z", "2025-09-29T23:59:59Z"),
+        ("За последние 3 дня", "2025-09-26T00:00:00Z", "2025-09-29T23:59:59Z"),
+        ("За последние две недели", "2025-09-15T00:00:00Z", "2025-09-29T23:59:59Z"),
+        ("Последние 6 месяцев", "2025-03-29T00:00:00Z", "2025-09-29T23:59:59Z"),
+        ("За последний час", "2025-09-29T11:00:00Z", "2025-09-29T12:00:00Z"),
+        ("Last 30 minutes", "2025-09-29T11:30:00Z", "2025-09-29T12:00:00Z"),
+        ("В августе 2025", "2025-08-01T00:00:00Z", "2025-08-31T23:59:59Z"),
+        ("В августе", "2025-08-01T00:00:00Z", "2025-08-31T23:59:59Z"),
+        ("В декабре", "2024-12-01T00:00:00Z", "2024-12-31T23:59:59Z"),
+        ("Q1 2024", "2024-01-01T00:00:00Z", "2024-03-31T23:59:59Z"),
+        ("3 квартал", "2025-07-01T00:00:00Z", "2025-09-30T23:59:59Z"),
+        ("За 2023 год", "2023-01-01T00:00:00Z", "2023-12-31T23:59:59Z"),
+        ("Дивиденды в 2024 году", "2024-01-01T00:00:00Z", "2024-12-31T23:59:59Z"),
+        ("Отчет за 2022 г.", "2022-01-01T00:00:00Z", "2022-12-31T23:59:59Z"),
+        ("Сделки за 2024?", "2024-01-01T00:00:00Z", "2024-12-31T23:59:59Z"),
+        ("Trades for 2024", "2024-01-01T00:00:00Z", "2024-12-31T23:59:59Z"),
+        ("5 сентября", "2025-09-05T00:00:00Z", "2025-09-05T23:59:59Z"),
+        ("С 15 по 20 августа", "2025-08-15T00:00:00Z", "2025-08-20T23:59:59Z"),
+        ("За все время", "2014-01-01T00:00:00Z", "2025-09-29T23:59:59Z"),
+        ("С 2025-09-01 по 2025-09-15", "2025-09-01T00:00:00Z", "2025-09-15T23:59:59Z"),
+        ("Between 2025-09-01 and 2025-09-15", "2025-09-01T00:00:00Z", "2025-09-15T23:59:59Z"),
+        ("Между 2025-09-01 и 2025-09-15", "2025-09-01T00:00:00Z", "2025-09-15T23:59:59Z"),
+        ("Сделки между 01.09.2025 и 15.09.2025", "2025-09-01T00:00:00Z", "2025-09-15T23:59:59Z"),
+        ("Между 1 сентября и 15 сентября", "2025-09-01T00:00:00Z", "2025-09-15T23:59:59Z"),
+    ],
+)
+def test_resolve_period(text: str, start: str, end: str) -> None:
+    period = resolve_period(text, NOW)
+
+    assert period is not None
+    assert (period.start_iso, period.end_iso) == (start, end)
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "Цена SBER@MISX",
+        "Стакан по Газпрому",
+        "Покажи 5 заявок",
+        "",
+        # Суммы, количества и идентификаторы - не годы и не даты
+        "Купи акций Сбера на 2000 рублей",
+        "Купи Газпром на 2000 ₽",
+        "Купи 2025 акций SBER@MISX",
+        "Продай 2010 лотов",
+        "Поставь стоп на 2010",
+        "Статус заявки ORD-2025-01-01",
+        "Счет ACC2024",
+        "Заявка 2025-09-01_v2",
+    ],
+)
+def test_resolve_period_none(text: str) -> None:
+    assert resolve_period(text, NOW) is None
+    assert annotate_period(text, NOW) == text
+
+
+def test_explicit_range_covers_whole_expression() -> None:
+    """Период "между ... и ..." берется целиком, а не только первой датой"""
+    text = "Сделки между 2025-09-01 и 2025-09-15 по счету"
+    period = resolve_period(text, NOW)
+
+    assert period is not None
+    assert period.text == "между 2025-09-01 и 2025-09-15"
+    assert text[period.position[0] : period.position[1]] == period.text
+
+
+@pytest.mark.parametrize(
+    ("text", "timeframe"),
+    [
+        ("За последний час", "TIME_FRAME_M1"),
+        ("Вчера", "TIME_FRAME_M5"),
+        ("За прошлую неделю", "TIME_FRAME_H1"),
+        ("В прошлом месяце", "TIME_FRAME_H4"),
+        ("За прошлый год", "TIME_FRAME_D"),
+        ("За все время", "TIME_FRAME_MN"),
+    ],
+)
+def test_period_timeframe(text: str, timeframe: str) -> None:
+    period = resolve_period(text, NOW)
+
+    assert period is not None
+    assert period.timeframe == timeframe
+    assert infer_timeframe(period.start, period.end) == timeframe
+
+
+def test_annotate_period() -> None:
+    assert annotate_period("Свечи за прошлую неделю по SBER@MISX", NOW) == (
+        "Свечи за прошлую неделю (2025-09-22T00:00:00Z - 2025-09-28T23:59:59Z) по SBER@MISX"
+    )
+    assert annotate_period("Цена SBER@MISX", NOW) == "Цена SBER@MISX"
+    # Дата внутри идентификатора пропускается, период после него все равно находится
+    assert annotate_period("Сделки по ORD-2025-01-01 за 2024 год", NOW) == (
+        "Сделки по ORD-2025-01-01 за 2024 год (2024-01-01T00:00:00Z - 2024-12-31T23:59:59Z)"
+    )
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [
+        ("2025-09-29", datetime(2025, 9, 29, 12, 0, tzinfo=UTC)),
+        ("2025-09-29T08:30:00Z", datetime(2025, 9, 29, 8, 30, tzinfo=UTC)),
+    ],
+)
+def test_reference_now(monkeypatch: pytest.MonkeyPatch, value: str, expected: datetime) -> None:
+    monkeypatch.setenv("REFERENCE_DATE", value)
+    assert reference_now() == expected
@@ -0,0 +1,120 @@
+from datetime import date
+
+import pytest
+
+from src.app.core.ticker_resolver import TickerResolver, contract_month, front_month_futures, get_resolver
+
+TODAY = date(2025, 9, 29)
+
+CATALOG = [
+    {"symbol": symbol, "ticker": symbol.split("@")[0]}
+    for symbol in (
+        "RIH5@RTSX",
+        "RIZ5@RTSX",
+        "RIH6@RTSX",
+        "SiZ5@RTSX",
+        "CRM5@RTSX",
+        "BR-10.25@FORTS",
+        "BR-11.25@FORTS",
+        "SBER@MISX",
+    )
+]
+
+
+@pytest.mark.parametrize(
+    ("question", "expected"),
+    [
+        ("Цена Сбербанка", ["SBER@MISX"]),
+        ("Что по Газпрому?", ["GAZP@MISX"]),
+        ("Сравни Газпром нефть и Лукойл", ["SIBN@MISX", "LKOH@MISX"]),
+        ("Котировки gazprom", ["GAZP@MISX"]),
+        ("Стакан по SBER", ["SBER@MISX"]),
+        ("Стакан по GMKN", ["GMKN@MISX"]),
+        ("стакан по gmkn", []),
+        ("Свечи сбера за неделю", ["SBER@MISX"]),
+        ("Норильский никель и ВТБ", ["GMKN@MISX", "VTBR@MISX"]),
+        ("Цена Сбербанка SBER@MISX", []),
+        # Названия-существительные: только с заглавной буквы или рядом со словом об инструменте
+        ("Какой магнит лучше", []),
+        ("Что на полюсе", []),
+        ("озон в атмосфере", []),
+        ("центр полюса", []),
+        ("Магнит вырос?", ["MGNT@MISX"]),
+        ("Что с акциями магнита?", ["MGNT@MISX"]),
+        ("сколько стоит озон", ["OZON@MISX"]),
+        ("котировки полюса", ["PLZL@MISX"]),
+        ("полюс золото", ["PLZL@MISX"]),
+        # Без каталога коды фьючерсов неизвестны
+        ("Свечи по фьючерсу на нефть", []),
+    ],
+)
+def test_resolve(question: str, expected: list[str]) -> None:
+    assert get_resolver().resolve(question) == expected
+
+
+def test_find_positions() -> None:
+    text = "Сравни Газпром нефть и Газпром"
+    mentions = get_resolver().find(text)
+
+    assert [(m.symbol, m.text) for m in mentions] == [("SIBN@MISX", "Газпром нефть"), ("GAZP@MISX", "Газпром")]
+    assert all(text[m.start : m.end] == m.text for m in mentions)
+
+
+@pytest.mark.parametrize(
+    ("question", "expected"),
+    [
+        ("Что по Газпрому?", "Что по Газпрому (GAZP@MISX)?"),
+        ("Купи акции Сбербанка и сбера", "Купи акции Сбербанка (SBER@MISX) и сбера"),
+        ("Цена SBER@MISX и Сбербанка", "Цена SBER@MISX и Сбербанка"),
+        ("Какой магнит лучше?", "Какой магнит лучше?"),
+        ("Дивиденды магнита", "Дивиденды магнита (MGNT@MISX)"),
+        ("Привет", "Привет"),
+    ],
+)
+def test_annotate(question: str, expected: str) -> None:
+    assert get_resolver().annotate(question) == expected
+
+
+@pytest.mark.parametrize(
+    ("ticker", "expected"),
+    [
+        ("RIZ5", ("RI", 2025, 12)),
+        ("SiH6", ("Si", 2026, 3)),
+        ("RIH4", ("RI", 2034, 3)),
+        ("BR-10.25", ("BR", 2025, 10)),
+        ("BR-13.25", None),
+        ("SBER", None),
+        ("RIZ55", None),
+    ],
+)
+def test_contract_month(ticker: str, expected: tuple[str, int, int] | None) -> None:
+    assert contract_month(ticker, TODAY) == expected
+
+
+def test_front_month_futures() -> None:
+    """Ближайший контракт с месяцем исполнения не раньше текущего; истекший CRM5 пропускается"""
+    assert front_month_futures(CATALOG, TODAY) == {"RI": "RIZ5@RTSX", "Si": "SiZ5@RTSX", "BR": "BR-10.25@FORTS"}
+    assert front_month_futures(CATALOG, date(2025, 12, 20))["RI"] == "RIZ5@RTSX"
+    assert front_month_futures(CATALOG, date(2026, 1, 10))["RI"] == "RIH6@RTSX"
+
+
+@pytest.mark.parametrize(
+    ("question", "expected"),
+    [
+        ("Свечи по фьючерсу на нефть", ["BR-10.25@FORTS"]),
+        ("Лента по фьючерсу на РТС", ["RIZ5@RTSX"]),
+        ("Сделки с фьючерсом на доллар", ["SiZ5@RTSX"]),
+        ("Опционы на фьючерс на юань", []),
+        ("Фьючерс на нефть BRF6@RTSX", []),
+    ],
+)
+def test_futures_from_catalog(question: str, expected: list[str]) -> None:
+    resolver = TickerResolver.from_aliases(assets=CATALOG, today=TODAY)
+    assert resolver.resolve(question) == expected
+
+
+def test_catalog_names() -> None:
+    resolver = TickerResolver.from_aliases(assets=[{"symbol": "T0001@MISX", "ticker": "T0001", "name": "Тестовая"}])
+
+    assert resolver.resolve("Цена Тестовой") == ["T0001@MISX"]
+    assert resolver.resolve("Цена T0001") == ["T0001@MISX"]
@@ -0,0 +1,88 @@
+import gzip
+from collections.abc import Iterator
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+from src.app.core.trace_sink import TraceSink, get_trace_sink, read_traces
+
+
+@pytest.fixture
+def fresh_sink_env() -> Iterator[None]:
+    """get_trace_sink читает переменные окружения один раз на процесс"""
+    get_trace_sink.cache_clear()
+    yield
+    get_trace_sink.cache_clear()
+
+
+def test_write_gzip_jsonl(tmp_path: Path) -> None:
+    """Каждая пачка - отдельный gzip member, файл читается целиком"""
+    sink = TraceSink(tmp_path)
+    assert sink.write("s1", {"step": 1, "day": date(2025, 9, 29)})
+    sink.flush(5)
+    assert sink.write("s1", {"step": 2})
+    sink.flush(5)
+
+    records = read_traces(sink.path("s1"))
+    assert [r["step"] for r in records] == [1, 2]
+    assert records[0]["session"] == "s1"
+    assert records[0]["day"] == "2025-09-29"
+    assert sink.written == 2
+    with gzip.open(sink.path("s1"), "rt", encoding="utf-8") as f:
+        assert len(f.read().splitlines()) == 2
+
+
+def test_sessions_in_separate_files(tmp_path: Path) -> None:
+    sink = TraceSink(tmp_path)
+    sink.write("a", {"n": 1})
+    sink.write("../b c", {"n": 2})
+    sink.flush(5)
+
+    assert sink.path("../b c") == tmp_path / "_b_c.jsonl.gz"
+    assert [r["n"] for r in read_traces(sink.path("a"))] == [1]
+    assert [r["n"] for r in read_traces(sink.path("../b c"))] == [2]
+
+
+def test_rotation(tmp_path: Path) -> None:
+    """Файл больше max_bytes сдвигается в .1, хранится не больше backups архивов"""
+    sink = TraceSink(tmp_path, max_bytes=1, backups=2)
+    for step in range(4):
+        sink.write("s1", {"step": step})
+        sink.flush(5)
+
+    assert not sink.path("s1").exists()
+    assert [r["step"] for r in read_traces(sink.path("s1", 1))] == [3]
+    assert [r["step"] for r in read_traces(sink.path("s1", 2))] == [2]
+    assert not sink.path("s1", 3).exists()
+
+
+def test_rotation_without_backups(tmp_path: Path) -> None:
+    sink = TraceSink(tmp_path, max_bytes=1, backups=0)
+    sink.write("s1", {"step": 0})
+    sink.flush(5)
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_disabled(tmp_path: Path) -> None:
+    sink = TraceSink(tmp_path, enabled=False)
+
+    assert not sink.write("s1", {"step": 0})
+    sink.flush(5)
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.parametrize(("value", "enabled"), [("false", False), ("0", False), ("no", False), ("true", True)])
+def test_trace_enabled_env(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, fresh_sink_env: None, value: str, enabled: bool
+) -> None:
+    monkeypatch.setenv("TRACE_ENABLED", value)
+    monkeypatch.setenv("TRACE_DIR", str(tmp_path))
+    monkeypatch.setenv("TRACE_MAX_BYTES", "2048")
+    sink = get_trace_sink()
+
+    assert (sink.enabled, sink.directory, sink.max_bytes) == (enabled, tmp_path, 2048)
+    assert sink.write("s1", {"step": 0}) is enabled
+    sink.flush(5)
+    assert sink.path("s1").exists() is enabled